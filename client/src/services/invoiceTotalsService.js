@@ -18,7 +18,7 @@ import { apiUrl } from "../utils/api";
  * Creates and updates invoice_log_totals collection with monthly totals per store
  */
 
-// Category IDs that match the invoice categories
+// Category IDs that match the invoice categories (canonical invoice_log_totals keys)
 const CATEGORY_IDS = [
   "FOOD",
   "CONDIMENT",
@@ -107,6 +107,9 @@ export const recomputeMonthlyTotals = async (
         targetMonth: Number(targetMonth),
         targetYear: Number(targetYear),
         totals,
+        // totals keys are the canonical category ids (see the backend's
+        // services/invoice_categories.py), so readers can skip alias matching
+        categorySchema: 1,
         updatedAt: serverTimestamp(),
       },
       { merge: true }
@@ -0,0 +1,3 @@
+"""
+PAC engine benchmarks (run with `python -m benchmarks.run`)
+"""
@@ -0,0 +1,136 @@
+"""
+Event-loop concurrency benchmark for the async Firestore layer
+
+Runs N concurrent DataIngestionService.get_input_data_async calls against
+an in-memory Firestore with a fixed round-trip latency, in two modes:
+
+    blocking  the read sleeps synchronously, as the sync SDK did inside
+              `async def` methods; requests queue behind each other
+    async     the read awaits, as AsyncClient does; requests overlap
+
+It reports wall time, per-request p50/p99 latency and the worst event-loop
+stall seen by a 1 ms heartbeat task.
+
+Usage (from server/python_backend):
+    python -m benchmarks.concurrency --requests 50 --latency-ms 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+from services.data_ingestion_service import DataIngestionService
+from services.sales_index_service import product_net_sales
+
+from .corpus import generate_corpus
+
+
+class _Snapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class _Ref:
+    def __init__(self, db, path: str):
+        self.db, self.path = db, path
+
+    async def get(self):
+        await self.db.round_trip()
+        return _Snapshot(self, self.db.docs.get(self.path))
+
+
+class _Collection:
+    def __init__(self, db, name: str):
+        self.db, self.name = db, name
+
+    def document(self, doc_id: str):
+        return _Ref(self.db, f"{self.name}/{doc_id}")
+
+
+class LatencyFirestore:
+    """In-memory async client stand-in where every round trip takes latency_s"""
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], latency_s: float, blocking: bool):
+        self.docs = docs
+        self.latency_s = latency_s
+        self.blocking = blocking
+
+    async def round_trip(self):
+        if self.blocking:
+            time.sleep(self.latency_s)
+        else:
+            await asyncio.sleep(self.latency_s)
+
+    def collection(self, name: str):
+        return _Collection(self, name)
+
+    async def get_all(self, refs):
+        await self.round_trip()
+        for ref in refs:
+            yield _Snapshot(ref, self.docs.get(ref.path))
+
+
+async def _heartbeat(stop: asyncio.Event, lags: List[float], interval: float = 0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(requests: int, latency_s: float, blocking: bool) -> Dict[str, float]:
+    """Fire `requests` concurrent input loads and time them"""
+    corpus = generate_corpus(requests)
+    docs: Dict[str, Dict[str, Any]] = {}
+    for sm in corpus:
+        docs[f"generate_input/{sm.store_id}_{sm.year_month}"] = sm.generate_input
+        docs[f"invoice_log_totals/{sm.store_id}_{sm.year_month}"] = sm.invoice_log_totals
+        index = docs.setdefault(f"sales_index/{sm.store_id}", {"months": {}, "complete": True})
+        index["months"][sm.year_month] = product_net_sales(sm.generate_input)
+
+    service = DataIngestionService.__new__(DataIngestionService)
+    service._async_db = LatencyFirestore(docs, latency_s, blocking)
+
+    async def one(store_id: str, year_month: str) -> float:
+        # Measured from the common start, so time spent queued counts
+        await service.get_input_data_async(store_id, year_month)
+        return time.perf_counter() - start
+
+    stop, lags = asyncio.Event(), []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one(sm.store_id, sm.year_month) for sm in corpus)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+
+    return {
+        "wall_ms": wall * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "max_loop_stall_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Async Firestore concurrency benchmark")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated round-trip time")
+    args = parser.parse_args(argv)
+
+    print(f"{args.requests} concurrent requests, {args.latency_ms:g} ms per Firestore round trip")
+    print(f"{'mode':10} {'wall ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max stall ms':>14}")
+    for mode, blocking in (("blocking", True), ("async", False)):
+        r = asyncio.run(run_mode(args.requests, args.latency_ms / 1000, blocking))
+        print(f"{mode:10} {r['wall_ms']:>10.1f} {r['p50_ms']:>10.1f} {r['p99_ms']:>10.1f} {r['max_loop_stall_ms']:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
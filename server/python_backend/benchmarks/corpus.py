@@ -0,0 +1,156 @@
+"""
+Synthetic store-month corpus for the PAC engine benchmarks
+
+Documents have the same shape the client writes to Firestore
+(generate_input, invoice_log_totals, projection rows), with values drawn
+from ranges typical of a single restaurant month. Generation is seeded, so
+a given (size, seed) always yields the same corpus.
+"""
+import random
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, List
+
+from models import PacInputData
+from services.pac_formulas import PAC_INPUT_FIELDS, pac_actual_values
+from services.proj_calculation_service import EXPENSE_LIST, TRAVEL_THRU_TRAINING
+
+
+@dataclass
+class StoreMonth:
+    """One synthetic store-month in every shape the engines accept"""
+    store_id: str
+    year_month: str
+    generate_input: Dict[str, Any]
+    invoice_log_totals: Dict[str, Any]
+    input_data: PacInputData
+    rows: List[Dict[str, Any]]
+
+
+def _money(rng: random.Random, low: float, high: float) -> float:
+    return round(rng.uniform(low, high), 2)
+
+
+def make_generate_input(rng: random.Random) -> Dict[str, Any]:
+    """A generate_input document"""
+    sales = _money(rng, 60000, 160000)
+    return {
+        "sales": {
+            "productNetSales": sales,
+            "allNetSales": round(sales * rng.uniform(1.01, 1.05), 2),
+            "promo": _money(rng, 500, 3000),
+            "managerMeal": _money(rng, 100, 600),
+            "cash": _money(rng, -200, 200),
+            "advertising": round(rng.uniform(3.5, 4.5), 2),
+            "duesAndSubscriptions": _money(rng, 0, 150),
+        },
+        "food": {
+            "rawWaste": round(rng.uniform(0.8, 2.5), 2),
+            "completeWaste": round(rng.uniform(1.0, 3.0), 2),
+            "condiment": round(rng.uniform(2.5, 3.5), 2),
+            "variance": round(rng.uniform(-0.5, 0.5), 2),
+            "unexplained": round(rng.uniform(-0.3, 0.3), 2),
+        },
+        "labor": {
+            "crewLabor": round(rng.uniform(22, 28), 2),
+            "totalLabor": round(rng.uniform(30, 36), 2),
+            "payrollTax": round(rng.uniform(7.5, 9.0), 2),
+            "additionalLaborDollars": _money(rng, 0, 800),
+        },
+        "inventoryStarting": {
+            "food": _money(rng, 10000, 18000),
+            "condiment": _money(rng, 1500, 2500),
+            "paper": _money(rng, 2500, 4000),
+            "nonProduct": _money(rng, 800, 1500),
+            "opsSupplies": _money(rng, 400, 700),
+        },
+        "inventoryEnding": {
+            "food": _money(rng, 10000, 18000),
+            "condiment": _money(rng, 1500, 2500),
+            "paper": _money(rng, 2500, 4000),
+            "nonProduct": _money(rng, 800, 1500),
+            "opsSupplies": _money(rng, 400, 700),
+        },
+        "updatedAt": "2025-01-31T12:00:00Z",
+        "submittedBy": "benchmark",
+    }
+
+
+def make_invoice_log_totals(rng: random.Random, product_sales: float) -> Dict[str, Any]:
+    """An invoice_log_totals document scaled to the month's sales"""
+    share = {
+        "FOOD": (0.28, 0.34), "CONDIMENT": (0.02, 0.035), "PAPER": (0.025, 0.04),
+        "NONPRODUCT": (0.008, 0.015), "TRAVEL": (0.002, 0.01), "ADVERTISING": (0.0, 0.005),
+        "ADV-OTHER": (0.002, 0.01), "PROMO": (0.0, 0.01), "OUTSIDE SVC": (0.004, 0.01),
+        "LINEN": (0.002, 0.005), "OP. SUPPLY": (0.002, 0.006), "M+R": (0.004, 0.012),
+        "SML EQUIP": (0.0, 0.004), "UTILITIES": (0.01, 0.02), "OFFICE": (0.001, 0.003),
+        "CREW RELATIONS": (0.001, 0.003), "TRAINING": (0.001, 0.004),
+    }
+    return {
+        "totals": {key: round(product_sales * rng.uniform(*bounds), 2) for key, bounds in share.items()},
+        "categorySchema": 1,
+        "updatedAt": "2025-01-31T12:00:00Z",
+    }
+
+
+def make_input_data(generate_input: Dict[str, Any], invoice_log_totals: Dict[str, Any]) -> PacInputData:
+    """The PacInputData equivalent of a generate_input / invoice_log_totals pair"""
+    values = pac_actual_values(generate_input, invoice_log_totals)
+    values["cash_adjustments"] = values["cash"]
+    fields: Dict[str, Any] = {}
+    for name, path in PAC_INPUT_FIELDS.items():
+        target = fields
+        for attr in path[:-1]:
+            target = target.setdefault(attr, {})
+        target[path[-1]] = Decimal(str(values.get(name, 0.0)))
+    return PacInputData(**fields)
+
+
+def make_rows(rng: random.Random, product_sales: float) -> List[Dict[str, Any]]:
+    """Projection rows as the projections page posts them to /apply"""
+    percents = {
+        "Base Food": (28, 33), "Employee Meal": (0.5, 1.5), "Condiment": (2.5, 3.5),
+        "Total Waste": (2, 4), "Paper": (3, 4.5), "Crew Labor": (22, 28),
+        "Management Labor": (7, 10), "Payroll Tax": (7.5, 9), "Advertising": (3.5, 4.5),
+    }
+    rows = []
+    for name in EXPENSE_LIST:
+        row = {"name": name, "projectedDollar": "", "projectedPercent": ""}
+        if name == "Product Sales":
+            row["projectedDollar"] = product_sales
+        elif name == "All Net Sales":
+            row["projectedDollar"] = round(product_sales * rng.uniform(1.01, 1.05), 2)
+        elif name in percents:
+            row["projectedPercent"] = round(rng.uniform(*percents[name]), 2)
+        elif name in TRAVEL_THRU_TRAINING:
+            row["projectedDollar"] = round(product_sales * rng.uniform(0.001, 0.015), 2)
+        rows.append(row)
+    return rows
+
+
+def generate_corpus(size: int, seed: int = 0) -> List[StoreMonth]:
+    """
+    Build `size` store-months spread over stores of twelve months each
+
+    Args:
+        size: Number of store-months
+        seed: Random seed
+
+    Returns:
+        List of StoreMonth
+    """
+    rng = random.Random(seed)
+    corpus: List[StoreMonth] = []
+    for i in range(size):
+        generate_input = make_generate_input(rng)
+        product_sales = generate_input["sales"]["productNetSales"]
+        invoice_log_totals = make_invoice_log_totals(rng, product_sales)
+        corpus.append(StoreMonth(
+            store_id=f"store_{i // 12 + 1:03d}",
+            year_month=f"2025{i % 12 + 1:02d}",
+            generate_input=generate_input,
+            invoice_log_totals=invoice_log_totals,
+            input_data=make_input_data(generate_input, invoice_log_totals),
+            rows=make_rows(rng, product_sales),
+        ))
+    return corpus
@@ -0,0 +1,234 @@
+"""
+PAC engine micro-benchmarks
+
+Times calculate_pac_actual, PacCalculationService.calculate_pac_from_input,
+ProjCalculationService.apply_all and the vectorized batch engine over
+synthetic corpora, reporting throughput, p50/p99 latency and allocations.
+
+Usage (from server/python_backend):
+    python -m benchmarks.run                      # 1, 100 and 10,000 store-months
+    python -m benchmarks.run --sizes 100 --save   # write the baseline
+    python -m benchmarks.run --compare            # exit 1 on regression vs the baseline
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+from services.account_mapping_service import AccountMappingService
+from services.pac_batch_service import calculate_pac_batch_compact
+from services.pac_calculation_service import PacCalculationService, calculate_pac_actual
+from services.proj_calculation_service import ProjCalculationService
+
+from .corpus import StoreMonth, generate_corpus
+
+
+DEFAULT_SIZES = (1, 100, 10_000)
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "pac_engine.json"
+
+
+class Benchmark(NamedTuple):
+    """fn is called once per item; items are built from the corpus"""
+    name: str
+    items: Callable[[List[StoreMonth]], List[Any]]
+    fn: Callable[[Any], Any]
+    store_months: Callable[[Any], int] = lambda item: 1
+
+
+def _benchmarks() -> List[Benchmark]:
+    pac_service = PacCalculationService(None, AccountMappingService())
+    proj_service = ProjCalculationService(None)
+    return [
+        Benchmark(
+            "calculate_pac_actual",
+            lambda corpus: [(sm.generate_input, sm.invoice_log_totals) for sm in corpus],
+            lambda item: calculate_pac_actual(*item),
+        ),
+        Benchmark(
+            "calculate_pac_from_input",
+            lambda corpus: [sm.input_data for sm in corpus],
+            pac_service.calculate_pac_from_input,
+        ),
+        Benchmark(
+            "apply_all",
+            lambda corpus: [sm.rows for sm in corpus],
+            proj_service.apply_all,
+        ),
+        Benchmark(
+            "calculate_pac_batch",
+            lambda corpus: [[sm.input_data for sm in corpus]],
+            calculate_pac_batch_compact,
+            len,
+        ),
+    ]
+
+
+def _percentile(sorted_ns: Sequence[int], q: float) -> float:
+    index = min(len(sorted_ns) - 1, max(0, round(q * (len(sorted_ns) - 1))))
+    return sorted_ns[index] / 1000.0
+
+
+def measure(
+    bench: Benchmark,
+    corpus: List[StoreMonth],
+    min_samples: int,
+    max_seconds: float,
+    allocations: bool,
+) -> Dict[str, Any]:
+    """
+    Time one benchmark over a corpus
+
+    Every item is called at least once, and the corpus is repeated until
+    min_samples calls have been timed or max_seconds have passed.
+    Allocations are measured on a separate, untimed pass so tracing does
+    not skew latency.
+
+    Returns:
+        {"calls", "store_months_per_s", "p50_us", "p99_us", "mean_us", and
+        "alloc_bytes_per_call", "alloc_blocks_per_call", "peak_kib" if measured}
+    """
+    items = bench.items(corpus)
+    for item in items[:3]:
+        bench.fn(item)  # warm up (graph compile, caches)
+
+    timings: List[int] = []
+    store_months = 0
+    clock = time.perf_counter_ns
+    deadline = clock() + int(max_seconds * 1e9)
+    while not timings or (len(timings) < min_samples and clock() < deadline):
+        for item in items:
+            start = clock()
+            bench.fn(item)
+            timings.append(clock() - start)
+            store_months += bench.store_months(item)
+
+    total_s = sum(timings) / 1e9
+    timings.sort()
+    result: Dict[str, Any] = {
+        "calls": len(timings),
+        "store_months_per_s": round(store_months / total_s, 1) if total_s else None,
+        "p50_us": round(_percentile(timings, 0.50), 2),
+        "p99_us": round(_percentile(timings, 0.99), 2),
+        "mean_us": round(total_s * 1e6 / len(timings), 2),
+    }
+
+    if allocations:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = [bench.fn(item) for item in items]
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        diff = after.compare_to(before, "filename")
+        result["alloc_bytes_per_call"] = round(sum(s.size_diff for s in diff) / len(items), 1)
+        result["alloc_blocks_per_call"] = round(sum(s.count_diff for s in diff) / len(items), 1)
+        result["peak_kib"] = round(peak / 1024, 1)
+        del kept
+    return result
+
+
+def run(
+    sizes: Sequence[int],
+    names: Sequence[str],
+    seed: int,
+    min_samples: int,
+    max_seconds: float,
+    allocations: bool,
+) -> Dict[str, Any]:
+    """Run the selected benchmarks at each size; keys are '<name>@<size>'"""
+    benches = [b for b in _benchmarks() if not names or b.name in names]
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        corpus = generate_corpus(size, seed)
+        for bench in benches:
+            results[f"{bench.name}@{size}"] = measure(bench, corpus, min_samples, max_seconds, allocations)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Regressions of results against a baseline
+
+    A case regresses when its p50 or p99 latency grows, or its throughput
+    drops, by more than `threshold` (a fraction).
+    """
+    regressions: List[str] = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric in ("p50_us", "p99_us"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {current[metric]}")
+        before, after = previous.get("store_months_per_s"), current.get("store_months_per_s")
+        if before and after and after < before / (1 + threshold):
+            regressions.append(f"{key}: store_months_per_s {before} -> {after}")
+    return regressions
+
+
+def _print_table(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    header = f"{'case':36} {'sm/s':>12} {'p50 us':>10} {'p99 us':>10} {'B/call':>10} {'blk/call':>9} {'vs p50':>8}"
+    print(header)
+    print("-" * len(header))
+    for key, r in results.items():
+        previous = baseline.get(key, {}).get("p50_us")
+        delta = f"{(r['p50_us'] / previous - 1) * 100:+.0f}%" if previous else ""
+        print(
+            f"{key:36} {r['store_months_per_s'] or 0:>12,.0f} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f}"
+            f" {r.get('alloc_bytes_per_call', 0):>10,.0f} {r.get('alloc_blocks_per_call', 0):>9,.0f} {delta:>8}"
+        )
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="PAC engine micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Corpus sizes in store-months")
+    parser.add_argument("--bench", nargs="+", default=[], help="Only these benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-samples", type=int, default=200,
+                        help="Minimum timed calls per case (small corpora are repeated)")
+    parser.add_argument("--max-seconds", type=float, default=5.0,
+                        help="Stop repeating a case after this long (one full pass always runs)")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip allocation tracing")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 if any case regressed")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown as a fraction before --compare fails")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.bench, args.seed, args.min_samples, args.max_seconds, not args.no_alloc)
+
+    baseline: Dict[str, Any] = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text()).get("results", {})
+    _print_table(results, baseline)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+            },
+            "results": {**baseline, **results},
+        }, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
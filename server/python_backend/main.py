@@ -4,10 +4,13 @@ Compatible with x86, ARM64 (Windows/macOS/Linux)
 """
 import os
 import platform
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import APIRouter
 from dotenv import load_dotenv
+from services.config_cache import get_config_cache
+from services.document_loader import document_loader_scope
 
 # Load env first so services see OPENAI_API_KEY, etc.
 load_dotenv()
@@ -52,6 +55,22 @@ def initialize_firebase() -> bool:
 
 FIREBASE_INITIALIZED = initialize_firebase()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume cascade recomputes a previous process left queued; stop the workers on shutdown"""
+    from services.recompute_queue import get_recompute_queue
+    from services.storage import get_storage
+    queue = get_recompute_queue()
+    if get_storage().is_available():
+        try:
+            resumed = await queue.resume()
+            if resumed:
+                print(f"🔁 Resumed {resumed} unfinished recompute jobs")
+        except Exception as e:
+            print(f"⚠️ Could not resume recompute jobs: {e}")
+    yield
+    await queue.close()
+
 # -------------
 # FastAPI app
 # -------------
@@ -61,6 +80,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS (tighten in prod)
@@ -79,6 +99,13 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def document_loader_per_request(request: Request, call_next):
+    """Share one Firestore document loader across everything a request reads"""
+    with document_loader_scope():
+        return await call_next(request)
+
+
 # Include routers...
 try:
     from routers import router as api_router, compat as compat_router
@@ -224,14 +251,13 @@ def get_me(identity=Depends(get_identity)):
 def list_stores(identity=Depends(get_identity)):
     db = _firestore()
     if db:
-        snaps = db.collection("stores").stream()
+        docs = get_config_cache(db, "stores").documents_sync()
         stores: List[Store] = []
-        for d in snaps:
-            data = d.to_dict() or {}
+        for doc_id, data in docs.items():
             # Explicit mapping to avoid 'id' collision when Firestore doc has an 'id' field
             stores.append(
                 Store(
-                    id=str(d.id),
+                    id=str(doc_id),
                     name=str(data.get("name", "")),
                     address=str(data.get("address", "")),
                 )
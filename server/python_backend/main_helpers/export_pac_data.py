@@ -0,0 +1,57 @@
+"""
+Export pac_actual or pac-projections to a flat CSV or Parquet file
+
+See services.pac_export_service for the columns. Documents are read page by
+page, so exports of every store and year run in constant memory.
+
+Usage (from server/python_backend):
+    python -m main_helpers.export_pac_data actual --from 202401 --to 202412
+    python -m main_helpers.export_pac_data actual --format parquet --stores store_001,store_002 -o pac.parquet
+    python -m main_helpers.export_pac_data projections --output projections.csv
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import List, Optional
+
+from services.pac_export_service import EXPORT_FORMATS, export_collection
+from services.storage import MAX_BATCH_WRITES, get_storage
+
+DATASETS = {"actual": "pac_actual", "projections": "pac-projections"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--stores", help="comma-separated store ids (default: all stores)")
+    parser.add_argument("--from", dest="from_ym", help="first month as YYYYMM")
+    parser.add_argument("--to", dest="to_ym", help="last month as YYYYMM")
+    parser.add_argument("-o", "--output", help="output file (default: <collection>.<format>)")
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    storage = get_storage()
+    if not storage.is_available():
+        from main import initialize_firebase
+        if not initialize_firebase():
+            print("Firebase is not configured; set PAC_STORAGE_BACKEND=sqlite for a local database")
+            return 1
+
+    collection = DATASETS[args.dataset]
+    output = args.output or f"{collection}.{args.format}"
+    store_ids = [store.strip() for store in args.stores.split(",") if store.strip()] if args.stores else None
+    mode = {"mode": "w", "newline": "", "encoding": "utf-8"} if args.format == "csv" else {"mode": "wb"}
+    with open(output, **mode) as out:
+        count = asyncio.run(export_collection(
+            storage, collection, args.format, out,
+            store_ids=store_ids, from_ym=args.from_ym, to_ym=args.to_ym, page_size=args.page_size,
+        ))
+    print(f"Wrote {count} {collection} rows to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
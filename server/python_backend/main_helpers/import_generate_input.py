@@ -0,0 +1,70 @@
+"""
+Bulk import generate_input from a POS / payroll CSV or XLSX export
+
+See services.generate_input_import for the accepted columns. The job id
+defaults to the file name; rerun the same command after an interruption
+to resume from the last committed batch.
+
+Usage (from server/python_backend):
+    python -m main_helpers.import_generate_input exports/2025-q1.csv
+    python -m main_helpers.import_generate_input exports/2025-q1.xlsx --job-id q1 --no-recompute
+    PAC_STORAGE_BACKEND=sqlite python -m main_helpers.import_generate_input exports/2025-q1.csv
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+from services.generate_input_import import GenerateInputImporter, iter_export_rows
+from services.storage import MAX_BATCH_WRITES, get_storage
+
+
+def _print_progress(job: Dict[str, Any]) -> None:
+    print(
+        f"  {job['rowsRead']} rows read, {job['rowsWritten']} written, "
+        f"{job['rowsInvalid']} invalid ({job['batches']} batches)"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="CSV or XLSX export, one row per store-month")
+    parser.add_argument("--job-id", help="checkpoint id (default: the file name)")
+    parser.add_argument("--submitted-by", default="Bulk import")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_WRITES)
+    parser.add_argument("--no-recompute", action="store_true", help="skip the PAC actual recompute")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    storage = get_storage()
+    if not storage.is_available():
+        from main import initialize_firebase
+        if not initialize_firebase():
+            print("Firebase is not configured; set PAC_STORAGE_BACKEND=sqlite for a local database")
+            return 1
+
+    source = os.path.basename(args.path)
+    importer = GenerateInputImporter(storage, args.batch_size)
+    job = asyncio.run(importer.run(
+        iter_export_rows(args.path),
+        args.job_id or source,
+        source=source,
+        submitted_by=args.submitted_by,
+        recompute=not args.no_recompute,
+        progress=_print_progress,
+    ))
+
+    for error in job["errors"]:
+        print(f"  skipped {error}")
+    store_months = sum(len(months) for months in job["affected"].values())
+    print(f"Imported {job['rowsWritten']} rows into {store_months} store-months ({job['rowsInvalid']} invalid)")
+    if "recompute" in job:
+        recompute = job["recompute"]
+        print(f"Recomputed {len(recompute['recomputed'])} PAC actual months, {len(recompute['cascaded'])} cascaded")
+    return 0 if not job["rowsInvalid"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
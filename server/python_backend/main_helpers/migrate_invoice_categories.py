@@ -0,0 +1,96 @@
+"""
+Rewrite invoice_log_totals documents to canonical category keys
+
+Pages through the collection in document id order and rewrites every
+document without the current categorySchema marker (see
+services.invoice_categories), one storage batch per page. The job is
+idempotent: rerunning it, or resuming with --start-after after an
+interruption, skips documents that are already canonical.
+
+Recompute pac_actual afterwards for months whose totals used alias keys
+(e.g. "PROMOTION"), since the engine now reads them.
+
+Usage (from server/python_backend):
+    python -m main_helpers.migrate_invoice_categories --dry-run
+    python -m main_helpers.migrate_invoice_categories
+    PAC_STORAGE_BACKEND=sqlite python -m main_helpers.migrate_invoice_categories
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Dict, List, Optional
+
+from services.invoice_categories import canonical_invoice_totals_doc
+from services.storage import MAX_BATCH_WRITES, DocumentStorage, WriteOp, get_storage
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "invoice_log_totals"
+
+
+async def migrate_invoice_totals(
+    storage: DocumentStorage,
+    dry_run: bool = False,
+    page_size: int = MAX_BATCH_WRITES,
+    start_after: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Rewrite non-canonical invoice_log_totals documents
+
+    Args:
+        storage: Backend to migrate
+        dry_run: Count the documents that would change without writing
+        page_size: Documents read and written per batch (at most MAX_BATCH_WRITES)
+        start_after: Resume after this document id
+
+    Returns:
+        Counts of documents scanned and rewritten
+    """
+    page_size = min(page_size, MAX_BATCH_WRITES)
+    scanned = rewritten = 0
+    cursor = start_after
+    while True:
+        page = await storage.scan(COLLECTION, start_after=cursor, limit=page_size)
+        if not page:
+            break
+        ops: List[WriteOp] = []
+        for doc_id, data in page:
+            canonical = canonical_invoice_totals_doc(data)
+            if canonical is not None:
+                # Full replace so the alias keys are dropped
+                ops.append(WriteOp(COLLECTION, doc_id, canonical))
+        if ops and not dry_run:
+            await storage.batch(ops)
+        scanned += len(page)
+        rewritten += len(ops)
+        cursor = page[-1][0]
+        logger.info(f"Migrated invoice totals through {cursor}: {scanned} scanned, {rewritten} rewritten")
+        if len(page) < page_size:
+            break
+    return {"scanned": scanned, "rewritten": rewritten}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES)
+    parser.add_argument("--start-after", help="resume after this document id")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    storage = get_storage()
+    if not storage.is_available():
+        from main import initialize_firebase
+        if not initialize_firebase():
+            print("Firebase is not configured; set PAC_STORAGE_BACKEND=sqlite for a local database")
+            return 1
+
+    counts = asyncio.run(migrate_invoice_totals(storage, args.dry_run, args.page_size, args.start_after))
+    verb = "would rewrite" if args.dry_run else "rewrote"
+    print(f"Scanned {counts['scanned']} {COLLECTION} documents, {verb} {counts['rewritten']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Upgrade pac-projections documents to the current projection schema
+
+Pages through the collection in document id order and merges the indexed
+lines and structured fields (see services.projection_schema) into every
+document without the current schemaVersion, one storage batch per page.
+Rows and the other stored fields are left as they are. The job is
+idempotent: rerunning it, or resuming with --start-after after an
+interruption, skips documents that are already current.
+
+Usage (from server/python_backend):
+    python -m main_helpers.migrate_projection_schema --dry-run
+    python -m main_helpers.migrate_projection_schema
+    PAC_STORAGE_BACKEND=sqlite python -m main_helpers.migrate_projection_schema
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Dict, List, Optional
+
+from services.projection_schema import projection_upgrade
+from services.storage import MAX_BATCH_WRITES, DocumentStorage, WriteOp, get_storage
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "pac-projections"
+
+
+async def migrate_projections(
+    storage: DocumentStorage,
+    dry_run: bool = False,
+    page_size: int = MAX_BATCH_WRITES,
+    start_after: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Upgrade pac-projections documents written before the current schema
+
+    Args:
+        storage: Backend to migrate
+        dry_run: Count the documents that would change without writing
+        page_size: Documents read and written per batch (at most MAX_BATCH_WRITES)
+        start_after: Resume after this document id
+
+    Returns:
+        Counts of documents scanned and upgraded
+    """
+    page_size = min(page_size, MAX_BATCH_WRITES)
+    scanned = upgraded = 0
+    cursor = start_after
+    while True:
+        page = await storage.scan(COLLECTION, start_after=cursor, limit=page_size)
+        if not page:
+            break
+        ops: List[WriteOp] = []
+        for doc_id, data in page:
+            upgrade = projection_upgrade(data)
+            if upgrade is not None:
+                # Merge only the derived fields, so a concurrent save keeps its rows
+                ops.append(WriteOp(COLLECTION, doc_id, upgrade, merge=True))
+        if ops and not dry_run:
+            await storage.batch(ops)
+        scanned += len(page)
+        upgraded += len(ops)
+        cursor = page[-1][0]
+        logger.info(f"Migrated projections through {cursor}: {scanned} scanned, {upgraded} upgraded")
+        if len(page) < page_size:
+            break
+    return {"scanned": scanned, "upgraded": upgraded}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES)
+    parser.add_argument("--start-after", help="resume after this document id")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    storage = get_storage()
+    if not storage.is_available():
+        from main import initialize_firebase
+        if not initialize_firebase():
+            print("Firebase is not configured; set PAC_STORAGE_BACKEND=sqlite for a local database")
+            return 1
+
+    counts = asyncio.run(migrate_projections(storage, args.dry_run, args.page_size, args.start_after))
+    verb = "would upgrade" if args.dry_run else "upgraded"
+    print(f"Scanned {counts['scanned']} {COLLECTION} documents, {verb} {counts['upgraded']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
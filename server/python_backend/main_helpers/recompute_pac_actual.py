@@ -0,0 +1,67 @@
+"""
+Recompute pac_actual for a set of stores and months in bulk
+
+See services.pac_bulk_recompute. Run it after a formula fix or an invoice
+category remap; calculations are spread over --workers processes. Months
+whose inputs and formulas have not changed since they were last computed
+are skipped unless --force is given.
+
+Usage (from server/python_backend):
+    python -m main_helpers.recompute_pac_actual
+    python -m main_helpers.recompute_pac_actual --stores store_001,store_002 --from 202401 --to 202412
+    PAC_STORAGE_BACKEND=sqlite python -m main_helpers.recompute_pac_actual --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, List, Optional
+
+from services.pac_bulk_recompute import BULK_USER, BulkRecompute
+from services.storage import MAX_BATCH_WRITES, get_storage
+
+
+def _print_progress(job: Dict[str, Any]) -> None:
+    print(
+        f"  {job['monthsRead']} months read, {job['monthsWritten']} written, "
+        f"{job['monthsUnchanged']} unchanged, {job['monthsFailed']} failed "
+        f"({job['monthsPerSecond']:.1f} months/s)"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", help="comma-separated store ids (default: all stores)")
+    parser.add_argument("--from", dest="from_ym", help="first month as YYYYMM")
+    parser.add_argument("--to", dest="to_ym", help="last month as YYYYMM")
+    parser.add_argument("--workers", type=int, help="calculation processes (default: CPU count; 0 = none)")
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES)
+    parser.add_argument("--submitted-by", default=BULK_USER)
+    parser.add_argument("--force", action="store_true", help="also rewrite months whose inputs have not changed")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    storage = get_storage()
+    if not storage.is_available():
+        from main import initialize_firebase
+        if not initialize_firebase():
+            print("Firebase is not configured; set PAC_STORAGE_BACKEND=sqlite for a local database")
+            return 1
+
+    store_ids = [store.strip() for store in args.stores.split(",") if store.strip()] if args.stores else None
+    bulk = BulkRecompute(storage, workers=args.workers, page_size=args.page_size)
+    job = BulkRecompute.new_job(store_ids, args.from_ym, args.to_ym, force=args.force)
+    print(f"Bulk recompute {job['jobId']} with {bulk.workers or 'no'} worker processes")
+    job = asyncio.run(bulk.run(job, args.submitted_by, progress=_print_progress))
+
+    for error in job["errors"]:
+        print(f"  {error}")
+    print(
+        f"Recomputed {job['monthsWritten']} PAC actual months in {job['elapsedSeconds']:.1f}s "
+        f"({job['monthsPerSecond']:.1f} months/s, {job['monthsUnchanged']} unchanged, {job['monthsFailed']} failed)"
+    )
+    return 0 if job["status"] == "completed" and not job["monthsFailed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
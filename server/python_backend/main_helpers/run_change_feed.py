@@ -0,0 +1,68 @@
+"""
+Keep pac_actual current by recomputing months whose sources change
+
+See services.change_feed_worker. Run exactly one of these per Firestore
+project, next to the API; stop it with Ctrl+C (months still waiting are
+recomputed before it exits).
+
+Usage (from server/python_backend):
+    python -m main_helpers.run_change_feed
+    python -m main_helpers.run_change_feed --debounce 10 --max-delay 120
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from typing import List, Optional
+
+from services.change_feed_worker import get_change_feed_worker
+from services.storage import get_storage
+
+
+async def _run(worker) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    worker.start()
+    try:
+        await worker.run(stop)
+    finally:
+        worker.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--debounce", type=float, help="seconds a month must be quiet before it is recomputed")
+    parser.add_argument("--max-delay", type=float, help="longest a month that keeps changing waits")
+    parser.add_argument("--batch-size", type=int, help="months recomputed per batch")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from main import initialize_firebase
+    if not initialize_firebase():
+        print("Firebase is not configured; the change feed listens to Firestore")
+        return 1
+    from firebase_admin import firestore
+
+    worker = get_change_feed_worker(firestore.client(), get_storage())
+    if args.debounce is not None:
+        worker.debounce_seconds = args.debounce
+    if args.max_delay is not None:
+        worker.max_delay_seconds = max(args.max_delay, worker.debounce_seconds)
+    if args.batch_size is not None:
+        worker.batch_size = max(1, args.batch_size)
+    try:
+        asyncio.run(_run(worker))
+    except KeyboardInterrupt:
+        pass
+    print(f"Change feed stopped: {worker.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
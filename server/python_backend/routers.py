@@ -1,16 +1,25 @@
 """
 FastAPI routers for PAC calculations
 """
+import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import json
 
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Security, Request, Query, Path
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from models import PacCalculationResult, PacInputData
-from services.pac_calculation_service import PacCalculationService
+from services.pac_calculation_service import PacCalculationService, normalize_store_id
+from services.pac_cache import get_pac_cache
+from services.projection_schema import current_projection, projection_line
+from services.config_cache import config_cache_stats
 from services.data_ingestion_service import DataIngestionService
+from services.document_loader import document_loader
+from services.pac_actual_service import PacActualService
+from services.recompute_queue import get_recompute_queue
+from services.storage import DocumentStorage, get_firestore_storage, get_storage
 from services.account_mapping_service import AccountMappingService
 from services.proj_calculation_service import (
     ProjCalculationService,
@@ -50,6 +59,20 @@ class ProjectionsSaveIn(BaseModel):
 class ApplyRowsIn(BaseModel):
     rows: List[Dict[str, Any]]
 
+class GoalSeekItemIn(BaseModel):
+    variable: str  # product_sales | crew_labor_percent | purchase
+    line: Optional[str] = None  # purchases row name when variable == "purchase"
+    target_pac_percent: Optional[float] = None  # defaults to the saved pacGoal
+    rows: Optional[List[Dict[str, Any]]] = None  # otherwise seeded from saved projections
+    store_id: Optional[str] = None
+    year: Optional[int] = None
+    month_index_1: Optional[int] = None
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+
+class GoalSeekIn(BaseModel):
+    items: List[GoalSeekItemIn]
+
 class HistoricalIn(BaseModel):
     store_id: str
     year: int
@@ -167,7 +190,7 @@ def require_auth(credentials: HTTPAuthorizationCredentials = Security(security_s
 
 
 def require_roles(allowed_roles: List[str]):
-    def _checker(
+    async def _checker(
         auth_ctx: Dict[str, Any] = Depends(require_auth),
         request: Request = None,
     ) -> Dict[str, Any]:
@@ -182,16 +205,12 @@ def require_roles(allowed_roles: List[str]):
         # 2) If not in claims, and we have an email + Firebase, look up Firestore 'users' doc
         if role is None and auth_ctx.get("email"):
             try:
-                import firebase_admin  # type: ignore
-                from firebase_admin import firestore  # type: ignore
-                if firebase_admin._apps:
-                    db = firestore.client()
-                    user_doc = db.collection("users").document(auth_ctx["email"]).get()
-                    if user_doc.exists:
-                        data = user_doc.to_dict() or {}
-                        r = data.get("role")
-                        if isinstance(r, str):
-                            role = r
+                storage = get_firestore_storage()
+                if storage.is_available():
+                    data = await document_loader(storage).load("users", auth_ctx["email"])
+                    r = (data or {}).get("role")
+                    if isinstance(r, str):
+                        role = r
             except Exception:
                 # Firestore not available or lookup failed; fall back below
                 pass
@@ -219,6 +238,22 @@ def get_pac_calculation_service() -> PacCalculationService:
     return PacCalculationService(data_ingestion_service, account_mapping_service)
 
 
+def _pac_storage() -> DocumentStorage:
+    """Storage backend for PAC documents (PAC_STORAGE_BACKEND); 503 if it cannot serve"""
+    storage = get_storage()
+    if not storage.is_available():
+        raise HTTPException(status_code=503, detail=f"{storage.name} storage not available")
+    return storage
+
+
+def _firestore_storage() -> DocumentStorage:
+    """Firestore, for the collections only it holds (month_locks, ...); 503 if it cannot serve"""
+    storage = get_firestore_storage()
+    if not storage.is_available():
+        raise HTTPException(status_code=503, detail="Firebase not initialized")
+    return storage
+
+
 def get_invoice_reader() -> InvoiceReader:
     """
     Lazily construct the InvoiceReader so the app can start
@@ -529,6 +564,115 @@ async def get_allowed_stores(
         raise HTTPException(status_code=500, detail="Failed to fetch allowed stores")
 
 # ---- PAC Routes ----
+class PacBatchItemIn(BaseModel):
+    entity_id: str
+    year_month: str  # YYYYMM format
+
+
+class PacBatchIn(BaseModel):
+    items: List[PacBatchItemIn]
+
+
+@router.post("/calc/batch")
+async def get_pac_calculations_batch(
+    payload: PacBatchIn,
+    pac_service: PacCalculationService = Depends(get_pac_calculation_service),
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Calculate PAC for many store-months in one vectorized pass (e.g. month close).
+    """
+    for item in payload.items:
+        if not is_valid_year_month(item.year_month):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid yearMonth '{item.year_month}'. Expected YYYYMM (e.g., 202501)",
+            )
+    try:
+        keys = [(item.entity_id, item.year_month) for item in payload.items]
+        results = await pac_service.calculate_pac_batch_async(keys)
+        return {
+            "results": [
+                {"entity_id": entity_id, "year_month": year_month, "result": result.to_model()}
+                for (entity_id, year_month), result in zip(keys, results)
+            ],
+            "count": len(results),
+        }
+    except Exception as ex:
+        raise HTTPException(status_code=500, detail=f"Error calculating PAC batch: {str(ex)}")
+
+
+class ScenarioAxisIn(BaseModel):
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    steps: Optional[int] = None
+
+
+class PacScenarioIn(BaseModel):
+    entity_id: str
+    year_month: str  # YYYYMM format
+    axes: Dict[str, ScenarioAxisIn]  # lever -> deltas, see pac_scenario_service.SCENARIO_LEVERS
+
+
+@router.post("/calc/scenario")
+async def get_pac_scenario(
+    payload: PacScenarioIn,
+    pac_service: PacCalculationService = Depends(get_pac_calculation_service),
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    What-if PAC surface for one store-month over a grid of lever adjustments
+    (crew labor %, waste %, condiment %, advertising %, product sales), in one vectorized pass.
+    """
+    if not is_valid_year_month(payload.year_month):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid yearMonth '{payload.year_month}'. Expected YYYYMM (e.g., 202501)",
+        )
+    try:
+        axes = {name: axis.model_dump() for name, axis in payload.axes.items()}
+        return {
+            "entity_id": payload.entity_id,
+            "year_month": payload.year_month,
+            **await pac_service.calculate_scenario_async(payload.entity_id, payload.year_month, axes),
+        }
+    except ValueError as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    except Exception as ex:
+        raise HTTPException(status_code=500, detail=f"Error calculating PAC scenario: {str(ex)}")
+
+
+@router.get("/cache/stats")
+async def get_pac_cache_stats(
+    _auth: Dict[str, Any] = Depends(require_roles(["Admin"])),
+) -> Dict[str, Any]:
+    """
+    PAC result cache size, hit/miss counters and configuration. Admin only.
+    """
+    return get_pac_cache().stats()
+
+
+@router.get("/cache/config-stats")
+async def get_config_cache_stats(
+    _auth: Dict[str, Any] = Depends(require_roles(["Admin"])),
+) -> Dict[str, Any]:
+    """
+    Refresh mode and hit/load counters of the configuration collection caches. Admin only.
+    """
+    return config_cache_stats()
+
+
+@router.get("/cache/recompute-stats")
+async def get_recompute_queue_stats(
+    _auth: Dict[str, Any] = Depends(require_roles(["Admin"])),
+) -> Dict[str, Any]:
+    """
+    Background cascade recompute queue depth and counters. Admin only.
+    """
+    return get_recompute_queue().stats()
+
+
 @router.get("/calc/{entity_id}/{year_month}", response_model=PacCalculationResult)
 async def get_pac_calculations(
     entity_id: str,
@@ -636,321 +780,47 @@ async def compute_and_save_pac_actual(
     """
     Compute and save PAC actual data to Firebase.
     This replaces the frontend pacActualService.js computeAndSavePacActual function.
+    When the stored document was computed from the same inputs, it is not
+    recomputed and no cascade is queued ("unchanged": true).
     """
     try:
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
-        
-        # Normalize store ID using the service function
-        from services.pac_calculation_service import normalize_store_id
-        store_id = normalize_store_id(payload.store_id)
+        storage = _pac_storage()
         
         year_month = payload.year_month
         if len(year_month) != 6 or not year_month.isdigit():
             raise HTTPException(status_code=400, detail="year_month must be in YYYYMM format")
         
-        year = int(year_month[:4])
         month_num = int(year_month[4:])
         if month_num < 1 or month_num > 12:
             raise HTTPException(status_code=400, detail="Invalid month in year_month")
         
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        month = month_names[month_num - 1]
-        
-        doc_id = f"{store_id}_{year_month}"
-        
-        # Fetch data from collections
-        generate_input_doc = db.collection("generate_input").document(doc_id).get()
-        invoice_log_totals_doc = db.collection("invoice_log_totals").document(doc_id).get()
-        pac_projections_doc = db.collection("pac-projections").document(doc_id).get()
-        
-        if not generate_input_doc.exists:
+        # Sources and the sales index go through the request's document loader
+        service = PacActualService(storage, document_loader(storage))
+        computed = await service.compute(payload.store_id, year_month, payload.submitted_by, cascade=False)
+        if computed is None:
             raise HTTPException(status_code=404, detail="No generate input data found")
-        
-        generate_input = generate_input_doc.to_dict() or {}
-        invoice_log_totals = invoice_log_totals_doc.to_dict() if invoice_log_totals_doc.exists else {"totals": {}}
-        pac_projections = pac_projections_doc.to_dict() if pac_projections_doc.exists else {}
-        
-        # Fetch Last Year Same Month Data
-        last_year = year - 1
-        last_year_doc_id = f"{store_id}_{last_year}{month_num:02d}"
-        
-        last_year_generate_input_doc = db.collection("generate_input").document(last_year_doc_id).get()
-        last_year_sales = 0.0
-        if last_year_generate_input_doc.exists:
-            data = last_year_generate_input_doc.to_dict() or {}
-            # Handle potential string/float values safely
-            try:
-                last_year_sales = float(data.get("sales", {}).get("productNetSales") or 0)
-            except (ValueError, TypeError):
-                last_year_sales = 0.0
-
-        # Fetch Last Year Same Month Last Year Data (2 years ago)
-        last_year_last_year = last_year - 1
-        last_year_last_year_doc_id = f"{store_id}_{last_year_last_year}{month_num:02d}"
-        
-        last_year_last_year_generate_input_doc = db.collection("generate_input").document(last_year_last_year_doc_id).get()
-        last_year_last_year_sales = 0.0
-        if last_year_last_year_generate_input_doc.exists:
-            data = last_year_last_year_generate_input_doc.to_dict() or {}
-            try:
-                last_year_last_year_sales = float(data.get("sales", {}).get("productNetSales") or 0)
-            except (ValueError, TypeError):
-                last_year_last_year_sales = 0.0
-
-        # Fetch Last Month Data
-        # Calculate previous month
-        if month_num == 1:
-            last_month_year = year - 1
-            last_month_num = 12
-        else:
-            last_month_year = year
-            last_month_num = month_num - 1
-            
-        last_month_doc_id = f"{store_id}_{last_month_year}{last_month_num:02d}"
-        last_month_generate_input_doc = db.collection("generate_input").document(last_month_doc_id).get()
-        last_month_sales = 0.0
-        if last_month_generate_input_doc.exists:
-            data = last_month_generate_input_doc.to_dict() or {}
-            try:
-                last_month_sales = float(data.get("sales", {}).get("productNetSales") or 0)
-            except (ValueError, TypeError):
-                last_month_sales = 0.0
 
-        # Fetch Last Month Last Year Data (for YoY calc on Last Month)
-        last_month_last_year_year = last_month_year - 1
-        last_month_last_year_doc_id = f"{store_id}_{last_month_last_year_year}{last_month_num:02d}"
-        
-        last_month_last_year_generate_input_doc = db.collection("generate_input").document(last_month_last_year_doc_id).get()
-        last_month_last_year_sales = 0.0
-        if last_month_last_year_generate_input_doc.exists:
-            data = last_month_last_year_generate_input_doc.to_dict() or {}
-            try:
-                last_month_last_year_sales = float(data.get("sales", {}).get("productNetSales") or 0)
-            except (ValueError, TypeError):
-                last_month_last_year_sales = 0.0
-
-        # Use the PAC actual calculation function
-        from services.pac_calculation_service import calculate_pac_actual
-        
-        # Calculate PAC actual using the original JS logic
-        pac_actual_data = calculate_pac_actual(
-            generate_input,
-            invoice_log_totals,
-            pac_projections
-        )
-        
-        # Add comparison data to pac_actual_data
-        # This will be saved into the document
-        pac_actual_data["salesComparison"] = {
-            "lastYearProductSales": last_year_sales,
-            "lastMonthProductSales": last_month_sales,
-            "lastMonthLastYearProductSales": last_month_last_year_sales,
-            "lastYearLastYearProductSales": last_year_last_year_sales
-        }
-        
-        # Determine last updated timestamp and user
-        timestamps = []
-        if generate_input.get("updatedAt"):
-            timestamps.append({
-                "timestamp": generate_input.get("updatedAt"),
-                "user": generate_input.get("submittedBy", payload.submitted_by),
-            })
-        if invoice_log_totals.get("updatedAt"):
-            timestamps.append({
-                "timestamp": invoice_log_totals.get("updatedAt"),
-                "user": invoice_log_totals.get("updatedBy", payload.submitted_by),
-            })
-        if pac_projections.get("updatedAt"):
-            timestamps.append({
-                "timestamp": pac_projections.get("updatedAt"),
-                "user": pac_projections.get("updatedBy", payload.submitted_by),
-            })
-        
-        most_recent = timestamps[0] if timestamps else {"timestamp": None, "user": payload.submitted_by}
-        for ts in timestamps[1:]:
-            if ts["timestamp"] and (not most_recent["timestamp"] or ts["timestamp"] > most_recent["timestamp"]):
-                most_recent = ts
-        
-        # Build the PAC actual document structure matching the JS service
-        pac_actual_doc = {
-            "storeID": store_id,
-            "store": f"Store {store_id.split('_')[1] if '_' in store_id else store_id}",
-            "year": year,
-            "month": month,
-            "monthNumber": month_num,
-            "lastUpdatedAt": firestore.SERVER_TIMESTAMP,
-            "lastUpdatedBy": payload.submitted_by,
-            "sourceData": {
-                "generateInputUpdatedAt": generate_input.get("updatedAt"),
-                "generateInputUpdatedBy": generate_input.get("submittedBy", payload.submitted_by),
-                "invoiceLogTotalsUpdatedAt": invoice_log_totals.get("updatedAt"),
-                "invoiceLogTotalsUpdatedBy": invoice_log_totals.get("updatedBy", payload.submitted_by),
-                "pacProjectionsUpdatedAt": pac_projections.get("updatedAt"),
-                "pacProjectionsUpdatedBy": pac_projections.get("updatedBy", payload.submitted_by),
-                "mostRecentSourceUpdatedAt": most_recent.get("timestamp"),
-                "mostRecentSourceUpdatedBy": most_recent.get("user"),
-            },
-            **pac_actual_data,
-        }
-        
-        # Save to Firestore
-        db.collection("pac_actual").document(doc_id).set(pac_actual_doc, merge=True)
-        
-        # Trigger cascading recomputes for months that depend on this month's data
-        # Only trigger if not already a cascade (to prevent infinite loops)
-        cascade_triggered = getattr(payload, 'is_cascade', False) if hasattr(payload, 'is_cascade') else False
-        cascaded_months = []
-        
-        if not cascade_triggered:
-            # Calculate dependent months
-            dependent_months = []
-            
-            # Next year same month (uses this month as "Last Year Same Month")
-            next_year_same_month = f"{year + 1}{month_num:02d}"
-            dependent_months.append(next_year_same_month)
-            
-            # Next month (uses this month as "Last Month")
-            if month_num == 12:
-                next_month = f"{year + 1}01"
-            else:
-                next_month = f"{year}{month_num + 1:02d}"
-            dependent_months.append(next_month)
-            
-            # Next year next month (uses this month as "Last Month Last Year")
-            if month_num == 12:
-                next_year_next_month = f"{year + 2}01"
-            else:
-                next_year_next_month = f"{year + 1}{month_num + 1:02d}"
-            dependent_months.append(next_year_next_month)
-            
-            # Trigger recomputes for dependent months that have existing pac_actual data
-            for dep_month in dependent_months:
-                dep_doc_id = f"{store_id}_{dep_month}"
-                dep_pac_actual = db.collection("pac_actual").document(dep_doc_id).get()
-                
-                if dep_pac_actual.exists:
-                    # This month has PAC actual data, recompute it
-                    try:
-                        # Check if generate_input exists for this month
-                        dep_generate_input = db.collection("generate_input").document(dep_doc_id).get()
-                        if dep_generate_input.exists:
-                            # Recursively call compute for this month (but mark as cascade to prevent loops)
-                            logger.info(f"Cascading recompute triggered for {dep_doc_id}")
-                            cascaded_months.append(dep_month)
-                            
-                            # Perform inline recompute for the dependent month
-                            dep_year = int(dep_month[:4])
-                            dep_month_num = int(dep_month[4:])
-                            dep_month_name = month_names[dep_month_num - 1]
-                            
-                            dep_generate_input_data = dep_generate_input.to_dict() or {}
-                            dep_invoice_log_totals_doc = db.collection("invoice_log_totals").document(dep_doc_id).get()
-                            dep_pac_projections_doc = db.collection("pac-projections").document(dep_doc_id).get()
-                            
-                            dep_invoice_log_totals = dep_invoice_log_totals_doc.to_dict() if dep_invoice_log_totals_doc.exists else {"totals": {}}
-                            dep_pac_projections = dep_pac_projections_doc.to_dict() if dep_pac_projections_doc.exists else {}
-                            
-                            # Fetch historical data for the dependent month
-                            dep_last_year = dep_year - 1
-                            dep_last_year_doc_id = f"{store_id}_{dep_last_year}{dep_month_num:02d}"
-                            dep_last_year_doc = db.collection("generate_input").document(dep_last_year_doc_id).get()
-                            dep_last_year_sales = 0.0
-                            if dep_last_year_doc.exists:
-                                try:
-                                    dep_last_year_sales = float(dep_last_year_doc.to_dict().get("sales", {}).get("productNetSales") or 0)
-                                except (ValueError, TypeError):
-                                    pass
-                            
-                            # 2 years ago for YoY on Last Year Same Month
-                            dep_last_year_last_year = dep_last_year - 1
-                            dep_last_year_last_year_doc_id = f"{store_id}_{dep_last_year_last_year}{dep_month_num:02d}"
-                            dep_last_year_last_year_doc = db.collection("generate_input").document(dep_last_year_last_year_doc_id).get()
-                            dep_last_year_last_year_sales = 0.0
-                            if dep_last_year_last_year_doc.exists:
-                                try:
-                                    dep_last_year_last_year_sales = float(dep_last_year_last_year_doc.to_dict().get("sales", {}).get("productNetSales") or 0)
-                                except (ValueError, TypeError):
-                                    pass
-                            
-                            # Last month
-                            if dep_month_num == 1:
-                                dep_last_month_year = dep_year - 1
-                                dep_last_month_num = 12
-                            else:
-                                dep_last_month_year = dep_year
-                                dep_last_month_num = dep_month_num - 1
-                            dep_last_month_doc_id = f"{store_id}_{dep_last_month_year}{dep_last_month_num:02d}"
-                            dep_last_month_doc = db.collection("generate_input").document(dep_last_month_doc_id).get()
-                            dep_last_month_sales = 0.0
-                            if dep_last_month_doc.exists:
-                                try:
-                                    dep_last_month_sales = float(dep_last_month_doc.to_dict().get("sales", {}).get("productNetSales") or 0)
-                                except (ValueError, TypeError):
-                                    pass
-                            
-                            # Last month last year
-                            dep_last_month_last_year_year = dep_last_month_year - 1
-                            dep_last_month_last_year_doc_id = f"{store_id}_{dep_last_month_last_year_year}{dep_last_month_num:02d}"
-                            dep_last_month_last_year_doc = db.collection("generate_input").document(dep_last_month_last_year_doc_id).get()
-                            dep_last_month_last_year_sales = 0.0
-                            if dep_last_month_last_year_doc.exists:
-                                try:
-                                    dep_last_month_last_year_sales = float(dep_last_month_last_year_doc.to_dict().get("sales", {}).get("productNetSales") or 0)
-                                except (ValueError, TypeError):
-                                    pass
-                            
-                            # Calculate PAC actual for dependent month
-                            dep_pac_actual_data = calculate_pac_actual(
-                                dep_generate_input_data,
-                                dep_invoice_log_totals,
-                                dep_pac_projections
-                            )
-                            
-                            dep_pac_actual_data["salesComparison"] = {
-                                "lastYearProductSales": dep_last_year_sales,
-                                "lastMonthProductSales": dep_last_month_sales,
-                                "lastMonthLastYearProductSales": dep_last_month_last_year_sales,
-                                "lastYearLastYearProductSales": dep_last_year_last_year_sales
-                            }
-                            
-                            # Update the dependent month's pac_actual
-                            dep_pac_actual_doc = {
-                                "storeID": store_id,
-                                "store": f"Store {store_id.split('_')[1] if '_' in store_id else store_id}",
-                                "year": dep_year,
-                                "month": dep_month_name,
-                                "monthNumber": dep_month_num,
-                                "lastUpdatedAt": firestore.SERVER_TIMESTAMP,
-                                "lastUpdatedBy": "System (Cascade)",
-                                **dep_pac_actual_data,
-                            }
-                            
-                            db.collection("pac_actual").document(dep_doc_id).set(dep_pac_actual_doc, merge=True)
-                            logger.info(f"Cascade recompute completed for {dep_doc_id}")
-                    except Exception as cascade_err:
-                        logger.warning(f"Failed to cascade recompute for {dep_doc_id}: {cascade_err}")
+        # Later months that compare against this one are recomputed in the background,
+        # unless the saved inputs were the ones the stored document came from
+        cascade_job = None
+        if not computed["unchanged"]:
+            store_id = normalize_store_id(payload.store_id)
+            planned = service.planner.plan([(store_id, year_month)])
+            cascade_job = await get_recompute_queue().enqueue(
+                store_id, [ym for _, ym in planned], source=computed["doc_id"]
+            )
         
         # Replace SERVER_TIMESTAMP with current time for response serialization
-        response_doc = pac_actual_doc.copy()
+        response_doc = computed["data"].copy()
         response_doc["lastUpdatedAt"] = datetime.now().isoformat()
         
-        result = {"success": True, "doc_id": doc_id, "data": response_doc}
-        if cascaded_months:
-            result["cascaded_months"] = cascaded_months
-        
-        return result
+        return {
+            "success": True,
+            "doc_id": computed["doc_id"],
+            "data": response_doc,
+            "unchanged": computed["unchanged"],
+            "cascade_job_id": cascade_job["jobId"] if cascade_job else None,
+        }
         
     except HTTPException:
         raise
@@ -959,6 +829,241 @@ async def compute_and_save_pac_actual(
         raise HTTPException(status_code=500, detail=f"Error computing PAC actual: {str(e)}")
 
 
+@router.get("/actual/jobs/{job_id}")
+async def get_pac_actual_job(
+    job_id: str,
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Status of a background recompute: queued, running, completed or failed.
+    Cascades queued by /actual/compute list the months recomputed and
+    skipped; bulk jobs from /actual/recompute report months written and
+    throughput.
+    """
+    try:
+        job = await get_recompute_queue().status(job_id)
+    except Exception as e:
+        logger.error(f"Error reading recompute job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error reading job status: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+class PacActualBulkRecomputeIn(BaseModel):
+    store_ids: Optional[List[str]] = None  # all stores if omitted
+    from_ym: Optional[str] = None  # YYYYMM, inclusive
+    to_ym: Optional[str] = None  # YYYYMM, inclusive
+    force: bool = False  # also rewrite documents whose inputs have not changed
+    submitted_by: str = "System (Bulk recompute)"
+
+
+@router.post("/actual/recompute")
+async def bulk_recompute_pac_actual(
+    payload: PacActualBulkRecomputeIn,
+    _auth: Dict[str, Any] = Depends(require_roles(["Admin"])),
+) -> Dict[str, Any]:
+    """
+    Regenerate every pac_actual of a store set and month range in the
+    background (e.g. after a formula fix or an invoice category remap).
+    Returns the job; poll /actual/jobs/{jobId} for progress and throughput.
+    """
+    try:
+        storage = _pac_storage()
+
+        from services.pac_bulk_recompute import BulkRecompute, get_bulk_recompute
+
+        for year_month in (payload.from_ym, payload.to_ym):
+            if year_month and not _is_valid_month(year_month):
+                raise HTTPException(status_code=400, detail="from_ym and to_ym must be in YYYYMM format")
+        if payload.from_ym and payload.to_ym and payload.from_ym > payload.to_ym:
+            raise HTTPException(status_code=400, detail="from_ym must not be after to_ym")
+
+        job = BulkRecompute.new_job(payload.store_ids, payload.from_ym, payload.to_ym, force=payload.force)
+        return await get_bulk_recompute(storage).start(job, payload.submitted_by)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error starting bulk PAC actual recompute: {e}")
+        raise HTTPException(status_code=500, detail=f"Error starting bulk recompute: {str(e)}")
+
+
+class PacActualDeltaIn(BaseModel):
+    store_id: str
+    year_month: str  # YYYYMM format
+    category: str  # invoice_log_totals category key, e.g. "M+R" (aliases such as "PROMOTION" accepted)
+    old_total: float
+    new_total: float
+    submitted_by: str = "System"
+
+
+@router.post("/actual/delta")
+async def apply_pac_actual_delta(
+    payload: PacActualDeltaIn,
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Apply a single invoice category change to an existing PAC actual document.
+    The new category total is saved to invoice_log_totals and only the affected
+    lines, group totals and percentages are updated, in one transaction. 409 if
+    the stored category total is not old_total (recompute or resend instead).
+    """
+    try:
+        if not is_valid_year_month(payload.year_month):
+            raise HTTPException(status_code=400, detail="year_month must be in YYYYMM format")
+
+        from services.pac_actual_service import InvoiceTotalConflict, PacActualService
+
+        store_id = normalize_store_id(payload.store_id)
+        try:
+            result = await PacActualService(_pac_storage()).apply_invoice_delta(
+                store_id, payload.year_month, payload.category,
+                payload.old_total, payload.new_total, payload.submitted_by,
+            )
+        except InvoiceTotalConflict as e:
+            raise HTTPException(status_code=409, detail=f"old_total does not match the stored total: {e}")
+        if result is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No PAC actual data found for {store_id}_{payload.year_month}; compute it first",
+            )
+        get_pac_cache().invalidate(store_id, payload.year_month)
+
+        return {"success": True, **result}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying PAC actual delta: {e}")
+        raise HTTPException(status_code=500, detail=f"Error applying PAC actual delta: {str(e)}")
+
+
+def _is_valid_month(year_month: str) -> bool:
+    return is_valid_year_month(year_month) and 1 <= int(year_month[4:]) <= 12
+
+
+class PacActualAggregateIn(BaseModel):
+    store_ids: List[str]
+    year_month: str  # YYYYMM format
+
+
+def _aggregation_service():
+    """PacAggregationService, or 503 when Firebase is not available"""
+    try:
+        import firebase_admin
+        if not firebase_admin._apps:
+            raise HTTPException(status_code=503, detail="Firebase not initialized")
+    except ModuleNotFoundError:
+        raise HTTPException(status_code=503, detail="Firebase not installed/available")
+
+    from services.pac_aggregation_service import PacAggregationService
+    return PacAggregationService()
+
+
+@router.post("/actual/aggregate")
+async def aggregate_pac_actual(
+    payload: PacActualAggregateIn,
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Consolidated PAC actual for a set of stores in one month.
+    Dollar lines are summed and percentages recomputed from consolidated sales.
+    """
+    try:
+        if not _is_valid_month(payload.year_month):
+            raise HTTPException(status_code=400, detail="year_month must be in YYYYMM format")
+        if not payload.store_ids:
+            raise HTTPException(status_code=400, detail="store_ids must not be empty")
+
+        service = _aggregation_service()
+        return {
+            "yearMonth": payload.year_month,
+            **await service.aggregate_stores(payload.store_ids, payload.year_month),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error aggregating PAC actual: {e}")
+        raise HTTPException(status_code=500, detail=f"Error aggregating PAC actual: {str(e)}")
+
+
+# Declared before /actual/{store_id}/{year_month} so "entities" is not taken as a store
+@router.get("/actual/entities/{year_month}")
+async def get_entity_pac_actual(
+    year_month: str,
+    entity: Optional[str] = Query(None, description="Only this entity"),
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Consolidated PAC actual per store entity for one month.
+    Member stores' source documents are fetched concurrently.
+    """
+    try:
+        if not _is_valid_month(year_month):
+            raise HTTPException(status_code=400, detail="year_month must be in YYYYMM format")
+
+        service = _aggregation_service()
+        result = await service.aggregate_entities(year_month, entity)
+        if entity is not None and not result["entities"]:
+            raise HTTPException(status_code=404, detail=f"No stores found for entity '{entity}'")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error aggregating entity PAC actual: {e}")
+        raise HTTPException(status_code=500, detail=f"Error aggregating entity PAC actual: {str(e)}")
+
+
+# Declared before /actual/{store_id}/{year_month} so "range" is not taken as a month
+@router.get("/actual/{store_id}/range")
+async def get_pac_actual_range(
+    store_id: str,
+    from_ym: str = Query(..., alias="from", description="First month as YYYYMM"),
+    to_ym: str = Query(..., alias="to", description="Last month as YYYYMM"),
+    _auth: Dict[str, Any] = Depends(require_auth),
+) -> Dict[str, Any]:
+    """
+    Get PAC actual data for a range of months with YTD and trailing-12 aggregates.
+    All documents (range, YTD and trailing-12 windows) are fetched in one batched read.
+    """
+    try:
+        storage = _pac_storage()
+
+        from services.pac_rollup_service import rollup_months, rollup_pac_actual
+
+        if not _is_valid_month(from_ym) or not _is_valid_month(to_ym):
+            raise HTTPException(status_code=400, detail="from and to must be in YYYYMM format")
+        try:
+            windows = rollup_months(from_ym, to_ym)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        store_id = normalize_store_id(store_id)
+        months = sorted(set().union(*windows.values()))
+        loaded = await document_loader(storage).load_many(("pac_actual", f"{store_id}_{ym}") for ym in months)
+
+        docs: Dict[str, Dict[str, Any]] = {}
+        for (_, doc_id), data in loaded.items():
+            if data is not None:
+                docs[doc_id.rsplit("_", 1)[-1]] = data
+
+        return {
+            "store_id": store_id,
+            "from": from_ym,
+            "to": to_ym,
+            **rollup_pac_actual(from_ym, to_ym, docs),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting PAC actual range: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting PAC actual range: {str(e)}")
+
+
 @router.get("/actual/{store_id}/{year_month}")
 async def get_pac_actual(
     store_id: str,
@@ -970,17 +1075,8 @@ async def get_pac_actual(
     This replaces the frontend pacActualService.js getPacActual function.
     """
     try:
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
-        
+        storage = _pac_storage()
+
         # Normalize store ID using the service function
         from services.pac_calculation_service import normalize_store_id
         store_id = normalize_store_id(store_id)
@@ -989,14 +1085,13 @@ async def get_pac_actual(
             raise HTTPException(status_code=400, detail="year_month must be in YYYYMM format")
         
         doc_id = f"{store_id}_{year_month}"
-        doc_ref = db.collection("pac_actual").document(doc_id)
-        doc = doc_ref.get()
+        doc = await document_loader(storage).load("pac_actual", doc_id)
         
-        if not doc.exists:
+        if doc is None:
             # Return 404, frontend will handle as null
             raise HTTPException(status_code=404, detail="PAC actual data not found")
         
-        return doc.to_dict()
+        return doc
         
     except HTTPException:
         raise
@@ -1005,6 +1100,61 @@ async def get_pac_actual(
         raise HTTPException(status_code=500, detail=f"Error getting PAC actual: {str(e)}")
 
 
+EXPORT_DATASETS = {"actual": "pac_actual", "projections": "pac-projections"}
+
+
+@router.get("/export/{dataset}")
+async def export_pac_data(
+    dataset: str = Path(..., description="actual or projections"),
+    export_format: str = Query("csv", alias="format", description="csv or parquet"),
+    stores: Optional[str] = Query(None, description="Comma-separated store ids; all stores if omitted"),
+    from_ym: Optional[str] = Query(None, alias="from", description="First month as YYYYMM"),
+    to_ym: Optional[str] = Query(None, alias="to", description="Last month as YYYYMM"),
+    _auth: Dict[str, Any] = Depends(require_auth),
+):
+    """
+    Stream pac_actual or pac-projections as a flat CSV or Parquet file.
+    Documents are read page by page with a cursor, so memory use does not
+    grow with the size of the export.
+    """
+    try:
+        storage = _pac_storage()
+
+        from services.pac_export_service import EXPORT_FORMATS, stream_export
+
+        collection = EXPORT_DATASETS.get(dataset)
+        if collection is None:
+            raise HTTPException(status_code=404, detail=f"Unknown export dataset {dataset!r}")
+        if export_format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        if (from_ym and not _is_valid_month(from_ym)) or (to_ym and not _is_valid_month(to_ym)):
+            raise HTTPException(status_code=400, detail="from and to must be in YYYYMM format")
+        if from_ym and to_ym and from_ym > to_ym:
+            raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+        store_ids = [store.strip() for store in stores.split(",") if store.strip()] if stores else None
+
+        try:
+            chunks = await stream_export(
+                storage, collection, export_format, store_ids=store_ids, from_ym=from_ym, to_ym=to_ym
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        filename = f"{collection}_{from_ym or 'start'}-{to_ym or 'end'}.{export_format}"
+        media_type = "text/csv" if export_format == "csv" else "application/vnd.apache.parquet"
+        return StreamingResponse(
+            chunks,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting PAC data: {e}")
+        raise HTTPException(status_code=500, detail=f"Error exporting PAC data: {str(e)}")
+
+
 # ---- Invoice OCR Route (under /api/pac) ----
 @router.post("/invoice/read")
 async def read_invoice(
@@ -1168,7 +1318,12 @@ async def submit_invoice(
             image_file=contents,
             image_filename=image_filename
         )
-            
+        
+        # invoice_log_totals for the target month(s) will be recomputed from this invoice
+        if is_recurring:
+            get_pac_cache().invalidate(normalize_store_id(store_id))
+        else:
+            get_pac_cache().invalidate(normalize_store_id(store_id), f"{target_year}{target_month:02d}")
         
         logger.info("Invoice submitted successfully")
         return result
@@ -1218,6 +1373,8 @@ async def delete_recurring_invoice_group(
         )
         
         logger.info(f"Recurring invoice group deleted: {result}")
+        for month in result.get("affected_months", []):
+            get_pac_cache().invalidate(normalize_store_id(month["store_id"]), month["year_month"])
         return result
         
     except Exception as e:
@@ -1241,6 +1398,9 @@ async def save_projections(
     await svc.save_projections(
         payload.store_id, payload.year, payload.month_index_1, payload.pacGoal, payload.projections
     )
+    get_pac_cache().invalidate(
+        normalize_store_id(payload.store_id), f"{payload.year}{payload.month_index_1:02d}"
+    )
     return {"ok": True}
 
 @router.post("/apply")
@@ -1251,6 +1411,23 @@ async def apply_projections_math(
     applied = svc.apply_all(payload.rows)
     return {"rows": applied}
 
+@router.post("/projections/solve")
+async def solve_projections_goal(
+    payload: GoalSeekIn,
+    svc: ProjCalculationService = Depends(get_proj_calculation_service),
+):
+    """
+    Solve one free variable per store-month so projected P.A.C. % hits its goal
+    """
+    for item in payload.items:
+        if item.rows is None and (item.store_id is None or item.year is None or item.month_index_1 is None):
+            raise HTTPException(
+                status_code=400,
+                detail="Each item needs rows or store_id, year and month_index_1",
+            )
+    results = await svc.solve_pac_goals([item.model_dump() for item in payload.items])
+    return {"results": results, "count": len(results)}
+
 @router.post("/historical")
 async def get_historical_rows(
     payload: HistoricalIn,
@@ -1279,122 +1456,31 @@ async def get_pac_projections(
             status_code=400, detail="Invalid year_month format. Use YYYYMM (e.g., 202501)"
         )
 
-    # Guard Firebase presence/initialization
-    try:
-        import firebase_admin
-        from firebase_admin import firestore
-        if not firebase_admin._apps:
-            raise HTTPException(status_code=503, detail="Firebase not initialized")
-    except ModuleNotFoundError:
-        raise HTTPException(status_code=503, detail="Firebase not installed/available")
+    storage = _pac_storage()
 
     try:
-        db = firestore.client()
         doc_id = f"{entity_id}_{year_month}"
-        doc_ref = db.collection("pac-projections").document(doc_id)
-        doc = doc_ref.get()
+        projections_data = await document_loader(storage).load("pac-projections", doc_id)
 
-        if not doc.exists:
+        if projections_data is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No projections data found for {entity_id} in {year_month}",
             )
 
-        projections_data = doc.to_dict()
-
-        # --- Fallback: derive structured fields from legacy `rows` documents ---
-        # Some older projection docs only contain raw `rows` and `pacGoal`.
-        # The Actual tab and calculation service expect structured fields like
-        # `product_net_sales`, `cash_adjustments`, and a `purchases` map.
-        # If those are missing, derive them from rows so older data still works.
-        try:
-            if projections_data is not None:
-                needs_structured = (
-                    "product_net_sales" not in projections_data
-                    and isinstance(projections_data.get("rows"), list)
-                )
-
-                if needs_structured:
-                    rows = projections_data.get("rows", [])
-
-                    def by_name(name: str) -> dict:
-                        for r in rows:
-                            nm = str(r.get("name", "")).strip().lower()
-                            if nm == name.strip().lower():
-                                return r
-                        return {}
-
-                    def get_dollar(row_name: str) -> float:
-                        r = by_name(row_name)
-                        try:
-                            return float(r.get("projectedDollar") or 0.0)
-                        except Exception:
-                            return 0.0
-
-                    # Top-level sales fields
-                    product_net_sales = get_dollar("Product Sales") or get_dollar("Product Net Sales")
-                    cash_adjustments = get_dollar("Cash +/-")
-
-                    # Purchases mapping (aligns with DataIngestionService.save_projections)
-                    purchase_map = {
-                        "travel": ["Travel"],
-                        "advertising_other": ["Adv Other", "Advertising Other"],
-                        "promotion": ["Promotion"],
-                        "outside_services": ["Outside Services"],
-                        "linen": ["Linen"],
-                        "operating_supply": ["OP. Supply", "Operating Supply"],
-                        "maintenance_repair": ["Maint. & Repair", "Maintenance & Repair"],
-                        "small_equipment": ["Small Equipment"],
-                        "utilities": ["Utilities"],
-                        "office": ["Office"],
-                        "training": ["Training"],
-                        # Crew Relations only (legacy CR/TR/D&S kept separate)
-                        "crew_relations": ["Crew Relations"],
-                    }
-
-                    purchases: Dict[str, float] = {}
-                    for key, names in purchase_map.items():
-                        amt = 0.0
-                        for nm in names:
-                            v = get_dollar(nm)
-                            if v:
-                                amt = v
-                                break
-                        purchases[key] = amt
-
-                    # Merge derived structured fields back into the payload
-                    projections_data = {
-                        **projections_data,
-                        "product_net_sales": float(product_net_sales or 0.0),
-                        "cash_adjustments": float(cash_adjustments or 0.0),
-                        "purchases": purchases,
-                    }
-        except Exception:
-            # If any derivation fails, continue with whatever we have
-            pass
+        # Documents saved before schema 2 get their lines and structured fields derived here
+        projections_data = current_projection(projections_data)
 
         # If the document contains rows, transform them directly to the response so
         # the Actual tab's Projected columns mirror the Projections tab entries exactly.
-        rows = projections_data.get("rows") or []
-        if rows:
-            def find_row(*names: str):
-                name_set = {n.strip().lower() for n in names}
-                for r in rows:
-                    if str(r.get("name", "")).strip().lower() in name_set:
-                        return r or {}
-                return {}
-
-            def as_expense(*names: str):
-                r = find_row(*names)
-                return {
-                    "dollars": float(r.get("projectedDollar") or 0.0),
-                    "percent": float(r.get("projectedPercent") or 0.0),
-                }
+        if projections_data.get("rows"):
+            def as_expense(line_id: str):
+                return dict(projection_line(projections_data, line_id))
 
             # Some deployments saved structured purchases without explicit Training/Crew Relations rows.
             # Fallback to structured purchases when a row is missing (dollars/percent = 0).
-            def expense_from_rows_or_purchases(row_names: list[str], purchase_key: str):
-                e = as_expense(*row_names)
+            def expense_from_rows_or_purchases(line_id: str, purchase_key: str):
+                e = as_expense(line_id)
                 if (e.get("dollars") or 0.0) > 0.0 or (e.get("percent") or 0.0) > 0.0:
                     return e
                 try:
@@ -1408,41 +1494,43 @@ async def get_pac_projections(
                     pass
                 return e
 
-            product_sales = float(find_row("Product Net Sales", "Product Sales").get("projectedDollar") or 0.0)
-            all_net_sales = float(find_row("All Net Sales").get("projectedDollar") or 0.0)
+            product_sales = projection_line(projections_data, "product_sales")["dollars"]
+            all_net_sales = projection_line(projections_data, "all_net_sales")["dollars"]
+            total_controllable = projection_line(projections_data, "total_controllable")
+            pac = projection_line(projections_data, "pac")
 
             return {
                 "product_net_sales": product_sales,
                 "all_net_sales": all_net_sales,
                 "controllable_expenses": {
-                    "base_food": as_expense("Base Food"),
-                    "employee_meal": as_expense("Employee Meal"),
-                    "condiment": as_expense("Condiment"),
-                    "total_waste": as_expense("Total Waste"),
-                    "paper": as_expense("Paper"),
-                    "crew_labor": as_expense("Crew Labor"),
-                    "management_labor": as_expense("Management Labor"),
-                    "payroll_tax": as_expense("Payroll Tax"),
+                    "base_food": as_expense("base_food"),
+                    "employee_meal": as_expense("employee_meal"),
+                    "condiment": as_expense("condiment"),
+                    "total_waste": as_expense("total_waste"),
+                    "paper": as_expense("paper"),
+                    "crew_labor": as_expense("crew_labor"),
+                    "management_labor": as_expense("management_labor"),
+                    "payroll_tax": as_expense("payroll_tax"),
                     "additional_labor_dollars": {"dollars": 0.0, "percent": 0.0},  # Will be populated from generate_input
-                    "travel": as_expense("Travel"),
-                    "advertising": as_expense("Advertising"),
-                    "advertising_other": as_expense("Adv Other", "Advertising Other"),
-                    "promotion": as_expense("Promotion"),
-                    "outside_services": as_expense("Outside Services"),
-                    "linen": as_expense("Linen"),
-                    "op_supply": as_expense("OP. Supply", "Operating Supply"),
-                    "maintenance_repair": as_expense("Maint. & Repair", "Maintenance & Repair"),
-                    "small_equipment": as_expense("Small Equipment"),
-                    "utilities": as_expense("Utilities"),
-                    "office": as_expense("Office"),
-                    "cash_adjustments": as_expense("Cash +/-"),
-                    "crew_relations": expense_from_rows_or_purchases(["Crew Relations"], "crew_relations"),
-                    "training": expense_from_rows_or_purchases(["Training"], "training"),
+                    "travel": as_expense("travel"),
+                    "advertising": as_expense("advertising"),
+                    "advertising_other": as_expense("advertising_other"),
+                    "promotion": as_expense("promotion"),
+                    "outside_services": as_expense("outside_services"),
+                    "linen": as_expense("linen"),
+                    "op_supply": as_expense("op_supply"),
+                    "maintenance_repair": as_expense("maintenance_repair"),
+                    "small_equipment": as_expense("small_equipment"),
+                    "utilities": as_expense("utilities"),
+                    "office": as_expense("office"),
+                    "cash_adjustments": as_expense("cash_adjustments"),
+                    "crew_relations": expense_from_rows_or_purchases("crew_relations", "crew_relations"),
+                    "training": expense_from_rows_or_purchases("training", "training"),
                 },
-                "total_controllable_dollars": float(find_row("Total Controllable").get("projectedDollar") or 0.0),
-                "total_controllable_percent": float(find_row("Total Controllable").get("projectedPercent") or 0.0),
-                "pac_percent": float(find_row("P.A.C.").get("projectedPercent") or 0.0),
-                "pac_dollars": float(find_row("P.A.C.").get("projectedDollar") or 0.0),
+                "total_controllable_dollars": total_controllable["dollars"],
+                "total_controllable_percent": total_controllable["percent"],
+                "pac_percent": pac["percent"],
+                "pac_dollars": pac["dollars"],
             }
 
         # Otherwise fall back to computed service (rare)
@@ -1583,10 +1671,10 @@ class MonthLockResponse(BaseModel):
 
 class MonthLockStatus(BaseModel):
     is_locked: bool
-    locked_by: str = None
-    locked_at: str = None
-    unlocked_by: str = None
-    unlocked_at: str = None
+    locked_by: Optional[str] = None
+    locked_at: Optional[str] = None
+    unlocked_by: Optional[str] = None
+    unlocked_at: Optional[str] = None
     store_id: str
     year_month: str
 
@@ -1604,23 +1692,11 @@ async def get_month_lock_status(
     Get the lock status for a specific store and month (YYYYMM format).
     """
     try:
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
+        storage = _firestore_storage()
         doc_id = f"{store_id}_{year_month}"
-        
-        lock_ref = db.collection("month_locks").document(doc_id)
-        lock_doc = lock_ref.get()
-        
-        if lock_doc.exists:
-            data = lock_doc.to_dict()
+        data = await document_loader(storage).load("month_locks", doc_id)
+
+        if data is not None:
             return MonthLockStatus(
                 is_locked=data.get("is_locked", False),
                 locked_by=data.get("locked_by"),
@@ -1636,7 +1712,9 @@ async def get_month_lock_status(
                 store_id=store_id,
                 year_month=year_month
             )
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting month lock status: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting month lock status: {str(e)}")
@@ -1657,16 +1735,8 @@ async def lock_month(request: MonthLockRequest) -> MonthLockResponse:
                 detail="Only General Managers, Supervisors, and Admins can lock months."
             )
 
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
+        storage = _firestore_storage()
+        from firebase_admin import firestore
         
         # Convert month name to number
         month_names = [
@@ -1681,11 +1751,10 @@ async def lock_month(request: MonthLockRequest) -> MonthLockResponse:
         year_month = f"{request.year}{month_index + 1:02d}"
         doc_id = f"{request.store_id}_{year_month}"
         
-        lock_ref = db.collection("month_locks").document(doc_id)
-        
+        loader = document_loader(storage)
+
         # Get existing lock data to preserve audit trail
-        existing_doc = lock_ref.get()
-        existing_data = existing_doc.to_dict() if existing_doc.exists else {}
+        existing_data = await loader.load("month_locks", doc_id) or {}
         
         lock_data = {
             "store_id": request.store_id,
@@ -1706,7 +1775,8 @@ async def lock_month(request: MonthLockRequest) -> MonthLockResponse:
             ]
         }
         
-        lock_ref.set(lock_data)
+        await storage.set("month_locks", doc_id, lock_data)
+        loader.clear("month_locks", doc_id)
         
         return MonthLockResponse(
             success=True,
@@ -1737,16 +1807,8 @@ async def unlock_month(request: MonthLockRequest) -> MonthLockResponse:
                 detail="Only Administrators can unlock months."
             )
 
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
+        storage = _firestore_storage()
+        from firebase_admin import firestore
         
         # Convert month name to number
         month_names = [
@@ -1761,11 +1823,10 @@ async def unlock_month(request: MonthLockRequest) -> MonthLockResponse:
         year_month = f"{request.year}{month_index + 1:02d}"
         doc_id = f"{request.store_id}_{year_month}"
         
-        lock_ref = db.collection("month_locks").document(doc_id)
-        
+        loader = document_loader(storage)
+
         # Get existing lock data to preserve audit trail
-        existing_doc = lock_ref.get()
-        existing_data = existing_doc.to_dict() if existing_doc.exists else {}
+        existing_data = await loader.load("month_locks", doc_id) or {}
         
         unlock_data = {
             "store_id": request.store_id,
@@ -1790,7 +1851,8 @@ async def unlock_month(request: MonthLockRequest) -> MonthLockResponse:
             ]
         }
         
-        lock_ref.set(unlock_data)
+        await storage.set("month_locks", doc_id, unlock_data)
+        loader.clear("month_locks", doc_id)
         
         return MonthLockResponse(
             success=True,
@@ -1813,25 +1875,18 @@ async def get_all_locked_months(store_id: str) -> Dict[str, Any]:
     Get all locked months for a specific store.
     """
     try:
-        # Guard Firebase presence/initialization
-        try:
-            import firebase_admin
-            from firebase_admin import firestore
-            if not firebase_admin._apps:
-                raise HTTPException(status_code=503, detail="Firebase not initialized")
-        except ModuleNotFoundError:
-            raise HTTPException(status_code=503, detail="Firebase not installed/available")
-
-        db = firestore.client()
-        
-        locks_ref = db.collection("month_locks")
-        query = locks_ref.where("store_id", "==", store_id).where("is_locked", "==", True)
-        
+        storage = _firestore_storage()
+        loader = document_loader(storage)
+
+        # Lock ids are "<store_id>_<YYYYMM>", so the store's locks are one id range
         locked_months = []
-        for doc in query.stream():
-            data = doc.to_dict()
+        for year_month, data in await storage.query_period("month_locks", store_id):
+            doc_id = f"{store_id}_{year_month}"
+            loader.prime("month_locks", doc_id, data)
+            if data.get("store_id") != store_id or data.get("is_locked") is not True:
+                continue
             locked_months.append({
-                "id": doc.id,
+                "id": doc_id,
                 "store_id": data.get("store_id"),
                 "year_month": data.get("year_month"),
                 "locked_by": data.get("locked_by"),
@@ -1845,6 +1900,8 @@ async def get_all_locked_months(store_id: str) -> Dict[str, Any]:
             "count": len(locked_months)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting locked months: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting locked months: {str(e)}")
@@ -2005,15 +2062,6 @@ async def update_stores(stores: List[Dict]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-    db = firestore.client()
-    collection = db.collection("announcements")
-    doc_ref = collection.document(announcement_id)
-    if not doc_ref.get().exists:
-        raise HTTPException(status_code=404, detail="Announcement not found")
-    doc_ref.delete()
-    return {"status": "deleted"}
-
-
 # ---- Deadline Models ----
 class DeadlineIn(BaseModel):
     title: str
@@ -6,6 +6,7 @@ import logging
 from typing import List, Dict, Any, Optional
 import firebase_admin
 from firebase_admin import firestore
+from .config_cache import get_config_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,17 +47,14 @@ class AnnouncementService:
 
         try:
             logger.info(f"Fetching announcements for role: {role}")
-            collection = self.db.collection(self.announcements_collection)
-            docs = collection.stream()
+            docs = await get_config_cache(self.db, self.announcements_collection).documents()
 
             results = []
-            for doc in docs:
-                data = doc.to_dict()
+            for doc_id, data in docs.items():
                 if not data:
                     continue
                 if data.get("visible_to") == "All" or data.get("visible_to") == role:
-                    data["id"] = doc.id
-                    results.append(data)
+                    results.append({**data, "id": doc_id})
             
             logger.info(f"Fetched {len(results)} announcements for role {role}")
             return results
@@ -72,16 +70,9 @@ class AnnouncementService:
 
         try:
             logger.info("Fetching all announcements")
-            collection = self.db.collection(self.announcements_collection)
-            docs = collection.stream()
+            docs = await get_config_cache(self.db, self.announcements_collection).documents()
 
-            results = []
-            for doc in docs:
-                data = doc.to_dict()
-                if not data:
-                    continue
-                data["id"] = doc.id
-                results.append(data)
+            results = [{**data, "id": doc_id} for doc_id, data in docs.items() if data]
 
             logger.info(f"Fetched {len(results)} total announcements")
             return results
@@ -106,6 +97,7 @@ class AnnouncementService:
             collection = self.db.collection(self.announcements_collection)
             doc_ref = collection.document()
             doc_ref.set(data)
+            get_config_cache(self.db, self.announcements_collection).invalidate()
             data["id"] = doc_ref.id
             logger.info(f"Successfully added announcement with id {doc_ref.id}")
             return data
@@ -130,6 +122,7 @@ class AnnouncementService:
             if not doc_ref.get().exists:
                 raise ValueError("Announcement not found")
             doc_ref.delete()
+            get_config_cache(self.db, self.announcements_collection).invalidate()
             logger.info(f"Successfully deleted announcement {announcement_id}")
             return True
         except Exception as e:
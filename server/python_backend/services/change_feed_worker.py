@@ -0,0 +1,261 @@
+"""
+PAC Change Feed - recompute pac_actual when its source collections change
+
+Not every write to a PAC source goes through /actual/compute: the web
+client writes invoice_log_totals directly (invoiceTotalsService.js), and a
+failed or skipped follow-up call leaves the month's pac_actual stale.
+ChangeFeedWorker watches generate_input, invoice_log_totals and
+pac-projections with Firestore snapshot listeners and recomputes the
+affected months off the request path:
+
+- every changed "<store_id>_<YYYYMM>" document marks its store-month
+  dirty. A burst of writes to one month (a save that touches several
+  collections, a run of invoices) becomes one recompute once the month
+  has been quiet for debounce_seconds, or max_delay_seconds after its
+  first change at the latest
+- due months are recomputed together by PacActualService.recompute_many,
+  at most batch_size at a time: one batched read and write, the sales
+  index updated and the cascade planned as for a bulk import
+- months whose stored pac_actual is current (input fingerprints) are not
+  rewritten, so changes the request path already handled cost reads only
+
+Listeners only follow documents whose updatedAt is at or after the time
+the worker started, so starting it does not read whole collections.
+Writers that do not stamp updatedAt, and deletes of documents last
+updated before the start, are not seen.
+
+Run it as one long-lived process next to the API:
+    python -m main_helpers.run_change_feed
+
+Configuration (environment):
+    PAC_CHANGE_FEED_DEBOUNCE_SECONDS   quiet time before a month is recomputed (default 5)
+    PAC_CHANGE_FEED_MAX_DELAY_SECONDS  longest a changing month waits (default 60)
+    PAC_CHANGE_FEED_BATCH_SIZE         months recomputed per batch (default 200)
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from .document_loader import DocumentLoader
+from .pac_actual_service import SOURCE_COLLECTIONS, PacActualService
+from .pac_calculation_service import normalize_store_id
+from .recompute_planner import StoreMonth
+from .storage import DocumentStorage, get_storage, split_period_id
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_USER = "System (Change feed)"
+
+
+class ChangeFeedWorker:
+    """Debounced, batched pac_actual recomputes driven by source collection listeners"""
+
+    def __init__(
+        self,
+        db: Any = None,
+        storage: Optional[DocumentStorage] = None,
+        debounce_seconds: float = 5,
+        max_delay_seconds: float = 60,
+        batch_size: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            db: Sync Firestore client to listen on (only needed by start())
+            storage: Backend to recompute with; defaults to the configured one
+            debounce_seconds: Quiet time after a month's last change before it is recomputed
+            max_delay_seconds: Longest a month keeps waiting while it keeps changing
+            batch_size: Most months per recompute_many call
+            clock: Monotonic time source (tests)
+        """
+        self.db = db
+        self._storage = storage
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.batch_size = max(1, batch_size)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # store-month -> (first change, last change) since its last recompute
+        self._dirty: Dict[StoreMonth, Tuple[float, float]] = {}
+        self._watches: List[Any] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.changes = 0
+        self.recomputed = 0
+        self.unchanged = 0
+        self.batches = 0
+        self.failures = 0
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    def mark(self, doc_id: str) -> bool:
+        """
+        Record a change to a source document; safe to call from listener threads
+
+        Returns:
+            False if the id is not "<store_id>_<YYYYMM>"
+        """
+        store_id, year_month = split_period_id(doc_id)
+        if store_id is None:
+            return False
+        store_id = normalize_store_id(store_id)
+        now = self._clock()
+        with self._lock:
+            first, _ = self._dirty.get((store_id, year_month), (now, now))
+            self._dirty[(store_id, year_month)] = (first, now)
+            self.changes += 1
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Runs on the listener's thread; the first call lists the documents already matching
+        for change in changes:
+            self.mark(change.document.id)
+
+    def due(self) -> List[StoreMonth]:
+        """Dirty months that are quiet long enough, or have waited max_delay_seconds, oldest first"""
+        now = self._clock()
+        with self._lock:
+            ready = [
+                (first, key) for key, (first, last) in self._dirty.items()
+                if now - last >= self.debounce_seconds or now - first >= self.max_delay_seconds
+            ]
+        return [key for _, key in sorted(ready)]
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next dirty month is due (0 if one is), or None if none is dirty"""
+        now = self._clock()
+        with self._lock:
+            if not self._dirty:
+                return None
+            return max(0.0, min(
+                min(last + self.debounce_seconds, first + self.max_delay_seconds) - now
+                for first, last in self._dirty.values()
+            ))
+
+    async def flush(self, everything: bool = False) -> Dict[str, List[str]]:
+        """
+        Recompute the due months (or every dirty month) in batches
+
+        A month that changes again while it is being recomputed stays dirty
+        and is recomputed once more later.
+
+        Returns:
+            {"recomputed", "unchanged", "cascaded", "missing"} document ids, summed over batches
+        """
+        with self._lock:
+            months = sorted(self._dirty) if everything else None
+        if months is None:
+            months = self.due()
+        result: Dict[str, List[str]] = {"recomputed": [], "unchanged": [], "cascaded": [], "missing": []}
+        for i in range(0, len(months), self.batch_size):
+            batch = months[i:i + self.batch_size]
+            with self._lock:
+                taken = {key: self._dirty.pop(key) for key in batch if key in self._dirty}
+            try:
+                storage = self.storage
+                # A fresh loader per batch, so every batch reads the sources as they are now
+                service = PacActualService(storage, DocumentLoader(storage))
+                done = await service.recompute_many(batch, CHANGE_FEED_USER)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Change feed recompute of {len(batch)} months failed: {e}")
+                with self._lock:
+                    # Retry on a later flush, keeping the original first-change times
+                    for key, (first, last) in taken.items():
+                        newer = self._dirty.get(key)
+                        self._dirty[key] = (first, newer[1] if newer else last)
+                continue
+            self.batches += 1
+            self.recomputed += len(done["recomputed"])
+            self.unchanged += len(done["unchanged"])
+            for name, ids in done.items():
+                result[name].extend(ids)
+        if months:
+            logger.info(
+                f"Change feed: {len(result['recomputed'])} months recomputed, {len(result['unchanged'])} unchanged, "
+                f"{len(result['cascaded'])} cascaded"
+            )
+        return result
+
+    def start(self, since: Optional[datetime] = None, collections: Sequence[str] = SOURCE_COLLECTIONS) -> None:
+        """
+        Start listening (call from the event loop that run() will use)
+
+        Args:
+            since: Follow documents updated at or after this time; defaults to now
+            collections: Source collections to watch
+
+        Raises:
+            RuntimeError: If there is no Firestore client
+        """
+        if self.db is None:
+            raise RuntimeError("ChangeFeedWorker needs a Firestore client to listen")
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        since = since or datetime.now(timezone.utc)
+        for collection in collections:
+            query = self.db.collection(collection).where(filter=FieldFilter("updatedAt", ">=", since))
+            self._watches.append(query.on_snapshot(self._on_snapshot))
+        logger.info(f"Change feed listening to {', '.join(collections)} for updates since {since.isoformat()}")
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Recompute due months until stop is set, then flush what is left"""
+        if self._wake is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+        while not stop.is_set():
+            for watch in self._watches:
+                if not watch.is_active:
+                    raise RuntimeError("A change feed listener stopped; restart the worker")
+            wait = self.next_due_in()
+            if wait == 0:
+                await self.flush()
+                continue
+            self._wake.clear()
+            waiters = [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(self._wake.wait())]
+            # Wake on a change, on stop, when a month falls due, and at least every 30s to check the listeners
+            await asyncio.wait(waiters, timeout=min(wait if wait is not None else 30, 30),
+                               return_when=asyncio.FIRST_COMPLETED)
+            for waiter in waiters:
+                waiter.cancel()
+        await self.flush(everything=True)
+
+    def close(self) -> None:
+        """Stop listening; dirty months are left for a final flush()"""
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            dirty = len(self._dirty)
+        return {
+            "listening": len(self._watches),
+            "dirty": dirty,
+            "changes": self.changes,
+            "recomputed": self.recomputed,
+            "unchanged": self.unchanged,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
+
+
+def get_change_feed_worker(db: Any, storage: Optional[DocumentStorage] = None) -> ChangeFeedWorker:
+    """ChangeFeedWorker configured from the environment"""
+    return ChangeFeedWorker(
+        db,
+        storage,
+        debounce_seconds=float(os.getenv("PAC_CHANGE_FEED_DEBOUNCE_SECONDS", "5")),
+        max_delay_seconds=float(os.getenv("PAC_CHANGE_FEED_MAX_DELAY_SECONDS", "60")),
+        batch_size=int(os.getenv("PAC_CHANGE_FEED_BATCH_SIZE", "200")),
+    )
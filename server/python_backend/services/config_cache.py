@@ -0,0 +1,236 @@
+"""
+Config Cache - in-memory copies of small, hot configuration collections
+
+invoiceCategories, settings, stores and announcements are read on almost
+every request but change a few times a day. A CollectionCache holds a whole
+collection as {doc_id: data} and serves reads from memory. It is kept fresh
+in one of two ways:
+
+- listen: a Firestore on_snapshot listener replaces the copy whenever a
+  document changes, including writes the web client makes directly
+- poll: when a listener cannot be started (or PAC_CONFIG_CACHE_MODE=poll),
+  a read at most every PAC_CONFIG_CACHE_POLL_SECONDS checks the version
+  stamp configVersions/<collection> (one document read) and reloads the
+  collection only if the stamp moved. Writes that do not bump the stamp
+  are picked up by a full reload every PAC_CONFIG_CACHE_MAX_AGE_SECONDS.
+
+Server-side writers call invalidate() after writing: it drops the local
+copy, so the next read sees the write, and bumps the version stamp for
+other processes.
+
+Configuration (environment):
+    PAC_CONFIG_CACHE_MODE              listen | poll | off (default listen)
+    PAC_CONFIG_CACHE_POLL_SECONDS      version stamp check interval (default 5)
+    PAC_CONFIG_CACHE_MAX_AGE_SECONDS   full reload interval when polling (default 300)
+
+Cached documents are shared between callers: treat them as read-only.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from firebase_admin import firestore
+
+logger = logging.getLogger(__name__)
+
+CONFIG_COLLECTIONS = ("invoiceCategories", "settings", "stores", "announcements")
+VERSION_COLLECTION = "configVersions"
+CACHE_MODES = ("listen", "poll", "off")
+
+
+class CollectionCache:
+    """Whole-collection read cache refreshed by a snapshot listener or a version stamp poll"""
+
+    def __init__(
+        self,
+        db: Any,
+        collection: str,
+        mode: str = "listen",
+        poll_seconds: float = 5,
+        max_age_seconds: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            db: Sync Firestore client
+            collection: Collection to cache
+            mode: "listen", "poll" or "off" (every read goes to Firestore)
+            poll_seconds: Minimum time between version stamp checks when polling
+            max_age_seconds: Full reload interval when polling (0 = never)
+            clock: Monotonic time source (tests)
+
+        Raises:
+            ValueError: If the mode is unknown
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown config cache mode {mode!r}; use one of {', '.join(CACHE_MODES)}")
+        self.db = db
+        self.collection = collection
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._docs: Optional[Dict[str, Dict[str, Any]]] = None
+        self._version: Any = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._watch = None
+        self.hits = 0
+        self.loads = 0
+        self.version_checks = 0
+        self.snapshots = 0
+        if mode == "listen":
+            self._listen()
+
+    def _listen(self) -> None:
+        try:
+            self._watch = self.db.collection(self.collection).on_snapshot(self._on_snapshot)
+        except Exception as e:
+            logger.warning(f"Snapshot listener unavailable for {self.collection} ({e}); polling instead")
+            self._watch = None
+            self.mode = "poll"
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Runs on the listener's background thread with every document in the collection
+        data = {doc.id: doc.to_dict() or {} for doc in docs}
+        with self._lock:
+            self._docs = data
+            self._loaded_at = self._clock()
+            self.snapshots += 1
+
+    def _listening(self) -> bool:
+        if self._watch is None:
+            return False
+        if not self._watch.is_active:
+            logger.warning(f"Snapshot listener for {self.collection} stopped; polling instead")
+            self._watch = None
+            self.mode = "poll"
+            with self._lock:
+                self._docs = None  # changes since the last snapshot may have been missed
+            return False
+        return True
+
+    def _read_version(self) -> Any:
+        snap = self.db.collection(VERSION_COLLECTION).document(self.collection).get()
+        return (snap.to_dict() or {}).get("version") if snap.exists else None
+
+    def _fresh(self) -> bool:
+        """True if the in-memory copy can be served without touching Firestore"""
+        if self._docs is None or self.mode == "off":
+            return False
+        if self._listening():
+            return True
+        now = self._clock()
+        if self.max_age_seconds and now - self._loaded_at >= self.max_age_seconds:
+            return False
+        if now - self._checked_at < self.poll_seconds:
+            return True
+        self._checked_at = now
+        self.version_checks += 1
+        return self._read_version() == self._version
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        version = self._read_version() if self.mode == "poll" else None
+        docs = {doc.id: doc.to_dict() or {} for doc in self.db.collection(self.collection).stream()}
+        with self._lock:
+            now = self._clock()
+            self._docs, self._version = docs, version
+            self._loaded_at = self._checked_at = now
+            self.loads += 1
+        logger.debug(f"Loaded {len(docs)} {self.collection} documents into the config cache")
+        return docs
+
+    def documents_sync(self) -> Dict[str, Dict[str, Any]]:
+        """Every document in the collection as {doc_id: data}"""
+        docs = self._docs
+        if self._fresh():
+            self.hits += 1
+            return docs
+        return self._load()
+
+    async def documents(self) -> Dict[str, Dict[str, Any]]:
+        """documents_sync(); a reload runs in a worker thread so it does not block the event loop"""
+        docs = self._docs
+        if docs is not None and self._listening():
+            self.hits += 1
+            return docs
+        return await asyncio.to_thread(self.documents_sync)
+
+    async def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Document data, or None if it does not exist"""
+        return (await self.documents()).get(doc_id)
+
+    def invalidate(self) -> None:
+        """
+        Call after writing to the collection: drops the local copy and
+        bumps the version stamp so polling processes reload too
+        """
+        with self._lock:
+            self._docs = None
+        try:
+            self.db.collection(VERSION_COLLECTION).document(self.collection).set(
+                {"version": firestore.Increment(1), "updatedAt": firestore.SERVER_TIMESTAMP}, merge=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not bump the {self.collection} config version: {e}")
+
+    def close(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "mode": self.mode,
+            "documents": len(self._docs) if self._docs is not None else None,
+            "hits": self.hits,
+            "loads": self.loads,
+            "version_checks": self.version_checks,
+            "snapshots": self.snapshots,
+        }
+
+
+_config_caches: Dict[str, CollectionCache] = {}
+_config_caches_lock = threading.Lock()
+
+
+def get_config_cache(db: Any, collection: str) -> CollectionCache:
+    """
+    Process-wide cache for a configuration collection, configured from the environment
+
+    Args:
+        db: Sync Firestore client; a cache bound to a different client is replaced
+        collection: Collection to cache (normally one of CONFIG_COLLECTIONS)
+    """
+    with _config_caches_lock:
+        cache = _config_caches.get(collection)
+        if cache is None or cache.db is not db:
+            if cache is not None:
+                cache.close()
+            cache = CollectionCache(
+                db,
+                collection,
+                mode=os.getenv("PAC_CONFIG_CACHE_MODE", "listen"),
+                poll_seconds=float(os.getenv("PAC_CONFIG_CACHE_POLL_SECONDS", "5")),
+                max_age_seconds=float(os.getenv("PAC_CONFIG_CACHE_MAX_AGE_SECONDS", "300")),
+            )
+            _config_caches[collection] = cache
+        return cache
+
+
+def config_cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _config_caches_lock:
+        return {collection: cache.stats() for collection, cache in _config_caches.items()}
+
+
+def close_config_caches() -> None:
+    """Stop every listener and drop the cached copies"""
+    with _config_caches_lock:
+        for cache in _config_caches.values():
+            cache.close()
+        _config_caches.clear()
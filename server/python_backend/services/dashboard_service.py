@@ -2,19 +2,22 @@
 Info Service for PAC-Pro
 Handles Firestore queries for sales, budgets, and PAC/projections
 """
+import asyncio
 import logging
 from typing import Dict, Any, List
 import firebase_admin
 from firebase_admin import firestore
+from .firestore_async import AsyncFirestoreMixin, get_document, stream_documents
 
 logger = logging.getLogger(__name__)
 
 
-class DashboardInfoService:
+class DashboardInfoService(AsyncFirestoreMixin):
     """Service for handling PAC-Pro info analytics (sales, budget, PAC projections)"""
 
-    def __init__(self):
+    def __init__(self, async_db: Any = None):
         self.db = None
+        self._async_db = async_db
         self._initialize_firebase()
 
     def _initialize_firebase(self):
@@ -49,7 +52,7 @@ class DashboardInfoService:
             startDate = f"{startYear}{startMonth:02d}"
 
             logger.info(f"Fetching sales for entity {entity_id} from {startDate} to {endDate}")
-            docs = self.db.collection("pac_actual").stream()
+            docs = await stream_documents(self.adb.collection("pac_actual"))
             totalSales = []
 
             for doc in docs:
@@ -79,9 +82,12 @@ class DashboardInfoService:
 
             # Spending calculation
             foodpaperspending = laborspending = purchasespending = 0
-            doc = self.db.collection("pac_actual").document(doc_id).get()
-            if doc.exists:
-                result = doc.to_dict()
+            actual_doc, projections_doc = await asyncio.gather(
+                get_document(self.adb, "pac_actual", doc_id),
+                get_document(self.adb, "pac-projections", doc_id),
+            )
+            if actual_doc is not None:
+                result = actual_doc
                 foodpaperspending = result.get("foodAndPaper", {}).get("total", {}).get("dollars", 0)
                 laborspending = result.get("labor", {}).get("total", {}).get("dollars", 0)
                 purchasespending = result.get("purchases", {}).get("total", {}).get("dollars", 0)
@@ -96,9 +102,8 @@ class DashboardInfoService:
                 "Utilities", "Office", "Cash +/-", "Crew Relations", "Training"
             ]
 
-            doc = self.db.collection("pac-projections").document(doc_id).get()
-            if doc.exists:
-                result = doc.to_dict()
+            if projections_doc is not None:
+                result = projections_doc
                 rows = result.get("rows", [])
                 foodpaperbudget = sum(row["projectedDollar"] for row in rows if row["name"] in foodpaper)
                 laborbudget = sum(row["projectedDollar"] for row in rows if row["name"] in labor)
@@ -139,8 +144,13 @@ class DashboardInfoService:
             pac = {}
             projections = {}
 
+            actual_docs, projection_docs = await asyncio.gather(
+                stream_documents(self.adb.collection("pac_actual")),
+                stream_documents(self.adb.collection("pac-projections")),
+            )
+
             # PAC actuals
-            for doc in self.db.collection("pac_actual").stream():
+            for doc in actual_docs:
                 doc_id = doc.id
                 storeID = doc_id[:9]
                 yyyymm = doc_id[-6:]
@@ -149,7 +159,7 @@ class DashboardInfoService:
                     pac[yyyymm] = result.get("totals", {}).get("pac", {}).get("dollars", 0)
 
             # PAC projections
-            for doc in self.db.collection("pac-projections").stream():
+            for doc in projection_docs:
                 doc_id = doc.id
                 storeID = doc_id[:9]
                 yyyymm = doc_id[-6:]
@@ -1,22 +1,37 @@
 """
 Data Ingestion Service - Python implementation of C# DataIngestionService
 """
+import asyncio
 from decimal import Decimal
 from typing import Dict, Any
 from models import PacInputData, InventoryData, PurchaseData
 import firebase_admin
 from firebase_admin import firestore
 import os
+from .firestore_async import AsyncFirestoreMixin
+from .invoice_categories import invoice_totals
+from .projection_schema import current_projection, projection_document
+from .sales_index_service import SalesIndexService
+from .storage import get_storage
 
 
-class DataIngestionService:
+class DataIngestionService(AsyncFirestoreMixin):
     """
     Service for ingesting data from various sources
     Python implementation of C# DataIngestionService
+
+    Reads go through the request-scoped document loader (self.loader) on the
+    async Firestore client, so they do not block the event loop and are not
+    repeated within a request.
     """
     
-    def __init__(self):
+    def __init__(self, async_db: Any = None):
         """Initialize Firebase connection"""
+        self._async_db = async_db
+        if async_db is None and get_storage().name != "firestore":
+            # Every read and write goes through self.storage; Firebase is not needed
+            self.db = None
+            return
         try:
             self.db = firestore.client()
         except ValueError:
@@ -36,10 +51,9 @@ class DataIngestionService:
         Return (rows, pacGoal) for a store+period, or ([], 0) if none.
         """
         doc_id = f"{store_id}_{year}{month_index_1:02d}"
-        snap = self.db.collection("pac-projections").document(doc_id).get()
-        if not snap.exists:
+        d = await self.loader.load("pac-projections", doc_id)
+        if d is None:
             return [], 0.0
-        d = snap.to_dict() or {}
         return d.get("rows", []) , float(d.get("pacGoal") or 0.0)
 
     async def save_projections(
@@ -51,171 +65,106 @@ class DataIngestionService:
         projections: list[dict],
     ):
         doc_id = f"{store_id}_{year}{month_index_1:02d}"
-        # Normalize incoming rows into a well-structured document so other
-        # services (and the Actual tab) can read consistent fields.
-        def by_name(name: str) -> dict:
-            for r in projections or []:
-                if str(r.get("name")).strip().lower() == name.strip().lower():
-                    return r
-            return {}
-
-        def get_dollar(row_name: str) -> float:
-            r = by_name(row_name)
-            try:
-                return float(r.get("projectedDollar") or 0.0)
-            except Exception:
-                return 0.0
-
-        # Top-level fields commonly needed downstream
-        product_net_sales = get_dollar("Product Sales") or get_dollar("Product Net Sales")
-        cash_adjustments = get_dollar("Cash +/-")
-
-        # Purchases mapping
-        purchase_map = {
-            "travel": ["Travel"],
-            "advertising_other": ["Adv Other", "Advertising Other"],
-            "promotion": ["Promotion"],
-            "outside_services": ["Outside Services"],
-            "linen": ["Linen"],
-            "operating_supply": ["OP. Supply", "Operating Supply"],
-            "maintenance_repair": ["Maint. & Repair", "Maintenance & Repair"],
-            "small_equipment": ["Small Equipment"],
-            "utilities": ["Utilities"],
-            "office": ["Office"],
-            "training": ["Training"],
-            "crew_relations": ["Crew Relations"],
-        }
-
-        purchases: Dict[str, float] = {}
-        for key, names in purchase_map.items():
-            amt = 0.0
-            for nm in names:
-                v = get_dollar(nm)
-                if v:  # first match wins (explicit ordering above)
-                    amt = v
-                    break
-            purchases[key] = amt
-
-        self.db.collection("pac-projections").document(doc_id).set(
+        # Store rows indexed by line id with the structured fields other
+        # services (and the Actual tab) read, so readers never re-derive them
+        await self.storage.set(
+            "pac-projections",
+            doc_id,
             {
-                "store_id": store_id,
-                "year": year,
-                "month_index_1": month_index_1,
-                "pacGoal": float(pac_goal),
-                "rows": projections,  # keep raw rows for UI seeding/reset
-                # Structured fields for backend/Actual tab consumption
-                "product_net_sales": product_net_sales,
-                "cash_adjustments": cash_adjustments,
-                "purchases": purchases,
+                **projection_document(store_id, year, month_index_1, pac_goal, projections),
                 "updatedAt": firestore.SERVER_TIMESTAMP,
             },
             merge=False,  # overwrite existing doc entirely for this month/store
         )
+        self.loader.clear("pac-projections", doc_id)
     
     async def _get_pac_data_from_firebase(self, entity_id: str, year_month: str) -> Dict[str, Any]:
         """Get PAC data from Firebase for a specific store and month using pac-projections"""
         doc_id = f"{entity_id}_{year_month}"
-        doc_ref = self.db.collection('pac-projections').document(doc_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            return doc.to_dict() or {}
-        else:
-            return {}
+        return await self.loader.load('pac-projections', doc_id) or {}
     
-    async def get_input_data_async(self, entity_id: str, year_month: str) -> PacInputData:
+    @staticmethod
+    def _history_months(year_month: str) -> Dict[str, str]:
         """
-        Get all input data for PAC calculation from Firebase.
-        fetches from generate_input and invoice_log_totals for Actuals.
+        Comparison months for a YYYYMM month (empty if year_month is malformed):
+        last_year, last_month, last_month_last_year and last_year_last_year
         """
-        # --- Fetch Historical Sales Data ---
         try:
             year = int(year_month[:4])
             month_num = int(year_month[4:])
-            
-            # Helper to format YYYYMM
-            def get_ym_str(y, m):
-                return f"{y}{m:02d}"
-            
-            # Last Year Same Month
-            last_year_ym = get_ym_str(year - 1, month_num)
-            
-            # Last Month
-            if month_num == 1:
-                last_month_ym = get_ym_str(year - 1, 12)
-            else:
-                last_month_ym = get_ym_str(year, month_num - 1)
-                
-            # Last Month Last Year
-            last_month_year = int(last_month_ym[:4])
-            last_month_mon = int(last_month_ym[4:])
-            last_month_last_year_ym = get_ym_str(last_month_year - 1, last_month_mon)
-            
-            # Last Year Same Month Last Year
-            last_year_last_year_ym = get_ym_str(year - 2, month_num)
-            
-            def get_sales_sync(ym):
-                """Synchronous helper to fetch sales data for a given year-month"""
-                try:
-                    # 1. Try generate_input (Actuals) - SOURCE OF TRUTH
-                    doc_id = f"{entity_id}_{ym}"
-                    doc_ref = self.db.collection('generate_input').document(doc_id)
-                    doc = doc_ref.get()
-                    if doc.exists:
-                        data = doc.to_dict() or {}
-                        sales = data.get('sales', {})
-                        val = sales.get('productNetSales')
-                        if val is not None and val != 0 and val != '0':
-                            try:
-                                return Decimal(str(val).replace('$', '').replace(',', ''))
-                            except:
-                                pass
-                    
-                    # 2. Fallback to pac-projections
-                    proj_doc = self.db.collection('pac-projections').document(doc_id).get()
-                    if proj_doc.exists:
-                        proj_data = proj_doc.to_dict() or {}
-                        val = proj_data.get('product_net_sales')
-                        if val is not None:
-                            try:
-                                return Decimal(str(val).replace('$', '').replace(',', ''))
-                            except:
-                                pass
-                    
-                    return Decimal('0')
-                except Exception as e:
-                    print(f"Warning: Error fetching sales for {ym}: {e}")
-                    return Decimal('0')
+        except ValueError:
+            print(f"Warning: Could not derive historical months for {year_month}")
+            return {}
 
-            last_year_sales = get_sales_sync(last_year_ym)
-            last_month_sales = get_sales_sync(last_month_ym)
-            last_month_last_year_sales = get_sales_sync(last_month_last_year_ym)
-            last_year_last_year_sales = get_sales_sync(last_year_last_year_ym)
-            
-        except Exception as e:
-            print(f"Warning: Could not fetch historical sales data: {e}")
-            last_year_sales = Decimal('0')
-            last_month_sales = Decimal('0')
-            last_month_last_year_sales = Decimal('0')
-            last_year_last_year_sales = Decimal('0')
+        def get_ym_str(y, m):
+            return f"{y}{m:02d}"
 
-        # --- Fetch Actuals Data (Generate Input + Invoice Logs) ---
-        doc_id = f"{entity_id}_{year_month}"
-        gen_doc = self.db.collection('generate_input').document(doc_id).get()
-        
-        if gen_doc.exists:
+        last_month_year, last_month_mon = (year - 1, 12) if month_num == 1 else (year, month_num - 1)
+        return {
+            'last_year': get_ym_str(year - 1, month_num),
+            'last_month': get_ym_str(last_month_year, last_month_mon),
+            # e.g. if Current is Jan 2025, Last Month is Dec 2024, Last Month Last Year is Dec 2023
+            'last_month_last_year': get_ym_str(last_month_year - 1, last_month_mon),
+            'last_year_last_year': get_ym_str(year - 2, month_num),
+        }
+
+    async def get_input_data_async(self, entity_id: str, year_month: str) -> PacInputData:
+        """
+        Get all input data for PAC calculation from Firebase.
+        fetches from generate_input and invoice_log_totals for Actuals.
+        """
+        # --- This month's documents, the comparison months' projections (the fallback
+        # for months without actual sales) and the store's sales index in one round trip ---
+        history = self._history_months(year_month)
+        loader = self.loader
+        sales_index = SalesIndexService(self.storage, loader)
+        loaded, indexed_sales = await asyncio.gather(
+            loader.load_many([
+                *((collection, f"{entity_id}_{year_month}")
+                  for collection in ('generate_input', 'invoice_log_totals', 'pac-projections')),
+                *(('pac-projections', f"{entity_id}_{ym}") for ym in history.values()),
+            ]),
+            sales_index.lookup(entity_id, history.values()),
+        )
+        docs = dict(loaded)
+        gen_data = docs[('generate_input', f"{entity_id}_{year_month}")]
+
+        def doc(collection, ym):
+            return docs.get((collection, f"{entity_id}_{ym}"))
+
+        # --- Historical Sales Data ---
+        def get_sales(ym):
+            """Sales for a given year-month from the sales index or prefetched projections"""
+            try:
+                # 1. Actual sales (sales index)
+                val = indexed_sales.get(ym)
+                if val:
+                    return Decimal(str(val))
+
+                # 2. Fallback to pac-projections
+                proj_data = doc('pac-projections', ym)
+                if proj_data is not None:
+                    val = proj_data.get('product_net_sales')
+                    if val is not None:
+                        try:
+                            return Decimal(str(val).replace('$', '').replace(',', ''))
+                        except:
+                            pass
+
+                return Decimal('0')
+            except Exception as e:
+                print(f"Warning: Error fetching sales for {ym}: {e}")
+                return Decimal('0')
+
+        last_year_sales = get_sales(history.get('last_year'))
+        last_month_sales = get_sales(history.get('last_month'))
+        last_month_last_year_sales = get_sales(history.get('last_month_last_year'))
+        last_year_last_year_sales = get_sales(history.get('last_year_last_year'))
+
+        # --- Actuals Data (Generate Input + Invoice Logs) ---
+        if gen_data is not None:
             # Use Actuals Data
-            gen_data = gen_doc.to_dict() or {}
-            
-            inv_doc = self.db.collection('invoice_log_totals').document(doc_id).get()
-            inv_data = inv_doc.to_dict() if inv_doc.exists else {}
-            inv_totals = inv_data.get('totals') or {}
-            
-            # Normalize keys for robust matching
-            normalized_totals = {}
-            for k, v in inv_totals.items():
-                # e.g. "OP. SUPPLY" -> "OPSUPPLY"
-                key_norm = str(k).strip().upper().replace('.', '').replace(' ', '').replace('_', '')
-                normalized_totals[key_norm] = v
+            inv_totals = invoice_totals(doc('invoice_log_totals', year_month))
 
             def d(val):
                 try:
@@ -227,17 +176,8 @@ class DataIngestionService:
                 except:
                     return Decimal('0')
 
-            def get_inv(keys):
-                for k in keys:
-                    # 1. Exact match
-                    if k in inv_totals:
-                        return d(inv_totals[k])
-                    # 2. Normalized match
-                    for variant in [k, k.upper()]:
-                        k_clean = variant.strip().replace('.', '').replace(' ', '').replace('_', '')
-                        if k_clean in normalized_totals:
-                            return d(normalized_totals[k_clean])
-                return Decimal('0')
+            def get_inv(category):
+                return d(inv_totals.get(category))
 
             sales = gen_data.get('sales') or {}
             labor = gen_data.get('labor') or {}
@@ -284,33 +224,33 @@ class DataIngestionService:
                 ),
                 
                 purchases=PurchaseData(
-                    food=get_inv(['FOOD']),
-                    paper=get_inv(['PAPER']),
-                    condiment=get_inv(['CONDIMENT']),
-                    non_product=get_inv(['NONPRODUCT', 'NON PRODUCT']),
+                    food=get_inv('FOOD'),
+                    paper=get_inv('PAPER'),
+                    condiment=get_inv('CONDIMENT'),
+                    non_product=get_inv('NONPRODUCT'),
                     # PurchaseData has operating_supply, not op_supplies
-                    operating_supply=get_inv(['OP. SUPPLY', 'OP SUPPLY']),
-                    travel=get_inv(['TRAVEL']),
-                    advertising_other=get_inv(['ADV-OTHER', 'ADV OTHER']),
-                    promotion=get_inv(['PROMO']),
-                    outside_services=get_inv(['OUTSIDE SVC', 'OUTSIDE SERVICES']),
-                    linen=get_inv(['LINEN']),
-                    maintenance_repair=get_inv(['M+R', 'MAINTENANCE & REPAIR']),
-                    small_equipment=get_inv(['SML EQUIP', 'SMALL EQUIPMENT']),
-                    utilities=get_inv(['UTILITIES']),
-                    office=get_inv(['OFFICE']),
-                    training=get_inv(['TRAINING']),
-                    crew_relations=get_inv(['CREW RELATIONS'])
+                    operating_supply=get_inv('OP. SUPPLY'),
+                    travel=get_inv('TRAVEL'),
+                    advertising_other=get_inv('ADV-OTHER'),
+                    promotion=get_inv('PROMO'),
+                    outside_services=get_inv('OUTSIDE SVC'),
+                    linen=get_inv('LINEN'),
+                    maintenance_repair=get_inv('M+R'),
+                    small_equipment=get_inv('SML EQUIP'),
+                    utilities=get_inv('UTILITIES'),
+                    office=get_inv('OFFICE'),
+                    training=get_inv('TRAINING'),
+                    crew_relations=get_inv('CREW RELATIONS')
                 )
             )
 
         # --- Fallback to Projections (Legacy/Budget logic) ---
-        data = await self._get_pac_data_from_firebase(entity_id, year_month)
+        # Documents saved before schema 2 get their structured fields derived here
+        data = dict(current_projection(doc('pac-projections', year_month)) or {})
         
         # Also read from generate_input for additional labor dollars and dues and subscriptions (Legacy partial read)
         try:
-            if gen_doc.exists:
-                gen_data = gen_doc.to_dict() or {}
+            if gen_data is not None:
                 labor_data = gen_data.get('labor', {})
                 sales_data = gen_data.get('sales', {})
                 data['additional_labor_dollars'] = float(labor_data.get('additionalLaborDollars', 0))
@@ -321,136 +261,18 @@ class DataIngestionService:
         except Exception:
             pass
 
-        # --- Backward compatible derivation ---
-        # Older documents may only contain `rows` without a structured `purchases` map.
-        # If so, derive structured fields from rows so Training and Crew Relations show up.
-        try:
-            rows = data.get("rows") if isinstance(data, dict) else None
-            purchases = data.get("purchases") if isinstance(data, dict) else None
-
-            needs_derivation = isinstance(rows, list) and (
-                not isinstance(purchases, dict)
-                or any(
-                    key not in purchases
-                    for key in [
-                        "travel",
-                        "advertising_other",
-                        "promotion",
-                        "outside_services",
-                        "linen",
-                        "operating_supply",
-                        "maintenance_repair",
-                        "small_equipment",
-                        "utilities",
-                        "office",
-                        "training",
-                        "crew_relations",
-                    ]
-                )
-            )
-
-            if needs_derivation:
-                def by_name(name: str) -> Dict[str, Any]:
-                    for r in rows:
-                        nm = str(r.get("name", "")).strip().lower()
-                        if nm == name.strip().lower():
-                            return r or {}
-                    return {}
-
-                def get_dollar(row_name: str) -> float:
-                    r = by_name(row_name)
-                    try:
-                        return float(r.get("projectedDollar") or 0.0)
-                    except Exception:
-                        return 0.0
-
-                # Sales fallbacks
-                pns = get_dollar("Product Sales") or get_dollar("Product Net Sales")
-                ca = get_dollar("Cash +/-")
-
-                # Derive purchases from rows using same mapping as save_projections
-                purchase_map = {
-                    "travel": ["Travel"],
-                    "advertising_other": ["Adv Other", "Advertising Other"],
-                    "promotion": ["Promotion"],
-                    "outside_services": ["Outside Services"],
-                    "linen": ["Linen"],
-                    "operating_supply": ["OP. Supply", "Operating Supply"],
-                    "maintenance_repair": ["Maint. & Repair", "Maintenance & Repair"],
-                    "small_equipment": ["Small Equipment"],
-                    "utilities": ["Utilities"],
-                    "office": ["Office"],
-                    "training": ["Training"],
-                    "crew_relations": ["Crew Relations"],
-                }
-
-                derived_purchases: Dict[str, float] = {}
-                for key, names in purchase_map.items():
-                    amt = 0.0
-                    for nm in names:
-                        v = get_dollar(nm)
-                        if v:
-                            amt = v
-                            break
-                    derived_purchases[key] = amt
-
-                # Merge back, preserving any existing structured values
-                data = {
-                    **data,
-                    "product_net_sales": float(data.get("product_net_sales") or pns or 0.0),
-                    "cash_adjustments": float(data.get("cash_adjustments") or ca or 0.0),
-                    "purchases": {**(purchases or {}), **derived_purchases},
-                }
-        except Exception:
-            # Non-fatal; proceed with whatever we have
-            pass
-        
-        # --- Fetch Historical Sales Data ---
-        try:
-            year = int(year_month[:4])
-            month_num = int(year_month[4:])
-            
-            # Helper to format YYYYMM
-            def get_ym_str(y, m):
-                return f"{y}{m:02d}"
-            
-            # Last Year Same Month
-            last_year_ym = get_ym_str(year - 1, month_num)
-            
-            # Last Month
-            if month_num == 1:
-                last_month_ym = get_ym_str(year - 1, 12)
-            else:
-                last_month_ym = get_ym_str(year, month_num - 1)
-                
-            # Last Month Last Year (Same month as "Last Month" but previous year)
-            # e.g. if Current is Jan 2025, Last Month is Dec 2024, Last Month Last Year is Dec 2023
-            # If Current is Feb 2025, Last Month is Jan 2025, Last Month Last Year is Jan 2024
-            last_month_year = int(last_month_ym[:4])
-            last_month_mon = int(last_month_ym[4:])
-            last_month_last_year_ym = get_ym_str(last_month_year - 1, last_month_mon)
-            
-            # Last Year Same Month Last Year (2 years ago)
-            last_year_last_year_ym = get_ym_str(year - 2, month_num)
-            
-            async def get_sales(ym):
-                try:
-                    d = await self._get_pac_data_from_firebase(entity_id, ym)
-                    return Decimal(str(d.get('product_net_sales', 0)))
-                except:
-                    return Decimal('0')
+        # --- Historical Sales Data (projections only) ---
+        def get_projected_sales(ym):
+            try:
+                d = doc('pac-projections', ym) or {}
+                return Decimal(str(d.get('product_net_sales', 0)))
+            except:
+                return Decimal('0')
 
-            last_year_sales = await get_sales(last_year_ym)
-            last_month_sales = await get_sales(last_month_ym)
-            last_month_last_year_sales = await get_sales(last_month_last_year_ym)
-            last_year_last_year_sales = await get_sales(last_year_last_year_ym)
-            
-        except Exception as e:
-            print(f"Warning: Could not fetch historical sales data: {e}")
-            last_year_sales = Decimal('0')
-            last_month_sales = Decimal('0')
-            last_month_last_year_sales = Decimal('0')
-            last_year_last_year_sales = Decimal('0')
+        last_year_sales = get_projected_sales(history.get('last_year'))
+        last_month_sales = get_projected_sales(history.get('last_month'))
+        last_month_last_year_sales = get_projected_sales(history.get('last_month_last_year'))
+        last_year_last_year_sales = get_projected_sales(history.get('last_year_last_year'))
 
         # Convert Firebase data to PacInputData
         return PacInputData(
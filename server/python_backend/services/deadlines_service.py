@@ -1,8 +1,10 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from .firestore_async import AsyncFirestoreMixin
 
-class DeadlinesService:
+
+class DeadlinesService(AsyncFirestoreMixin):
     """Service for managing deadlines in Firestore.
     
     Handles CRUD operations for deadlines including:
@@ -12,8 +14,9 @@ class DeadlinesService:
     - Deleting deadlines
     """
 
-    def __init__(self) -> None:
+    def __init__(self, async_db: Any = None) -> None:
         self._db = None
+        self._async_db = async_db
         self._init_firestore()
 
     def _init_firestore(self) -> None:
@@ -31,9 +34,10 @@ class DeadlinesService:
         return self._db is not None
 
     def _deadlines_collection(self):
-        if self._db is None:
+        """Async collection reference (reads do not block the event loop)"""
+        if self._db is None and self._async_db is None:
             raise RuntimeError("Firebase not initialized")
-        return self._db.collection("deadlines")
+        return self.adb.collection("deadlines")
 
     def _serialize_ts(self, value):
         """Convert Firestore timestamp to ISO string."""
@@ -77,7 +81,7 @@ class DeadlinesService:
         query = col.order_by("dueDate", direction=firestore.Query.ASCENDING)
         
         results: List[Dict[str, Any]] = []
-        for doc in query.stream():
+        async for doc in query.stream():
             data = doc.to_dict() or {}
             results.append(self._serialize_deadline(doc.id, data))
         
@@ -100,7 +104,7 @@ class DeadlinesService:
         )
         
         results: List[Dict[str, Any]] = []
-        for doc in query.stream():
+        async for doc in query.stream():
             data = doc.to_dict() or {}
             due_date_str = data.get("dueDate", "")
             
@@ -145,10 +149,10 @@ class DeadlinesService:
         
         # Add the document
         doc_ref = col.document()
-        doc_ref.set(doc_data)
+        await doc_ref.set(doc_data)
         
         # Re-read to get the generated ID and timestamps
-        snap = doc_ref.get()
+        snap = await doc_ref.get()
         if snap.exists:
             data = snap.to_dict() or {}
             return self._serialize_deadline(doc_ref.id, data)
@@ -167,7 +171,7 @@ class DeadlinesService:
         doc_ref = col.document(deadline_id)
         
         # Check if document exists
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             raise ValueError(f"Deadline with id {deadline_id} not found")
         
         # Prepare update data
@@ -189,10 +193,10 @@ class DeadlinesService:
             update_data["dayOfMonth"] = deadline_data["dayOfMonth"] if deadline_data.get("recurring") else None
         
         # Update the document
-        doc_ref.update(update_data)
+        await doc_ref.update(update_data)
         
         # Re-read to get updated data
-        snap = doc_ref.get()
+        snap = await doc_ref.get()
         if snap.exists:
             data = snap.to_dict() or {}
             return self._serialize_deadline(doc_ref.id, data)
@@ -208,10 +212,10 @@ class DeadlinesService:
         doc_ref = col.document(deadline_id)
         
         # Check if document exists
-        if not doc_ref.get().exists:
+        if not (await doc_ref.get()).exists:
             raise ValueError(f"Deadline with id {deadline_id} not found")
         
         # Delete the document
-        doc_ref.delete()
+        await doc_ref.delete()
         return True
 
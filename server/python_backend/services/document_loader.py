@@ -0,0 +1,163 @@
+"""
+Request-scoped document loader
+
+One PAC page load reaches the same source documents (generate_input,
+invoice_log_totals, pac-projections, pac_actual) from several services.
+A DocumentLoader collects every key requested in the same event-loop tick,
+fetches them with a single storage get_many (one get_all on Firestore),
+and memoizes the result (misses included) for the rest of its scope, so
+each document is read at most once.
+
+main.py opens a scope per HTTP request. Batch jobs open their own with
+document_loader_scope(); inside an active scope that call reuses it.
+Outside any scope document_loader() returns a fresh, unshared loader.
+A scope keeps one loader per backend, so routes reading collections
+that only Firestore holds (users, month_locks) share it too when PAC
+documents are on SQLite.
+
+Loaded documents are shared between callers: treat them as read-only.
+"""
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from .storage import DocKey, DocumentStorage, get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentLoader:
+    """Batching, memoizing document reader bound to one event loop"""
+
+    def __init__(self, storage: Optional[DocumentStorage] = None):
+        """
+        Args:
+            storage: Backend to read from; defaults to the configured one (get_storage)
+        """
+        self._storage = storage
+        self._results: Dict[DocKey, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        self._pending: Dict[DocKey, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        # Fetches in flight, referenced until they finish so they are not garbage collected
+        self._fetches: set = set()
+        # Backend name -> loader of the same scope for another backend
+        self._others: Dict[str, "DocumentLoader"] = {}
+        self.requested = 0
+        self.fetched = 0
+        self.round_trips = 0
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    async def load(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Document data ({} for an empty document), or None if it does not exist"""
+        return (await self.load_many([(collection, doc_id)]))[(collection, doc_id)]
+
+    async def load_many(self, keys: Iterable[DocKey]) -> Dict[DocKey, Optional[Dict[str, Any]]]:
+        """
+        Load several documents, joining the batch of the current tick
+
+        Args:
+            keys: (collection, doc_id) pairs; duplicates are fine
+
+        Returns:
+            Key -> document data, or None if missing
+        """
+        keys = list(dict.fromkeys(keys))
+        self.requested += len(keys)
+        loop = asyncio.get_running_loop()
+        for key in keys:
+            if key in self._results:
+                continue
+            future = loop.create_future()
+            self._results[key] = future
+            if not self._pending:
+                # Let every coroutine runnable this tick add its keys first
+                loop.call_soon(self._dispatch)
+            self._pending[key] = future
+        values = await asyncio.gather(*(self._results[key] for key in keys))
+        return dict(zip(keys, values))
+
+    def prime(self, collection: str, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """Record a document the caller already has (e.g. just written)"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(data)
+        self._results[(collection, doc_id)] = future
+
+    def clear(self, collection: str, doc_id: str) -> None:
+        """Forget a memoized document so the next load reads it again"""
+        if (collection, doc_id) not in self._pending:
+            self._results.pop((collection, doc_id), None)
+
+    def for_storage(self, storage: Optional[DocumentStorage]) -> "DocumentLoader":
+        """This loader, or the one of its scope for a different backend"""
+        if storage is None or storage.name == self.storage.name:
+            return self
+        if storage.name not in self._others:
+            self._others[storage.name] = DocumentLoader(storage)
+        return self._others[storage.name]
+
+    def stats(self) -> Dict[str, int]:
+        """Keys requested, documents fetched and storage round trips so far"""
+        return {"requested": self.requested, "fetched": self.fetched, "roundTrips": self.round_trips}
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._fetch(batch))
+            self._fetches.add(task)
+            task.add_done_callback(self._fetches.discard)
+
+    async def _fetch(self, batch: Dict[DocKey, "asyncio.Future[Optional[Dict[str, Any]]]"]) -> None:
+        self.round_trips += 1
+        self.fetched += len(batch)
+        try:
+            docs = await self.storage.get_many(list(batch))
+        except Exception as e:
+            logger.warning(f"Document batch of {len(batch)} failed: {e}")
+            for key, future in batch.items():
+                # Failures are not memoized; a later load retries
+                if self._results.get(key) is future:
+                    del self._results[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(docs[key])
+
+
+_current_loader: ContextVar[Optional[DocumentLoader]] = ContextVar("document_loader", default=None)
+
+
+def document_loader(storage: Optional[DocumentStorage] = None) -> DocumentLoader:
+    """
+    The loader of the active scope, or a new unshared one
+
+    Args:
+        storage: Backend to read from; defaults to the configured one
+    """
+    loader = _current_loader.get()
+    return loader.for_storage(storage) if loader is not None else DocumentLoader(storage)
+
+
+@contextmanager
+def document_loader_scope(storage: Optional[DocumentStorage] = None) -> Iterator[DocumentLoader]:
+    """
+    Share one loader with everything run in this context
+
+    Reuses the active scope if there is one. Tasks created inside the
+    scope (asyncio.gather, create_task) inherit it.
+    """
+    loader = _current_loader.get()
+    if loader is not None:
+        yield loader
+        return
+    loader = DocumentLoader(storage)
+    token = _current_loader.set(loader)
+    try:
+        yield loader
+    finally:
+        _current_loader.reset(token)
@@ -0,0 +1,97 @@
+"""
+Async Firestore data access for PAC-Pro
+
+The sync `firestore.client()` blocks the event loop for every read, so one
+slow query stalls every concurrent request. Services with `async def`
+methods read through the AsyncClient returned here instead.
+
+gRPC async channels belong to the event loop they were created on, so one
+client is kept per running loop.
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Hashable, List, Optional
+
+import firebase_admin
+from firebase_admin import firestore_async
+
+logger = logging.getLogger(__name__)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    AsyncClient for the running event loop
+
+    Raises:
+        RuntimeError: If Firebase is not initialized or there is no running loop
+    """
+    if not firebase_admin._apps:
+        raise RuntimeError("Firebase not initialized")
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = firestore_async.client()
+        _clients[loop] = client
+    return client
+
+
+class AsyncFirestoreMixin:
+    """
+    Gives a service an `adb` async client
+
+    Tests (and the concurrency benchmark) pass `async_db` to use a fake.
+    """
+
+    _async_db: Any = None
+
+    @property
+    def adb(self):
+        """Async Firestore client for the running event loop"""
+        return self._async_db if self._async_db is not None else get_async_client()
+
+    @property
+    def storage(self):
+        """
+        DocumentStorage for PAC documents: the configured backend, or
+        Firestore over `async_db` when one was passed in
+        """
+        from .storage import FirestoreStorage, get_storage
+        return FirestoreStorage(self._async_db) if self._async_db is not None else get_storage()
+
+    @property
+    def loader(self):
+        """Request-scoped DocumentLoader (see services.document_loader)"""
+        from .document_loader import document_loader
+        return document_loader(self.storage)
+
+
+async def get_document(db, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+    """Document data ({} for an empty document), or None if it does not exist"""
+    snap = await db.collection(collection).document(doc_id).get()
+    return (snap.to_dict() or {}) if snap.exists else None
+
+
+async def get_documents(db, refs: Dict[Hashable, Any]) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+    """
+    Resolve document references with a single get_all round trip
+
+    Args:
+        db: Async client
+        refs: Any key -> DocumentReference
+
+    Returns:
+        Same keys -> document data ({} for empty docs), or None if missing
+    """
+    by_path: Dict[str, Dict[str, Any]] = {}
+    async for snap in db.get_all(list(refs.values())):
+        if snap.exists:
+            by_path[snap.reference.path] = snap.to_dict() or {}
+    return {key: by_path.get(ref.path) for key, ref in refs.items()}
+
+
+async def stream_documents(query) -> List[Any]:
+    """All snapshots of a collection or query"""
+    return [snap async for snap in query.stream()]
@@ -0,0 +1,384 @@
+"""
+Bulk import of generate_input from POS / payroll exports
+
+Streams a CSV or XLSX export row by row (one row per store-month), validates
+each row into the generate_input shape the Generate tab writes, and merges
+the documents in storage batches of up to MAX_BATCH_WRITES operations.
+
+Columns are matched case-insensitively, ignoring spaces, dots and
+underscores. Every row needs a store (storeID / store_id / store) and a
+period: yearMonth (YYYYMM) or year + month (number or name). Value columns
+use the Generate tab field names ("productNetSales", "crewLabor",
+"startingFood", ...) or dotted paths ("sales.productNetSales"). Blank cells
+are left out, so they keep the value already saved, as in the Generate tab.
+
+Each batch commits its import_jobs/<job_id> checkpoint, and the imported
+product net sales in each store's sales index, in the same storage batch as
+the rows, so an interrupted import resumes after the last committed row. Once every row is in, the affected store-months are recomputed together
+(PacActualService.recompute_many).
+"""
+import csv
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from firebase_admin import firestore
+
+from .document_loader import document_loader_scope
+from .pac_actual_service import MONTH_NAMES, PacActualService
+from .pac_calculation_service import normalize_store_id
+from .sales_index_service import index_write, product_net_sales
+from .storage import MAX_BATCH_WRITES, DocumentStorage, WriteOp, get_storage
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOBS_COLLECTION = "import_jobs"
+
+# Generate tab input name -> (generate_input section, field)
+GENERATE_INPUT_FIELDS: Dict[str, Tuple[str, str]] = {
+    "productNetSales": ("sales", "productNetSales"),
+    "cash": ("sales", "cash"),
+    "promo": ("sales", "promo"),
+    "allNetSales": ("sales", "allNetSales"),
+    "managerMeal": ("sales", "managerMeal"),
+    "advertising": ("sales", "advertising"),
+    "duesAndSubscriptions": ("sales", "duesAndSubscriptions"),
+    "crewLabor": ("labor", "crewLabor"),
+    "totalLabor": ("labor", "totalLabor"),
+    "payrollTax": ("labor", "payrollTax"),
+    "additionalLaborDollars": ("labor", "additionalLaborDollars"),
+    "completeWaste": ("food", "completeWaste"),
+    "rawWaste": ("food", "rawWaste"),
+    "condiment": ("food", "condiment"),
+    "variance": ("food", "variance"),
+    "unexplained": ("food", "unexplained"),
+    "discounts": ("food", "discounts"),
+    "baseFood": ("food", "baseFood"),
+    "foodOverBase": ("food", "foodOverBase"),
+    "empMgrMealsPercent": ("food", "empMgrMealsPercent"),
+    "startingFood": ("inventoryStarting", "food"),
+    "startingCondiment": ("inventoryStarting", "condiment"),
+    "startingPaper": ("inventoryStarting", "paper"),
+    "startingNonProduct": ("inventoryStarting", "nonProduct"),
+    "startingOpsSupplies": ("inventoryStarting", "opsSupplies"),
+    "endingFood": ("inventoryEnding", "food"),
+    "endingCondiment": ("inventoryEnding", "condiment"),
+    "endingPaper": ("inventoryEnding", "paper"),
+    "endingNonProduct": ("inventoryEnding", "nonProduct"),
+    "endingOpsSupplies": ("inventoryEnding", "opsSupplies"),
+}
+
+_STORE_COLUMNS = ("storeid", "store")
+_NOT_NAME_CHARS = re.compile(r"[\s._\-]")
+
+
+def _fold(name: Any) -> str:
+    return _NOT_NAME_CHARS.sub("", str(name or "")).lower()
+
+
+# Folded column name -> (section, field); dotted paths fold to the same keys
+_COLUMN_FIELDS: Dict[str, Tuple[str, str]] = {}
+for _name, (_section, _field) in GENERATE_INPUT_FIELDS.items():
+    _COLUMN_FIELDS[_fold(_name)] = (_section, _field)
+    _COLUMN_FIELDS[_fold(f"{_section}.{_field}")] = (_section, _field)
+
+_MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(MONTH_NAMES, start=1)}
+_MONTH_NUMBERS.update({name[:3].lower(): number for number, name in enumerate(MONTH_NAMES, start=1)})
+
+
+class ImportRowError(ValueError):
+    """A row that cannot be turned into a generate_input document"""
+
+    def __init__(self, row_number: int, message: str):
+        super().__init__(f"row {row_number}: {message}")
+        self.row_number = row_number
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """
+    A numeric cell as a float, or None if blank
+
+    Accepts "$1,234.56", "12.5%" and accounting negatives "(100)".
+
+    Raises:
+        ValueError: If the cell is not a number
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace("$", "").replace(",", "").replace("%", "").strip()
+    if not text:
+        return None
+    if text.startswith("(") and text.endswith(")"):
+        text = "-" + text[1:-1]
+    return float(text)
+
+
+def _period(row: Dict[str, Any], row_number: int) -> Tuple[int, int]:
+    """(year, month number) from a yearMonth column or year + month columns"""
+    year_month = str(row.get("yearmonth") or "").strip()
+    if year_month:
+        if len(year_month) != 6 or not year_month.isdigit():
+            raise ImportRowError(row_number, f"yearMonth {year_month!r} is not YYYYMM")
+        year, month = int(year_month[:4]), int(year_month[4:])
+    else:
+        year_text = str(row.get("year") or "").strip()
+        month_text = str(row.get("month") or "").strip()
+        if not year_text or not month_text:
+            raise ImportRowError(row_number, "missing yearMonth (or year and month)")
+        try:
+            year = int(float(year_text))
+        except ValueError:
+            raise ImportRowError(row_number, f"year {year_text!r} is not a number")
+        month = _MONTH_NUMBERS.get(month_text.lower())
+        if month is None:
+            try:
+                month = int(float(month_text))
+            except ValueError:
+                raise ImportRowError(row_number, f"month {month_text!r} is not a month")
+    if not 1 <= month <= 12:
+        raise ImportRowError(row_number, f"month {month} is out of range")
+    return year, month
+
+
+def parse_row(row: Dict[str, Any], row_number: int, submitted_by: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Validate an export row into a generate_input document
+
+    Args:
+        row: Column name -> cell value
+        row_number: 1-based data row number, for error messages
+        submitted_by: Recorded as submittedBy
+
+    Returns:
+        (doc_id, document to merge)
+
+    Raises:
+        ImportRowError: If the row has no store or period, or a value is not a number
+    """
+    folded = {_fold(name): value for name, value in row.items() if name is not None}
+    store = next((str(folded[c]).strip() for c in _STORE_COLUMNS if str(folded.get(c) or "").strip()), None)
+    if not store:
+        raise ImportRowError(row_number, "missing store")
+    store_id = normalize_store_id(store)
+    year, month = _period(folded, row_number)
+
+    doc: Dict[str, Any] = {
+        "storeID": store_id,
+        "year": year,
+        "month": MONTH_NAMES[month - 1],
+        "monthNumber": month,
+        "submittedBy": submitted_by,
+    }
+    values = 0
+    for column, value in folded.items():
+        target = _COLUMN_FIELDS.get(column)
+        if target is None:
+            continue
+        try:
+            number = parse_number(value)
+        except ValueError:
+            raise ImportRowError(row_number, f"{column} {value!r} is not a number")
+        if number is not None:
+            section, field = target
+            doc.setdefault(section, {})[field] = number
+            values += 1
+    if not values:
+        raise ImportRowError(row_number, "no generate input values")
+    return f"{store_id}_{year}{month:02d}", doc
+
+
+def iter_export_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the rows of a CSV or XLSX export as column name -> value
+
+    Raises:
+        RuntimeError: For XLSX files when openpyxl is not installed
+        ValueError: For other file types
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".txt"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif extension in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("openpyxl is required for XLSX imports (pip install openpyxl)")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            for values in rows:
+                if any(value is not None for value in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported export type {extension!r}; use .csv or .xlsx")
+
+
+def _merge(base: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+class GenerateInputImporter:
+    """Resumable, batched generate_input import with one bulk PAC recompute"""
+
+    def __init__(self, storage: Optional[DocumentStorage] = None, batch_size: int = MAX_BATCH_WRITES):
+        """
+        Args:
+            storage: Backend to write to; defaults to the configured one
+            batch_size: Operations per commit, sales index and checkpoint included (at most MAX_BATCH_WRITES)
+        """
+        self._storage = storage
+        self.batch_size = max(3, min(batch_size, MAX_BATCH_WRITES))
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    async def run(
+        self,
+        rows: Iterator[Dict[str, Any]],
+        job_id: str,
+        source: str = "",
+        submitted_by: str = "Bulk import",
+        recompute: bool = True,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Import rows, resuming job_id from its checkpoint if it was interrupted
+
+        Args:
+            rows: Export rows, e.g. from iter_export_rows
+            job_id: Checkpoint id; rerunning the same job skips committed rows
+            source: Description of the input (file name); a resumed job must match it
+            submitted_by: Recorded as submittedBy / lastUpdatedBy
+            recompute: Recompute PAC actual for the affected store-months at the end
+            progress: Called with the checkpoint after every commit
+
+        Returns:
+            The final checkpoint: row counts, errors, affected store-months and recompute results
+
+        Raises:
+            RuntimeError: If job_id was started from a different source
+        """
+        storage = self.storage
+        job = await storage.get(IMPORT_JOBS_COLLECTION, job_id)
+        if job is None:
+            job = {
+                "jobId": job_id,
+                "source": source,
+                "status": "importing",
+                "rowsRead": 0,
+                "rowsWritten": 0,
+                "rowsInvalid": 0,
+                "batches": 0,
+                "errors": [],
+                "affected": {},
+                "startedAt": datetime.now(timezone.utc).isoformat(),
+            }
+        elif job.get("source") != source:
+            raise RuntimeError(f"Import job {job_id} was started from {job.get('source')!r}, not {source!r}")
+        elif job.get("status") == "importing":
+            logger.info(f"Resuming import {job_id} after row {job['rowsRead']}")
+
+        if job["status"] == "importing":
+            await self._import_rows(rows, job, submitted_by, progress)
+            job["status"] = "imported"
+            await storage.set(IMPORT_JOBS_COLLECTION, job_id, self._checkpoint(job))
+
+        if job["status"] == "imported" and recompute:
+            store_months = [(store_id, ym) for store_id, months in job["affected"].items() for ym in months]
+            with document_loader_scope(storage) as loader:
+                job["recompute"] = await PacActualService(storage, loader).recompute_many(
+                    store_months, submitted_by
+                )
+            job["status"] = "completed"
+            await storage.set(IMPORT_JOBS_COLLECTION, job_id, self._checkpoint(job))
+        return job
+
+    async def _import_rows(
+        self,
+        rows: Iterator[Dict[str, Any]],
+        job: Dict[str, Any],
+        submitted_by: str,
+        progress: Optional[Callable[[Dict[str, Any]], None]],
+    ) -> None:
+        committed = checkpointed = job["rowsRead"]
+        pending: Dict[str, Dict[str, Any]] = {}
+        stores: set = set()  # each adds a sales index write to the batch
+        read = 0
+        for row in rows:
+            read += 1
+            if read <= committed:
+                continue
+            try:
+                doc_id, doc = parse_row(row, read, submitted_by)
+            except ImportRowError as e:
+                job["rowsInvalid"] += 1
+                if len(job["errors"]) < 100:
+                    job["errors"].append(str(e))
+            else:
+                # Rows for the same store-month in one batch become one write
+                pending[doc_id] = _merge(pending.get(doc_id, {}), doc)
+                stores.add(doc["storeID"])
+                job["rowsWritten"] += 1
+            job["rowsRead"] = read
+            if len(pending) + len(stores) >= self.batch_size - 1:
+                await self._commit(pending, job, progress)
+                pending, stores, checkpointed = {}, set(), read
+        if job["rowsRead"] > checkpointed:
+            await self._commit(pending, job, progress)
+
+    async def _commit(
+        self,
+        pending: Dict[str, Dict[str, Any]],
+        job: Dict[str, Any],
+        progress: Optional[Callable[[Dict[str, Any]], None]],
+    ) -> None:
+        """Write a batch of documents together with the checkpoint that covers them"""
+        for doc_id, doc in pending.items():
+            months = job["affected"].setdefault(doc["storeID"], [])
+            year_month = doc_id[-6:]
+            if year_month not in months:
+                months.append(year_month)
+        job["batches"] += 1
+        ops = [
+            WriteOp("generate_input", doc_id, {**doc, "updatedAt": firestore.SERVER_TIMESTAMP}, merge=True)
+            for doc_id, doc in pending.items()
+        ]
+        # Rows without productNetSales keep the saved sales, and so keep their index entry
+        sales: Dict[str, Dict[str, float]] = {}
+        for doc_id, doc in pending.items():
+            if "productNetSales" in (doc.get("sales") or {}):
+                sales.setdefault(doc["storeID"], {})[doc_id[-6:]] = product_net_sales(doc)
+        ops.extend(index_write(store_id, months) for store_id, months in sales.items())
+        ops.append(WriteOp(IMPORT_JOBS_COLLECTION, job["jobId"], self._checkpoint(job)))
+        await self.storage.batch(ops)
+        logger.info(
+            f"Import {job['jobId']}: {job['rowsRead']} rows read, {job['rowsWritten']} written, "
+            f"{job['rowsInvalid']} invalid"
+        )
+        if progress is not None:
+            progress(job)
+
+    @staticmethod
+    def _checkpoint(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **job,
+            "affected": {store_id: sorted(months) for store_id, months in job["affected"].items()},
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        }
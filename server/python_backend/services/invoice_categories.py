@@ -0,0 +1,150 @@
+"""
+Canonical invoice category keys
+
+invoice_log_totals.totals is keyed by invoice category. The canonical keys
+are the category ids the client writes (InvoiceSettings.js /
+invoiceTotalsService.js), plus ADVERTISING. Older documents and imports
+use other spellings ("PROMOTION", "Op Supply", "MAINTENANCE & REPAIR"),
+which the alias table below maps to a canonical key.
+
+Documents whose totals are all canonical carry `categorySchema:
+CATEGORY_SCHEMA_VERSION`; readers use their totals as-is. Anything else is
+canonicalized once per read (one dictionary lookup per key).
+main_helpers/migrate_invoice_categories.py rewrites existing documents.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+CATEGORY_SCHEMA_VERSION = 1
+
+CANONICAL_CATEGORIES: Tuple[str, ...] = (
+    "FOOD",
+    "CONDIMENT",
+    "PAPER",
+    "NONPRODUCT",
+    "TRAVEL",
+    "ADVERTISING",
+    "ADV-OTHER",
+    "PROMO",
+    "OUTSIDE SVC",
+    "LINEN",
+    "OP. SUPPLY",
+    "M+R",
+    "SML EQUIP",
+    "UTILITIES",
+    "OFFICE",
+    "TRAINING",
+    "CREW RELATIONS",
+)
+
+# Canonical key -> other spellings seen in stored documents and imports
+_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "NONPRODUCT": ("NON PRODUCT", "NON-PRODUCT"),
+    "ADVERTISING": ("ADV",),
+    "ADV-OTHER": ("ADV OTHER", "ADVERTISING OTHER", "ADV. OTHER"),
+    "PROMO": ("PROMOTION", "PROMOTIONS"),
+    "OUTSIDE SVC": ("OUTSIDE SERVICES", "OUTSIDE SERVICE"),
+    "OP. SUPPLY": ("OP SUPPLY", "OPERATING SUPPLY", "OPERATING SUPPLIES", "OPS SUPPLIES"),
+    "M+R": ("M&R", "MAINTENANCE & REPAIR", "MAINT. & REPAIR", "MAINTENANCE AND REPAIR"),
+    "SML EQUIP": ("SMALL EQUIPMENT", "SMALL EQUIP"),
+    "OFFICE": ("OFFICE SUPPLIES",),
+    "CREW RELATIONS": ("CREW RELATION",),
+}
+
+_NOT_KEY_CHARS = re.compile(r"[^A-Z0-9+&]")
+
+
+def _fold(key: str) -> str:
+    # "Op. Supply", "OP_SUPPLY" and "op supply" all fold to "OPSUPPLY"
+    return _NOT_KEY_CHARS.sub("", str(key).upper())
+
+
+# Folded spelling -> canonical key, compiled once at import
+CATEGORY_ALIASES: Dict[str, str] = {}
+for _canonical in CANONICAL_CATEGORIES:
+    for _spelling in (_canonical,) + _ALIASES.get(_canonical, ()):
+        _folded = _fold(_spelling)
+        if CATEGORY_ALIASES.setdefault(_folded, _canonical) != _canonical:
+            raise ValueError(f"Invoice category alias {_spelling!r} is ambiguous")
+
+_CANONICAL_SET = frozenset(CANONICAL_CATEGORIES)
+
+
+@lru_cache(maxsize=1024)
+def canonical_category(key: str) -> Optional[str]:
+    """Canonical key for any known spelling of a category, or None"""
+    if key in _CANONICAL_SET:
+        return key
+    return CATEGORY_ALIASES.get(_fold(key))
+
+
+def canonicalize_totals(totals: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Rewrite a totals map to canonical keys
+
+    The client merges its totals into the document, so a legacy spelling can
+    sit next to the canonical key it was replaced by: the canonical key wins,
+    otherwise the first alias seen. Unknown keys are kept so no data is dropped.
+    """
+    result: Dict[str, Any] = {}
+    for key, value in totals.items():
+        canonical = canonical_category(key)
+        if canonical is None:
+            result[key] = value
+        elif key == canonical or canonical not in result:
+            result[canonical] = value
+    return result
+
+
+def canonicalize_invoice_categories(categories: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Rewrite an invoice's categories map to canonical keys before it is saved
+
+    The totals job only sums canonical keys, so an invoice saved under an
+    alias would drop out of invoice_log_totals. Amounts of two spellings of
+    one category are combined into a list, the shape the totals job sums.
+    """
+    result: Dict[str, Any] = {}
+    for key, value in categories.items():
+        canonical = canonical_category(key) or key
+        if canonical in result:
+            result[canonical] = _as_list(result[canonical]) + _as_list(value)
+        else:
+            result[canonical] = value
+    return result
+
+
+def _as_list(value: Any) -> list:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def invoice_totals(invoice_log_totals: Optional[Mapping[str, Any]]) -> Mapping[str, Any]:
+    """
+    Canonical totals of an invoice_log_totals document, for direct key lookups
+
+    Documents already marked with the current categorySchema are returned as-is.
+    """
+    if not invoice_log_totals:
+        return {}
+    totals = invoice_log_totals.get("totals") or {}
+    if invoice_log_totals.get("categorySchema") == CATEGORY_SCHEMA_VERSION:
+        return totals
+    return canonicalize_totals(totals)
+
+
+def canonical_invoice_totals_doc(doc: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The canonical form of an invoice_log_totals document for writing
+
+    Returns:
+        The rewritten document, or None if it is already canonical
+    """
+    if doc.get("categorySchema") == CATEGORY_SCHEMA_VERSION:
+        return None
+    return {
+        **doc,
+        "totals": canonicalize_totals(doc.get("totals") or {}),
+        "categorySchema": CATEGORY_SCHEMA_VERSION,
+    }
+
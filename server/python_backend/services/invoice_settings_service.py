@@ -1,5 +1,7 @@
 from typing import List, Dict, Any
 
+from .config_cache import get_config_cache
+
 
 class InvoiceSettingsService:
     """Service for managing invoice category settings in Firestore.
@@ -53,6 +55,11 @@ class InvoiceSettingsService:
             raise RuntimeError("Firebase not initialized")
         return self._db.collection("invoiceCategories")
 
+    def _categories_cache(self):
+        if self._db is None:
+            raise RuntimeError("Firebase not initialized")
+        return get_config_cache(self._db, "invoiceCategories")
+
     def _serialize_ts(self, value):
         try:
             # Firestore Timestamp has .isoformat via to_datetime()
@@ -67,31 +74,28 @@ class InvoiceSettingsService:
         """Ensure default docs exist and return ordered category list."""
         from firebase_admin import firestore  # type: ignore
 
-        col = self._categories_collection()
-        results: List[Dict[str, Any]] = []
-
-        for cat_id in self.DEFAULT_INVOICE_CATEGORIES:
-            doc_ref = col.document(cat_id)
-            snap = doc_ref.get()
+        cache = self._categories_cache()
+        docs = await cache.documents()
 
-            if snap.exists:
-                data = snap.to_dict() or {}
-            else:
-                # Create missing doc with defaults
-                data = {
+        missing = [cat_id for cat_id in self.DEFAULT_INVOICE_CATEGORIES if cat_id not in docs]
+        if missing:
+            # Create missing docs with defaults, then reload to capture server timestamps
+            col = self._categories_collection()
+            batch = self._db.batch()
+            for cat_id in missing:
+                batch.set(col.document(cat_id), {
                     "bankAccountNum": "0000",
                     "name": cat_id,
                     "description": f"Account settings for {cat_id} category",
                     "createdAt": firestore.SERVER_TIMESTAMP,
-                }
-                doc_ref.set(data)
-                # After set, re-read to capture server timestamp if available
-                try:
-                    snap = doc_ref.get()
-                    data = snap.to_dict() or data
-                except Exception:
-                    pass
+                })
+            batch.commit()
+            cache.invalidate()
+            docs = await cache.documents()
 
+        results: List[Dict[str, Any]] = []
+        for cat_id in self.DEFAULT_INVOICE_CATEGORIES:
+            data = docs.get(cat_id) or {}
             created_at = data.get("createdAt")
             results.append({
                 "id": cat_id,
@@ -130,6 +134,7 @@ class InvoiceSettingsService:
             }
             doc_ref.set(default_data)
             merged = default_data
+        self._categories_cache().invalidate()
 
         # Re-read to reflect latest stored values
         try:
@@ -11,6 +11,8 @@ from dotenv import load_dotenv
 import firebase_admin
 from firebase_admin import firestore, storage, credentials
 
+from .invoice_categories import canonicalize_invoice_categories
+
 
 class InvoiceSubmitService:
     """Service for submitting invoices to Firebase"""
@@ -191,6 +193,7 @@ class InvoiceSubmitService:
             
             deleted_count = 0
             moved_to_deleted_count = 0
+            affected_months = set()
             
             for doc in docs:
                 invoice_data = doc.to_dict()
@@ -213,10 +216,15 @@ class InvoiceSubmitService:
                     # Delete from invoices collection
                     doc.reference.delete()
                     deleted_count += 1
+                    affected_months.add((invoice_data.get('storeID', ''), f"{invoice_year}{invoice_month:02d}"))
             
             return {
                 "success": True,
                 "deleted_count": deleted_count,
+                "affected_months": [
+                    {"store_id": store_id, "year_month": year_month}
+                    for store_id, year_month in sorted(affected_months)
+                ],
                 "message": f"Deleted {deleted_count} recurring invoice(s)"
             }
             
@@ -236,7 +244,7 @@ class InvoiceSubmitService:
             invoice_id = invoice_ref.id
             
             doc_data = {
-                'categories': invoice_data.get('categories', {}),
+                'categories': canonicalize_invoice_categories(invoice_data.get('categories') or {}),
                 'companyName': invoice_data.get('companyName', ''),
                 'dateSubmitted': invoice_data.get('dateSubmitted', ''),
                 'imageURL': image_url or '',
@@ -293,7 +301,7 @@ class InvoiceSubmitService:
             invoice_id = invoice_ref.id
             
             doc_data = {
-                'categories': invoice_data.get('categories', {}),
+                'categories': canonicalize_invoice_categories(invoice_data.get('categories') or {}),
                 'companyName': invoice_data.get('companyName', ''),
                 'dateSubmitted': invoice_data.get('dateSubmitted', ''),
                 'imageURL': image_url,  # Store the signed URL for direct use in frontend
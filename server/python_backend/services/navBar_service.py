@@ -3,6 +3,8 @@ from typing import List, Dict, Any, Optional
 import firebase_admin
 from firebase_admin import firestore
 
+from .config_cache import get_config_cache
+
 
 class NavBarService:
     def __init__(self) -> None:
@@ -36,12 +38,11 @@ class NavBarService:
             return None
         return doc
 
-    def _shape_store(self, doc) -> Dict[str, Any]:
-        data = doc.to_dict() or {}
+    def _shape_store(self, doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         shaped = {
-            "id": str(doc.id),
+            "id": str(doc_id),
             # Prefer existing fields used by UI; fall back to reasonable defaults
-            "storeID": data.get("storeID") or data.get("id") or str(doc.id),
+            "storeID": data.get("storeID") or data.get("id") or str(doc_id),
             "subName": data.get("subName") or data.get("name") or "",
         }
         # Include optional fields for broader compatibility
@@ -52,15 +53,8 @@ class NavBarService:
         return shaped
 
     def _get_stores_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
-        stores: List[Dict[str, Any]] = []
-        for sid in ids:
-            try:
-                doc = self.db.collection("stores").document(str(sid)).get()
-                if doc.exists:
-                    stores.append(self._shape_store(doc))
-            except Exception:
-                continue
-        return stores
+        docs = get_config_cache(self.db, "stores").documents_sync()
+        return [self._shape_store(str(sid), docs[str(sid)]) for sid in ids if str(sid) in docs]
 
     def fetch_allowed_stores(self, email: str) -> List[Dict[str, Any]]:
         if not self.db:
@@ -75,8 +69,8 @@ class NavBarService:
 
         # Admins: all stores
         if role.lower() == "admin":
-            snaps = self.db.collection("stores").stream()
-            return [self._shape_store(d) for d in snaps]
+            docs = get_config_cache(self.db, "stores").documents_sync()
+            return [self._shape_store(doc_id, data) for doc_id, data in docs.items()]
 
         # Non-admins: assigned stores only
         assigned = user_data.get("assignedStores", []) or []
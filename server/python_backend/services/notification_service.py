@@ -7,15 +7,18 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 import firebase_admin
 from firebase_admin import firestore
+from .config_cache import get_config_cache
+from .firestore_async import AsyncFirestoreMixin, stream_documents
 
 logger = logging.getLogger(__name__)
 
 
-class NotificationService:
+class NotificationService(AsyncFirestoreMixin):
     """Service for managing notifications and notification settings in Firestore"""
 
-    def __init__(self):
+    def __init__(self, async_db: Any = None):
         self.db = None
+        self._async_db = async_db
         self.notifications_collection = "notifications"
         self.settings_collection = "settings"
         self._initialize_firebase()
@@ -45,12 +48,10 @@ class NotificationService:
             raise RuntimeError("Firebase not initialized - cannot fetch notification settings")
 
         try:
-            doc_ref = self.db.collection(self.settings_collection).document("notifications")
-            doc = doc_ref.get()
+            data = await get_config_cache(self.db, self.settings_collection).get("notifications")
             settings = []
 
-            if doc.exists:
-                data = doc.to_dict()
+            if data is not None:
                 for t, v in data.items():
                     settings.append({
                         "type": t,
@@ -71,8 +72,9 @@ class NotificationService:
             raise RuntimeError("Firebase not initialized - cannot update notification settings")
 
         try:
-            doc_ref = self.db.collection(self.settings_collection).document("notifications")
-            doc_ref.set(payload)
+            doc_ref = self.adb.collection(self.settings_collection).document("notifications")
+            await doc_ref.set(payload)
+            get_config_cache(self.db, self.settings_collection).invalidate()
             logger.info("Notification settings updated successfully")
             return True
         except Exception as e:
@@ -89,11 +91,11 @@ class NotificationService:
 
         try:
             ref = (
-                self.db.collection(self.notifications_collection)
+                self.adb.collection(self.notifications_collection)
                 .where("toEmail", "==", to_email)
                 .order_by("createdAt", direction=firestore.Query.DESCENDING)
             )
-            docs = ref.stream()
+            docs = await stream_documents(ref)
             notifications = []
             for doc in docs:
                 data = doc.to_dict()
@@ -112,11 +114,11 @@ class NotificationService:
             raise RuntimeError("Firebase not initialized - cannot mark notification")
 
         try:
-            doc_ref = self.db.collection(self.notifications_collection).document(notif_id)
-            if not doc_ref.get().exists:
+            doc_ref = self.adb.collection(self.notifications_collection).document(notif_id)
+            if not (await doc_ref.get()).exists:
                 raise ValueError("Notification not found")
 
-            doc_ref.update({"read": True, "readAt": datetime.now()})
+            await doc_ref.update({"read": True, "readAt": datetime.now()})
             logger.info(f"Notification {notif_id} marked as read")
             return True
         except Exception as e:
@@ -129,13 +131,13 @@ class NotificationService:
             raise RuntimeError("Firebase not initialized - cannot mark notifications")
 
         try:
-            query = self.db.collection(self.notifications_collection).where("toEmail", "==", to_email)
-            batch = self.db.batch()
-            for doc in query.stream():
+            query = self.adb.collection(self.notifications_collection).where("toEmail", "==", to_email)
+            batch = self.adb.batch()
+            for doc in await stream_documents(query):
                 data = doc.to_dict()
                 if not data.get("read", False):
                     batch.update(doc.reference, {"read": True, "readAt": datetime.now()})
-            batch.commit()
+            await batch.commit()
             logger.info(f"Marked all notifications as read for {to_email}")
             return True
         except Exception as e:
@@ -0,0 +1,587 @@
+"""
+PAC Actual Service - computes and saves pac_actual documents
+
+A pac_actual document is derived from the month's generate_input,
+invoice_log_totals and pac-projections, plus the sales comparisons of
+four earlier months (from the store's sales index). Because of those
+comparisons, saving a month also recomputes the later months that
+compare against it (services.recompute_planner plans them) when they
+already have a pac_actual document: the cascade.
+
+Each document records an inputFingerprint: a hash of its sources'
+contents, its comparison sales and FORMULA_VERSION. When a save finds the
+stored fingerprint unchanged, nothing is computed, written (beyond a
+refreshed sourceData) or cascaded.
+
+apply_invoice_delta() patches a month for one invoice category change
+(POST /actual/delta) instead of recomputing it.
+
+compute() handles one month. POST /actual/compute calls it without the
+cascade and queues the dependent months instead (services.recompute_queue),
+which recomputes them with recompute_existing(). recompute_many()
+handles any number at once (bulk imports): sources are read in one
+round trip, the sales index is updated once per store, every affected
+month including the cascade is computed once, and writes are committed
+in storage batches.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from firebase_admin import firestore
+
+from .data_ingestion_service import DataIngestionService
+from .document_loader import DocumentLoader, document_loader
+from .invoice_categories import (
+    CATEGORY_SCHEMA_VERSION, canonical_category, canonical_invoice_totals_doc, invoice_totals,
+)
+from .pac_cache import PacResultCache, get_pac_cache, source_fingerprint
+from .pac_calculation_service import _set_path, calculate_pac_actual, calculate_pac_actual_delta, normalize_store_id
+from .pac_formulas import PAC_ACTUAL_FIELDS, PAC_ACTUAL_GRAPH, to_num
+from .recompute_planner import RecomputePlanner, StoreMonth, get_recompute_planner
+from .sales_index_service import SALES_INDEX_COLLECTION, SalesIndexService
+from .storage import DocumentStorage, WriteOp, get_storage
+
+logger = logging.getLogger(__name__)
+
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+SOURCE_COLLECTIONS = ("generate_input", "invoice_log_totals", "pac-projections")
+
+CASCADE_USER = "System (Cascade)"
+
+
+class InvoiceTotalConflict(ValueError):
+    """The stored invoice category total is not the one a delta was computed from"""
+
+    def __init__(self, doc_id: str, category: str, stored_total: float):
+        super().__init__(f"{doc_id} has {category} = {stored_total:.2f} in invoice_log_totals")
+        self.doc_id = doc_id
+        self.category = category
+        self.stored_total = stored_total
+
+# Bump when calculate_pac_actual or the document layout changes outside
+# PAC_ACTUAL_GRAPH, so stored input fingerprints stop matching
+PAC_ACTUAL_REVISION = 1
+
+# Changes whenever the formulas, their input fields or the category schema change
+FORMULA_VERSION = source_fingerprint(
+    PAC_ACTUAL_REVISION, PAC_ACTUAL_GRAPH.source(), PAC_ACTUAL_FIELDS, CATEGORY_SCHEMA_VERSION
+)[:16]
+
+# Source fields that record who saved a document and when; no PAC value reads them
+BOOKKEEPING_FIELDS = frozenset({"updatedAt", "updatedBy", "submittedBy", "createdAt"})
+
+
+def input_fingerprint(
+    generate_input: Dict[str, Any],
+    invoice_log_totals: Optional[Dict[str, Any]],
+    pac_projections: Optional[Dict[str, Any]],
+    sales: Dict[str, Optional[float]],
+) -> str:
+    """
+    Fingerprint of everything a pac_actual document's values come from
+
+    Source contents (without BOOKKEEPING_FIELDS), the comparison months'
+    sales and FORMULA_VERSION. Stored as inputFingerprint.
+    """
+    def content(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {key: value for key, value in (doc or {}).items() if key not in BOOKKEEPING_FIELDS}
+
+    return source_fingerprint(
+        FORMULA_VERSION, content(generate_input), content(invoice_log_totals), content(pac_projections), sales
+    )
+
+
+def sales_comparison(sales: Dict[str, Optional[float]]) -> Dict[str, float]:
+    """The salesComparison block of a pac_actual document from history month -> sales"""
+    return {
+        "lastYearProductSales": sales.get("last_year") or 0.0,
+        "lastMonthProductSales": sales.get("last_month") or 0.0,
+        "lastMonthLastYearProductSales": sales.get("last_month_last_year") or 0.0,
+        "lastYearLastYearProductSales": sales.get("last_year_last_year") or 0.0,
+    }
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    """Value at a dotted path of a nested dict, or None"""
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _source_data(
+    generate_input: Dict[str, Any],
+    invoice_log_totals: Dict[str, Any],
+    pac_projections: Dict[str, Any],
+    submitted_by: str,
+) -> Dict[str, Any]:
+    """Who last updated each source, and the most recent of them"""
+    timestamps = []
+    if generate_input.get("updatedAt"):
+        timestamps.append({
+            "timestamp": generate_input.get("updatedAt"),
+            "user": generate_input.get("submittedBy", submitted_by),
+        })
+    if invoice_log_totals.get("updatedAt"):
+        timestamps.append({
+            "timestamp": invoice_log_totals.get("updatedAt"),
+            "user": invoice_log_totals.get("updatedBy", submitted_by),
+        })
+    if pac_projections.get("updatedAt"):
+        timestamps.append({
+            "timestamp": pac_projections.get("updatedAt"),
+            "user": pac_projections.get("updatedBy", submitted_by),
+        })
+
+    most_recent = timestamps[0] if timestamps else {"timestamp": None, "user": submitted_by}
+    for ts in timestamps[1:]:
+        if ts["timestamp"] and (not most_recent["timestamp"] or ts["timestamp"] > most_recent["timestamp"]):
+            most_recent = ts
+
+    return {
+        "generateInputUpdatedAt": generate_input.get("updatedAt"),
+        "generateInputUpdatedBy": generate_input.get("submittedBy", submitted_by),
+        "invoiceLogTotalsUpdatedAt": invoice_log_totals.get("updatedAt"),
+        "invoiceLogTotalsUpdatedBy": invoice_log_totals.get("updatedBy", submitted_by),
+        "pacProjectionsUpdatedAt": pac_projections.get("updatedAt"),
+        "pacProjectionsUpdatedBy": pac_projections.get("updatedBy", submitted_by),
+        "mostRecentSourceUpdatedAt": most_recent.get("timestamp"),
+        "mostRecentSourceUpdatedBy": most_recent.get("user"),
+    }
+
+
+def pac_actual_document(
+    store_id: str,
+    year_month: str,
+    pac_actual_data: Dict[str, Any],
+    sales: Dict[str, Optional[float]],
+    submitted_by: str,
+    source_data: Optional[Dict[str, Any]] = None,
+    fingerprint: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    A pac_actual document from calculate_pac_actual's result
+
+    Args:
+        pac_actual_data: calculate_pac_actual output (not modified)
+        sales: History month name (see DataIngestionService._history_months) -> product sales
+        source_data: sourceData block, left out if None
+        fingerprint: input_fingerprint of the document's inputs, left out if None
+    """
+    month_num = int(year_month[4:])
+    doc = {
+        "storeID": store_id,
+        "store": f"Store {store_id.split('_')[1] if '_' in store_id else store_id}",
+        "year": int(year_month[:4]),
+        "month": MONTH_NAMES[month_num - 1],
+        "monthNumber": month_num,
+        "lastUpdatedAt": firestore.SERVER_TIMESTAMP,
+        "lastUpdatedBy": submitted_by,
+    }
+    if source_data is not None:
+        doc["sourceData"] = source_data
+    if fingerprint is not None:
+        doc["inputFingerprint"] = fingerprint
+    return {**doc, **pac_actual_data, "salesComparison": sales_comparison(sales)}
+
+
+def current_update(
+    stored: Optional[Dict[str, Any]], fingerprint: str, source_data: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    The write that brings a stored pac_actual up to date when its inputs have not changed
+
+    Returns:
+        None if the stored document was computed from other inputs (recompute it);
+        {} if it is current; {"sourceData": ...} if only the sources' bookkeeping moved
+    """
+    if stored is None or stored.get("inputFingerprint") != fingerprint:
+        return None
+    if source_data is not None and stored.get("sourceData") != source_data:
+        return {"sourceData": source_data}
+    return {}
+
+
+class PacActualService:
+    """Computes pac_actual documents and writes them with their cascade"""
+
+    def __init__(
+        self,
+        storage: Optional[DocumentStorage] = None,
+        loader: Optional[DocumentLoader] = None,
+        result_cache: Optional[PacResultCache] = None,
+        planner: Optional[RecomputePlanner] = None,
+    ):
+        """
+        Args:
+            storage: Backend to write to; defaults to the configured one
+            loader: Loader to read through; defaults to the request's
+            result_cache: Computed-result cache; defaults to the process-wide one
+            planner: Cascade planner; defaults to the process-wide one
+        """
+        self._storage = storage
+        self._loader = loader
+        self.result_cache = result_cache if result_cache is not None else get_pac_cache()
+        self.planner = planner if planner is not None else get_recompute_planner()
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    @property
+    def loader(self) -> DocumentLoader:
+        if self._loader is None:
+            self._loader = document_loader(self.storage)
+        return self._loader
+
+    @property
+    def sales_index(self) -> SalesIndexService:
+        return SalesIndexService(self.storage, self.loader)
+
+    async def compute(
+        self, store_id: str, year_month: str, submitted_by: str = "System", cascade: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Compute and save one month's pac_actual, then its cascade
+
+        Nothing is computed, written or cascaded when the stored document
+        was computed from the same inputs (see input_fingerprint).
+
+        Args:
+            store_id: Store id in any accepted format
+            year_month: Month in YYYYMM format
+            submitted_by: Recorded as lastUpdatedBy
+            cascade: Also recompute dependent months that have pac_actual
+
+        Returns:
+            {"doc_id", "data", "unchanged", "cascaded_months"}, or None if the month has no generate_input
+        """
+        store_id = normalize_store_id(store_id)
+        doc_id = f"{store_id}_{year_month}"
+        loader = self.loader
+        sales_index = self.sales_index
+
+        # This month's sources, its stored pac_actual and the store's sales index in one batch
+        docs = await loader.load_many(
+            [(name, doc_id) for name in ("pac_actual",) + SOURCE_COLLECTIONS] + [(SALES_INDEX_COLLECTION, store_id)]
+        )
+        if docs[("generate_input", doc_id)] is None:
+            return None
+
+        self._canonical_invoice_totals(docs)
+
+        # The Generate tab calls this right after saving generate_input
+        await sales_index.record(store_id, year_month, docs[("generate_input", doc_id)])
+
+        history = await self._history_sales([(store_id, year_month)])
+        write, changed = self._document(store_id, year_month, docs, history[store_id], submitted_by)
+        if write:
+            await self.storage.set("pac_actual", doc_id, write, merge=True)
+            loader.clear("pac_actual", doc_id)
+        pac_actual_doc = write if changed else {**docs[("pac_actual", doc_id)], **write}
+
+        cascaded_months: List[str] = []
+        if cascade and changed:
+            cascaded_months = [ym for _, ym in await self._cascade([(store_id, year_month)])]
+
+        return {
+            "doc_id": doc_id,
+            "data": pac_actual_doc,
+            "unchanged": not changed,
+            "cascaded_months": cascaded_months,
+        }
+
+    async def apply_invoice_delta(
+        self,
+        store_id: str,
+        year_month: str,
+        category: str,
+        old_total: float,
+        new_total: float,
+        submitted_by: str = "System",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Record one invoice category change and patch the month's pac_actual with it
+
+        In one storage transaction the stored category total is checked
+        against old_total, the new total is written to invoice_log_totals
+        and only the affected pac_actual fields are updated, so a stale
+        old_total cannot make the two drift apart. The patched document
+        loses its inputFingerprint: the next compute() recomputes it in full.
+
+        Args:
+            store_id: Store id in any accepted format
+            year_month: Month in YYYYMM format
+            category: invoice_log_totals category key; aliases are accepted
+            old_total: Category total the change was made from
+            new_total: Category total after the change
+            submitted_by: Recorded as lastUpdatedBy
+
+        Returns:
+            {"doc_id", "updated"} (dotted path -> amount added), or None if the month has no pac_actual
+
+        Raises:
+            InvoiceTotalConflict: If the stored total is not old_total
+        """
+        store_id = normalize_store_id(store_id)
+        doc_id = f"{store_id}_{year_month}"
+        category = canonical_category(category) or category
+        updated: Dict[str, float] = {}
+
+        def update(docs: Dict[Tuple[str, str], Optional[Dict[str, Any]]]) -> List[WriteOp]:
+            updated.clear()
+            pac_actual = docs[("pac_actual", doc_id)]
+            if pac_actual is None:
+                return []
+            stored = docs[("invoice_log_totals", doc_id)] or {}
+            stored_total = to_num(invoice_totals(stored).get(category))
+            if round(stored_total - to_num(old_total), 2) != 0:
+                raise InvoiceTotalConflict(doc_id, category, stored_total)
+
+            # Written whole in canonical form, so an alias key cannot count twice
+            totals_doc = canonical_invoice_totals_doc(stored) or stored
+            ops = [WriteOp("invoice_log_totals", doc_id, {
+                **totals_doc,
+                "totals": {**(totals_doc.get("totals") or {}), category: new_total},
+                "categorySchema": CATEGORY_SCHEMA_VERSION,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            })]
+            updated.update(calculate_pac_actual_delta(pac_actual, category, old_total, new_total))
+            if updated:
+                patch: Dict[str, Any] = {
+                    "lastUpdatedAt": firestore.SERVER_TIMESTAMP,
+                    "lastUpdatedBy": submitted_by,
+                    "inputFingerprint": None,
+                }
+                for path, amount in updated.items():
+                    _set_path(patch, path, to_num(_get_path(pac_actual, path)) + amount)
+                ops.append(WriteOp("pac_actual", doc_id, patch, merge=True))
+            return ops
+
+        ops = await self.storage.transact([("pac_actual", doc_id), ("invoice_log_totals", doc_id)], update)
+        for collection in ("pac_actual", "invoice_log_totals"):
+            self.loader.clear(collection, doc_id)
+        if not ops:
+            return None
+        return {"doc_id": doc_id, "updated": dict(updated)}
+
+    async def recompute_many(
+        self, store_months: Iterable[StoreMonth], submitted_by: str = "System", cascade: bool = True
+    ) -> Dict[str, List[str]]:
+        """
+        Recompute many store-months in bulk, each exactly once
+
+        Every month's sales are recorded in the sales index before any
+        comparison is computed, so months of the same batch see each other.
+        Months whose stored pac_actual is current are not rewritten and do
+        not cascade.
+
+        Args:
+            store_months: (store_id, YYYYMM) pairs; duplicates are fine
+            submitted_by: Recorded as lastUpdatedBy
+            cascade: Also recompute dependent months outside the batch that have pac_actual
+
+        Returns:
+            {"recomputed", "unchanged", "cascaded", "missing"} document ids;
+            missing months have no generate_input
+        """
+        targets = list(dict.fromkeys((normalize_store_id(store_id), ym) for store_id, ym in store_months))
+        loader = self.loader
+        sales_index = self.sales_index
+        stores = sorted({store_id for store_id, _ in targets})
+
+        docs = await loader.load_many(
+            [
+                (name, f"{store_id}_{ym}")
+                for store_id, ym in targets
+                for name in ("pac_actual",) + SOURCE_COLLECTIONS
+            ]
+            + [(SALES_INDEX_COLLECTION, store_id) for store_id in stores]
+        )
+        present = [(s, ym) for s, ym in targets if docs[("generate_input", f"{s}_{ym}")] is not None]
+        missing = [f"{s}_{ym}" for s, ym in targets if docs[("generate_input", f"{s}_{ym}")] is None]
+
+        by_store: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for store_id, ym in present:
+            by_store.setdefault(store_id, {})[ym] = docs[("generate_input", f"{store_id}_{ym}")]
+        await asyncio.gather(*(sales_index.record_many(s, months) for s, months in by_store.items()))
+
+        self._canonical_invoice_totals(docs)
+        history = await self._history_sales(present)
+        ops: List[WriteOp] = []
+        recomputed: List[StoreMonth] = []
+        unchanged: List[StoreMonth] = []
+        for store_id, ym in present:
+            write, changed = self._document(store_id, ym, docs, history[store_id], submitted_by)
+            if write:
+                ops.append(WriteOp("pac_actual", f"{store_id}_{ym}", write, merge=True))
+            (recomputed if changed else unchanged).append((store_id, ym))
+        await self.storage.batch(ops)
+        for store_id, ym in present:
+            loader.clear("pac_actual", f"{store_id}_{ym}")
+
+        cascaded: List[str] = []
+        if cascade:
+            cascaded = [
+                f"{store_id}_{ym}" for store_id, ym in await self._cascade(recomputed, skip=targets)
+            ]
+
+        logger.info(
+            f"Recomputed {len(recomputed)} PAC actual months ({len(unchanged)} unchanged, "
+            f"{len(cascaded)} cascaded, {len(missing)} without input)"
+        )
+        return {
+            "recomputed": [f"{s}_{ym}" for s, ym in recomputed],
+            "unchanged": [f"{s}_{ym}" for s, ym in unchanged],
+            "cascaded": cascaded,
+            "missing": missing,
+        }
+
+    async def _cascade(self, sources: Sequence[StoreMonth], skip: Iterable[StoreMonth] = ()) -> List[StoreMonth]:
+        """
+        Recompute the planned dependents of months just saved that already have pac_actual, once each
+
+        Args:
+            sources: Months just saved
+            skip: Months already recomputed in this run
+        """
+        if not sources:
+            return []
+        return await self.recompute_existing(self.planner.plan(sources, skip=skip))
+
+    async def recompute_existing(self, store_months: Sequence[StoreMonth]) -> List[StoreMonth]:
+        """
+        Recompute months that already have a pac_actual document, as a cascade
+
+        Months without pac_actual or generate_input are skipped, and so are
+        months whose pac_actual is current. Sources of every month and the
+        stores' sales indexes are read in one batch, then every month is
+        computed without further reads.
+
+        Args:
+            store_months: Normalized (store_id, YYYYMM) pairs
+
+        Returns:
+            The months recomputed
+        """
+        if not store_months:
+            return []
+        docs = await self.loader.load_many(
+            [
+                (name, f"{store_id}_{ym}")
+                for store_id, ym in store_months
+                for name in ("pac_actual",) + SOURCE_COLLECTIONS
+            ]
+            + [(SALES_INDEX_COLLECTION, store_id) for store_id in sorted({store_id for store_id, _ in store_months})]
+        )
+        existing = [
+            (store_id, ym) for store_id, ym in store_months
+            if docs[("pac_actual", f"{store_id}_{ym}")] is not None
+            and docs[("generate_input", f"{store_id}_{ym}")] is not None
+        ]
+        history = await self._history_sales(existing)
+
+        recomputed: List[StoreMonth] = []
+        ops: List[WriteOp] = []
+        for store_id, ym in existing:
+            dep_doc_id = f"{store_id}_{ym}"
+            try:
+                write, changed = self._document(
+                    store_id, ym, docs, history[store_id], CASCADE_USER, with_source_data=False
+                )
+                if changed:
+                    logger.info(f"Cascading recompute triggered for {dep_doc_id}")
+                    ops.append(WriteOp("pac_actual", dep_doc_id, write, merge=True))
+                    recomputed.append((store_id, ym))
+            except Exception as cascade_err:
+                logger.warning(f"Failed to cascade recompute for {dep_doc_id}: {cascade_err}")
+
+        if ops:
+            await self.storage.batch(ops)
+            for store_id, ym in recomputed:
+                self.loader.clear("pac_actual", f"{store_id}_{ym}")
+        return recomputed
+
+    async def _history_sales(self, store_months: Sequence[StoreMonth]) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Comparison sales of every given month, in one lookup
+
+        Returns:
+            store_id -> YYYYMM -> sales (None without generate_input)
+        """
+        months: Dict[str, List[str]] = {}
+        for store_id, ym in store_months:
+            months.setdefault(store_id, []).extend(DataIngestionService._history_months(ym).values())
+        return await self.sales_index.lookup_many(months) if months else {}
+
+    def _document(
+        self,
+        store_id: str,
+        year_month: str,
+        docs: Dict[Tuple[str, str], Optional[Dict[str, Any]]],
+        history_sales: Dict[str, Optional[float]],
+        submitted_by: str,
+        with_source_data: bool = True,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Build the pac_actual document of a month whose sources are in docs
+
+        When docs also holds the month's stored pac_actual and it is current
+        (same input_fingerprint), nothing is computed.
+
+        Args:
+            history_sales: The store's comparison sales from _history_sales()
+
+        Returns:
+            (write, changed): the document to merge and True, or for a current
+            document at most its refreshed sourceData ({} if nothing) and False
+        """
+        doc_id = f"{store_id}_{year_month}"
+        generate_input = docs[("generate_input", doc_id)]
+        invoice_log_totals = docs[("invoice_log_totals", doc_id)] or {"totals": {}}
+        pac_projections = docs[("pac-projections", doc_id)] or {}
+
+        history = DataIngestionService._history_months(year_month)
+        sales = {name: history_sales.get(month) for name, month in history.items()}
+        source_data = (
+            _source_data(generate_input, invoice_log_totals, pac_projections, submitted_by)
+            if with_source_data else None
+        )
+        fingerprint = input_fingerprint(generate_input, invoice_log_totals, pac_projections, sales)
+        update = current_update(docs.get(("pac_actual", doc_id)), fingerprint, source_data)
+        if update is not None:
+            return update, False
+
+        # Cached by the fingerprint computed above, so a hit costs no hashing
+        pac_actual_data = self.result_cache.get_or_compute(
+            ("actual", fingerprint),
+            store_id,
+            year_month,
+            lambda: calculate_pac_actual(generate_input, invoice_log_totals, pac_projections),
+        )
+        return pac_actual_document(
+            store_id, year_month, pac_actual_data, sales, submitted_by, source_data, fingerprint
+        ), True
+
+    @staticmethod
+    def _canonical_invoice_totals(docs: Dict[Tuple[str, str], Optional[Dict[str, Any]]]) -> None:
+        """
+        Replace loaded invoice_log_totals documents that are not canonical yet with their canonical form
+
+        Only the copies in docs change. The web client merges into these
+        documents, and overwriting one here could drop a merge that lands
+        between the read and the write; stored documents are rewritten by
+        migrate_invoice_categories.
+        """
+        for (collection, doc_id), data in list(docs.items()):
+            if collection != "invoice_log_totals" or data is None:
+                continue
+            canonical = canonical_invoice_totals_doc(data)
+            if canonical is not None:
+                docs[(collection, doc_id)] = canonical
@@ -0,0 +1,192 @@
+"""
+PAC Aggregation Service - consolidated PAC actual for groups of stores
+
+Member stores are grouped by the `entity` field kept on store documents.
+Each store's pac_actual is computed from its source documents; the sources
+of every store are read through one document loader, so a whole entity is
+fetched in a single round trip. Then line dollars are summed and every
+percentage is recomputed against the consolidated product sales.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import firebase_admin
+from firebase_admin import firestore
+
+from .document_loader import DocumentLoader, document_loader, document_loader_scope
+from .pac_calculation_service import calculate_pac_actual, normalize_store_id
+from .pac_formulas import to_num
+from .pac_rollup_service import consolidated_lines, line_dollars, sum_line_dollars
+from .store_management_service import StoreManagementService
+
+logger = logging.getLogger(__name__)
+
+# Entity name used for stores that have none set
+UNASSIGNED_ENTITY = "Unassigned"
+
+SOURCE_COLLECTIONS = ("generate_input", "invoice_log_totals", "pac-projections")
+
+
+def group_stores_by_entity(stores: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Group store documents by their `entity` field
+
+    Args:
+        stores: Store documents as returned by StoreManagementService.fetch_active_stores
+
+    Returns:
+        Entity name -> sorted canonical store ids
+    """
+    groups: Dict[str, set] = {}
+    for store in stores:
+        store_id = store.get("id") or store.get("storeID")
+        if not store_id:
+            continue
+        entity = str(store.get("entity") or "").strip() or UNASSIGNED_ENTITY
+        groups.setdefault(entity, set()).add(normalize_store_id(store_id))
+    return {entity: sorted(ids) for entity, ids in sorted(groups.items())}
+
+
+def consolidate_pac_actual(docs: Mapping[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Sum pac_actual documents of several stores for the same month
+
+    Args:
+        docs: Store id -> pac_actual document (None when the store has no data)
+
+    Returns:
+        {"stores", "missingStores", "byStore", "consolidated"}
+    """
+    present = sorted(store_id for store_id, doc in docs.items() if doc)
+    missing = sorted(store_id for store_id, doc in docs.items() if not doc)
+
+    rows = {store_id: line_dollars(docs[store_id]) for store_id in present}
+    by_store = [
+        {
+            "storeId": store_id,
+            "productSales": to_num(docs[store_id].get("sales", {}).get("productSales", {}).get("dollars")),
+            "totalControllable": docs[store_id].get("totals", {}).get("totalControllable", {}),
+            "pac": docs[store_id].get("totals", {}).get("pac", {}),
+        }
+        for store_id in present
+    ]
+
+    return {
+        "stores": present,
+        "missingStores": missing,
+        "byStore": by_store,
+        "consolidated": consolidated_lines(sum_line_dollars(rows.values())),
+    }
+
+
+class PacAggregationService:
+    """Service for consolidated multi-store PAC actual"""
+
+    def __init__(self, store_service: Optional[StoreManagementService] = None):
+        """
+        Args:
+            store_service: Source of the active stores; defaults to a new StoreManagementService
+        """
+        self.db = None
+        self._store_service = store_service
+        self._initialize_firebase()
+
+    @property
+    def store_service(self) -> StoreManagementService:
+        if self._store_service is None:
+            self._store_service = StoreManagementService()
+        return self._store_service
+
+    def _initialize_firebase(self):
+        """Initialize Firebase Firestore"""
+        try:
+            if not firebase_admin._apps:
+                self.db = None
+                return
+            self.db = firestore.client()
+        except Exception as e:
+            logger.warning(f"Failed to initialize Firebase: {e}")
+            self.db = None
+
+    def is_available(self) -> bool:
+        """Check if Firebase is available"""
+        return self.db is not None
+
+    async def _fetch_store_sources(
+        self, store_id: str, year_month: str, loader: DocumentLoader
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], Dict[str, Any]]:
+        """Read generate_input, invoice_log_totals and pac-projections through the loader"""
+        doc_id = f"{store_id}_{year_month}"
+        docs = await loader.load_many((name, doc_id) for name in SOURCE_COLLECTIONS)
+        return (
+            docs[("generate_input", doc_id)],
+            docs[("invoice_log_totals", doc_id)] or {"totals": {}},
+            docs[("pac-projections", doc_id)] or {},
+        )
+
+    async def compute_store_actual(
+        self, store_id: str, year_month: str, loader: Optional[DocumentLoader] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Compute pac_actual for one store-month from its source documents
+
+        Args:
+            store_id: Canonical store id
+            year_month: Month in YYYYMM format
+            loader: Document loader to join; defaults to the active scope's
+
+        Returns:
+            The pac_actual document, or None if the store has no generate_input
+        """
+        generate_input, invoice_log_totals, pac_projections = await self._fetch_store_sources(
+            store_id, year_month, loader or document_loader()
+        )
+        if generate_input is None:
+            return None
+        return calculate_pac_actual(generate_input, invoice_log_totals, pac_projections)
+
+    async def aggregate_stores(self, store_ids: List[str], year_month: str) -> Dict[str, Any]:
+        """
+        Consolidated pac_actual for an arbitrary set of stores
+
+        Args:
+            store_ids: Store ids in any accepted format
+            year_month: Month in YYYYMM format
+
+        Returns:
+            consolidate_pac_actual output for the given stores
+        """
+        if not self.db:
+            raise RuntimeError("Firebase not initialized - cannot aggregate PAC")
+
+        ids = sorted({normalize_store_id(store_id) for store_id in store_ids})
+        with document_loader_scope() as loader:
+            docs = await asyncio.gather(
+                *(self.compute_store_actual(store_id, year_month, loader) for store_id in ids)
+            )
+        return consolidate_pac_actual(dict(zip(ids, docs)))
+
+    async def aggregate_entities(self, year_month: str, entity: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Consolidated pac_actual per entity
+
+        Args:
+            year_month: Month in YYYYMM format
+            entity: Restrict to a single entity name
+
+        Returns:
+            {"yearMonth", "entities": [{"entity", "stores", "missingStores", "byStore", "consolidated"}]}
+        """
+        # Cached stores collection, read off the event loop
+        stores = await self.store_service.fetch_active_stores()
+        groups = group_stores_by_entity(stores)
+        if entity is not None:
+            groups = {name: ids for name, ids in groups.items() if name == entity}
+
+        with document_loader_scope():
+            results = await asyncio.gather(*(self.aggregate_stores(ids, year_month) for ids in groups.values()))
+        return {
+            "yearMonth": year_month,
+            "entities": [{"entity": name, **result} for name, result in zip(groups, results)],
+        }
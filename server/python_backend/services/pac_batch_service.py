@@ -0,0 +1,121 @@
+"""
+PAC Batch Service - vectorized PAC calculations for many store-months at once
+
+Packs a list of PacInputData into NumPy columns and evaluates the shared
+PAC formula graph (services.pac_formulas) over them in a single vectorized
+pass. Results mirror PacCalculationService.calculate_pac_from_input to the cent.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from models import PacInputData, PacCalculationResult
+from .pac_formulas import PAC_INPUT_GRAPH, PAC_INPUT_FIELDS, AMOUNT_USED_NODES, pac_input_values
+from .pac_result import CompactPacResult
+
+
+# Controllable expense lines in the order they are summed by the scalar path
+EXPENSE_LINES: List[str] = list(PAC_INPUT_GRAPH.line_names)
+
+AMOUNT_USED_FIELDS: List[str] = list(AMOUNT_USED_NODES)
+
+_evaluate = PAC_INPUT_GRAPH.compile(float)
+
+
+def pack_inputs(inputs: Sequence[PacInputData]) -> Dict[str, np.ndarray]:
+    """
+    Pack a sequence of PacInputData into one float64 column per graph input
+
+    Args:
+        inputs: Input data for each store-month
+
+    Returns:
+        Mapping of column name to a 1-D array of length len(inputs)
+    """
+    rows = [pac_input_values(input_data) for input_data in inputs]
+    return {
+        name: np.array([float(row[name] or 0) for row in rows], dtype=np.float64)
+        for name in PAC_INPUT_FIELDS
+    }
+
+
+def _evaluate_columns(cols: Dict[str, np.ndarray]):
+    """Run the compiled graph over packed columns; returns (values, dollars, percents, valid)"""
+    S = cols["product_sales"]
+    valid = S > 0
+    safe_S = np.where(valid, S, 1.0)
+
+    def pct(dollars) -> np.ndarray:
+        return np.where(valid, (dollars / safe_S) * 100, 0.0)
+
+    values, dollars, percents = _evaluate(cols, pct)
+    return values, dollars, percents, valid
+
+
+def compute_pac_columns(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Evaluate the shared PAC formula graph over packed input columns
+
+    Args:
+        cols: Columns produced by pack_inputs
+
+    Returns:
+        Mapping of output name to array. Expense lines are returned as
+        '<line>.dollars' and '<line>.percent'.
+    """
+    values, dollars, percents, valid = _evaluate_columns(cols)
+    nodes = dict(zip(PAC_INPUT_GRAPH.node_names, values))
+
+    out: Dict[str, np.ndarray] = {"all_net_sales": nodes["all_net_sales"]}
+    for field, node in AMOUNT_USED_NODES.items():
+        out[f"amount_used.{field}"] = nodes[node]
+    for name, d, p in zip(EXPENSE_LINES, dollars, percents):
+        out[f"{name}.dollars"] = d
+        out[f"{name}.percent"] = p
+    out["total_controllable_dollars"] = nodes["total_controllable"]
+    out["total_controllable_percent"] = nodes["total_controllable_percent"]
+    out["pac_percent"] = nodes["pac_percent"]
+    out["pac_dollars"] = nodes["pac_dollars"]
+    out["valid"] = valid
+    return out
+
+
+def _rows(columns: Sequence[np.ndarray]) -> List[tuple]:
+    """Transpose equal-length columns into per-row tuples"""
+    return list(zip(*[column.tolist() for column in columns]))
+
+
+def calculate_pac_batch_compact(inputs: Sequence[PacInputData]) -> List[CompactPacResult]:
+    """
+    Calculate PAC for many inputs in one vectorized pass, without building models
+
+    Args:
+        inputs: Input data for each store-month
+
+    Returns:
+        One CompactPacResult per input, in the same order
+    """
+    if not inputs:
+        return []
+    values, dollars, percents, valid = _evaluate_columns(pack_inputs(inputs))
+    return [
+        CompactPacResult(input_data, v, d, p, ok)
+        for input_data, v, d, p, ok in zip(
+            inputs, _rows(values), _rows(dollars), _rows(percents), valid.tolist()
+        )
+    ]
+
+
+def calculate_pac_batch(inputs: Sequence[PacInputData]) -> List[PacCalculationResult]:
+    """
+    Calculate PAC for many inputs in one vectorized pass
+
+    Dollar values are rounded to cents and percentages to four places.
+
+    Args:
+        inputs: Input data for each store-month
+
+    Returns:
+        One PacCalculationResult per input, in the same order
+    """
+    return [result.to_model() for result in calculate_pac_batch_compact(inputs)]
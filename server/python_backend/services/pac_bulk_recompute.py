@@ -0,0 +1,324 @@
+"""
+Bulk PAC Recompute - regenerate pac_actual for a set of stores and months
+
+After a formula fix or an invoice category remap every pac_actual document
+has to be rebuilt. BulkRecompute pages through the generate_input of the
+selected stores and months (storage.iter_period_pages) and, per page:
+
+- reads the page's pac_actual, invoice_log_totals and pac-projections in
+  one get_many; the next page is read while this one is computed
+- skips months whose pac_actual was computed from the same inputs by the
+  same formulas (pac_actual_service.input_fingerprint)
+- runs calculate_pac_actual over the rest in a process pool
+- records the page's sales in each store's sales index, and adds the
+  sales comparisons from the pages read so far or, for earlier months,
+  from the stores' index documents (SalesIndexService.lookup_many)
+- writes the documents in storage batches together with the job's progress
+
+invoice_log_totals are read in their canonical categories but not written
+back: the web client merges into them, and a rewrite from the page read
+could drop a merge that lands in between. migrate_invoice_categories
+rewrites the stored documents.
+
+Progress (months read, written, unchanged and failed, throughput) is saved to
+recompute_jobs/<job_id>, where GET /actual/jobs/{job_id} reads it.
+
+Configuration (environment):
+    PAC_BULK_WORKERS     calculation processes (default: CPU count; 0 computes in a thread)
+    PAC_BULK_PAGE_SIZE   generate_input documents per page (default 500)
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .data_ingestion_service import DataIngestionService
+from .document_loader import DocumentLoader
+from .invoice_categories import canonical_invoice_totals_doc
+from .pac_actual_service import _source_data, current_update, input_fingerprint, pac_actual_document
+from .pac_calculation_service import calculate_pac_actual, normalize_store_id
+from .recompute_queue import RECOMPUTE_JOBS_COLLECTION
+from .sales_index_service import SalesIndexService, product_net_sales
+from .storage import MAX_BATCH_WRITES, DocumentStorage, WriteOp, get_storage, iter_period_pages
+
+logger = logging.getLogger(__name__)
+
+BULK_USER = "System (Bulk recompute)"
+
+# (store_id, YYYYMM, generate_input), and the page's other sources by (collection, doc id)
+Page = Tuple[List[Tuple[str, str, Dict[str, Any]]], Dict[Tuple[str, str], Optional[Dict[str, Any]]]]
+
+# Background runs started by start(), kept referenced until they finish
+_bulk_tasks: set = set()
+
+
+def _calculate_chunk(sources: List[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[Any, Any]]:
+    """calculate_pac_actual over (generate_input, invoice_log_totals, pac-projections) triples, in a worker process"""
+    results = []
+    for generate_input, invoice_log_totals, pac_projections in sources:
+        try:
+            results.append((calculate_pac_actual(generate_input, invoice_log_totals, pac_projections), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def _chunks(items: List[Any], count: int) -> List[List[Any]]:
+    size = max(1, -(-len(items) // max(1, count)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class BulkRecompute:
+    """Recomputes every pac_actual of a store set and month range"""
+
+    def __init__(
+        self,
+        storage: Optional[DocumentStorage] = None,
+        workers: Optional[int] = None,
+        page_size: int = MAX_BATCH_WRITES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            storage: Backend to read and write; defaults to the configured one
+            workers: Calculation processes; None uses the CPU count, 0 computes in a thread
+            page_size: generate_input documents read, computed and written together
+            clock: Monotonic time source for throughput (tests)
+        """
+        self._storage = storage
+        self.workers = (os.cpu_count() or 1) if workers is None else max(0, workers)
+        self.page_size = max(1, page_size)
+        self._clock = clock
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    @staticmethod
+    def new_job(
+        store_ids: Optional[Iterable[str]] = None,
+        from_ym: Optional[str] = None,
+        to_ym: Optional[str] = None,
+        job_id: Optional[str] = None,
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        A queued bulk job for the given stores (None = all) and months
+
+        Months whose pac_actual is current (same inputFingerprint) are
+        skipped unless force is set.
+        """
+        return {
+            "jobId": job_id or uuid.uuid4().hex,
+            "kind": "bulk",
+            "status": "queued",
+            "stores": sorted({normalize_store_id(s) for s in store_ids}) if store_ids is not None else None,
+            "from": from_ym,
+            "to": to_ym,
+            "force": force,
+            "pages": 0,
+            "monthsRead": 0,
+            "monthsWritten": 0,
+            "monthsUnchanged": 0,
+            "monthsFailed": 0,
+            "errors": [],
+            "elapsedSeconds": 0.0,
+            "monthsPerSecond": 0.0,
+            "createdAt": datetime.now().isoformat(),
+            "finishedAt": None,
+        }
+
+    async def start(self, job: Dict[str, Any], submitted_by: str = BULK_USER) -> Dict[str, Any]:
+        """
+        Save a new job and run it in the background
+
+        Returns:
+            The job as saved; poll recompute_jobs/<jobId> for progress
+        """
+        await self.storage.set(RECOMPUTE_JOBS_COLLECTION, job["jobId"], dict(job))
+        # A fresh context, so the run does not share the request's document loader
+        task = asyncio.get_running_loop().create_task(
+            self.run(job, submitted_by), context=contextvars.Context()
+        )
+        _bulk_tasks.add(task)
+        task.add_done_callback(_bulk_tasks.discard)
+        return dict(job)
+
+    async def run(
+        self,
+        job: Dict[str, Any],
+        submitted_by: str = BULK_USER,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Recompute the job's store-months, saving progress after every page
+
+        Args:
+            job: From new_job(); updated in place
+            submitted_by: Recorded as lastUpdatedBy
+            progress: Called with the job after every page
+
+        Returns:
+            The finished job (status completed, or failed with the error)
+        """
+        storage = self.storage
+        started = self._clock()
+        job["status"] = "running"
+        pages = iter_period_pages(
+            storage, "generate_input", job["stores"], job["from"], job["to"], self.page_size
+        ).__aiter__()
+        # store -> YYYYMM -> sales as generate_input holds them (None without generate_input)
+        indexes: Dict[str, Dict[str, Optional[float]]] = {}
+        sales_index = SalesIndexService(storage, DocumentLoader(storage))
+        pool = self._executor()
+        next_page: Optional[asyncio.Future] = None
+        try:
+            next_page = asyncio.ensure_future(self._read(pages))
+            while True:
+                page = await next_page
+                if page is None:
+                    break
+                next_page = asyncio.ensure_future(self._read(pages))
+                ops = await self._compute(page, pool, sales_index, indexes, job, submitted_by)
+                self._update_throughput(job, started)
+                ops.append(WriteOp(RECOMPUTE_JOBS_COLLECTION, job["jobId"], dict(job)))
+                await storage.batch(ops)
+                logger.info(
+                    f"Bulk recompute {job['jobId']}: {job['monthsWritten']} of {job['monthsRead']} months "
+                    f"written ({job['monthsPerSecond']:.1f}/s)"
+                )
+                if progress is not None:
+                    progress(job)
+            job["status"] = "completed"
+        except Exception as e:
+            if next_page is not None:
+                next_page.cancel()
+            job["status"] = "failed"
+            job["errors"].append(str(e))
+            logger.error(f"Bulk recompute {job['jobId']} failed: {e}")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        self._update_throughput(job, started)
+        job["finishedAt"] = datetime.now().isoformat()
+        try:
+            await storage.set(RECOMPUTE_JOBS_COLLECTION, job["jobId"], dict(job))
+        except Exception as e:
+            logger.warning(f"Could not save bulk recompute job {job['jobId']}: {e}")
+        return job
+
+    def _executor(self) -> Optional[Executor]:
+        if not self.workers:
+            return None
+        # spawn: forking a process that holds Firestore's gRPC threads can deadlock the child
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def _read(self, pages: AsyncIterator) -> Optional[Page]:
+        """The next generate_input page and its other sources, or None after the last page"""
+        try:
+            docs = await pages.__anext__()
+        except StopAsyncIteration:
+            return None
+        others = await self.storage.get_many([
+            (collection, f"{store_id}_{ym}")
+            for store_id, ym, _ in docs
+            for collection in ("pac_actual", "invoice_log_totals", "pac-projections")
+        ])
+        return docs, others
+
+    async def _compute(
+        self,
+        page: Page,
+        pool: Optional[Executor],
+        sales_index: SalesIndexService,
+        indexes: Dict[str, Dict[str, Optional[float]]],
+        job: Dict[str, Any],
+        submitted_by: str,
+    ) -> List[WriteOp]:
+        """Writes for one page: the pac_actual documents that changed"""
+        docs, others = page
+        by_store: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for store_id, ym, generate_input in docs:
+            by_store.setdefault(store_id, {})[ym] = generate_input
+        # The page is what generate_input holds now: record it in the index
+        for store_id, months in by_store.items():
+            await sales_index.record_many(store_id, months)
+            indexes.setdefault(store_id, {}).update(
+                {ym: product_net_sales(generate_input) for ym, generate_input in months.items()}
+            )
+        # Comparison months outside the pages read so far
+        outside: Dict[str, List[str]] = {}
+        for store_id, ym, _ in docs:
+            history = DataIngestionService._history_months(ym).values()
+            outside.setdefault(store_id, []).extend(month for month in history if month not in indexes[store_id])
+        for store_id, sales in (await sales_index.lookup_many(outside)).items():
+            indexes[store_id].update(sales)
+
+        ops: List[WriteOp] = []
+        pending = []
+        for store_id, ym, generate_input in docs:
+            doc_id = f"{store_id}_{ym}"
+            invoice_log_totals = others[("invoice_log_totals", doc_id)]
+            if invoice_log_totals is not None:
+                invoice_log_totals = canonical_invoice_totals_doc(invoice_log_totals) or invoice_log_totals
+            source = (generate_input, invoice_log_totals or {"totals": {}}, others[("pac-projections", doc_id)] or {})
+            history = DataIngestionService._history_months(ym)
+            sales = {name: indexes[store_id].get(month) for name, month in history.items()}
+            source_data = _source_data(*source, submitted_by)
+            fingerprint = input_fingerprint(*source, sales)
+
+            # Documents computed from the same inputs by the same formulas are left as they are
+            update = None if job.get("force") else current_update(
+                others[("pac_actual", doc_id)], fingerprint, source_data
+            )
+            if update is not None:
+                if update:
+                    ops.append(WriteOp("pac_actual", doc_id, update, merge=True))
+                job["monthsUnchanged"] += 1
+                continue
+            pending.append((store_id, ym, source, sales, source_data, fingerprint))
+
+        loop = asyncio.get_running_loop()
+        chunks = _chunks([source for _, _, source, _, _, _ in pending], self.workers or 1)
+        chunk_results = await asyncio.gather(*(
+            loop.run_in_executor(pool, _calculate_chunk, chunk) if pool is not None
+            else asyncio.to_thread(_calculate_chunk, chunk)
+            for chunk in chunks
+        ))
+        results = [result for chunk in chunk_results for result in chunk]
+
+        for (store_id, ym, _, sales, source_data, fingerprint), (pac_actual_data, error) in zip(pending, results):
+            doc_id = f"{store_id}_{ym}"
+            if error is not None:
+                job["monthsFailed"] += 1
+                if len(job["errors"]) < 100:
+                    job["errors"].append(f"{doc_id}: {error}")
+                continue
+            doc = pac_actual_document(store_id, ym, pac_actual_data, sales, submitted_by, source_data, fingerprint)
+            ops.append(WriteOp("pac_actual", doc_id, doc, merge=True))
+            job["monthsWritten"] += 1
+        job["monthsRead"] += len(docs)
+        job["pages"] += 1
+        return ops
+
+    def _update_throughput(self, job: Dict[str, Any], started: float) -> None:
+        elapsed = self._clock() - started
+        job["elapsedSeconds"] = round(elapsed, 3)
+        job["monthsPerSecond"] = round(job["monthsWritten"] / elapsed, 1) if elapsed > 0 else 0.0
+
+
+def get_bulk_recompute(storage: Optional[DocumentStorage] = None) -> BulkRecompute:
+    """BulkRecompute configured from the environment"""
+    workers = os.getenv("PAC_BULK_WORKERS")
+    return BulkRecompute(
+        storage,
+        workers=int(workers) if workers else None,
+        page_size=int(os.getenv("PAC_BULK_PAGE_SIZE", str(MAX_BATCH_WRITES))),
+    )
@@ -0,0 +1,157 @@
+"""
+PAC Result Cache - content-addressed LRU cache for PAC calculations
+
+Results are keyed by a hash of the source documents they were computed
+from (generate_input, invoice_log_totals, pac-projections), so a changed
+source can never produce a stale hit. Only callers that already have that
+hash use the cache: PacActualService keys it on the inputFingerprint it
+computes for its skip check. Hashing the sources only to look a result up
+costs more than calculating it, so /calc and the entity aggregation
+calculate directly. Entries are also tagged with their
+(store_id, year_month) so API writes to those collections can drop them
+eagerly instead of waiting for LRU eviction or the TTL.
+
+Configuration (environment):
+    PAC_CACHE_MAX_ENTRIES   maximum cached results (default 1024, 0 disables)
+    PAC_CACHE_TTL_SECONDS   entry lifetime in seconds (default 600, 0 = no TTL)
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def source_fingerprint(*documents: Any) -> str:
+    """
+    Stable hash of one or more source documents
+
+    Firestore timestamps and other non-JSON values are hashed by their
+    string form; key order does not matter.
+    """
+    payload = json.dumps(documents, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PacResultCache:
+    """LRU cache with TTL, hit/miss counters and (store_id, year_month) invalidation"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[str, str], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None, counting a hit or miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, _, value = entry
+                if self.ttl_seconds and self._clock() - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, store_id: str, year_month: str) -> None:
+        """Store a value tagged with the store-month it was computed for"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), (store_id, year_month), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        store_id: str,
+        year_month: str,
+        compute: Callable[[], Any],
+    ) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, store_id, year_month)
+        return value
+
+    def invalidate(self, store_id: str, year_month: Optional[str] = None) -> int:
+        """
+        Drop entries for a store-month, or for every month of a store
+
+        Args:
+            store_id: Normalized store id (store_XXX)
+            year_month: YYYYMM, or None for all months
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            stale = [
+                key for key, (_, (sid, ym), _) in self._entries.items()
+                if sid == store_id and (year_month is None or ym == year_month)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached PAC results for {store_id} {year_month or '*'}")
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+_pac_cache: Optional[PacResultCache] = None
+
+
+def get_pac_cache() -> PacResultCache:
+    """Process-wide PAC result cache configured from the environment"""
+    global _pac_cache
+    if _pac_cache is None:
+        _pac_cache = PacResultCache(
+            max_entries=int(os.getenv("PAC_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("PAC_CACHE_TTL_SECONDS", "600")),
+        )
+    return _pac_cache
@@ -0,0 +1,309 @@
+"""
+PAC Export Service - columnar export of pac_actual and pac-projections
+
+Documents are read a page at a time with a document-id cursor
+(DocumentStorage.scan) and flattened into a fixed set of typed columns, so
+the export never holds more than one page in memory:
+
+- pac_actual: one "<section>.<line>.dollars" / ".percent" pair per
+  PAC_ACTUAL_GRAPH line, the derived node fields, salesComparison and
+  lastUpdatedBy/At
+- pac-projections: pacGoal and "<row name>.dollars" / ".percent" per
+  projection row (EXPENSE_LIST), read from the document's indexed lines
+
+Every row starts with storeId, yearMonth, year and month. Missing values
+are left empty (null in Parquet), not zero.
+
+CSV uses the standard library. Parquet needs pyarrow and writes one row
+group per page.
+"""
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from .pac_formulas import PAC_ACTUAL_GRAPH, PAC_ACTUAL_INPUT_PATHS, PAC_ACTUAL_NODE_PATHS, to_num
+from .pac_calculation_service import normalize_store_id
+from .proj_calculation_service import EXPENSE_LIST
+from .projection_schema import PROJECTION_LINE_IDS, current_projection
+from .storage import MAX_BATCH_WRITES, DocumentStorage, iter_period_pages
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+class ExportColumn(NamedTuple):
+    """A typed output column; value reads it from (store_id, year_month, document)"""
+    name: str
+    type: str  # "string" | "int" | "float"
+    value: Callable[[str, str, Dict[str, Any]], Any]
+
+
+def _path(doc: Dict[str, Any], dotted: str) -> Any:
+    value: Any = doc
+    for part in dotted.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _float(value: Any) -> Optional[float]:
+    return None if value is None or value == "" else to_num(value)
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _number_column(name: str, path: str) -> ExportColumn:
+    return ExportColumn(name, "float", lambda store_id, ym, doc: _float(_path(doc, path)))
+
+
+_KEY_COLUMNS = [
+    ExportColumn("storeId", "string", lambda store_id, ym, doc: store_id),
+    ExportColumn("yearMonth", "string", lambda store_id, ym, doc: ym),
+    ExportColumn("year", "int", lambda store_id, ym, doc: int(ym[:4])),
+    ExportColumn("month", "int", lambda store_id, ym, doc: int(ym[4:])),
+]
+
+PAC_ACTUAL_COLUMNS: List[ExportColumn] = _KEY_COLUMNS + [
+    _number_column(f"{line}.{part}", f"{line}.{part}")
+    for line in PAC_ACTUAL_GRAPH.line_names
+    for part in ("dollars", "percent")
+] + [
+    _number_column(path, path)
+    for path in list(PAC_ACTUAL_NODE_PATHS.values()) + list(PAC_ACTUAL_INPUT_PATHS.values())
+] + [
+    _number_column(f"salesComparison.{key}", f"salesComparison.{key}")
+    for key in (
+        "lastYearProductSales", "lastMonthProductSales",
+        "lastMonthLastYearProductSales", "lastYearLastYearProductSales",
+    )
+] + [
+    ExportColumn("lastUpdatedBy", "string", lambda store_id, ym, doc: _text(doc.get("lastUpdatedBy"))),
+    ExportColumn("lastUpdatedAt", "string", lambda store_id, ym, doc: _text(doc.get("lastUpdatedAt"))),
+]
+
+
+def _projection_column(name: str, part: str) -> ExportColumn:
+    line_id = PROJECTION_LINE_IDS[name]
+    return ExportColumn(
+        f"{name}.{part}", "float", lambda store_id, ym, doc: (doc.get("lines") or {}).get(line_id, {}).get(part)
+    )
+
+
+PROJECTION_COLUMNS: List[ExportColumn] = _KEY_COLUMNS + [
+    _number_column("pacGoal", "pacGoal"),
+] + [
+    column
+    for name in EXPENSE_LIST
+    for column in (
+        _projection_column(name, "dollars"),
+        _projection_column(name, "percent"),
+    )
+]
+
+EXPORT_COLLECTIONS: Dict[str, List[ExportColumn]] = {
+    "pac_actual": PAC_ACTUAL_COLUMNS,
+    "pac-projections": PROJECTION_COLUMNS,
+}
+
+# Applied to each document before its columns are read
+_PREPARE: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "pac-projections": current_projection,
+}
+
+
+async def iter_export_pages(
+    storage: DocumentStorage,
+    collection: str,
+    store_ids: Optional[Iterable[str]] = None,
+    from_ym: Optional[str] = None,
+    to_ym: Optional[str] = None,
+    page_size: int = MAX_BATCH_WRITES,
+) -> AsyncIterator[List[List[Any]]]:
+    """
+    Flattened rows of a collection, one storage page at a time
+
+    Args:
+        storage: Backend to read
+        collection: "pac_actual" or "pac-projections"
+        store_ids: Only these stores (any accepted format); all stores if None
+        from_ym: First month (inclusive), unbounded if None
+        to_ym: Last month (inclusive), unbounded if None
+        page_size: Documents per read
+
+    Yields:
+        Lists of rows, each aligned with EXPORT_COLLECTIONS[collection]
+    """
+    columns = EXPORT_COLLECTIONS[collection]
+    prepare = _PREPARE.get(collection)
+    if store_ids is not None:
+        store_ids = [normalize_store_id(store_id) for store_id in store_ids]
+    async for docs in iter_period_pages(storage, collection, store_ids, from_ym, to_ym, page_size):
+        rows = []
+        for store_id, year_month, data in docs:
+            if prepare is not None:
+                data = prepare(data)
+            rows.append([column.value(store_id, year_month, data) for column in columns])
+        yield rows
+
+
+class CsvExportWriter:
+    """Writes pages of rows as CSV text"""
+
+    def __init__(self, out: Any, columns: Sequence[ExportColumn]):
+        """
+        Args:
+            out: Text stream to write to
+            columns: Column definitions, in row order
+        """
+        self._writer = csv.writer(out)
+        self._writer.writerow([column.name for column in columns])
+
+    def write(self, rows: List[List[Any]]) -> None:
+        self._writer.writerows(["" if value is None else value for value in row] for row in rows)
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetExportWriter:
+    """Writes pages of rows as Parquet row groups"""
+
+    _TYPES = {"string": "string", "int": "int32", "float": "float64"}
+
+    def __init__(self, out: Any, columns: Sequence[ExportColumn]):
+        """
+        Args:
+            out: Binary stream to write to (need not be seekable)
+            columns: Column definitions, in row order
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("pyarrow is required for Parquet exports (pip install pyarrow)")
+        self._pa = pa
+        self._schema = pa.schema([(column.name, getattr(pa, self._TYPES[column.type])()) for column in columns])
+        self._writer = pq.ParquetWriter(out, self._schema)
+
+    def write(self, rows: List[List[Any]]) -> None:
+        arrays = [
+            self._pa.array([row[index] for row in rows], type=field.type)
+            for index, field in enumerate(self._schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def create_writer(export_format: str, out: Any, columns: Sequence[ExportColumn]):
+    """
+    CsvExportWriter (text stream) or ParquetExportWriter (binary stream)
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if export_format == "csv":
+        return CsvExportWriter(out, columns)
+    if export_format == "parquet":
+        return ParquetExportWriter(out, columns)
+    raise ValueError(f"Unknown export format {export_format!r}; use one of {', '.join(EXPORT_FORMATS)}")
+
+
+async def export_collection(
+    storage: DocumentStorage,
+    collection: str,
+    export_format: str,
+    out: Any,
+    **filters: Any,
+) -> int:
+    """
+    Export a collection to a stream
+
+    Args:
+        storage: Backend to read
+        collection: "pac_actual" or "pac-projections"
+        export_format: "csv" or "parquet"
+        out: Text stream for CSV, binary stream for Parquet
+        **filters: store_ids, from_ym, to_ym and page_size (see iter_export_pages)
+
+    Returns:
+        Number of rows written
+    """
+    writer = create_writer(export_format, out, EXPORT_COLLECTIONS[collection])
+    count = 0
+    try:
+        async for rows in iter_export_pages(storage, collection, **filters):
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        writer.close()
+    logger.info(f"Exported {count} {collection} rows as {export_format}")
+    return count
+
+
+class _Drain(io.RawIOBase):
+    """Write-only stream whose contents are taken after each page"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def stream_export(
+    storage: DocumentStorage,
+    collection: str,
+    export_format: str,
+    **filters: Any,
+) -> AsyncIterator[bytes]:
+    """
+    The export as byte chunks, one per page, for a streaming HTTP response
+
+    The writer is created before the first chunk, so a missing Parquet
+    dependency fails before anything is sent.
+
+    Args:
+        **filters: store_ids, from_ym, to_ym and page_size (see iter_export_pages)
+    """
+    drain = _Drain()
+    text = io.TextIOWrapper(drain, encoding="utf-8", newline="", write_through=True) if export_format == "csv" else None
+    writer = create_writer(export_format, text or drain, EXPORT_COLLECTIONS[collection])
+
+    async def chunks() -> AsyncIterator[bytes]:
+        try:
+            async for rows in iter_export_pages(storage, collection, **filters):
+                writer.write(rows)
+                yield drain.take()
+        finally:
+            writer.close()
+        tail = drain.take()
+        if tail:
+            yield tail
+
+    return chunks()
@@ -0,0 +1,592 @@
+"""
+PAC Formulas - declarative expression graph shared by the PAC engines
+
+Every PAC formula is declared once here as a named expression. The
+PacInputData engine (Decimal, also evaluated column-wise by the batch
+engine) and the generate_input engine behind calculate_pac_actual are
+two graphs assembled from the same shared nodes plus the few lines whose
+sources genuinely differ (RTI, invoice-sourced promotion/advertising,
+cash sign, percent bases).
+
+Each graph is topologically sorted and compiled once into a plain Python
+function per number type, so evaluation has no interpretation overhead
+and the same compiled code runs on floats, Decimals or NumPy arrays.
+"""
+import ast
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .invoice_categories import invoice_totals
+
+
+# Only the percent-of-product-sales helper may be called from an expression
+PCT = "pct"
+
+
+@dataclass(frozen=True)
+class Node:
+    """Named intermediate value computed from inputs and other nodes"""
+    name: str
+    expr: str
+
+
+@dataclass(frozen=True)
+class Line:
+    """Reported line with a dollars expression and its percent basis"""
+    name: str
+    dollars: str
+    percent: Optional[str] = None  # None -> pct(dollars)
+
+
+class FormulaGraphError(ValueError):
+    """Raised when a formula graph is malformed (cycle, bad name, bad syntax)"""
+
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.USub, ast.UAdd,
+)
+
+
+def _parse(graph: str, name: str, expr: str) -> ast.Expression:
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise FormulaGraphError(f"{graph}: invalid expression for '{name}': {expr!r}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise FormulaGraphError(f"{graph}: unsupported syntax in '{name}': {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and node.func.id == PCT
+                    and len(node.args) == 1 and not node.keywords):
+                raise FormulaGraphError(f"{graph}: only {PCT}(x) may be called in '{name}'")
+    return tree
+
+
+def _names(tree: ast.Expression) -> List[str]:
+    """Referenced names in first-seen order, excluding the pct helper"""
+    seen: Dict[str, None] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id != PCT:
+            seen.setdefault(node.id)
+    return list(seen)
+
+
+class _Constants(ast.NodeTransformer):
+    """Hoist float literals so each backend can build them in its own number type"""
+
+    def __init__(self, literals: List[str]):
+        self.literals = literals
+
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, float):
+            self.literals.append(repr(node.value))
+            return ast.copy_location(ast.Name(id=f"_c{len(self.literals) - 1}", ctx=ast.Load()), node)
+        return node
+
+
+class FormulaGraph:
+    """
+    A set of nodes and reported lines compiled into one evaluation function
+
+    Names that are not nodes are inputs. Lines may reference nodes and
+    inputs but not other lines.
+    """
+
+    def __init__(self, name: str, nodes: Sequence[Node], lines: Sequence[Line]):
+        self.name = name
+        trees: Dict[str, ast.Expression] = {}
+        for node in nodes:
+            if node.name in trees:
+                raise FormulaGraphError(f"{name}: duplicate node '{node.name}'")
+            if node.name.startswith("_") or node.name == PCT:
+                raise FormulaGraphError(f"{name}: reserved node name '{node.name}'")
+            trees[node.name] = _parse(name, node.name, node.expr)
+
+        line_names = [line.name for line in lines]
+        if len(set(line_names)) != len(line_names):
+            raise FormulaGraphError(f"{name}: duplicate line names")
+
+        self._trees = trees
+        self._lines = [
+            (line.name,
+             _parse(name, line.name, line.dollars),
+             _parse(name, line.name, line.percent) if line.percent is not None else None)
+            for line in lines
+        ]
+        self.dependencies: Dict[str, List[str]] = {
+            node: [dep for dep in _names(tree) if dep in trees] for node, tree in trees.items()
+        }
+        self.node_names: Tuple[str, ...] = tuple(self._toposort())
+        self.line_names: Tuple[str, ...] = tuple(line_names)
+
+        referenced: Dict[str, None] = {}
+        for tree in list(trees.values()) + [t for _, d, p in self._lines for t in (d, p) if t is not None]:
+            for dep in _names(tree):
+                if dep not in trees:
+                    referenced.setdefault(dep)
+        self.inputs: Tuple[str, ...] = tuple(referenced)
+        self._compiled: Dict[type, Callable] = {}
+        self._sensitivity: Dict[str, Dict[str, Dict[str, Tuple[float, float]]]] = {}
+
+    def _toposort(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+        def visit(node: str, path: List[str]) -> None:
+            if state.get(node) == 2:
+                return
+            if state.get(node) == 1:
+                cycle = path[path.index(node):] + [node]
+                raise FormulaGraphError(f"{self.name}: cycle {' -> '.join(cycle)}")
+            state[node] = 1
+            for dep in self.dependencies[node]:
+                visit(dep, path + [node])
+            state[node] = 2
+            order.append(node)
+
+        for node in self._trees:
+            visit(node, [])
+        return order
+
+    def source(self) -> Tuple[str, List[str]]:
+        """
+        Generate the evaluation function source
+
+        Returns:
+            (source code, float literals hoisted as _c0.._cN)
+        """
+        literals: List[str] = []
+        hoist = _Constants(literals)
+
+        def code(tree: ast.Expression) -> str:
+            return ast.unparse(hoist.visit(ast.parse(ast.unparse(tree), mode="eval")))
+
+        body = [f"    {name} = _in[{name!r}]" for name in self.inputs]
+        body += [f"    {name} = {code(self._trees[name])}" for name in self.node_names]
+        for i, (_, dollars, percent) in enumerate(self._lines):
+            body.append(f"    _d{i} = {code(dollars)}")
+            body.append(f"    _p{i} = {code(percent) if percent is not None else f'{PCT}(_d{i})'}")
+
+        def tuple_of(items: List[str]) -> str:
+            return "(" + "".join(f"{item}, " for item in items) + ")"
+
+        n = len(self._lines)
+        body.append(
+            "    return "
+            + tuple_of(list(self.node_names)) + ", "
+            + tuple_of([f"_d{i}" for i in range(n)]) + ", "
+            + tuple_of([f"_p{i}" for i in range(n)])
+        )
+        return f"def evaluate(_in, {PCT}):\n" + "\n".join(body) + "\n", literals
+
+    def compile(self, number: type = float) -> Callable:
+        """
+        Compile the graph for a number type
+
+        Args:
+            number: float (also used for NumPy arrays) or Decimal
+
+        Returns:
+            evaluate(inputs, pct) -> (node values, line dollars, line percents),
+            each a tuple ordered like node_names / line_names
+        """
+        fn = self._compiled.get(number)
+        if fn is None:
+            src, literals = self.source()
+            namespace: Dict[str, Any] = {f"_c{i}": number(lit) for i, lit in enumerate(literals)}
+            exec(compile(src, f"<pac formula graph {self.name}>", "exec"), namespace)
+            fn = self._compiled[number] = namespace["evaluate"]
+        return fn
+
+    def sensitivity(self, input_name: str) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """
+        Coefficients of every output with respect to one input
+
+        The graph must be affine in that input (true for every invoice
+        purchase category). Each coefficient is split into a direct part
+        and a part that flows through pct(), which must be scaled by
+        100 / product sales when applied.
+
+        Args:
+            input_name: Name in self.inputs
+
+        Returns:
+            {"nodes": {...}, "dollars": {...}, "percents": {...}} mapping each
+            affected node / line to (direct, via_pct); unaffected outputs are omitted
+        """
+        cached = self._sensitivity.get(input_name)
+        if cached is not None:
+            return cached
+        if input_name not in self.inputs:
+            raise FormulaGraphError(f"{self.name}: unknown input '{input_name}'")
+
+        fn = self.compile(float)
+
+        def flat(inputs: Dict[str, float], pct: Callable) -> List[float]:
+            values, dollars, percents = fn(inputs, pct)
+            return list(values) + list(dollars) + list(percents)
+
+        def coefficients(base: Dict[str, float], pct: Callable) -> List[float]:
+            bumped = dict(base)
+            bumped[input_name] = base[input_name] + 1.0
+            return [b - a for a, b in zip(flat(base, pct), flat(bumped, pct))]
+
+        def identity(value):
+            return value
+
+        def zero(value):
+            return 0 * value
+
+        zeros = {name: 0.0 for name in self.inputs}
+        direct = coefficients(zeros, zero)
+        through_pct = [t - d for t, d in zip(coefficients(zeros, identity), direct)]
+
+        # Affine check: the coefficients must not depend on the other inputs
+        varied = {name: 1.0 + 0.37 * i for i, name in enumerate(self.inputs)}
+        check = coefficients(varied, identity)
+        for expected, got in zip((d + p for d, p in zip(direct, through_pct)), check):
+            if abs(expected - got) > 1e-9 * max(1.0, abs(expected)):
+                raise FormulaGraphError(f"{self.name}: outputs are not affine in '{input_name}'")
+
+        names = (
+            [("nodes", n) for n in self.node_names]
+            + [("dollars", n) for n in self.line_names]
+            + [("percents", n) for n in self.line_names]
+        )
+        result: Dict[str, Dict[str, Tuple[float, float]]] = {"nodes": {}, "dollars": {}, "percents": {}}
+        for (kind, name), d, p in zip(names, direct, through_pct):
+            if d or p:
+                result[kind][name] = (d, p)
+        self._sensitivity[input_name] = result
+        return result
+
+    def evaluate(
+        self,
+        inputs: Mapping[str, Any],
+        pct: Callable[[Any], Any],
+        number: type = float,
+    ) -> Tuple[Dict[str, Any], Dict[str, Tuple[Any, Any]]]:
+        """
+        Evaluate the graph
+
+        Args:
+            inputs: Value for every name in self.inputs
+            pct: Percent-of-product-sales function for this backend
+            number: Number type the graph was compiled for
+
+        Returns:
+            (node name -> value, line name -> (dollars, percent))
+        """
+        values, dollars, percents = self.compile(number)(inputs, pct)
+        return (
+            dict(zip(self.node_names, values)),
+            {name: (d, p) for name, d, p in zip(self.line_names, dollars, percents)},
+        )
+
+
+# ============================================================================
+# Shared formulas
+# ============================================================================
+
+SHARED_NODES: List[Node] = [
+    Node("raw_waste", "(raw_waste_percent / 100) * product_sales"),
+    Node("complete_waste", "(complete_waste_percent / 100) * product_sales"),
+    Node("other_food_components", "promotions * 0.30 + manager_meals * 0.30 + raw_waste + complete_waste"),
+    Node("employee_meal", "manager_meals * 0.30"),
+    Node("condiment", "(condiment_percent / 100) * product_sales"),
+    Node("total_waste", "complete_waste + raw_waste"),
+    Node("paper", "begin_paper + purchase_paper - end_paper"),
+    Node("crew_labor", "(crew_labor_percent / 100) * product_sales"),
+    Node("management_labor", "((total_labor_percent - crew_labor_percent) / 100) * product_sales"),
+    # Additional labor dollars do NOT affect payroll tax
+    Node("payroll_tax", "(crew_labor + management_labor) * (payroll_tax_rate / 100)"),
+    Node("promotion_from_sales", "promotions * 0.30"),
+    Node("advertising_from_sales", "(advertising_percent / 100) * all_net_sales"),
+    Node("op_supplies_usage", "begin_op_supplies + purchase_operating_supply - end_op_supplies"),
+    Node("non_product_usage", "begin_non_product + purchase_non_product - end_non_product"),
+]
+
+
+# ============================================================================
+# PacInputData engine (PacCalculationService / batch engine)
+# ============================================================================
+
+# Graph input -> attribute path on PacInputData
+PAC_INPUT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "product_sales": ("product_net_sales",),
+    "cash_adjustments": ("cash_adjustments",),
+    "promotions": ("promotions",),
+    "manager_meals": ("manager_meals",),
+    "crew_labor_percent": ("crew_labor_percent",),
+    "total_labor_percent": ("total_labor_percent",),
+    "payroll_tax_rate": ("payroll_tax_rate",),
+    "additional_labor_dollars": ("additional_labor_dollars",),
+    "complete_waste_percent": ("complete_waste_percent",),
+    "raw_waste_percent": ("raw_waste_percent",),
+    "condiment_percent": ("condiment_percent",),
+    "advertising_percent": ("advertising_percent",),
+    "dues_and_subscriptions": ("dues_and_subscriptions",),
+    "begin_food": ("beginning_inventory", "food"),
+    "begin_condiment": ("beginning_inventory", "condiment"),
+    "begin_paper": ("beginning_inventory", "paper"),
+    "begin_non_product": ("beginning_inventory", "non_product"),
+    "begin_op_supplies": ("beginning_inventory", "op_supplies"),
+    "end_food": ("ending_inventory", "food"),
+    "end_condiment": ("ending_inventory", "condiment"),
+    "end_paper": ("ending_inventory", "paper"),
+    "end_non_product": ("ending_inventory", "non_product"),
+    "end_op_supplies": ("ending_inventory", "op_supplies"),
+    "purchase_food": ("purchases", "food"),
+    "purchase_condiment": ("purchases", "condiment"),
+    "purchase_paper": ("purchases", "paper"),
+    "purchase_non_product": ("purchases", "non_product"),
+    "purchase_travel": ("purchases", "travel"),
+    "purchase_advertising_other": ("purchases", "advertising_other"),
+    "purchase_outside_services": ("purchases", "outside_services"),
+    "purchase_linen": ("purchases", "linen"),
+    "purchase_operating_supply": ("purchases", "operating_supply"),
+    "purchase_maintenance_repair": ("purchases", "maintenance_repair"),
+    "purchase_small_equipment": ("purchases", "small_equipment"),
+    "purchase_utilities": ("purchases", "utilities"),
+    "purchase_office": ("purchases", "office"),
+    "purchase_training": ("purchases", "training"),
+    "purchase_crew_relations": ("purchases", "crew_relations"),
+}
+
+PAC_INPUT_GRAPH = FormulaGraph(
+    "pac_input",
+    SHARED_NODES + [
+        Node("all_net_sales", "product_sales + cash_adjustments + promotions + manager_meals"),
+        Node("base_food", "begin_food + purchase_food - end_food - other_food_components"),
+        Node("condiment_usage", "begin_condiment + purchase_condiment - end_condiment"),
+        Node("total_waste_percent", "complete_waste_percent + raw_waste_percent"),
+        Node("management_labor_percent", "total_labor_percent - crew_labor_percent"),
+        Node("payroll_tax_percent", "(payroll_tax_rate / 100) * total_labor_percent"),
+        Node("total_controllable", (
+            "base_food + employee_meal + condiment + total_waste + paper"
+            " + crew_labor + management_labor + payroll_tax + additional_labor_dollars"
+            " + purchase_travel + advertising_from_sales + purchase_advertising_other"
+            " + promotion_from_sales + purchase_outside_services + purchase_linen"
+            " + purchase_operating_supply + purchase_maintenance_repair + purchase_small_equipment"
+            " + purchase_utilities + purchase_office + cash_adjustments + purchase_crew_relations"
+            " + purchase_training + dues_and_subscriptions"
+        )),
+        Node("total_controllable_percent", "pct(total_controllable)"),
+        Node("pac_percent", "100 - total_controllable_percent"),
+        Node("pac_dollars", "(pac_percent / 100) * product_sales"),
+    ],
+    [
+        Line("base_food", "base_food"),
+        Line("employee_meal", "employee_meal"),
+        Line("condiment", "condiment", "condiment_percent"),
+        Line("total_waste", "total_waste", "total_waste_percent"),
+        Line("paper", "paper"),
+        Line("crew_labor", "crew_labor", "crew_labor_percent"),
+        Line("management_labor", "management_labor", "management_labor_percent"),
+        Line("payroll_tax", "payroll_tax", "payroll_tax_percent"),
+        Line("additional_labor_dollars", "additional_labor_dollars"),
+        Line("travel", "purchase_travel"),
+        Line("advertising", "advertising_from_sales"),
+        Line("advertising_other", "purchase_advertising_other"),
+        Line("promotion", "promotion_from_sales"),
+        Line("outside_services", "purchase_outside_services"),
+        Line("linen", "purchase_linen"),
+        Line("op_supply", "purchase_operating_supply"),
+        Line("maintenance_repair", "purchase_maintenance_repair"),
+        Line("small_equipment", "purchase_small_equipment"),
+        Line("utilities", "purchase_utilities"),
+        Line("office", "purchase_office"),
+        # Cash +/- (treat as positive expense for UI consistency)
+        Line("cash_adjustments", "cash_adjustments"),
+        Line("crew_relations", "purchase_crew_relations"),
+        Line("training", "purchase_training"),
+        Line("dues_and_subscriptions", "dues_and_subscriptions"),
+    ],
+)
+
+# PacInputData amount-used field -> graph node
+AMOUNT_USED_NODES: Dict[str, str] = {
+    "food": "base_food",
+    "paper": "paper",
+    "condiment": "condiment_usage",
+    "non_product": "non_product_usage",
+    "op_supplies": "op_supplies_usage",
+}
+
+
+def pac_input_values(input_data) -> Dict[str, Any]:
+    """Flatten a PacInputData into PAC_INPUT_GRAPH inputs"""
+    values: Dict[str, Any] = {}
+    for name, path in PAC_INPUT_FIELDS.items():
+        obj = input_data
+        for attr in path:
+            obj = getattr(obj, attr)
+        values[name] = obj
+    return values
+
+
+# ============================================================================
+# generate_input engine (calculate_pac_actual)
+# ============================================================================
+
+# Graph input -> (generate_input section, key); None section means invoice totals
+PAC_ACTUAL_FIELDS: Dict[str, Tuple[Optional[str], str]] = {
+    "product_sales": ("sales", "productNetSales"),
+    "all_net_sales": ("sales", "allNetSales"),
+    "promotions": ("sales", "promo"),
+    "manager_meals": ("sales", "managerMeal"),
+    "cash": ("sales", "cash"),
+    "advertising_percent": ("sales", "advertising"),
+    "dues_and_subscriptions": ("sales", "duesAndSubscriptions"),
+    "raw_waste_percent": ("food", "rawWaste"),
+    "complete_waste_percent": ("food", "completeWaste"),
+    "condiment_percent": ("food", "condiment"),
+    "stat_variance_percent": ("food", "variance"),
+    "unexplained_percent": ("food", "unexplained"),
+    "crew_labor_percent": ("labor", "crewLabor"),
+    "total_labor_percent": ("labor", "totalLabor"),
+    "payroll_tax_rate": ("labor", "payrollTax"),
+    "additional_labor_dollars": ("labor", "additionalLaborDollars"),
+    "begin_food": ("inventoryStarting", "food"),
+    "begin_condiment": ("inventoryStarting", "condiment"),
+    "begin_paper": ("inventoryStarting", "paper"),
+    "begin_non_product": ("inventoryStarting", "nonProduct"),
+    "begin_op_supplies": ("inventoryStarting", "opsSupplies"),
+    "end_food": ("inventoryEnding", "food"),
+    "end_condiment": ("inventoryEnding", "condiment"),
+    "end_paper": ("inventoryEnding", "paper"),
+    "end_non_product": ("inventoryEnding", "nonProduct"),
+    "end_op_supplies": ("inventoryEnding", "opsSupplies"),
+    "purchase_food": (None, "FOOD"),
+    "purchase_condiment": (None, "CONDIMENT"),
+    "purchase_paper": (None, "PAPER"),
+    "purchase_non_product": (None, "NONPRODUCT"),
+    "purchase_travel": (None, "TRAVEL"),
+    "purchase_advertising": (None, "ADVERTISING"),
+    "purchase_advertising_other": (None, "ADV-OTHER"),
+    "purchase_promotion": (None, "PROMO"),
+    "purchase_outside_services": (None, "OUTSIDE SVC"),
+    "purchase_linen": (None, "LINEN"),
+    "purchase_operating_supply": (None, "OP. SUPPLY"),
+    "purchase_maintenance_repair": (None, "M+R"),
+    "purchase_small_equipment": (None, "SML EQUIP"),
+    "purchase_utilities": (None, "UTILITIES"),
+    "purchase_office": (None, "OFFICE"),
+    "purchase_crew_relations": (None, "CREW RELATIONS"),
+    "purchase_training": (None, "TRAINING"),
+}
+
+# Line names are dotted paths into the pac_actual document
+PAC_ACTUAL_GRAPH = FormulaGraph(
+    "pac_actual",
+    SHARED_NODES + [
+        Node("rti", "condiment + end_condiment - begin_condiment - purchase_condiment"),
+        Node("base_food", "begin_food + purchase_food - end_food - rti - other_food_components"),
+        Node("promotion", "promotion_from_sales + purchase_promotion"),
+        Node("advertising", "advertising_from_sales + purchase_advertising"),
+        Node("cash_plus_minus", "-cash"),  # Flip the sign
+        Node("food_and_paper_total", "base_food + employee_meal + condiment + total_waste + paper"),
+        Node("labor_total", "crew_labor + management_labor + payroll_tax + additional_labor_dollars"),
+        Node("purchases_total", (
+            "purchase_travel + advertising + purchase_advertising_other + promotion"
+            " + purchase_outside_services + purchase_linen + purchase_operating_supply"
+            " + purchase_maintenance_repair + purchase_small_equipment + purchase_utilities"
+            " + dues_and_subscriptions + purchase_office + cash_plus_minus"
+            " + purchase_crew_relations + purchase_training"
+        )),
+        Node("total_controllable", "food_and_paper_total + labor_total + purchases_total"),
+        Node("pac", "product_sales - total_controllable"),
+        Node("gross_profit_percent", "100 - pct(food_and_paper_total)"),
+        # Unexplained subtracts if negative, handled by addition
+        Node("food_over_base", (
+            "raw_waste_percent + complete_waste_percent + condiment_percent"
+            " + stat_variance_percent + unexplained_percent"
+        )),
+    ],
+    [
+        Line("sales.productSales", "product_sales", "100.0"),
+        Line("sales.allNetSales", "all_net_sales"),
+        Line("foodAndPaper.baseFood", "base_food"),
+        Line("foodAndPaper.employeeMeal", "employee_meal"),
+        Line("foodAndPaper.condiment", "condiment"),
+        Line("foodAndPaper.totalWaste", "total_waste"),
+        Line("foodAndPaper.paper", "paper"),
+        Line("foodAndPaper.total", "food_and_paper_total"),
+        Line("labor.crewLabor", "crew_labor"),
+        Line("labor.managementLabor", "management_labor"),
+        Line("labor.payrollTax", "payroll_tax"),
+        Line("labor.additionalLaborDollars", "additional_labor_dollars"),
+        Line("labor.total", "labor_total"),
+        Line("purchases.travel", "purchase_travel"),
+        Line("purchases.advOther", "purchase_advertising_other"),
+        Line("purchases.promotion", "promotion"),
+        Line("purchases.outsideServices", "purchase_outside_services"),
+        Line("purchases.linen", "purchase_linen"),
+        Line("purchases.opsSupplies", "purchase_operating_supply"),
+        Line("purchases.maintenanceRepair", "purchase_maintenance_repair"),
+        Line("purchases.smallEquipment", "purchase_small_equipment"),
+        Line("purchases.utilities", "purchase_utilities"),
+        Line("purchases.office", "purchase_office"),
+        Line("purchases.cashPlusMinus", "cash_plus_minus"),
+        Line("purchases.crewRelations", "purchase_crew_relations"),
+        Line("purchases.training", "purchase_training"),
+        Line("purchases.duesAndSubscriptions", "dues_and_subscriptions"),
+        Line("purchases.advertising", "advertising"),
+        Line("purchases.total", "purchases_total"),
+        Line("totals.totalControllable", "total_controllable"),
+        Line("totals.pac", "pac", "100 - pct(total_controllable)"),
+    ],
+)
+
+
+# pac_actual document fields that hold graph nodes or copy graph inputs through
+PAC_ACTUAL_NODE_PATHS: Dict[str, str] = {
+    "other_food_components": "totals.otherFoodComponents",
+    "rti": "totals.rti",
+    "gross_profit_percent": "totals.grossProfit.percent",
+    "food_over_base": "foodCost.foodOverBase",
+    "op_supplies_usage": "nonProductAndSupplies.operatingSupplies.usage",
+    "non_product_usage": "nonProductAndSupplies.nonProduct.usage",
+}
+PAC_ACTUAL_INPUT_PATHS: Dict[str, str] = {
+    "raw_waste_percent": "foodCost.rawWaste",
+    "complete_waste_percent": "foodCost.completeWaste",
+    "stat_variance_percent": "foodCost.statVariance",
+    "begin_op_supplies": "nonProductAndSupplies.operatingSupplies.starting",
+    "purchase_operating_supply": "nonProductAndSupplies.operatingSupplies.purchases",
+    "end_op_supplies": "nonProductAndSupplies.operatingSupplies.ending",
+    "begin_non_product": "nonProductAndSupplies.nonProduct.starting",
+    "purchase_non_product": "nonProductAndSupplies.nonProduct.purchases",
+    "end_non_product": "nonProductAndSupplies.nonProduct.ending",
+}
+
+# Canonical invoice_log_totals category -> graph input
+INVOICE_CATEGORY_INPUTS: Dict[str, str] = {
+    key: name for name, (section, key) in PAC_ACTUAL_FIELDS.items() if section is None
+}
+
+
+def to_num(val) -> float:
+    """Convert a stored value to float, defaulting to 0"""
+    try:
+        return float(val) if val is not None else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def pac_actual_values(generate_input: Dict[str, Any], invoice_log_totals: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Flatten generate_input and invoice_log_totals documents into PAC_ACTUAL_GRAPH inputs"""
+    totals = invoice_totals(invoice_log_totals)
+    values: Dict[str, float] = {}
+    for name, (section, key) in PAC_ACTUAL_FIELDS.items():
+        source = totals if section is None else generate_input.get(section, {})
+        values[name] = to_num(source.get(key))
+    return values
+
+
+# Compile both graphs at import so a malformed graph fails fast
+PAC_INPUT_GRAPH.compile(Decimal)
+PAC_INPUT_GRAPH.compile(float)
+PAC_ACTUAL_GRAPH.compile(float)
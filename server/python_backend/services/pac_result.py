@@ -0,0 +1,165 @@
+"""
+Compact PAC result - slot-based internal representation of a PAC calculation
+
+A CompactPacResult holds the raw output tuples of PAC_INPUT_GRAPH (node
+values, line dollars, line percents) plus the input it was computed from.
+Lines are addressed through a fixed index, so building one costs a handful
+of tuple allocations instead of ~30 validated Pydantic models. Internal
+consumers (batch, sweeps, aggregation) read it directly; the public
+PacCalculationResult is built only at the API boundary via to_model().
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from models import PacInputData, PacCalculationResult
+from .pac_formulas import PAC_INPUT_GRAPH, AMOUNT_USED_NODES, pac_input_values
+
+
+LINE_INDEX: Dict[str, int] = {name: i for i, name in enumerate(PAC_INPUT_GRAPH.line_names)}
+NODE_INDEX: Dict[str, int] = {name: i for i, name in enumerate(PAC_INPUT_GRAPH.node_names)}
+
+_ALL_NET_SALES = NODE_INDEX["all_net_sales"]
+_TOTAL_CONTROLLABLE = NODE_INDEX["total_controllable"]
+_TOTAL_CONTROLLABLE_PERCENT = NODE_INDEX["total_controllable_percent"]
+_PAC_PERCENT = NODE_INDEX["pac_percent"]
+_PAC_DOLLARS = NODE_INDEX["pac_dollars"]
+_AMOUNT_USED = tuple((field, NODE_INDEX[node]) for field, node in AMOUNT_USED_NODES.items())
+
+
+_QUANTUM = {2: Decimal("0.01"), 4: Decimal("0.0001")}
+
+_evaluate_decimal = PAC_INPUT_GRAPH.compile(Decimal)
+
+
+def evaluate_decimal(input_data: PacInputData) -> Tuple[tuple, tuple, tuple]:
+    """PAC_INPUT_GRAPH over input_data in Decimal: (node values, line dollars, line percents)"""
+    S = input_data.product_net_sales
+    valid = S > 0
+
+    def pct(value: Decimal) -> Decimal:
+        return (value / S) * 100 if valid else Decimal('0')
+
+    return _evaluate_decimal(pac_input_values(input_data), pct)
+
+
+def _round(value: Decimal, places: int) -> Decimal:
+    return value.quantize(_QUANTUM[places], ROUND_HALF_UP)
+
+
+def _exact(value: Decimal, places: int) -> Decimal:
+    return value
+
+
+class CompactPacResult:
+    """
+    PAC result backed by parallel tuples
+
+    Rows with no product sales carry only the sales figures (valid is False),
+    mirroring the zeroed PacCalculationResult of the scalar path.
+    """
+    __slots__ = ("input_data", "values", "dollars", "percents", "valid", "_model")
+
+    def __init__(
+        self,
+        input_data: PacInputData,
+        values: Sequence[Any],
+        dollars: Sequence[Any] = (),
+        percents: Sequence[Any] = (),
+        valid: bool = True,
+    ):
+        self.input_data = input_data
+        self.values = values
+        self.dollars = dollars
+        self.percents = percents
+        self.valid = valid
+        self._model: Optional[PacCalculationResult] = None
+
+    @property
+    def product_net_sales(self) -> Decimal:
+        return self.input_data.product_net_sales
+
+    @property
+    def all_net_sales(self) -> Any:
+        return self.values[_ALL_NET_SALES]
+
+    @property
+    def total_controllable_dollars(self) -> Any:
+        return self.values[_TOTAL_CONTROLLABLE] if self.valid else 0
+
+    @property
+    def pac_percent(self) -> Any:
+        return self.values[_PAC_PERCENT] if self.valid else 0
+
+    @property
+    def pac_dollars(self) -> Any:
+        return self.values[_PAC_DOLLARS] if self.valid else 0
+
+    def value(self, node: str) -> Any:
+        """Value of any PAC_INPUT_GRAPH node"""
+        return self.values[NODE_INDEX[node]]
+
+    def line(self, name: str) -> Tuple[Any, Any]:
+        """(dollars, percent) of a controllable line"""
+        if not self.valid:
+            return 0, 0
+        i = LINE_INDEX[name]
+        return self.dollars[i], self.percents[i]
+
+    def to_model(self) -> PacCalculationResult:
+        """Build (once) the public PacCalculationResult"""
+        if self._model is None:
+            self._model = self._build_model()
+        return self._model
+
+    def _build_model(self) -> PacCalculationResult:
+        input_data = self.input_data
+        values, dollars, percents = self.values, self.dollars, self.percents
+        number = _exact
+        if not isinstance(values[_ALL_NET_SALES], Decimal):
+            # Float rows (batch engine) are evaluated again in Decimal and rounded once,
+            # half up: binary floats put some half-cent ties just below the half
+            values, dollars, percents = evaluate_decimal(input_data)
+            number = _round
+        all_net_sales = number(values[_ALL_NET_SALES], 2)
+        if not self.valid:
+            return PacCalculationResult(
+                product_net_sales=input_data.product_net_sales,
+                all_net_sales=all_net_sales,
+            )
+
+        amount_used = {field: number(values[i], 2) for field, i in _AMOUNT_USED}
+        begin = input_data.beginning_inventory
+        end = input_data.ending_inventory
+        return PacCalculationResult.model_validate({
+            "product_net_sales": input_data.product_net_sales,
+            "all_net_sales": all_net_sales,
+            "amount_used": amount_used,
+            "controllable_expenses": {
+                name: {"dollars": number(d, 2), "percent": number(p, 4)}
+                for name, d, p in zip(PAC_INPUT_GRAPH.line_names, dollars, percents)
+            },
+            "total_controllable_dollars": number(values[_TOTAL_CONTROLLABLE], 2),
+            "total_controllable_percent": number(values[_TOTAL_CONTROLLABLE_PERCENT], 4),
+            "pac_percent": number(values[_PAC_PERCENT], 4),
+            "pac_dollars": number(values[_PAC_DOLLARS], 2),
+            "non_product_and_supplies": {
+                "operatingSupplies": {
+                    "starting": begin.op_supplies,
+                    "purchases": input_data.purchases.operating_supply,
+                    "ending": end.op_supplies,
+                    "usage": amount_used["op_supplies"],
+                },
+                "nonProduct": {
+                    "starting": begin.non_product,
+                    "purchases": input_data.purchases.non_product,
+                    "ending": end.non_product,
+                    "usage": amount_used["non_product"],
+                },
+            },
+            "sales_comparison": {
+                "lastYearProductSales": input_data.last_year_product_sales or Decimal('0'),
+                "lastMonthProductSales": input_data.last_month_product_sales or Decimal('0'),
+                "lastMonthLastYearProductSales": input_data.last_month_last_year_product_sales or Decimal('0'),
+                "lastYearLastYearProductSales": input_data.last_year_last_year_product_sales or Decimal('0'),
+            },
+        })
@@ -0,0 +1,127 @@
+"""
+PAC Rollup Service - multi-month series and aggregates over pac_actual documents
+
+Aggregates are sums of line dollars across the months that have data, with
+percentages recomputed against the summed product sales (never an average
+of monthly percentages).
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .pac_formulas import PAC_ACTUAL_GRAPH, to_num
+
+
+# Longest range a single request may cover
+MAX_RANGE_MONTHS = 120
+
+# Every reported pac_actual line, as (section, key)
+ROLLUP_LINES: List[Tuple[str, str]] = [tuple(name.split(".")) for name in PAC_ACTUAL_GRAPH.line_names]
+_PRODUCT_SALES = PAC_ACTUAL_GRAPH.line_names.index("sales.productSales")
+
+
+def shift_month(year_month: str, months: int) -> str:
+    """Add (or subtract) months to a YYYYMM string"""
+    index = int(year_month[:4]) * 12 + int(year_month[4:]) - 1 + months
+    return f"{index // 12}{index % 12 + 1:02d}"
+
+
+def month_range(from_ym: str, to_ym: str) -> List[str]:
+    """
+    Inclusive list of YYYYMM months
+
+    Raises:
+        ValueError: If the range is reversed or longer than MAX_RANGE_MONTHS
+    """
+    if from_ym > to_ym:
+        raise ValueError("'from' must not be after 'to'")
+    months = [from_ym]
+    while months[-1] != to_ym:
+        if len(months) >= MAX_RANGE_MONTHS:
+            raise ValueError(f"Range may cover at most {MAX_RANGE_MONTHS} months")
+        months.append(shift_month(months[-1], 1))
+    return months
+
+
+def rollup_months(from_ym: str, to_ym: str) -> Dict[str, List[str]]:
+    """Months needed for the series, year-to-date and trailing-12 windows ending at to_ym"""
+    return {
+        "series": month_range(from_ym, to_ym),
+        "ytd": month_range(f"{to_ym[:4]}01", to_ym),
+        "trailing12": month_range(shift_month(to_ym, -11), to_ym),
+    }
+
+
+def line_dollars(doc: Mapping[str, Any]) -> List[float]:
+    """Dollars of every ROLLUP_LINES entry of a pac_actual document"""
+    return [to_num(doc.get(section, {}).get(key, {}).get("dollars")) for section, key in ROLLUP_LINES]
+
+
+def sum_line_dollars(rows: Iterable[List[float]]) -> List[float]:
+    """Element-wise sum of line_dollars rows"""
+    totals = [0.0] * len(ROLLUP_LINES)
+    for row in rows:
+        totals = [a + b for a, b in zip(totals, row)]
+    return totals
+
+
+def consolidated_lines(totals: List[float]) -> Dict[str, Dict[str, Any]]:
+    """Nested {section: {line: {dollars, percent}}} with percents of the summed product sales"""
+    product_sales = totals[_PRODUCT_SALES]
+    lines: Dict[str, Dict[str, Any]] = {}
+    for (section, key), dollars in zip(ROLLUP_LINES, totals):
+        percent = (dollars / product_sales * 100) if product_sales > 0 else 0
+        lines.setdefault(section, {})[key] = {"dollars": dollars, "percent": percent}
+    lines["sales"]["productSales"]["percent"] = 100.0
+    lines["totals"]["pac"]["percent"] = 100 - lines["totals"]["totalControllable"]["percent"]
+    return lines
+
+
+def _aggregate(totals: List[float], months: List[str]) -> Dict[str, Any]:
+    return {"months": months, "monthsWithData": len(months), **consolidated_lines(totals)}
+
+
+def rollup_pac_actual(
+    from_ym: str,
+    to_ym: str,
+    docs: Mapping[str, Optional[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Build the monthly series and YTD / trailing-12 aggregates in one pass
+
+    Args:
+        from_ym: First month of the series (YYYYMM)
+        to_ym: Last month of the series and end of both aggregate windows
+        docs: YYYYMM -> pac_actual document (None or missing when absent)
+
+    Returns:
+        {"series": [{"yearMonth", "data"}], "ytd": {...}, "trailing12": {...}}
+    """
+    windows = rollup_months(from_ym, to_ym)
+    series_months = set(windows["series"])
+    ytd_months = set(windows["ytd"])
+    t12_months = set(windows["trailing12"])
+
+    n = len(ROLLUP_LINES)
+    ytd, t12 = [0.0] * n, [0.0] * n
+    ytd_with_data: List[str] = []
+    t12_with_data: List[str] = []
+    series: List[Dict[str, Any]] = []
+
+    for ym in sorted(series_months | ytd_months | t12_months):
+        doc = docs.get(ym)
+        if ym in series_months:
+            series.append({"yearMonth": ym, "data": doc})
+        if not doc:
+            continue
+        dollars = line_dollars(doc)
+        if ym in ytd_months:
+            ytd = [a + b for a, b in zip(ytd, dollars)]
+            ytd_with_data.append(ym)
+        if ym in t12_months:
+            t12 = [a + b for a, b in zip(t12, dollars)]
+            t12_with_data.append(ym)
+
+    return {
+        "series": series,
+        "ytd": _aggregate(ytd, ytd_with_data),
+        "trailing12": _aggregate(t12, t12_with_data),
+    }
@@ -0,0 +1,143 @@
+"""
+PAC Scenario Service - vectorized what-if sweeps over one store-month
+
+A scenario is a grid of lever adjustments applied to a base PacInputData.
+Every grid point becomes one element of the packed input columns, so the
+whole surface is a single pass of the compiled PAC formula graph.
+"""
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
+
+from models import PacInputData
+from .pac_batch_service import _evaluate_columns, pack_inputs
+from .pac_formulas import PAC_INPUT_GRAPH
+
+
+# Largest grid a single request may evaluate
+MAX_SCENARIO_POINTS = 100_000
+
+# Lever -> what one unit of adjustment means. All levers are deltas from the base month.
+SCENARIO_LEVERS: Dict[str, str] = {
+    "product_sales": "percent change in product sales",
+    "crew_labor_percent": "points of crew labor (management labor % unchanged)",
+    "waste_percent": "points of complete waste, bought as extra food",
+    "condiment_percent": "points of condiment",
+    "advertising_percent": "points of advertising",
+}
+
+_NODE_INDEX = {name: i for i, name in enumerate(PAC_INPUT_GRAPH.node_names)}
+
+
+def axis_values(spec: Mapping[str, object]) -> np.ndarray:
+    """
+    Expand one axis spec into its grid values
+
+    Args:
+        spec: Either {"values": [...]} or {"start", "stop", "steps"} (inclusive)
+
+    Raises:
+        ValueError: If the spec is empty or malformed
+    """
+    if spec.get("values") is not None:
+        values = np.asarray(spec["values"], dtype=np.float64)
+    elif spec.get("start") is not None and spec.get("stop") is not None:
+        steps = int(spec.get("steps") or 2)
+        if steps < 1:
+            raise ValueError("steps must be at least 1")
+        values = np.linspace(float(spec["start"]), float(spec["stop"]), steps)
+    else:
+        raise ValueError("axis needs 'values' or 'start'/'stop'")
+    if values.ndim != 1 or values.size == 0:
+        raise ValueError("axis must have at least one value")
+    return values
+
+
+def scenario_grid(
+    axes: Mapping[str, Mapping[str, object]],
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Cartesian product of the axes, flattened in C order (last axis fastest)
+
+    Returns:
+        (lever -> axis values, lever -> delta per grid point)
+
+    Raises:
+        ValueError: On unknown levers or grids over MAX_SCENARIO_POINTS
+    """
+    unknown = sorted(set(axes) - set(SCENARIO_LEVERS))
+    if unknown:
+        raise ValueError(f"Unknown scenario levers: {', '.join(unknown)}")
+    values = {name: axis_values(spec) for name, spec in axes.items()}
+    points = int(np.prod([v.size for v in values.values()])) if values else 1
+    if points > MAX_SCENARIO_POINTS:
+        raise ValueError(f"Scenario grid has {points} points; at most {MAX_SCENARIO_POINTS} allowed")
+    if not values:
+        return values, {}
+    mesh = np.meshgrid(*values.values(), indexing="ij")
+    return values, {name: m.ravel() for name, m in zip(values, mesh)}
+
+
+def apply_levers(base: Mapping[str, np.ndarray], grid: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Broadcast single-row base columns over the grid and apply lever deltas
+
+    Args:
+        base: Packed columns of one store-month (arrays of length 1)
+        grid: Lever name -> delta per grid point
+
+    Returns:
+        Packed columns with one element per grid point
+    """
+    points = next(iter(grid.values())).size if grid else 1
+    cols = {name: np.repeat(column, points) for name, column in base.items()}
+    zero = np.zeros(points)
+
+    cols["product_sales"] = cols["product_sales"] * (1 + grid.get("product_sales", zero) / 100)
+    crew = grid.get("crew_labor_percent", zero)
+    cols["crew_labor_percent"] = cols["crew_labor_percent"] + crew
+    cols["total_labor_percent"] = cols["total_labor_percent"] + crew
+    cols["condiment_percent"] = cols["condiment_percent"] + grid.get("condiment_percent", zero)
+    cols["advertising_percent"] = cols["advertising_percent"] + grid.get("advertising_percent", zero)
+
+    # Waste is carved out of food usage; extra waste is extra food, so base food stays put
+    waste = grid.get("waste_percent", zero)
+    cols["complete_waste_percent"] = cols["complete_waste_percent"] + waste
+    cols["purchase_food"] = cols["purchase_food"] + (waste / 100) * cols["product_sales"]
+    return cols
+
+
+def evaluate_scenario(input_data: PacInputData, axes: Mapping[str, Mapping[str, object]]) -> Dict[str, object]:
+    """
+    Evaluate the PAC surface over a grid of lever adjustments
+
+    Args:
+        input_data: Base store-month
+        axes: Lever name -> axis spec (see axis_values)
+
+    Returns:
+        {"axes", "shape", "points", "base", "surface"}; surface arrays are
+        flattened in C order over shape
+    """
+    axis, grid = scenario_grid(axes)
+    base = pack_inputs([input_data])
+    values, _, _, valid = _evaluate_columns(apply_levers(base, grid))
+
+    def node(name: str) -> np.ndarray:
+        return np.where(valid, values[_NODE_INDEX[name]], 0.0)
+
+    base_values, _, _, base_valid = _evaluate_columns(base)
+    base_pac = float(base_values[_NODE_INDEX["pac_percent"]][0]) if base_valid[0] else 0.0
+    pac_percent = node("pac_percent")
+
+    return {
+        "axes": {name: v.tolist() for name, v in axis.items()},
+        "shape": [v.size for v in axis.values()],
+        "points": int(pac_percent.size),
+        "base": {"pac_percent": round(base_pac, 4)},
+        "surface": {
+            "pac_percent": np.round(pac_percent, 4).tolist(),
+            "pac_dollars": np.round(node("pac_dollars"), 2).tolist(),
+            "total_controllable_percent": np.round(node("total_controllable_percent"), 4).tolist(),
+        },
+    }
@@ -8,6 +8,7 @@ Projection calculations WITH I/O.
 
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Dict, List, Any, Iterable, Tuple, Optional
@@ -53,6 +54,17 @@ LABOR_GROUP: List[str] = [
 ]
 PURCHASES_GROUP: List[str] = ["Advertising", *TRAVEL_THRU_TRAINING]
 
+# Goal seek: free variable -> (row, key) it sets; "purchase" takes the row from `line`
+GOAL_SEEK_VARIABLES: Dict[str, Tuple[Optional[str], str]] = {
+    "product_sales": ("Product Sales", "projectedDollar"),
+    "crew_labor_percent": ("Crew Labor", "projectedPercent"),
+    "purchase": (None, "projectedDollar"),
+}
+
+# PAC % is reported to the cent, so a solution within this is exact
+GOAL_SEEK_TOLERANCE = Decimal("0.01")
+GOAL_SEEK_MAX_ITERATIONS = 64
+
 
 # -----------------------------------------------------------------------------
 # Numeric helpers
@@ -276,6 +288,163 @@ class ProjCalculationService:
                 break
         return next_rows
 
+    # ------------------------------ Goal seek -------------------------------
+
+    def projected_pac_percent(self, rows: List[Dict[str, Any]]) -> Decimal:
+        """Projected P.A.C. % after the full apply_all pipeline"""
+        return _D(self._find_value(self.apply_all(rows), "P.A.C.", "projectedPercent"))
+
+    def solve_pac_goal(
+        self,
+        rows: List[Dict[str, Any]],
+        target_pac_percent: float,
+        variable: str,
+        line: Optional[str] = None,
+        lower: Optional[float] = None,
+        upper: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Find the value of one free variable that makes projected P.A.C. % hit a target.
+
+        Crew labor % and purchases lines enter P.A.C. % linearly, so they are
+        solved in closed form (then checked a cent either side for rounding).
+        Product sales enters as 1/sales and is solved by bounded bisection;
+        All Net Sales keeps its ratio to Product Sales while it moves.
+
+        Args:
+            rows: Projection rows (as accepted by apply_all)
+            target_pac_percent: Desired projected P.A.C. %
+            variable: One of GOAL_SEEK_VARIABLES
+            line: Purchases row name when variable == "purchase"
+            lower, upper: Search bounds for product sales
+
+        Returns:
+            {"variable", "line", "target", "value", "pacPercent", "solved", "method", "rows"}
+
+        Raises:
+            ValueError: On an unknown variable or purchases line
+        """
+        if variable not in GOAL_SEEK_VARIABLES:
+            raise ValueError(f"Unknown goal-seek variable '{variable}'")
+        row_name, key = GOAL_SEEK_VARIABLES[variable]
+        if variable == "purchase":
+            if line not in TRAVEL_THRU_TRAINING:
+                raise ValueError(f"line must be one of: {', '.join(TRAVEL_THRU_TRAINING)}")
+            row_name = line
+
+        base = self.seed_merge(EXPENSE_LIST, rows)
+        target = _D(target_pac_percent)
+        ps = _D(self._find_value(base, "Product Sales", "projectedDollar"))
+        ans = _D(self._find_value(base, "All Net Sales", "projectedDollar"))
+
+        def with_value(x: Decimal) -> List[Dict[str, Any]]:
+            out = [dict(r) for r in base]
+            for r in out:
+                if r.get("name") == row_name:
+                    r[key] = float(x)
+                elif variable == "product_sales" and r.get("name") == "All Net Sales" and ps > 0:
+                    r["projectedDollar"] = float(_q2(ans * x / ps))
+            return out
+
+        def pac(x: Decimal) -> Decimal:
+            return self.projected_pac_percent(with_value(x))
+
+        if variable == "product_sales":
+            lo = _D(lower if lower is not None else 1)
+            hi = _D(upper if upper is not None else max(ps, Decimal("1000")) * 10)
+            value = self._bisect(pac, lo, hi, target)
+            method = "bisection"
+        else:
+            x0 = _D(self._find_value(base, row_name, key))
+            if variable == "crew_labor_percent":
+                # Crew $ and its payroll tax both move with crew %
+                tax = _D(self._find_value(base, "Payroll Tax", "projectedPercent"))
+                slope = -(1 + tax / 100)
+            else:
+                slope = -100 / ps if ps > 0 else Decimal("0")
+            value = None
+            if slope != 0:
+                guess = _q2(x0 + (target - pac(x0)) / slope)
+                step = Decimal("0.01")
+                value = min((guess - step, guess, guess + step), key=lambda x: abs(pac(x) - target))
+            method = "closed_form"
+
+        solved_rows = self.apply_all(with_value(value)) if value is not None else self.apply_all(base)
+        achieved = _D(self._find_value(solved_rows, "P.A.C.", "projectedPercent"))
+        return {
+            "variable": variable,
+            "line": row_name,
+            "target": float(target),
+            "value": float(value) if value is not None else None,
+            "pacPercent": float(achieved),
+            "solved": (
+                value is not None
+                and abs(achieved - target) <= GOAL_SEEK_TOLERANCE
+                # Only Cash +/- may legitimately go negative
+                and (value >= 0 or row_name == "Cash +/-")
+            ),
+            "method": method,
+            "rows": solved_rows,
+        }
+
+    async def solve_pac_goals(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Goal-seek many store-months in one call.
+
+        Each item names a free variable (and `line` for purchases) and either
+        carries its own `rows` or a store_id/year/month_index_1 to seed them
+        from saved projections. The target defaults to the saved pacGoal.
+
+        Returns:
+            One solve_pac_goal result per item (without rows on error, with "error")
+        """
+        async def solve(item: Dict[str, Any]) -> Dict[str, Any]:
+            rows, target = item.get("rows"), item.get("target_pac_percent")
+            if rows is None:
+                seeded = await self.seed_projections(item["store_id"], item["year"], item["month_index_1"])
+                rows = seeded["rows"]
+                target = seeded["pacGoal"] if target is None else target
+            if target is None:
+                raise ValueError("target_pac_percent is required when rows are given")
+            return self.solve_pac_goal(
+                rows, target, item["variable"], item.get("line"), item.get("lower"), item.get("upper")
+            )
+
+        results = await asyncio.gather(*(solve(item) for item in items), return_exceptions=True)
+        out: List[Dict[str, Any]] = []
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                out.append({"store_id": item.get("store_id"), "solved": False, "error": str(result)})
+            else:
+                out.append({"store_id": item.get("store_id"), **result})
+        return out
+
+    @staticmethod
+    def _bisect(f, lo: Decimal, hi: Decimal, target: Decimal) -> Optional[Decimal]:
+        """
+        Bisection for a monotone f on [lo, hi] (cent resolution).
+        Returns None if the target is not bracketed by the bounds.
+        """
+        f_lo, f_hi = f(lo) - target, f(hi) - target
+        if f_lo == 0:
+            return lo
+        if f_hi == 0:
+            return hi
+        if (f_lo > 0) == (f_hi > 0):
+            return None
+        for _ in range(GOAL_SEEK_MAX_ITERATIONS):
+            if hi - lo <= Decimal("0.01"):
+                break
+            mid = _q2((lo + hi) / 2)
+            f_mid = f(mid) - target
+            if abs(f_mid) <= GOAL_SEEK_TOLERANCE / 2:
+                return mid
+            if (f_mid > 0) == (f_lo > 0):
+                lo, f_lo = mid, f_mid
+            else:
+                hi = mid
+        return lo if abs(f_lo) <= abs(f(hi) - target) else hi
+
     # ------------------------------ utilities -------------------------------
 
     @staticmethod
@@ -0,0 +1,188 @@
+"""
+pac-projections document schema
+
+A projection document keeps the Projections tab's raw `rows` (the client
+reads them to seed the grid), plus fields derived from them when it is
+saved:
+
+- lines: {line id: {"dollars", "percent"}}, one entry per projection row
+  keyed by the canonical line id below (e.g. "Maint. & Repair" ->
+  "maintenance_repair"), so readers look a line up instead of scanning rows
+- product_net_sales, cash_adjustments and purchases: the structured fields
+  the calculation engine reads
+- schemaVersion: PROJECTION_SCHEMA_VERSION
+
+Documents written before schema 2 only have rows (and sometimes a partial
+purchases map). current_projection() upgrades them in memory, and
+main_helpers/migrate_projection_schema.py rewrites them once, after which
+readers never derive anything.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+PROJECTION_SCHEMA_VERSION = 2
+
+# Projection row name (EXPENSE_LIST, in order) -> canonical line id
+PROJECTION_LINE_IDS: Dict[str, str] = {
+    "Product Sales": "product_sales",
+    "All Net Sales": "all_net_sales",
+    "Base Food": "base_food",
+    "Employee Meal": "employee_meal",
+    "Condiment": "condiment",
+    "Total Waste": "total_waste",
+    "Paper": "paper",
+    "Crew Labor": "crew_labor",
+    "Management Labor": "management_labor",
+    "Payroll Tax": "payroll_tax",
+    "Advertising": "advertising",
+    "Travel": "travel",
+    "Adv Other": "advertising_other",
+    "Promotion": "promotion",
+    "Outside Services": "outside_services",
+    "Linen": "linen",
+    "OP. Supply": "op_supply",
+    "Maint. & Repair": "maintenance_repair",
+    "Small Equipment": "small_equipment",
+    "Utilities": "utilities",
+    "Office": "office",
+    "Cash +/-": "cash_adjustments",
+    "Crew Relations": "crew_relations",
+    "Training": "training",
+    "Total Controllable": "total_controllable",
+    "P.A.C.": "pac",
+}
+
+# Older row names, used when the canonical row is missing or zero
+_LINE_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "product_sales": ("Product Net Sales",),
+    "advertising_other": ("Advertising Other",),
+    "op_supply": ("Operating Supply",),
+    "maintenance_repair": ("Maintenance & Repair",),
+}
+
+# purchases map key -> line id
+PURCHASE_LINES: Dict[str, str] = {
+    "travel": "travel",
+    "advertising_other": "advertising_other",
+    "promotion": "promotion",
+    "outside_services": "outside_services",
+    "linen": "linen",
+    "operating_supply": "op_supply",
+    "maintenance_repair": "maintenance_repair",
+    "small_equipment": "small_equipment",
+    "utilities": "utilities",
+    "office": "office",
+    "training": "training",
+    "crew_relations": "crew_relations",
+}
+
+# Line id -> row names to try, in order, compiled once at import
+_LINE_NAMES: Dict[str, Tuple[str, ...]] = {
+    line_id: tuple(n.lower() for n in (name,) + _LINE_ALIASES.get(line_id, ()))
+    for name, line_id in PROJECTION_LINE_IDS.items()
+}
+
+EMPTY_LINE: Mapping[str, float] = {"dollars": 0.0, "percent": 0.0}
+
+
+def _amount(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def index_projection_rows(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Projection rows keyed by line id
+
+    The first row of each name is used. A line takes its canonical row,
+    or the first alias row with a non-zero amount when that is missing or
+    zero. Rows with unknown names are left out.
+    """
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for row in rows or []:
+        if isinstance(row, dict):
+            by_name.setdefault(str(row.get("name", "")).strip().lower(), row)
+
+    lines: Dict[str, Dict[str, float]] = {}
+    for line_id, names in _LINE_NAMES.items():
+        candidates = [by_name[name] for name in names if name in by_name]
+        if not candidates:
+            continue
+        row = next((r for r in candidates if _amount(r.get("projectedDollar"))), candidates[0])
+        lines[line_id] = {
+            "dollars": _amount(row.get("projectedDollar")),
+            "percent": _amount(row.get("projectedPercent")),
+        }
+    return lines
+
+
+def _structured_fields(lines: Mapping[str, Mapping[str, float]]) -> Dict[str, Any]:
+    def dollars(line_id: str) -> float:
+        return (lines.get(line_id) or EMPTY_LINE)["dollars"]
+
+    return {
+        "product_net_sales": dollars("product_sales"),
+        "cash_adjustments": dollars("cash_adjustments"),
+        "purchases": {key: dollars(line_id) for key, line_id in PURCHASE_LINES.items()},
+    }
+
+
+def projection_document(
+    store_id: str,
+    year: int,
+    month_index_1: int,
+    pac_goal: float,
+    rows: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """A current-schema pac-projections document for the rows being saved (without updatedAt)"""
+    lines = index_projection_rows(rows)
+    return {
+        "store_id": store_id,
+        "year": year,
+        "month_index_1": month_index_1,
+        "pacGoal": float(pac_goal),
+        "rows": rows,  # keep raw rows for UI seeding/reset
+        "lines": lines,
+        **_structured_fields(lines),
+        "schemaVersion": PROJECTION_SCHEMA_VERSION,
+    }
+
+
+def projection_upgrade(doc: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Fields that bring an older projection document to the current schema
+
+    Structured sales values already stored are kept. Purchases derived
+    from rows replace stored ones, because older saves left some keys
+    (Training, Crew Relations) out.
+
+    Returns:
+        The fields to merge into the document, or None if it is current
+    """
+    if doc.get("schemaVersion") == PROJECTION_SCHEMA_VERSION:
+        return None
+    rows = doc.get("rows")
+    lines = index_projection_rows(rows) if isinstance(rows, list) else {}
+    derived = _structured_fields(lines)
+    purchases = doc.get("purchases") if isinstance(doc.get("purchases"), dict) else {}
+    return {
+        "lines": lines,
+        "product_net_sales": doc.get("product_net_sales") or derived["product_net_sales"],
+        "cash_adjustments": doc.get("cash_adjustments") or derived["cash_adjustments"],
+        "purchases": {**purchases, **derived["purchases"]} if lines else purchases,
+        "schemaVersion": PROJECTION_SCHEMA_VERSION,
+    }
+
+
+def current_projection(doc: Optional[Mapping[str, Any]]) -> Optional[Mapping[str, Any]]:
+    """A projection document in the current schema: as-is, or upgraded in memory"""
+    if doc is None:
+        return None
+    upgrade = projection_upgrade(doc)
+    return doc if upgrade is None else {**doc, **upgrade}
+
+
+def projection_line(doc: Mapping[str, Any], line_id: str) -> Mapping[str, float]:
+    """{"dollars", "percent"} of a line of a current-schema document (zero if absent)"""
+    return (doc.get("lines") or {}).get(line_id) or EMPTY_LINE
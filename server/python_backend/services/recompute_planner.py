@@ -0,0 +1,154 @@
+"""
+Recompute Planner - which pac_actual months a change affects, in order
+
+A month's pac_actual compares its product sales against four earlier
+months (DataIngestionService._history_months): last month, last year,
+last month last year and two years ago. Inverted, that is the comparison
+graph: month M is read by M+1, M+12, M+13 and M+24 of the same store.
+
+RecomputePlanner.plan() walks the graph from the changed months and
+returns every affected store-month once, in topological order (a month
+comes after every planned month it reads). The walk is bounded by:
+
+- max_depth: edges followed from a changed month. Comparisons read the
+  sales index (generate_input), not other pac_actual documents, so a
+  recomputed month changes no comparison and depth 1 reaches every stale
+  month; a larger depth also follows the dependents of dependents
+- horizon_months: months further than this after the changed month they
+  were reached from are left out
+- max_months: plan size; months left out are counted in stats()
+
+Configuration (environment):
+    PAC_RECOMPUTE_MAX_DEPTH        edges followed (default 1)
+    PAC_RECOMPUTE_HORIZON_MONTHS   furthest month after a change (default 24)
+    PAC_RECOMPUTE_MAX_MONTHS       most months per plan (default 5000)
+"""
+import heapq
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .pac_rollup_service import shift_month
+
+logger = logging.getLogger(__name__)
+
+# (store_id, YYYYMM)
+StoreMonth = Tuple[str, str]
+
+# Months after M whose comparisons read M (as last year, last month, last month last year, two years ago)
+COMPARISON_OFFSETS = (12, 1, 13, 24)
+
+
+def months_between(start: str, end: str) -> int:
+    """Number of months from start to end (YYYYMM), negative if end is earlier"""
+    return (int(end[:4]) - int(start[:4])) * 12 + int(end[4:]) - int(start[4:])
+
+
+def dependent_months(year_month: str) -> List[str]:
+    """Months whose sales comparisons read this month: next year, next month, next month next year, two years on"""
+    return [shift_month(year_month, offset) for offset in COMPARISON_OFFSETS]
+
+
+class RecomputePlanner:
+    """Plans transitive pac_actual recomputes over the comparison graph"""
+
+    def __init__(self, max_depth: int = 1, horizon_months: int = 24, max_months: int = 5000):
+        """
+        Args:
+            max_depth: Edges followed from a changed month (at least 1)
+            horizon_months: Furthest month after a change that is planned
+            max_months: Most months in one plan
+        """
+        self.max_depth = max(1, max_depth)
+        self.horizon_months = horizon_months
+        self.max_months = max_months
+        self.plans = 0
+        self.truncated = 0
+
+    def plan(self, changed: Iterable[StoreMonth], skip: Iterable[StoreMonth] = ()) -> List[StoreMonth]:
+        """
+        Store-months to recompute after the changed ones, in topological order
+
+        Args:
+            changed: Normalized (store_id, YYYYMM) pairs whose sources changed
+            skip: Months already recomputed by the caller; walked through but not planned
+
+        Returns:
+            Affected months, each once (at most max_months; the rest are counted in truncated)
+        """
+        changed = list(dict.fromkeys(changed))
+        skipped: Set[StoreMonth] = set(changed) | set(skip)
+
+        # Breadth-first, so a month keeps the shortest depth it is reachable at
+        depth: Dict[StoreMonth, int] = {key: 0 for key in changed}
+        origin: Dict[StoreMonth, str] = {key: key[1] for key in changed}
+        frontier = changed
+        for level in range(1, self.max_depth + 1):
+            reached = []
+            for store_id, ym in frontier:
+                for dep_month in dependent_months(ym):
+                    key = (store_id, dep_month)
+                    if key in depth or months_between(origin[(store_id, ym)], dep_month) > self.horizon_months:
+                        continue
+                    depth[key] = level
+                    origin[key] = origin[(store_id, ym)]
+                    reached.append(key)
+            frontier = reached
+
+        planned = [key for key in depth if key not in skipped]
+        ordered = self._topological(planned)
+        self.plans += 1
+        left_out = max(0, len(ordered) - self.max_months)
+        if left_out:
+            self.truncated += left_out
+            logger.warning(f"Recompute plan capped at {self.max_months} months; {left_out} affected months left out")
+        return ordered[:self.max_months]
+
+    @staticmethod
+    def _topological(months: List[StoreMonth]) -> List[StoreMonth]:
+        """Kahn's algorithm over the comparison edges between the planned months, earliest month first on ties"""
+        planned = set(months)
+        readers: Dict[StoreMonth, List[StoreMonth]] = {key: [] for key in months}
+        unread = {key: 0 for key in months}
+        for store_id, ym in months:
+            for dep_month in dependent_months(ym):
+                key = (store_id, dep_month)
+                if key in planned:
+                    readers[(store_id, ym)].append(key)
+                    unread[key] += 1
+
+        ready = [(ym, store_id) for (store_id, ym), count in unread.items() if count == 0]
+        heapq.heapify(ready)
+        ordered: List[StoreMonth] = []
+        while ready:
+            ym, store_id = heapq.heappop(ready)
+            ordered.append((store_id, ym))
+            for key in readers[(store_id, ym)]:
+                unread[key] -= 1
+                if unread[key] == 0:
+                    heapq.heappush(ready, (key[1], key[0]))
+        return ordered
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_depth": self.max_depth,
+            "horizon_months": self.horizon_months,
+            "max_months": self.max_months,
+            "plans": self.plans,
+            "truncated": self.truncated,
+        }
+
+
+_recompute_planner: Optional[RecomputePlanner] = None
+
+
+def get_recompute_planner() -> RecomputePlanner:
+    """Process-wide recompute planner configured from the environment"""
+    global _recompute_planner
+    if _recompute_planner is None:
+        _recompute_planner = RecomputePlanner(
+            max_depth=int(os.getenv("PAC_RECOMPUTE_MAX_DEPTH", "1")),
+            horizon_months=int(os.getenv("PAC_RECOMPUTE_HORIZON_MONTHS", "24")),
+            max_months=int(os.getenv("PAC_RECOMPUTE_MAX_MONTHS", "5000")),
+        )
+    return _recompute_planner
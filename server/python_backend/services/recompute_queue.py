@@ -0,0 +1,328 @@
+"""
+Recompute Queue - background cascade recomputes of pac_actual
+
+Saving a month through POST /actual/compute writes that month and returns;
+the later months whose sales comparisons read it (as planned by
+services.recompute_planner) are queued here and recomputed by
+in-process asyncio workers.
+
+Pending work is keyed by (store_id, YYYYMM), so saving several months in
+a row that share a dependent queues that dependent once; every job that
+asked for it is attached to the single recompute (coalesced). A month
+queued again while it is being recomputed runs once more afterwards,
+since its sources may have changed after they were read. Workers take up
+to PAC_RECOMPUTE_BATCH_SIZE pending months at a time and recompute them
+with one batched read and one batched write.
+
+Each enqueue returns a job (id, status, months). The job is written to
+recompute_jobs/<job_id> as "queued" before enqueue returns, with a marker
+in recompute_pending/<job_id> that is deleted in the same batch that saves
+the finished status. A process that stops (restart, deploy, crash) with
+cascades still queued loses only the in-memory queue: resume(), run at API
+startup, queues every job that still has a marker again. Live status is
+kept in memory; status() reads recompute_jobs for jobs of other processes.
+
+Configuration (environment):
+    PAC_RECOMPUTE_WORKERS      worker tasks per process (default 2)
+    PAC_RECOMPUTE_BATCH_SIZE   months recomputed per batch (default 50)
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .document_loader import DocumentLoader
+from .pac_actual_service import PacActualService
+from .pac_cache import PacResultCache
+from .pac_calculation_service import normalize_store_id
+from .recompute_planner import StoreMonth
+from .storage import MAX_BATCH_WRITES, DocumentStorage, WriteOp, get_storage, split_period_id
+
+logger = logging.getLogger(__name__)
+
+RECOMPUTE_JOBS_COLLECTION = "recompute_jobs"
+# One document per cascade job that has not finished, read back by resume()
+PENDING_CASCADES_COLLECTION = "recompute_pending"
+
+# Finished jobs kept in memory for status lookups (older ones are read back from storage)
+MAX_FINISHED_JOBS = 1000
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {**job, "recomputed": list(job["recomputed"]), "skipped": list(job["skipped"])}
+
+
+class RecomputeQueue:
+    """Coalescing background queue of cascade recomputes"""
+
+    def __init__(
+        self,
+        storage: Optional[DocumentStorage] = None,
+        workers: int = 2,
+        batch_size: int = 50,
+        result_cache: Optional[PacResultCache] = None,
+    ):
+        """
+        Args:
+            storage: Backend to read and write; defaults to the configured one
+            workers: Worker tasks, started on the first enqueue
+            batch_size: Most months one worker recomputes at a time
+            result_cache: Computed-result cache; defaults to the process-wide one
+        """
+        self._storage = storage
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.result_cache = result_cache
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._queue: Optional["asyncio.Queue[StoreMonth]"] = None
+        self._reset()
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    def _reset(self) -> None:
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._remaining: Dict[str, set] = {}
+        # (store_id, ym) -> job ids waiting on its next recompute
+        self._pending: Dict[StoreMonth, List[str]] = {}
+        # months being recomputed -> job ids waiting on the rerun that follows
+        self._running: Dict[StoreMonth, List[str]] = {}
+        self.recomputed = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (tests, CLI runs): the old tasks and queue are gone with the old one
+            self._loop = loop
+            self._tasks = []
+            self._queue = asyncio.Queue()
+            self._reset()
+        if not self._tasks:
+            # A fresh context, so workers do not inherit the enqueuing request's document loader
+            self._tasks = [
+                loop.create_task(self._worker(), context=contextvars.Context())
+                for _ in range(self.workers)
+            ]
+
+    async def enqueue(self, store_id: str, months: Iterable[str], source: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue recomputes of a store's months that already have pac_actual
+
+        The job is saved as queued before this returns, so resume() finds it
+        if the process stops before it finishes.
+
+        Args:
+            store_id: Store id in any accepted format
+            months: YYYYMM months to recompute
+            source: What triggered the job (e.g. the doc id just saved), for status
+
+        Returns:
+            A snapshot of the job: {"jobId", "status", "months", ...}
+        """
+        self._ensure_workers()
+        store_id = normalize_store_id(store_id)
+        keys = list(dict.fromkeys((store_id, ym) for ym in months))
+        job_id, created_at = uuid.uuid4().hex, _now()
+        if keys:
+            # Saved before a worker can take it, so the finished status is the last write
+            doc_ids = [f"{s}_{ym}" for s, ym in keys]
+            try:
+                await self.storage.batch([
+                    WriteOp(RECOMPUTE_JOBS_COLLECTION, job_id, {
+                        "jobId": job_id, "status": "queued", "source": source, "months": doc_ids,
+                        "createdAt": created_at,
+                    }),
+                    WriteOp(PENDING_CASCADES_COLLECTION, job_id, {
+                        "months": doc_ids, "source": source, "createdAt": created_at,
+                    }),
+                ])
+            except Exception as e:
+                # Still run in this process; only a restart before it finishes would lose it
+                logger.warning(f"Could not save recompute job {job_id}: {e}")
+        return self._add(job_id, keys, source, created_at)
+
+    async def resume(self) -> int:
+        """
+        Queue again the cascade jobs left unfinished by a stopped process
+
+        Returns:
+            Number of jobs queued
+        """
+        self._ensure_workers()
+        resumed = 0
+        start_after: Optional[str] = None
+        while True:
+            page = await self.storage.scan(PENDING_CASCADES_COLLECTION, start_after=start_after)
+            for job_id, pending in page:
+                if job_id in self._jobs:
+                    continue
+                keys = [split_period_id(doc_id) for doc_id in pending.get("months") or []]
+                keys = [key for key in keys if key[0] is not None]
+                self._add(job_id, keys, pending.get("source"), pending.get("createdAt") or _now())
+                resumed += 1
+            if len(page) < MAX_BATCH_WRITES:
+                break
+            start_after = page[-1][0]
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished recompute jobs")
+        return resumed
+
+    def _add(self, job_id: str, keys: List[StoreMonth], source: Optional[str], created_at: str) -> Dict[str, Any]:
+        job = {
+            "jobId": job_id,
+            "status": "queued",
+            "source": source,
+            "months": [f"{s}_{ym}" for s, ym in keys],
+            "recomputed": [],
+            "skipped": [],
+            "coalesced": 0,
+            "error": None,
+            "createdAt": created_at,
+            "startedAt": None,
+            "finishedAt": None,
+        }
+        self._jobs[job_id] = job
+        self._remaining[job_id] = set(keys)
+
+        for key in keys:
+            if key in self._pending:
+                self._pending[key].append(job_id)
+                job["coalesced"] += 1
+                self.coalesced += 1
+            elif key in self._running:
+                self._running[key].append(job_id)
+            else:
+                self._pending[key] = [job_id]
+                self._queue.put_nowait(key)
+        if not keys:
+            self._finish(job_id)
+        return _snapshot(job)
+
+    async def _worker(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._run(batch)
+            except Exception as e:  # _run records failures on the jobs; keep the worker alive
+                logger.error(f"Recompute worker failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _run(self, batch: List[StoreMonth]) -> None:
+        waiting: Dict[StoreMonth, List[str]] = {}
+        for key in batch:
+            waiting[key] = self._pending.pop(key, [])
+            self._running[key] = []
+            for job_id in waiting[key]:
+                if self._jobs[job_id]["status"] == "queued":
+                    self._jobs[job_id].update(status="running", startedAt=_now())
+
+        error: Optional[str] = None
+        recomputed: set = set()
+        try:
+            # A fresh loader per batch: sources are read as they are now
+            storage = self.storage
+            service = PacActualService(storage, DocumentLoader(storage), result_cache=self.result_cache)
+            recomputed = set(await service.recompute_existing(batch))
+            self.recomputed += len(recomputed)
+            self.batches += 1
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Cascade recompute of {len(batch)} months failed: {e}")
+
+        finished: List[str] = []
+        for key in batch:
+            doc_id = f"{key[0]}_{key[1]}"
+            for job_id in waiting[key]:
+                job = self._jobs[job_id]
+                if error is not None:
+                    job["error"] = error
+                job["recomputed" if key in recomputed else "skipped"].append(doc_id)
+                self._remaining[job_id].discard(key)
+                if not self._remaining[job_id]:
+                    finished.append(job_id)
+            rerun = self._running.pop(key)
+            if rerun:
+                self._pending[key] = rerun
+                self._queue.put_nowait(key)
+        if finished:
+            await self._save([self._finish(job_id) for job_id in finished])
+
+    def _finish(self, job_id: str) -> Dict[str, Any]:
+        job = self._jobs[job_id]
+        job.update(status="failed" if job["error"] else "completed", finishedAt=_now())
+        del self._remaining[job_id]
+        self._jobs.move_to_end(job_id)
+        finished = [jid for jid in self._jobs if jid not in self._remaining]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+        return job
+
+    async def _save(self, jobs: List[Dict[str, Any]]) -> None:
+        try:
+            ops = []
+            for job in jobs:
+                ops.append(WriteOp(RECOMPUTE_JOBS_COLLECTION, job["jobId"], _snapshot(job)))
+                ops.append(WriteOp(PENDING_CASCADES_COLLECTION, job["jobId"], delete=True))
+            await self.storage.batch(ops)
+        except Exception as e:
+            logger.warning(f"Could not save the status of {len(jobs)} recompute jobs: {e}")
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's status, or None if it is unknown"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return _snapshot(job)
+        return await self.storage.get(RECOMPUTE_JOBS_COLLECTION, job_id)
+
+    async def join(self) -> None:
+        """Wait until every queued recompute has run (tests and scripts)"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """Stop the workers; unfinished jobs are left for resume()"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "live_jobs": len(self._remaining),
+            "recomputed": self.recomputed,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+        }
+
+
+_recompute_queue: Optional[RecomputeQueue] = None
+
+
+def get_recompute_queue() -> RecomputeQueue:
+    """Process-wide recompute queue configured from the environment"""
+    global _recompute_queue
+    if _recompute_queue is None:
+        _recompute_queue = RecomputeQueue(
+            workers=int(os.getenv("PAC_RECOMPUTE_WORKERS", "2")),
+            batch_size=int(os.getenv("PAC_RECOMPUTE_BATCH_SIZE", "50")),
+        )
+    return _recompute_queue
@@ -0,0 +1,220 @@
+"""
+Sales Index Service - per-store monthly product net sales
+
+PAC comparisons (last year, last month, last month last year, two years
+ago) only need product net sales, yet used to read four whole
+generate_input documents. The `sales_index` collection keeps one small
+document per store, and lookup() answers every comparison of a month from
+that one read:
+
+    sales_index/<store_id> = {"storeId", "months": {"YYYYMM": sales}, "complete", "updatedAt"}
+
+The index is the source of truth for comparison sales, so every backend
+path that writes or learns of a generate_input write records it:
+
+- POST /actual/compute (the Generate tab calls it after saving) and
+  PacActualService.recompute_many, which the change feed
+  (services.change_feed_worker) runs for generate_input documents the web
+  client saved without a successful /actual/compute
+- the generate_input importer, in the same storage batch as the rows
+- the bulk recompute, from the generate_input pages it reads
+
+A store whose index is missing or not complete yet is answered from the
+months' generate_input, as before the index, and its index is rebuilt from
+all its generate_input documents in the background (off the request path).
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+
+from .document_loader import DocumentLoader, document_loader
+from .storage import DocumentStorage, WriteOp, get_storage
+
+logger = logging.getLogger(__name__)
+
+SALES_INDEX_COLLECTION = "sales_index"
+
+# store_id -> background rebuild of its index, so a store is rebuilt once at a time
+_rebuild_tasks: Dict[str, asyncio.Task] = {}
+
+
+def product_net_sales(generate_input: Optional[Dict[str, Any]]) -> float:
+    """sales.productNetSales of a generate_input document as a float (0 if missing or malformed)"""
+    value = ((generate_input or {}).get("sales") or {}).get("productNetSales")
+    try:
+        return float(str(value).replace("$", "").replace(",", "").strip()) if value is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+def index_write(store_id: str, sales: Dict[str, float]) -> WriteOp:
+    """Merge of YYYYMM -> sales into a store's index, for a storage batch"""
+    return WriteOp(
+        SALES_INDEX_COLLECTION,
+        store_id,
+        {"storeId": store_id, "months": sales, "updatedAt": firestore.SERVER_TIMESTAMP},
+        merge=True,
+    )
+
+
+class SalesIndexService:
+    """Reads and maintains sales_index documents"""
+
+    def __init__(self, storage: Optional[DocumentStorage] = None, loader: Optional[DocumentLoader] = None):
+        """
+        Args:
+            storage: Backend to write to; defaults to the configured one
+            loader: Loader to read through; defaults to the request's
+        """
+        self._storage = storage
+        self._loader = loader
+
+    @property
+    def storage(self) -> DocumentStorage:
+        return self._storage if self._storage is not None else get_storage()
+
+    @property
+    def loader(self) -> DocumentLoader:
+        return self._loader if self._loader is not None else document_loader(self.storage)
+
+    async def lookup(self, store_id: str, year_months: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        Sales of a store's months
+
+        Returns:
+            YYYYMM -> sales, or None for months without generate_input
+        """
+        return (await self.lookup_many({store_id: year_months}))[store_id]
+
+    async def lookup_many(self, months_by_store: Dict[str, Iterable[str]]) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Sales of several stores' months, from one read of their index documents
+
+        Stores without a complete index are answered from the months'
+        generate_input (one more read) and rebuilt in the background.
+
+        Args:
+            months_by_store: store_id -> YYYYMM months
+
+        Returns:
+            store_id -> YYYYMM -> sales, or None for months without generate_input
+        """
+        months_by_store = {store_id: list(dict.fromkeys(months)) for store_id, months in months_by_store.items()}
+        loader = self.loader
+        indexes = await loader.load_many((SALES_INDEX_COLLECTION, store_id) for store_id in months_by_store)
+        found: Dict[str, Dict[str, Optional[float]]] = {}
+        unindexed: List[str] = []
+        for store_id, year_months in months_by_store.items():
+            index = indexes[(SALES_INDEX_COLLECTION, store_id)]
+            if index is not None and index.get("complete"):
+                entries = index.get("months") or {}
+                found[store_id] = {ym: entries.get(ym) for ym in year_months}
+            else:
+                unindexed.append(store_id)
+                self.schedule_rebuild(store_id)
+        if unindexed:
+            docs = await loader.load_many(
+                ("generate_input", f"{store_id}_{ym}") for store_id in unindexed for ym in months_by_store[store_id]
+            )
+            for store_id in unindexed:
+                found[store_id] = {}
+                for ym in months_by_store[store_id]:
+                    doc = docs[("generate_input", f"{store_id}_{ym}")]
+                    found[store_id][ym] = product_net_sales(doc) if doc is not None else None
+        return found
+
+    async def record(self, store_id: str, year_month: str, generate_input: Dict[str, Any]) -> bool:
+        """
+        Record a month's sales after its generate_input was written
+
+        Returns:
+            True if the index changed
+        """
+        sales = product_net_sales(generate_input)
+        loader = self.loader
+        doc = await loader.load(SALES_INDEX_COLLECTION, store_id)
+        months = (doc or {}).get("months") or {}
+        if doc is not None and months.get(year_month) == sales:
+            return False
+
+        await self.storage.batch([index_write(store_id, {year_month: sales})])
+        loader.prime(SALES_INDEX_COLLECTION, store_id, {
+            **(doc or {"storeId": store_id}),
+            "months": {**months, year_month: sales},
+        })
+        return True
+
+    async def record_many(self, store_id: str, generate_inputs: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Record several months of one store with a single write
+
+        Args:
+            generate_inputs: YYYYMM -> generate_input document
+
+        Returns:
+            True if the index changed
+        """
+        loader = self.loader
+        doc = await loader.load(SALES_INDEX_COLLECTION, store_id)
+        months = (doc or {}).get("months") or {}
+        changed = {
+            year_month: sales
+            for year_month, sales in (
+                (year_month, product_net_sales(data)) for year_month, data in generate_inputs.items()
+            )
+            if doc is None or months.get(year_month) != sales
+        }
+        if not changed:
+            return False
+
+        await self.storage.batch([index_write(store_id, changed)])
+        loader.prime(SALES_INDEX_COLLECTION, store_id, {
+            **(doc or {"storeId": store_id}),
+            "months": {**months, **changed},
+        })
+        return True
+
+    def schedule_rebuild(self, store_id: str) -> None:
+        """Rebuild a store's index in a background task, unless one is running"""
+        loop = asyncio.get_running_loop()
+        running = _rebuild_tasks.get(store_id)
+        if running is not None and not running.done() and running.get_loop() is loop:
+            return
+        storage = self.storage
+        # Its own loader and a fresh context: the task outlives the request that started it
+        task = loop.create_task(
+            SalesIndexService(storage, DocumentLoader(storage)).rebuild(store_id), context=contextvars.Context()
+        )
+        _rebuild_tasks[store_id] = task
+        task.add_done_callback(lambda done: _rebuild_finished(store_id, done))
+
+    async def rebuild(self, store_id: str) -> Dict[str, Any]:
+        """
+        Rebuild a store's index from all its generate_input documents
+
+        Returns:
+            The new index document
+        """
+        rows = await self.storage.query_period("generate_input", store_id)
+        doc = {
+            "storeId": store_id,
+            "months": {year_month: product_net_sales(data) for year_month, data in rows},
+            "complete": True,
+        }
+        # Merged, so months recorded while the documents were read are kept
+        await self.storage.set(
+            SALES_INDEX_COLLECTION, store_id, {**doc, "updatedAt": firestore.SERVER_TIMESTAMP}, merge=True
+        )
+        self.loader.clear(SALES_INDEX_COLLECTION, store_id)
+        logger.info(f"Rebuilt sales index for {store_id} ({len(doc['months'])} months)")
+        return doc
+
+
+def _rebuild_finished(store_id: str, task: asyncio.Task) -> None:
+    if _rebuild_tasks.get(store_id) is task:
+        del _rebuild_tasks[store_id]
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Sales index rebuild for {store_id} failed: {task.exception()}")
@@ -0,0 +1,222 @@
+"""
+Embedded SQLite storage backend
+
+Every collection shares one `documents` table holding JSON bodies. Ids of
+the form "<store_id>_<YYYYMM>" are also split into indexed store_id and
+year_month columns, so reading a store's months is an index range scan.
+
+Firestore-only values are stored as JSON: SERVER_TIMESTAMP becomes the
+write time and datetimes become ISO-8601 strings.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .storage import MAX_BATCH_WRITES, DocKey, DocumentStorage, TransactionUpdate, WriteOp, split_period_id
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    doc_id     TEXT NOT NULL,
+    store_id   TEXT,
+    year_month TEXT,
+    data       TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS ix_documents_store_period
+    ON documents (collection, store_id, year_month);
+CREATE INDEX IF NOT EXISTS ix_documents_period
+    ON documents (year_month, store_id);
+"""
+
+# Keeps a variable list well under SQLITE_MAX_VARIABLE_NUMBER on old builds
+_MAX_KEYS_PER_QUERY = 400
+
+
+def deep_merge(base: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Firestore set(merge=True) semantics: maps merge recursively, other values replace"""
+    merged = dict(base)
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _json_default(now: str):
+    try:
+        from firebase_admin import firestore
+        server_timestamp = firestore.SERVER_TIMESTAMP
+    except ImportError:
+        server_timestamp = None
+
+    def default(value: Any) -> Any:
+        if server_timestamp is not None and value is server_timestamp:
+            return now
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        return str(value)
+
+    return default
+
+
+class SqliteStorage(DocumentStorage):
+    """DocumentStorage in a local SQLite file (":memory:" for tests)"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "pac.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    async def get_many(self, keys: Sequence[DocKey]) -> Dict[DocKey, Optional[Dict[str, Any]]]:
+        return await asyncio.to_thread(self.get_many_sync, keys)
+
+    async def batch(self, ops: Sequence[WriteOp]) -> None:
+        await asyncio.to_thread(self.batch_sync, ops)
+
+    async def transact(self, keys: Sequence[DocKey], update: TransactionUpdate) -> List[WriteOp]:
+        return await asyncio.to_thread(self.transact_sync, keys, update)
+
+    async def query_period(
+        self,
+        collection: str,
+        store_id: str,
+        from_ym: Optional[str] = None,
+        to_ym: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        return await asyncio.to_thread(self.query_period_sync, collection, store_id, from_ym, to_ym)
+
+    async def scan(
+        self,
+        collection: str,
+        start_after: Optional[str] = None,
+        limit: int = MAX_BATCH_WRITES,
+        end_at: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        return await asyncio.to_thread(self.scan_sync, collection, start_after, limit, end_at)
+
+    # Synchronous implementations (also usable from scripts and benchmarks)
+
+    def get_many_sync(self, keys: Sequence[DocKey]) -> Dict[DocKey, Optional[Dict[str, Any]]]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[DocKey, Dict[str, Any]] = {}
+        with self._lock:
+            for start in range(0, len(keys), _MAX_KEYS_PER_QUERY):
+                chunk = keys[start:start + _MAX_KEYS_PER_QUERY]
+                where = " OR ".join(["(collection = ? AND doc_id = ?)"] * len(chunk))
+                params = [part for key in chunk for part in key]
+                for collection, doc_id, data in self._conn.execute(
+                    f"SELECT collection, doc_id, data FROM documents WHERE {where}", params
+                ):
+                    found[(collection, doc_id)] = json.loads(data)
+        return {key: found.get(key) for key in keys}
+
+    def batch_sync(self, ops: Sequence[WriteOp]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        default = _json_default(now)
+        with self._lock:
+            for start in range(0, len(ops), MAX_BATCH_WRITES):
+                chunk = ops[start:start + MAX_BATCH_WRITES]
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for op in chunk:
+                        self._apply(op, now, default)
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+
+    def transact_sync(self, keys: Sequence[DocKey], update: TransactionUpdate) -> List[WriteOp]:
+        now = datetime.now(timezone.utc).isoformat()
+        default = _json_default(now)
+        with self._lock:
+            # The write lock is held from the read to the commit, so update runs once
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                docs: Dict[DocKey, Optional[Dict[str, Any]]] = {}
+                for collection, doc_id in dict.fromkeys(keys):
+                    row = self._conn.execute(
+                        "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+                    ).fetchone()
+                    docs[(collection, doc_id)] = json.loads(row[0]) if row is not None else None
+                ops = list(update(docs))
+                for op in ops:
+                    self._apply(op, now, default)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ops
+
+    def _apply(self, op: WriteOp, now: str, default) -> None:
+        if op.delete:
+            self._conn.execute(
+                "DELETE FROM documents WHERE collection = ? AND doc_id = ?", (op.collection, op.doc_id)
+            )
+            return
+        data = op.data or {}
+        if op.merge:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (op.collection, op.doc_id)
+            ).fetchone()
+            if row is not None:
+                data = deep_merge(json.loads(row[0]), data)
+        store_id, year_month = split_period_id(op.doc_id)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, doc_id, store_id, year_month, data, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (op.collection, op.doc_id, store_id, year_month, json.dumps(data, default=default), now),
+        )
+
+    def query_period_sync(
+        self,
+        collection: str,
+        store_id: str,
+        from_ym: Optional[str] = None,
+        to_ym: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT year_month, data FROM documents"
+                " WHERE collection = ? AND store_id = ? AND year_month BETWEEN ? AND ?"
+                " ORDER BY year_month",
+                (collection, store_id, from_ym or "000000", to_ym or "999999"),
+            ).fetchall()
+        return [(year_month, json.loads(data)) for year_month, data in rows]
+
+    def scan_sync(
+        self,
+        collection: str,
+        start_after: Optional[str] = None,
+        limit: int = MAX_BATCH_WRITES,
+        end_at: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        sql = "SELECT doc_id, data FROM documents WHERE collection = ? AND doc_id > ?"
+        params: List[Any] = [collection, start_after or ""]
+        if end_at is not None:
+            sql += " AND doc_id <= ?"
+            params.append(end_at)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY doc_id LIMIT ?", (*params, limit)).fetchall()
+        return [(doc_id, json.loads(data)) for doc_id, data in rows]
@@ -0,0 +1,354 @@
+"""
+Document storage backends for PAC-Pro
+
+PAC documents live in collections keyed "<store_id>_<YYYYMM>". Code that
+goes through DocumentStorage instead of firestore.client() runs unchanged
+on Firestore or on the embedded SQLite backend (services.sqlite_storage),
+which serves on-prem and offline deployments and reproducible benchmarks.
+
+Configuration (environment):
+    PAC_STORAGE_BACKEND   "firestore" (default) or "sqlite"
+    PAC_SQLITE_PATH       database file for the sqlite backend (default pac.sqlite3)
+"""
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (collection, document id)
+DocKey = Tuple[str, str]
+
+# Writes derived from documents read in a transaction (see DocumentStorage.transact)
+TransactionUpdate = Callable[[Dict[DocKey, Optional[Dict[str, Any]]]], Sequence["WriteOp"]]
+
+# Firestore's per-batch write limit; the SQLite backend uses it too so both
+# commit in the same units
+MAX_BATCH_WRITES = 500
+
+_PERIOD_ID = re.compile(r"^(?P<store_id>.+)_(?P<year_month>\d{6})$")
+
+
+def split_period_id(doc_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """(store_id, year_month) of a "<store_id>_<YYYYMM>" id, or (None, None)"""
+    match = _PERIOD_ID.match(doc_id)
+    return (match["store_id"], match["year_month"]) if match else (None, None)
+
+
+class WriteOp(NamedTuple):
+    """One write of a batch; data is ignored for deletes"""
+    collection: str
+    doc_id: str
+    data: Optional[Dict[str, Any]] = None
+    merge: bool = False
+    delete: bool = False
+
+
+class DocumentStorage(ABC):
+    """Async document store with the access patterns the PAC services need"""
+
+    name = "abstract"
+
+    def is_available(self) -> bool:
+        """Whether the backend can serve requests"""
+        return True
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Document data ({} for an empty document), or None if it does not exist"""
+        return (await self.get_many([(collection, doc_id)]))[(collection, doc_id)]
+
+    @abstractmethod
+    async def get_many(self, keys: Sequence[DocKey]) -> Dict[DocKey, Optional[Dict[str, Any]]]:
+        """Several documents in one round trip; missing ones map to None"""
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False) -> None:
+        """
+        Write a document
+
+        Args:
+            merge: Deep-merge maps into the existing document instead of replacing it
+        """
+        await self.batch([WriteOp(collection, doc_id, data, merge)])
+
+    async def delete(self, collection: str, doc_id: str) -> None:
+        """Delete a document (no error if it does not exist)"""
+        await self.batch([WriteOp(collection, doc_id, delete=True)])
+
+    @abstractmethod
+    async def batch(self, ops: Sequence[WriteOp]) -> None:
+        """Apply writes atomically in chunks of MAX_BATCH_WRITES"""
+
+    @abstractmethod
+    async def transact(self, keys: Sequence[DocKey], update: TransactionUpdate) -> List[WriteOp]:
+        """
+        Read documents and apply the writes derived from them atomically
+
+        No other write to the read documents lands between the read and the
+        writes. update may run more than once (Firestore retries when a read
+        document changed), so it must not have side effects; an exception it
+        raises aborts the transaction and propagates.
+
+        Args:
+            keys: Documents to read
+            update: Key -> data (None if missing) -> writes to apply
+
+        Returns:
+            The writes applied
+        """
+
+    @abstractmethod
+    async def query_period(
+        self,
+        collection: str,
+        store_id: str,
+        from_ym: Optional[str] = None,
+        to_ym: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Documents of one store over a month range
+
+        Args:
+            collection: Collection with "<store_id>_<YYYYMM>" ids
+            store_id: Canonical store id
+            from_ym: First month (inclusive), unbounded if None
+            to_ym: Last month (inclusive), unbounded if None
+
+        Returns:
+            (year_month, data) pairs in month order
+        """
+
+    @abstractmethod
+    async def scan(
+        self,
+        collection: str,
+        start_after: Optional[str] = None,
+        limit: int = MAX_BATCH_WRITES,
+        end_at: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        One page of a whole collection in document id order
+
+        Args:
+            collection: Collection to read
+            start_after: Last document id of the previous page, None for the first
+            limit: Page size
+            end_at: Last document id to include, unbounded if None
+
+        Returns:
+            (doc_id, data) pairs; fewer than limit on the last page
+        """
+
+
+class FirestoreStorage(DocumentStorage):
+    """
+    DocumentStorage over the async Firestore client
+
+    firebase_admin is imported on first use, so the SQLite backend runs without it.
+    """
+
+    name = "firestore"
+
+    def __init__(self, db: Any = None):
+        """
+        Args:
+            db: Async client; defaults to the client for the running loop
+        """
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is not None:
+            return self._db
+        from .firestore_async import get_async_client
+        return get_async_client()
+
+    def is_available(self) -> bool:
+        if self._db is not None:
+            return True
+        try:
+            import firebase_admin
+        except ImportError:
+            return False
+        return bool(firebase_admin._apps)
+
+    async def get_many(self, keys: Sequence[DocKey]) -> Dict[DocKey, Optional[Dict[str, Any]]]:
+        from .firestore_async import get_documents
+
+        db = self.db
+        return await get_documents(db, {key: db.collection(key[0]).document(key[1]) for key in keys})
+
+    async def batch(self, ops: Sequence[WriteOp]) -> None:
+        db = self.db
+        for start in range(0, len(ops), MAX_BATCH_WRITES):
+            batch = db.batch()
+            for op in ops[start:start + MAX_BATCH_WRITES]:
+                ref = db.collection(op.collection).document(op.doc_id)
+                if op.delete:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, op.data, merge=op.merge)
+            await batch.commit()
+
+    async def transact(self, keys: Sequence[DocKey], update: TransactionUpdate) -> List[WriteOp]:
+        from google.cloud.firestore_v1.async_transaction import async_transactional
+
+        db = self.db
+        refs = {key: db.collection(key[0]).document(key[1]) for key in dict.fromkeys(keys)}
+        by_path = {ref.path: key for key, ref in refs.items()}
+
+        @async_transactional
+        async def run(transaction) -> List[WriteOp]:
+            docs: Dict[DocKey, Optional[Dict[str, Any]]] = {key: None for key in refs}
+            async for snap in await transaction.get_all(list(refs.values())):
+                if snap.exists:
+                    docs[by_path[snap.reference.path]] = snap.to_dict() or {}
+            ops = list(update(docs))
+            for op in ops:
+                ref = db.collection(op.collection).document(op.doc_id)
+                if op.delete:
+                    transaction.delete(ref)
+                else:
+                    transaction.set(ref, op.data, merge=op.merge)
+            return ops
+
+        return await run(db.transaction())
+
+    async def query_period(
+        self,
+        collection: str,
+        store_id: str,
+        from_ym: Optional[str] = None,
+        to_ym: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        # Ids sort as "<store_id>_<YYYYMM>", so a month range is an id range
+        coll = self.db.collection(collection)
+        query = coll.where(filter=FieldFilter("__name__", ">=", coll.document(f"{store_id}_{from_ym or '000000'}")))
+        query = query.where(filter=FieldFilter("__name__", "<=", coll.document(f"{store_id}_{to_ym or '999999'}")))
+        results = []
+        async for snap in query.stream():
+            doc_store, year_month = split_period_id(snap.id)
+            if doc_store == store_id:
+                results.append((year_month, snap.to_dict() or {}))
+        return results
+
+    async def scan(
+        self,
+        collection: str,
+        start_after: Optional[str] = None,
+        limit: int = MAX_BATCH_WRITES,
+        end_at: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        query = self.db.collection(collection).order_by("__name__")
+        if start_after is not None:
+            query = query.start_after({"__name__": start_after})
+        if end_at is not None:
+            query = query.end_at({"__name__": end_at})
+        return [(snap.id, snap.to_dict() or {}) async for snap in query.limit(limit).stream()]
+
+
+def _previous_month(year_month: str) -> str:
+    # Ids are fixed width, so "<store>_<YYYYMM - 1>" sorts just before the first month
+    return f"{int(year_month) - 1:06d}"
+
+
+async def iter_period_pages(
+    storage: DocumentStorage,
+    collection: str,
+    store_ids: Optional[Iterable[str]] = None,
+    from_ym: Optional[str] = None,
+    to_ym: Optional[str] = None,
+    page_size: int = MAX_BATCH_WRITES,
+) -> AsyncIterator[List[Tuple[str, str, Dict[str, Any]]]]:
+    """
+    "<store_id>_<YYYYMM>" documents of a collection, one scan page at a time
+
+    Args:
+        storage: Backend to read
+        collection: Collection keyed by store and month
+        store_ids: Only these canonical store ids; all stores if None
+        from_ym: First month (inclusive), unbounded if None
+        to_ym: Last month (inclusive), unbounded if None
+        page_size: Documents per read
+
+    Yields:
+        Non-empty lists of (store_id, year_month, data)
+    """
+    if store_ids is None:
+        ranges: List[Tuple[Optional[str], Optional[str]]] = [(None, None)]
+    else:
+        # One id range per store: "<store>_<from>" .. "<store>_<to>"
+        ranges = [
+            (f"{store_id}_{_previous_month(from_ym) if from_ym else ''}", f"{store_id}_{to_ym or '999999'}")
+            for store_id in sorted(set(store_ids))
+        ]
+
+    for start_after, end_at in ranges:
+        cursor = start_after
+        while True:
+            page = await storage.scan(collection, start_after=cursor, limit=page_size, end_at=end_at)
+            docs = []
+            for doc_id, data in page:
+                store_id, year_month = split_period_id(doc_id)
+                if store_id is None:
+                    continue
+                if (from_ym and year_month < from_ym) or (to_ym and year_month > to_ym):
+                    continue
+                docs.append((store_id, year_month, data))
+            if docs:
+                yield docs
+            if len(page) < page_size:
+                break
+            cursor = page[-1][0]
+
+
+_storage: Optional[DocumentStorage] = None
+_firestore_storage: Optional["FirestoreStorage"] = None
+
+
+def create_storage(backend: str, **options: Any) -> DocumentStorage:
+    """
+    Build a storage backend by name
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "firestore":
+        return FirestoreStorage(**options)
+    if backend == "sqlite":
+        from .sqlite_storage import SqliteStorage
+        return SqliteStorage(options.get("path") or os.getenv("PAC_SQLITE_PATH", "pac.sqlite3"))
+    raise ValueError(f"Unknown storage backend {backend!r}; use 'firestore' or 'sqlite'")
+
+
+def get_storage() -> DocumentStorage:
+    """Process-wide storage backend configured from the environment"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage(os.getenv("PAC_STORAGE_BACKEND", "firestore").strip().lower())
+        logger.info(f"PAC storage backend: {_storage.name}")
+    return _storage
+
+
+def get_firestore_storage() -> DocumentStorage:
+    """
+    Firestore, for the collections only it holds (users, month_locks, announcements)
+
+    The configured backend when that is Firestore, so a request shares one loader for both.
+    """
+    global _firestore_storage
+    storage = get_storage()
+    if storage.name == "firestore":
+        return storage
+    if _firestore_storage is None:
+        _firestore_storage = FirestoreStorage()
+    return _firestore_storage
+
+
+def set_storage(storage: Optional[DocumentStorage]) -> None:
+    """Replace the process-wide backend (None re-reads the environment on next use)"""
+    global _storage
+    _storage = storage
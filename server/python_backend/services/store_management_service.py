@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import firebase_admin
 from firebase_admin import firestore
+from .config_cache import get_config_cache
 
 logger = logging.getLogger(__name__)
 
@@ -45,8 +46,8 @@ class StoreManagementService:
             raise RuntimeError("Firebase not initialized - cannot fetch stores")
 
         try:
-            docs = self.db.collection(self.stores_collection).stream()
-            stores = [{**doc.to_dict(), "id": doc.id} for doc in docs]
+            docs = await get_config_cache(self.db, self.stores_collection).documents()
+            stores = [{**data, "id": doc_id} for doc_id, data in docs.items()]
             logger.info(f"Fetched {len(stores)} active stores")
             return stores
         except Exception as e:
@@ -69,6 +70,7 @@ class StoreManagementService:
 
             doc_ref = self.db.collection(self.stores_collection).document(store_data["id"])
             doc_ref.set(store_data)
+            get_config_cache(self.db, self.stores_collection).invalidate()
             logger.info(f"Added new store: {store_data['id']}")
             return store_data
         except Exception as e:
@@ -89,6 +91,7 @@ class StoreManagementService:
                 ref = self.db.collection(self.stores_collection).document(sid)
                 batch.update(ref, {k: v for k, v in s.items() if k != "id"})
             batch.commit()
+            get_config_cache(self.db, self.stores_collection).invalidate()
             logger.info(f"Updated {len(stores)} stores")
             return True
         except Exception as e:
@@ -147,6 +150,7 @@ class StoreManagementService:
 
             deleted_ref = self.db.collection(self.deleted_collection).add(deleted_payload)
             ref.delete()
+            get_config_cache(self.db, self.stores_collection).invalidate()
             logger.info(f"Moved store {store_id} to deletedStores")
             return {"deletedRefId": deleted_ref[1].id}
         except Exception as e:
@@ -180,6 +184,7 @@ class StoreManagementService:
 
             self.db.collection(self.stores_collection).document(target_id).set(store_data)
             deleted_ref.delete()
+            get_config_cache(self.db, self.stores_collection).invalidate()
 
             logger.info(f"Restored store {target_id}")
             return {"restoredId": target_id}
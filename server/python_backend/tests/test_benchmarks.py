@@ -0,0 +1,48 @@
+"""
+Tests for the benchmark corpus generator and regression check
+"""
+import pytest
+from benchmarks.concurrency import run_mode
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import compare, run
+from services.pac_calculation_service import calculate_pac_actual
+
+
+def test_corpus_is_deterministic_and_consistent():
+    first, second = generate_corpus(13, seed=7), generate_corpus(13, seed=7)
+
+    assert [sm.generate_input for sm in first] == [sm.generate_input for sm in second]
+    assert (first[12].store_id, first[12].year_month) == ("store_002", "202501")
+    for sm in first:
+        doc = calculate_pac_actual(sm.generate_input, sm.invoice_log_totals)
+        assert float(sm.input_data.product_net_sales) == doc["sales"]["productSales"]["dollars"]
+        assert len(sm.rows) == 26
+
+
+def test_run_reports_every_case():
+    results = run([2], ["calculate_pac_actual", "apply_all"], seed=0,
+                  min_samples=1, max_seconds=0, allocations=True)
+
+    assert set(results) == {"calculate_pac_actual@2", "apply_all@2"}
+    for result in results.values():
+        assert result["calls"] == 2
+        assert result["p99_us"] >= result["p50_us"] > 0
+        assert "alloc_bytes_per_call" in result
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {"a@1": {"p50_us": 100, "p99_us": 200, "store_months_per_s": 1000}}
+    ok = {"a@1": {"p50_us": 120, "p99_us": 240, "store_months_per_s": 850}}
+    slow = {"a@1": {"p50_us": 130, "p99_us": 200, "store_months_per_s": 700}}
+
+    assert compare(ok, baseline, 0.25) == []
+    assert len(compare(slow, baseline, 0.25)) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_reads_overlap_while_blocking_reads_queue():
+    blocking = await run_mode(10, 0.01, blocking=True)
+    overlapped = await run_mode(10, 0.01, blocking=False)
+
+    assert blocking["wall_ms"] >= 100
+    assert overlapped["wall_ms"] < blocking["wall_ms"] / 2
@@ -0,0 +1,159 @@
+"""
+Tests for the change-feed pac_actual worker
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from services.change_feed_worker import ChangeFeedWorker
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+from tests.test_pac_actual_service import gi
+from tests.test_pac_cache import FakeClock
+
+
+class FakeWatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+
+    def changed(self, *doc_ids):
+        """Deliver a snapshot with the given documents changed, as a listener thread would"""
+        changes = [SimpleNamespace(document=SimpleNamespace(id=doc_id)) for doc_id in doc_ids]
+        self.callback([], changes, None)
+
+
+class FakeListenDb:
+    """collection().where().on_snapshot() of the sync Firestore client"""
+
+    def __init__(self):
+        self.watches = {}
+        self.filters = {}
+
+    def collection(self, name):
+        db = self
+
+        class Query:
+            def where(self, filter):
+                db.filters[name] = filter
+                return self
+
+            def on_snapshot(self, callback):
+                db.watches[name] = FakeWatch(callback)
+                return db.watches[name]
+
+        return Query()
+
+
+def seeded_storage():
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", gi(1000)),
+        WriteOp("generate_input", "store_001_202506", gi(1200)),
+        WriteOp("generate_input", "store_002_202506", gi(900)),
+    ])
+    return storage
+
+
+def test_months_wait_for_a_quiet_period_or_the_max_delay():
+    clock = FakeClock()
+    worker = ChangeFeedWorker(debounce_seconds=5, max_delay_seconds=20, clock=clock)
+
+    assert worker.mark("store_001_202506")
+    assert worker.mark("2_202506")  # store ids are normalized
+    assert not worker.mark("settings")
+    clock.now = 4
+    worker.mark("store_001_202506")
+    assert worker.next_due_in() == 1
+
+    clock.now = 6
+    assert worker.due() == [("store_002", "202506")]
+
+    # A month that keeps changing is still recomputed after max_delay_seconds
+    for now in range(8, 21, 3):
+        clock.now = now
+        worker.mark("store_001_202506")
+    assert worker.due() == [("store_001", "202506"), ("store_002", "202506")]
+    assert worker.stats()["changes"] == 8
+
+
+@pytest.mark.asyncio
+async def test_flush_recomputes_due_months_in_batches():
+    storage = seeded_storage()
+    clock = FakeClock()
+    worker = ChangeFeedWorker(storage=storage, debounce_seconds=5, batch_size=1, clock=clock)
+    worker.mark("store_001_202506")
+    clock.now = 5
+    assert (await worker.flush())["recomputed"] == ["store_001_202506"]
+
+    await storage.set("generate_input", "store_001_202406", gi(1500))
+    worker.mark("store_002_202506")
+    worker.mark("store_001_202406")
+    clock.now = 7
+    worker.mark("store_002_202506")
+    assert (await worker.flush())["recomputed"] == []
+    clock.now = 10
+    result = await worker.flush()
+    assert result["recomputed"] == ["store_001_202406"]
+    assert result["cascaded"] == ["store_001_202506"]  # its last-year comparison moved
+    assert worker.stats()["dirty"] == 1
+
+    # Already current: read, compared and left alone
+    worker.mark("store_001_202406")
+    result = await worker.flush(everything=True)
+    assert (result["recomputed"], result["unchanged"]) == (["store_002_202506"], ["store_001_202406"])
+    assert worker.stats() == {
+        "listening": 0, "dirty": 0, "changes": 5, "recomputed": 3, "unchanged": 1, "batches": 4, "failures": 0,
+    }
+    doc = await storage.get("pac_actual", "store_002_202506")
+    assert doc["lastUpdatedBy"] == "System (Change feed)"
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_stay_dirty():
+    class BrokenStorage(SqliteStorage):
+        async def get_many(self, refs):
+            raise RuntimeError("unavailable")
+
+    storage = BrokenStorage(":memory:")
+    worker = ChangeFeedWorker(storage=storage, debounce_seconds=0)
+    worker.mark("store_001_202506")
+
+    assert (await worker.flush())["recomputed"] == []
+    assert worker.stats()["failures"] == 1
+    assert worker.due() == [("store_001", "202506")]
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_listener_changes_are_recomputed_until_stopped():
+    storage = seeded_storage()
+    db = FakeListenDb()
+    worker = ChangeFeedWorker(db, storage, debounce_seconds=0.01)
+    worker.start(collections=("generate_input", "invoice_log_totals"))
+    assert set(db.watches) == {"generate_input", "invoice_log_totals"}
+    assert db.filters["generate_input"].field_path == "updatedAt"
+
+    stop = asyncio.Event()
+    task = asyncio.create_task(worker.run(stop))
+    await asyncio.to_thread(db.watches["invoice_log_totals"].changed, "store_002_202506")
+    for _ in range(100):
+        if await storage.get("pac_actual", "store_002_202506") is not None:
+            break
+        await asyncio.sleep(0.01)
+    assert await storage.get("pac_actual", "store_002_202506") is not None
+
+    # Left waiting when stopped: recomputed before run() returns
+    worker.debounce_seconds = worker.max_delay_seconds = 60
+    db.watches["generate_input"].changed("store_001_202406")
+    stop.set()
+    await task
+    assert await storage.get("pac_actual", "store_001_202406") is not None
+
+    worker.close()
+    assert not db.watches["generate_input"].is_active
+    assert worker.stats()["listening"] == 0
+    storage.close()
@@ -0,0 +1,207 @@
+"""
+Tests for the configuration collection cache
+"""
+import pytest
+from firebase_admin import firestore
+from services.config_cache import CollectionCache
+from services.invoice_settings_service import InvoiceSettingsService
+from tests.test_pac_cache import FakeClock
+
+
+class FakeDoc:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeWatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+
+
+class FakeDocRef:
+    def __init__(self, db, collection, doc_id):
+        self.db, self.collection, self.id = db, collection, doc_id
+
+    def get(self):
+        self.db.reads += 1
+        return FakeDoc(self.id, self.db.docs.get(self.collection, {}).get(self.id))
+
+    def set(self, data, merge=False):
+        self.db.write(self.collection, self.id, data, merge)
+
+
+class FakeCollectionRef:
+    def __init__(self, db, name):
+        self.db, self.name = db, name
+
+    def document(self, doc_id):
+        return FakeDocRef(self.db, self.name, doc_id)
+
+    def stream(self):
+        docs = self.db.docs.get(self.name, {})
+        self.db.reads += max(len(docs), 1)
+        return [FakeDoc(doc_id, data) for doc_id, data in docs.items()]
+
+    def on_snapshot(self, callback):
+        if not self.db.listeners_supported:
+            raise NotImplementedError("listeners are not supported")
+        watch = FakeWatch(callback)
+        self.db.watches.setdefault(self.name, []).append(watch)
+        watch.callback(self.stream(), [], None)
+        return watch
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref, data, merge))
+
+    def commit(self):
+        for ref, data, merge in self.ops:
+            ref.set(data, merge)
+
+
+class FakeSyncFirestore:
+    """Sync Firestore client over {collection: {doc_id: data}} that counts document reads"""
+
+    def __init__(self, docs, listeners_supported=True):
+        self.docs = docs
+        self.listeners_supported = listeners_supported
+        self.watches = {}
+        self.reads = 0
+
+    def collection(self, name):
+        return FakeCollectionRef(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def write(self, collection, doc_id, data, merge=False):
+        docs = self.docs.setdefault(collection, {})
+        current = dict(docs.get(doc_id) or {}) if merge else {}
+        for key, value in data.items():
+            if isinstance(value, firestore.Increment):
+                value = (current.get(key) or 0) + value.value
+            elif value is firestore.SERVER_TIMESTAMP:
+                value = "2025-01-01T00:00:00"
+            current[key] = value
+        docs[doc_id] = current
+        for watch in self.watches.get(collection, []):
+            if watch.is_active:
+                watch.callback([FakeDoc(i, d) for i, d in docs.items()], [], None)
+
+
+def announcements():
+    return {"announcements": {"a1": {"title": "Welcome", "visible_to": "All"}}}
+
+
+@pytest.mark.asyncio
+async def test_listener_keeps_the_copy_fresh_without_reads():
+    db = FakeSyncFirestore(announcements())
+    cache = CollectionCache(db, "announcements")
+    reads = db.reads
+
+    assert await cache.get("a1") == {"title": "Welcome", "visible_to": "All"}
+    db.write("announcements", "a2", {"title": "Client write"})  # e.g. from the web client
+
+    assert set(await cache.documents()) == {"a1", "a2"}
+    assert db.reads == reads
+    assert (cache.mode, cache.loads, cache.snapshots) == ("listen", 0, 2)
+
+
+@pytest.mark.asyncio
+async def test_stopped_listener_falls_back_to_polling():
+    db = FakeSyncFirestore(announcements())
+    cache = CollectionCache(db, "announcements")
+    db.watches["announcements"][0].is_active = False
+
+    db.docs["announcements"]["a2"] = {"title": "Missed by the listener"}
+
+    assert set(await cache.documents()) == {"a1", "a2"}
+    assert (cache.mode, cache.loads) == ("poll", 1)
+
+
+def test_poll_mode_reloads_only_when_the_version_stamp_moves():
+    clock = FakeClock()
+    db = FakeSyncFirestore(announcements(), listeners_supported=False)
+    cache = CollectionCache(db, "announcements", poll_seconds=5, max_age_seconds=300, clock=clock)
+    assert cache.mode == "poll"
+
+    cache.documents_sync()
+    clock.now = 3
+    cache.documents_sync()  # within poll_seconds: no reads at all
+    clock.now = 10
+    cache.documents_sync()  # stamp unchanged: one stamp read, no reload
+    assert (cache.loads, cache.version_checks, cache.hits) == (1, 1, 2)
+
+    other_process = CollectionCache(db, "announcements", mode="poll", clock=clock)
+    db.docs["announcements"]["a2"] = {"title": "New"}
+    other_process.invalidate()
+    clock.now = 20
+
+    assert set(cache.documents_sync()) == {"a1", "a2"}
+    assert cache.loads == 2
+
+
+def test_poll_mode_reloads_after_max_age():
+    clock = FakeClock()
+    db = FakeSyncFirestore(announcements())
+    cache = CollectionCache(db, "announcements", mode="poll", poll_seconds=5, max_age_seconds=60, clock=clock)
+    cache.documents_sync()
+
+    db.docs["announcements"]["a2"] = {"title": "Unstamped write"}
+    clock.now = 61
+
+    assert "a2" in cache.documents_sync()
+
+
+def test_off_mode_reads_every_time():
+    db = FakeSyncFirestore(announcements())
+    cache = CollectionCache(db, "announcements", mode="off")
+
+    cache.documents_sync()
+    cache.documents_sync()
+
+    assert (cache.loads, cache.hits) == (2, 0)
+
+
+def test_invalidate_lets_the_writer_read_its_own_write():
+    db = FakeSyncFirestore(announcements(), listeners_supported=False)
+    cache = CollectionCache(db, "announcements", poll_seconds=60)
+    cache.documents_sync()
+
+    db.docs["announcements"]["a1"] = {"title": "Edited"}
+    cache.invalidate()
+
+    assert cache.documents_sync()["a1"] == {"title": "Edited"}
+    assert db.docs["configVersions"]["announcements"]["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invoice_categories_are_served_from_the_cache(monkeypatch):
+    db = FakeSyncFirestore({"invoiceCategories": {"FOOD": {"name": "FOOD", "bankAccountNum": "1234"}}})
+    cache = CollectionCache(db, "invoiceCategories")
+    monkeypatch.setattr("services.invoice_settings_service.get_config_cache", lambda _db, _name: cache)
+    service = InvoiceSettingsService()
+    service._db = db
+
+    first = await service.get_categories()
+    reads = db.reads
+    second = await service.get_categories()
+
+    assert first == second
+    assert [c["id"] for c in first] == InvoiceSettingsService.DEFAULT_INVOICE_CATEGORIES
+    assert first[0]["bankAccountNum"] == "1234" and first[1]["bankAccountNum"] == "0000"
+    assert len(db.docs["invoiceCategories"]) == 16
+    assert db.reads == reads  # was one document read per category
@@ -0,0 +1,262 @@
+"""
+Tests for DataIngestionService document loading
+"""
+import asyncio
+import pytest
+from decimal import Decimal
+from services import sales_index_service
+from services.data_ingestion_service import DataIngestionService
+from services.sales_index_service import product_net_sales
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+class FakeRef:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    async def get(self):
+        self.db.reads += 1
+        return FakeSnapshot(self, self.db.docs.get(self.path))
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db, self.name = db, name
+
+    def document(self, doc_id):
+        return FakeRef(self.db, self.name, doc_id)
+
+    def where(self, filter):
+        return FakeQuery(self, [filter])
+
+    def order_by(self, field):
+        assert field == "__name__"
+        return FakeQuery(self, [])
+
+
+class FakeQuery:
+    """Supports the document-id ranges and cursors FirestoreStorage.query_period and scan use"""
+
+    OPS = {">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b}
+
+    def __init__(self, collection, filters, cursors=(), limit_to=None):
+        self.collection, self.filters = collection, filters
+        self.cursors, self.limit_to = list(cursors), limit_to
+
+    def where(self, filter):
+        return FakeQuery(self.collection, self.filters + [filter], self.cursors, self.limit_to)
+
+    def start_after(self, fields):
+        return FakeQuery(self.collection, self.filters, self.cursors + [(">", fields["__name__"])], self.limit_to)
+
+    def end_at(self, fields):
+        return FakeQuery(self.collection, self.filters, self.cursors + [("<=", fields["__name__"])], self.limit_to)
+
+    def limit(self, count):
+        return FakeQuery(self.collection, self.filters, self.cursors, count)
+
+    async def stream(self):
+        db = self.collection.db
+        db.reads += 1
+        returned = 0
+        for path in sorted(db.docs):
+            ref = self.collection.document(path.split("/", 1)[1])
+            if ref.path != path or not all(self.OPS[f.op_string](path, f.value.path) for f in self.filters):
+                continue
+            if not all(ref.id > doc_id if op == ">" else ref.id <= doc_id for op, doc_id in self.cursors):
+                continue
+            if self.limit_to is not None and returned >= self.limit_to:
+                return
+            returned += 1
+            yield FakeSnapshot(ref, db.docs[path])
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append((ref.path, data, merge))
+
+    async def commit(self):
+        self.db.writes += 1
+        for path, data, merge in self.ops:
+            self.db.docs[path] = {**self.db.docs.get(path, {}), **data} if merge else data
+
+
+class FakeAsyncFirestore:
+    """Async client stand-in; counts round trips (each get(), get_all(), stream() or commit() is one)"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+        self.writes = 0
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    async def get_all(self, refs):
+        self.reads += 1
+        for ref in refs:
+            yield FakeSnapshot(ref, self.docs.get(ref.path))
+
+
+def with_sales_index(docs):
+    """docs plus the complete sales_index the backend maintains for their generate_input"""
+    indexes = {}
+    for path, data in docs.items():
+        collection, doc_id = path.split("/")
+        if collection == "generate_input":
+            store_id, year_month = doc_id.rsplit("_", 1)
+            index = indexes.setdefault(f"sales_index/{store_id}", {"storeId": store_id, "months": {}, "complete": True})
+            index["months"][year_month] = product_net_sales(data)
+    return {**indexes, **docs}
+
+
+def make_service(docs, indexed=True):
+    service = DataIngestionService.__new__(DataIngestionService)
+    service._async_db = FakeAsyncFirestore(with_sales_index(docs) if indexed else dict(docs))
+    return service
+
+
+async def rebuilds_finished():
+    await asyncio.gather(*list(sales_index_service._rebuild_tasks.values()))
+
+
+@pytest.mark.asyncio
+async def test_history_comes_from_the_sales_index_with_projection_fallback():
+    service = make_service({
+        "generate_input/store_001_202501": {
+            "sales": {"productNetSales": "$100,000.00", "promo": 500},
+            "labor": {"crewLabor": 25},
+        },
+        "invoice_log_totals/store_001_202501": {"totals": {"FOOD": 30000, "op supply": 120}},
+        "generate_input/store_001_202401": {"sales": {"productNetSales": 90000}},
+        "generate_input/store_001_202412": {"sales": {"productNetSales": 0}},
+        "pac-projections/store_001_202412": {"product_net_sales": 95000},
+        "pac-projections/store_001_202312": {"product_net_sales": 85000},
+    })
+
+    data = await service.get_input_data_async("store_001", "202501")
+
+    # Sources, index and the comparison projections in one round trip
+    assert service.adb.reads == 1
+    assert data.product_net_sales == Decimal("100000.00")
+    assert data.crew_labor_percent == Decimal("25")
+    assert data.purchases.food == Decimal("30000")
+    assert data.purchases.operating_supply == Decimal("120")
+    assert data.last_year_product_sales == Decimal("90000")
+    # Zero actual sales fall back to projections
+    assert data.last_month_product_sales == Decimal("95000")
+    assert data.last_month_last_year_product_sales == Decimal("85000")
+    assert data.last_year_last_year_product_sales == Decimal("0")
+
+
+@pytest.mark.asyncio
+async def test_projection_fallback_without_actuals():
+    service = make_service({
+        "pac-projections/store_001_202503": {
+            "product_net_sales": 120000,
+            "crew_labor_percent": 24,
+            "purchases": {"travel": 300},
+        },
+        "pac-projections/store_001_202403": {"product_net_sales": 110000},
+    })
+
+    data = await service.get_input_data_async("store_001", "202503")
+    await rebuilds_finished()
+
+    # Sources + index + projections, history generate_input (no index yet), and the background index rebuild
+    assert service.adb.reads == 3
+    assert data.product_net_sales == Decimal("120000")
+    assert data.purchases.travel == Decimal("300")
+    assert data.last_year_product_sales == Decimal("110000")
+
+
+@pytest.mark.asyncio
+async def test_indexed_history_loads_in_one_round_trip():
+    service = make_service({
+        f"generate_input/store_001_{ym}": {"sales": {"productNetSales": sales}}
+        for ym, sales in (("202501", 100), ("202401", 90), ("202412", 95), ("202312", 85), ("202301", 80))
+    })
+
+    data = await service.get_input_data_async("store_001", "202501")
+
+    assert service.adb.reads == 1
+    assert [
+        data.last_year_product_sales, data.last_month_product_sales,
+        data.last_month_last_year_product_sales, data.last_year_last_year_product_sales,
+    ] == [Decimal("90"), Decimal("95"), Decimal("85"), Decimal("80")]
+
+
+@pytest.mark.asyncio
+async def test_fetch_projections_reads_through_async_client():
+    service = make_service({"pac-projections/store_001_202501": {"rows": [{"name": "Travel"}], "pacGoal": "12.5"}})
+
+    assert await service.fetch_projections("store_001", 2025, 1) == ([{"name": "Travel"}], 12.5)
+    assert await service.fetch_projections("store_001", 2025, 2) == ([], 0.0)
+
+
+def baseline_history_sales(docs, store_id, year_month):
+    """History sales as the pre-index get_input_data_async read them, document by document"""
+    def money(value):
+        return Decimal(str(value).replace("$", "").replace(",", ""))
+
+    def sales(ym):
+        gen = docs.get(f"generate_input/{store_id}_{ym}")
+        if gen is not None and docs.get(f"generate_input/{store_id}_{year_month}") is not None:
+            val = (gen.get("sales") or {}).get("productNetSales")
+            if val is not None and val != 0 and val != "0":
+                return money(val)
+        proj = docs.get(f"pac-projections/{store_id}_{ym}") or {}
+        return money(proj.get("product_net_sales", 0))
+
+    history = DataIngestionService._history_months(year_month)
+    return [sales(history[name]) for name in ("last_year", "last_month", "last_month_last_year", "last_year_last_year")]
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("with_actuals", [True, False])
+@pytest.mark.asyncio
+async def test_history_sales_match_the_baseline_reads(with_actuals, indexed):
+    docs = {
+        # Projection only
+        "pac-projections/store_001_202401": {"product_net_sales": 777},
+        # Actual and projection
+        "generate_input/store_001_202412": {"sales": {"productNetSales": "$1,200.00"}},
+        "pac-projections/store_001_202412": {"product_net_sales": 1100},
+        # Zero actual falls back to the projection
+        "generate_input/store_001_202312": {"sales": {"productNetSales": 0}},
+        "pac-projections/store_001_202312": {"product_net_sales": 850},
+        # Actual only (202301)
+        "generate_input/store_001_202301": {"sales": {"productNetSales": 800}},
+        "pac-projections/store_001_202501": {"product_net_sales": 5000},
+    }
+    if with_actuals:
+        docs["generate_input/store_001_202501"] = {"sales": {"productNetSales": 1000}}
+    service = make_service(docs, indexed)
+
+    data = await service.get_input_data_async("store_001", "202501")
+    await rebuilds_finished()
+
+    assert [
+        data.last_year_product_sales, data.last_month_product_sales,
+        data.last_month_last_year_product_sales, data.last_year_last_year_product_sales,
+    ] == baseline_history_sales(docs, "store_001", "202501")
+    assert data.last_year_product_sales == Decimal("777")
+    assert service.adb.docs["sales_index/store_001"]["complete"] is True
@@ -0,0 +1,140 @@
+"""
+Tests for the request-scoped document loader
+"""
+import asyncio
+import pytest
+from services.document_loader import DocumentLoader, document_loader, document_loader_scope
+from services.pac_calculation_service import PacCalculationService
+from services.storage import FirestoreStorage
+from tests.test_data_ingestion_service import FakeAsyncFirestore, make_service
+
+
+class FailingFirestore(FakeAsyncFirestore):
+    async def get_all(self, refs):
+        self.reads += 1
+        raise RuntimeError("unavailable")
+        yield
+
+
+@pytest.mark.asyncio
+async def test_loads_in_the_same_tick_share_one_round_trip():
+    db = FakeAsyncFirestore({"generate_input/store_001_202501": {"sales": {}}})
+    loader = DocumentLoader(FirestoreStorage(db))
+
+    found, missing, again = await asyncio.gather(
+        loader.load("generate_input", "store_001_202501"),
+        loader.load("generate_input", "store_001_202502"),
+        loader.load("generate_input", "store_001_202501"),
+    )
+
+    assert (found, missing, again) == ({"sales": {}}, None, {"sales": {}})
+    assert db.reads == 1
+    assert loader.stats() == {"requested": 3, "fetched": 2, "roundTrips": 1}
+
+
+@pytest.mark.asyncio
+async def test_documents_and_misses_are_memoized_until_cleared():
+    db = FakeAsyncFirestore({"pac_actual/store_001_202501": {"v": 1}})
+    loader = DocumentLoader(FirestoreStorage(db))
+
+    await loader.load_many([("pac_actual", "store_001_202501"), ("pac_actual", "store_001_202502")])
+    await loader.load_many([("pac_actual", "store_001_202502"), ("pac_actual", "store_001_202501")])
+    assert db.reads == 1
+
+    db.docs["pac_actual/store_001_202501"] = {"v": 2}
+    loader.clear("pac_actual", "store_001_202501")
+    assert await loader.load("pac_actual", "store_001_202501") == {"v": 2}
+    assert db.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_retried():
+    db = FailingFirestore({})
+    loader = DocumentLoader(FirestoreStorage(db))
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await loader.load("stores", "store_001")
+    assert db.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_scope_is_shared_and_reused():
+    assert document_loader() is not document_loader()
+    with document_loader_scope() as outer:
+        with document_loader_scope() as inner:
+            assert inner is outer
+        assert await asyncio.gather(asyncio.create_task(_current())) == [outer]
+    assert document_loader() is not outer
+
+
+async def _current():
+    return document_loader()
+
+
+@pytest.mark.asyncio
+async def test_scope_keeps_one_loader_per_backend():
+    from services.sqlite_storage import SqliteStorage
+
+    sqlite, db = SqliteStorage(":memory:"), FakeAsyncFirestore({"users/a@b.c": {"role": "Admin"}})
+    with document_loader_scope(sqlite) as loader:
+        firestore_loader = document_loader(FirestoreStorage(db))
+        assert document_loader(sqlite) is loader
+        assert firestore_loader is not loader
+        assert document_loader(FirestoreStorage(db)) is firestore_loader
+        assert await firestore_loader.load("users", "a@b.c") == {"role": "Admin"}
+    sqlite.close()
+
+
+def test_month_lock_routes_read_through_the_request_loader():
+    import routers
+    from datetime import datetime
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.storage import set_storage
+
+    locked = {"store_id": "store_001", "year_month": "202405", "is_locked": True,
+              "locked_by": "gm@example.com", "locked_at": datetime(2024, 6, 3), "lock_history": [{"action": "locked"}]}
+    db = FakeAsyncFirestore({
+        "month_locks/store_001_202405": locked,
+        "month_locks/store_001_202404": {**locked, "year_month": "202404", "is_locked": False},
+        "month_locks/store_002_202405": {**locked, "store_id": "store_002"},
+    })
+    set_storage(FirestoreStorage(db))
+    app.dependency_overrides[routers.require_auth] = lambda: {}
+    try:
+        client = TestClient(app)
+        status = client.get("/api/pac/month-locks/store_001/202405").json()
+        listed = client.get("/api/pac/month-locks/store_001").json()
+        reads = db.reads
+        unlock = {"store_id": "store_001", "month": "May", "year": 2024,
+                  "user_email": "admin@example.com", "user_role": "Admin"}
+        unlocked = client.post("/api/pac/month-locks/unlock", json=unlock)
+    finally:
+        app.dependency_overrides.pop(routers.require_auth, None)
+        set_storage(None)
+
+    assert (status["is_locked"], status["locked_by"]) == (True, "gm@example.com")
+    assert [m["id"] for m in listed["locked_months"]] == ["store_001_202405"]
+    assert reads == 2
+    assert unlocked.status_code == 200 and unlocked.json()["locked_by"] == "gm@example.com"
+    saved = db.docs["month_locks/store_001_202405"]
+    assert saved["is_locked"] is False
+    assert [h["action"] for h in saved["lock_history"]] == ["locked", "unlocked"]
+    assert db.reads == reads + 1 and db.writes == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_calculation_reads_overlapping_history_once():
+    docs = {
+        f"generate_input/store_001_2025{m:02d}": {"sales": {"productNetSales": 1000 * m}}
+        for m in range(1, 13)
+    }
+    ingestion = make_service(docs)
+    service = PacCalculationService(ingestion, None)
+
+    results = await service.calculate_pac_batch_async([("store_001", f"2025{m:02d}") for m in range(1, 13)])
+
+    assert len(results) == 12
+    # All sources, projections and the sales index together
+    assert ingestion.adb.reads == 1
@@ -0,0 +1,117 @@
+"""
+Tests for the bulk generate_input import
+"""
+import pytest
+from services.generate_input_import import (
+    IMPORT_JOBS_COLLECTION,
+    GenerateInputImporter,
+    ImportRowError,
+    iter_export_rows,
+    parse_number,
+    parse_row,
+)
+from services.sales_index_service import SALES_INDEX_COLLECTION
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+
+CSV = """Store ID,Year Month,Product Net Sales,crew_labor,Starting Food,endingFood,Notes
+1,202501,"$10,000.50",25%,1500,1400,first
+store_002,202501,9000,,,,
+3,2025-01,100,,,,bad period
+store_001,202502,(250),,,,negative
+store_004,202501,lots,,,,bad number
+"""
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "pos.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def test_parse_number_accepts_export_formats():
+    assert parse_number("$1,234.50") == 1234.5
+    assert parse_number("12.5%") == 12.5
+    assert parse_number("(100)") == -100.0
+    assert parse_number(" ") is None
+    with pytest.raises(ValueError):
+        parse_number("n/a")
+
+
+def test_parse_row_builds_the_generate_input_shape():
+    doc_id, doc = parse_row(
+        {"store": "Store 7", "Year": "2025", "Month": "March", "sales.productNetSales": "100", "Total Labor": ""},
+        1,
+        "Importer",
+    )
+
+    assert doc_id == "store_007_202503"
+    assert doc == {
+        "storeID": "store_007", "year": 2025, "month": "March", "monthNumber": 3,
+        "submittedBy": "Importer", "sales": {"productNetSales": 100.0},
+    }
+    with pytest.raises(ImportRowError, match="row 4: missing store"):
+        parse_row({"yearMonth": "202501", "cash": "1"}, 4, "Importer")
+
+
+@pytest.mark.asyncio
+async def test_import_writes_batches_then_recomputes_once(storage, export):
+    storage.batch_sync([WriteOp("generate_input", "store_001_202501", {"labor": {"payrollTax": 9}})])
+    progress = []
+
+    job = await GenerateInputImporter(storage, batch_size=2).run(
+        iter_export_rows(export), "pos.csv", source="pos.csv", progress=lambda j: progress.append(j["rowsRead"])
+    )
+
+    assert (job["rowsRead"], job["rowsWritten"], job["rowsInvalid"]) == (5, 3, 2)
+    assert job["errors"] == ["row 3: yearMonth '2025-01' is not YYYYMM", "row 5: productnetsales 'lots' is not a number"]
+    assert progress == [1, 2, 4, 5]
+    assert job["affected"] == {"store_001": ["202501", "202502"], "store_002": ["202501"]}
+    january = await storage.get("generate_input", "store_001_202501")
+    assert january["sales"] == {"productNetSales": 10000.5}
+    assert january["labor"] == {"payrollTax": 9, "crewLabor": 25.0}
+    assert january["inventoryEnding"] == {"food": 1400.0}
+    assert job["status"] == "completed"
+    assert sorted(job["recompute"]["recomputed"]) == ["store_001_202501", "store_001_202502", "store_002_202501"]
+    february = await storage.get("pac_actual", "store_001_202502")
+    assert february["salesComparison"]["lastMonthProductSales"] == 10000.5
+    assert (await storage.get(IMPORT_JOBS_COLLECTION, "pos.csv"))["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_imported_sales_reach_the_index_without_a_recompute(storage, export):
+    await GenerateInputImporter(storage).run(iter_export_rows(export), "job", source="pos.csv", recompute=False)
+
+    assert await storage.get("pac_actual", "store_001_202501") is None
+    index = await storage.get(SALES_INDEX_COLLECTION, "store_001")
+    assert index["months"] == {"202501": 10000.5, "202502": -250.0}
+
+
+@pytest.mark.asyncio
+async def test_interrupted_import_resumes_after_the_last_commit(storage, export):
+    def crashing(rows, after):
+        for number, row in enumerate(rows, start=1):
+            if number > after:
+                raise ConnectionError("lost connection")
+            yield row
+
+    importer = GenerateInputImporter(storage, batch_size=2)
+    with pytest.raises(ConnectionError):
+        await importer.run(crashing(iter_export_rows(export), 3), "job", source="pos.csv")
+    checkpoint = await storage.get(IMPORT_JOBS_COLLECTION, "job")
+    assert (checkpoint["status"], checkpoint["rowsRead"]) == ("importing", 2)
+
+    job = await importer.run(iter_export_rows(export), "job", source="pos.csv")
+
+    assert (job["rowsRead"], job["rowsWritten"], job["rowsInvalid"]) == (5, 3, 2)
+    assert job["status"] == "completed"
+    with pytest.raises(RuntimeError, match="was started from"):
+        await importer.run(iter_export_rows(export), "job", source="other.csv")
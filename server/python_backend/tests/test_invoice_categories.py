@@ -0,0 +1,71 @@
+"""
+Tests for canonical invoice category keys and the invoice_log_totals migration
+"""
+import pytest
+from main_helpers.migrate_invoice_categories import migrate_invoice_totals
+from services.invoice_categories import (
+    CANONICAL_CATEGORIES,
+    CATEGORY_SCHEMA_VERSION,
+    canonical_category,
+    canonicalize_invoice_categories,
+    canonicalize_totals,
+    invoice_totals,
+)
+from services.sqlite_storage import SqliteStorage
+
+
+@pytest.mark.parametrize("spelling, expected", [
+    ("OP. SUPPLY", "OP. SUPPLY"),
+    ("op supply", "OP. SUPPLY"),
+    ("OP_SUPPLY", "OP. SUPPLY"),
+    ("PROMOTION", "PROMO"),
+    ("Maintenance & Repair", "M+R"),
+    ("m+r", "M+R"),
+    ("Non Product", "NONPRODUCT"),
+    ("Small Equipment", "SML EQUIP"),
+    ("NOT A CATEGORY", None),
+])
+def test_canonical_category(spelling, expected):
+    assert canonical_category(spelling) == expected
+
+
+def test_canonical_keys_map_to_themselves():
+    assert [canonical_category(key) for key in CANONICAL_CATEGORIES] == list(CANONICAL_CATEGORIES)
+
+
+def test_canonicalize_totals_prefers_the_canonical_key_and_keeps_unknown_keys():
+    totals = {"PROMOTION": 10, "PROMO": 25, "Op Supply": 5, "MISC": 1}
+    assert canonicalize_totals(totals) == {"PROMO": 25, "OP. SUPPLY": 5, "MISC": 1}
+
+
+def test_marked_documents_are_read_as_is():
+    totals = {"PROMO": 25}
+    marked = {"totals": totals, "categorySchema": CATEGORY_SCHEMA_VERSION}
+    assert invoice_totals(marked) is totals
+    assert invoice_totals({"totals": {"PROMOTION": 25}}) == totals
+    assert invoice_totals(None) == {}
+
+
+def test_invoice_categories_combine_alias_amounts():
+    categories = {"M+R": [100, 50], "Maintenance & Repair": 25, "FOOD": 10}
+    assert canonicalize_invoice_categories(categories) == {"M+R": [100, 50, 25], "FOOD": 10}
+
+
+@pytest.mark.asyncio
+async def test_migration_rewrites_legacy_documents_once():
+    storage = SqliteStorage(":memory:")
+    await storage.set("invoice_log_totals", "store_001_202501", {"totals": {"PROMOTION": 5}, "storeID": "store_001"})
+    await storage.set("invoice_log_totals", "store_001_202502", {"totals": {"PROMO": 7}, "categorySchema": 1})
+    await storage.set("invoice_log_totals", "store_002_202501", {"totals": {"op supply": 3, "FOOD": 1}})
+
+    dry = await migrate_invoice_totals(storage, dry_run=True, page_size=2)
+    first = await migrate_invoice_totals(storage, page_size=2)
+    again = await migrate_invoice_totals(storage, page_size=2)
+
+    assert dry == first == {"scanned": 3, "rewritten": 2}
+    assert again == {"scanned": 3, "rewritten": 0}
+    assert await storage.get("invoice_log_totals", "store_001_202501") == {
+        "totals": {"PROMO": 5}, "storeID": "store_001", "categorySchema": 1,
+    }
+    assert (await storage.get("invoice_log_totals", "store_002_202501"))["totals"] == {"OP. SUPPLY": 3, "FOOD": 1}
+    storage.close()
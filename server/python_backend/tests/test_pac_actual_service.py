@@ -0,0 +1,284 @@
+"""
+Tests for computing and saving pac_actual documents
+"""
+import asyncio
+import pytest
+from services import sales_index_service
+from services.document_loader import DocumentLoader
+from services.invoice_categories import canonical_invoice_totals_doc
+from services.pac_actual_service import InvoiceTotalConflict, PacActualService
+from services.pac_cache import PacResultCache
+from services.recompute_planner import dependent_months
+from services.sales_index_service import SALES_INDEX_COLLECTION, SalesIndexService
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+
+
+def gi(sales):
+    return {"sales": {"productNetSales": sales, "allNetSales": sales}}
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+def service(storage):
+    return PacActualService(storage, result_cache=PacResultCache(max_entries=0))
+
+
+def test_dependent_months_wrap_the_year():
+    assert dependent_months("202406") == ["202506", "202407", "202507", "202606"]
+    assert dependent_months("202412") == ["202512", "202501", "202601", "202612"]
+
+
+@pytest.mark.asyncio
+async def test_compute_saves_the_month_and_cascades_to_existing_dependents(storage):
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", gi(1000)),
+        WriteOp("generate_input", "store_001_202407", gi(1100)),
+        WriteOp("pac_actual", "store_001_202407", {"stale": True}),
+        WriteOp("generate_input", "store_001_202506", gi(1200)),  # no pac_actual yet: not cascaded
+    ])
+
+    result = await service(storage).compute("1", "202406", "Alice")
+
+    assert result["doc_id"] == "store_001_202406"
+    assert result["cascaded_months"] == ["202407"]
+    saved = await storage.get("pac_actual", "store_001_202406")
+    assert saved["lastUpdatedBy"] == "Alice" and saved["month"] == "June"
+    dependent = await storage.get("pac_actual", "store_001_202407")
+    assert dependent["lastUpdatedBy"] == "System (Cascade)"
+    assert dependent["salesComparison"]["lastMonthProductSales"] == 1000.0
+    assert await storage.get("pac_actual", "store_001_202506") is None
+
+
+@pytest.mark.asyncio
+async def test_compute_reads_legacy_invoice_totals_without_rewriting_them(storage):
+    legacy = {"totals": {"PROMOTION": 40, "Op Supply": 5}}
+    canonical_storage = SqliteStorage(":memory:")
+    for target, totals in ((storage, legacy), (canonical_storage, canonical_invoice_totals_doc(legacy))):
+        target.batch_sync([
+            WriteOp("generate_input", "store_001_202406", gi(1000)),
+            WriteOp("invoice_log_totals", "store_001_202406", totals),
+        ])
+
+    await service(storage).compute("store_001", "202406")
+    await service(canonical_storage).compute("store_001", "202406")
+
+    # The client merges into invoice_log_totals; the request path must not overwrite it
+    assert await storage.get("invoice_log_totals", "store_001_202406") == legacy
+    saved = await storage.get("pac_actual", "store_001_202406")
+    expected = await canonical_storage.get("pac_actual", "store_001_202406")
+    assert {k: v for k, v in saved.items() if k not in ("lastUpdatedAt", "sourceData")} == {
+        k: v for k, v in expected.items() if k not in ("lastUpdatedAt", "sourceData")
+    }
+    canonical_storage.close()
+
+
+@pytest.mark.asyncio
+async def test_compute_returns_none_without_generate_input(storage):
+    assert await service(storage).compute("store_001", "202406") is None
+
+
+@pytest.mark.asyncio
+async def test_recompute_many_sees_sales_of_the_same_batch(storage):
+    # A complete index that predates the batch
+    storage.batch_sync([
+        WriteOp(SALES_INDEX_COLLECTION, "store_001", {"months": {}, "complete": True}),
+        WriteOp("generate_input", "store_001_202501", gi(500)),
+        WriteOp("generate_input", "store_001_202502", gi(600)),
+        WriteOp("generate_input", "store_002_202601", gi(700)),
+        WriteOp("generate_input", "store_001_202601", gi(800)),
+        WriteOp("pac_actual", "store_001_202601", {}),
+    ])
+
+    result = await service(storage).recompute_many([
+        ("store_001", "202501"), ("1", "202502"), ("store_001", "202502"), ("store_003", "202501"),
+    ], "Importer")
+
+    assert result == {
+        "recomputed": ["store_001_202501", "store_001_202502"],
+        "unchanged": [],
+        "cascaded": ["store_001_202601"],
+        "missing": ["store_003_202501"],
+    }
+    february = await storage.get("pac_actual", "store_001_202502")
+    assert february["salesComparison"]["lastMonthProductSales"] == 500.0
+    cascaded = await storage.get("pac_actual", "store_001_202601")
+    assert cascaded["salesComparison"]["lastYearProductSales"] == 500.0
+    assert cascaded["salesComparison"]["lastMonthLastYearProductSales"] == 0.0
+    index = await storage.get(SALES_INDEX_COLLECTION, "store_001")
+    assert index["months"] == {"202501": 500.0, "202502": 600.0}
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.asyncio
+async def test_cascade_batch_reads_its_sources_and_comparisons_together(storage, indexed):
+    months = [f"2025{m:02d}" for m in range(1, 13)]
+    storage.batch_sync([WriteOp("generate_input", f"store_001_2024{m:02d}", gi(900)) for m in range(1, 13)] + [
+        op for ym in months
+        for op in (WriteOp("generate_input", f"store_001_{ym}", gi(1000)), WriteOp("pac_actual", f"store_001_{ym}", {}))
+    ])
+    if indexed:
+        await SalesIndexService(storage, DocumentLoader(storage)).rebuild("store_001")
+    loader = DocumentLoader(storage)
+
+    recomputed = await PacActualService(storage, loader, PacResultCache(max_entries=0)).recompute_existing(
+        [("store_001", ym) for ym in months]
+    )
+    await asyncio.gather(*list(sales_index_service._rebuild_tasks.values()))
+
+    assert len(recomputed) == 12
+    # Sources and index together; without an index, one more read for every month's comparisons
+    assert loader.stats()["roundTrips"] == (1 if indexed else 2)
+    june = await storage.get("pac_actual", "store_001_202506")
+    assert (june["salesComparison"]["lastYearProductSales"], june["salesComparison"]["lastMonthProductSales"]) == (
+        900, 1000,
+    )
+
+
+@pytest.mark.asyncio
+async def test_saving_unchanged_inputs_skips_the_write_and_the_cascade(storage):
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", {**gi(1000), "updatedAt": "2024-07-01", "submittedBy": "Alice"}),
+        WriteOp("generate_input", "store_001_202407", gi(1100)),
+        WriteOp("pac_actual", "store_001_202407", {"stale": True}),
+    ])
+    await service(storage).compute("store_001", "202406", "Alice")
+
+    again = await service(storage).compute("store_001", "202406", "Bob")
+
+    assert again["unchanged"] and again["cascaded_months"] == []
+    assert again["data"]["lastUpdatedBy"] == "Alice"
+    assert (await storage.get("pac_actual", "store_001_202406"))["lastUpdatedBy"] == "Alice"
+
+    # A re-save of the same values only refreshes the recorded source timestamps
+    await storage.set("generate_input", "store_001_202406", {"updatedAt": "2024-07-02", "submittedBy": "Bob"}, merge=True)
+    resaved = await service(storage).compute("store_001", "202406", "Bob")
+    assert resaved["unchanged"]
+    saved = await storage.get("pac_actual", "store_001_202406")
+    assert saved["lastUpdatedBy"] == "Alice"
+    assert saved["sourceData"]["generateInputUpdatedAt"] == "2024-07-02"
+
+
+@pytest.mark.asyncio
+async def test_changed_inputs_or_formulas_are_recomputed(storage, monkeypatch):
+    storage.batch_sync([WriteOp("generate_input", "store_001_202406", gi(1000))])
+    await service(storage).compute("store_001", "202406", "Alice")
+
+    await storage.set("generate_input", "store_001_202406", gi(1200), merge=True)
+    changed = await service(storage).compute("store_001", "202406", "Bob")
+    assert not changed["unchanged"] and changed["data"]["lastUpdatedBy"] == "Bob"
+
+    monkeypatch.setattr("services.pac_actual_service.FORMULA_VERSION", "next")
+    assert not (await service(storage).compute("store_001", "202406", "Carol"))["unchanged"]
+
+
+def full_gi(sales):
+    return {
+        "sales": {"productNetSales": sales, "allNetSales": sales},
+        "inventoryStarting": {"opsSupplies": 300}, "inventoryEnding": {"opsSupplies": 250},
+    }
+
+
+@pytest.mark.asyncio
+async def test_invoice_delta_patches_the_month_and_saves_the_new_total(storage):
+    expected_storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", full_gi(1000)),
+        WriteOp("invoice_log_totals", "store_001_202406", {"totals": {"Op Supply": 40, "M+R": 12}}),
+    ])
+    expected_storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", full_gi(1000)),
+        WriteOp("invoice_log_totals", "store_001_202406", {"totals": {"OP. SUPPLY": 65.5, "M+R": 12}}),
+    ])
+    await service(storage).compute("store_001", "202406")
+    await service(expected_storage).compute("store_001", "202406")
+
+    result = await service(storage).apply_invoice_delta("1", "202406", "Op Supply", 40, 65.5, "Bob")
+
+    assert result["doc_id"] == "store_001_202406" and result["updated"]
+    totals = await storage.get("invoice_log_totals", "store_001_202406")
+    assert totals["totals"] == {"OP. SUPPLY": 65.5, "M+R": 12}
+    patched = await storage.get("pac_actual", "store_001_202406")
+    expected = await expected_storage.get("pac_actual", "store_001_202406")
+    assert patched["lastUpdatedBy"] == "Bob" and patched["inputFingerprint"] is None
+    assert patched["nonProductAndSupplies"]["operatingSupplies"]["purchases"] == 65.5
+    for path in result["updated"]:
+        section, *rest = path.split(".")
+        got, want = patched[section], expected[section]
+        for part in rest:
+            got, want = got[part], want[part]
+        assert got == pytest.approx(want), path
+    expected_storage.close()
+
+
+@pytest.mark.asyncio
+async def test_invoice_delta_from_a_stale_total_is_rejected(storage):
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", full_gi(1000)),
+        WriteOp("invoice_log_totals", "store_001_202406", {"totals": {"M+R": 12}}),
+    ])
+    await service(storage).compute("store_001", "202406")
+    before = await storage.get("pac_actual", "store_001_202406")
+
+    with pytest.raises(InvoiceTotalConflict) as conflict:
+        await service(storage).apply_invoice_delta("store_001", "202406", "M+R", 30, 50)
+
+    assert conflict.value.stored_total == 12
+    assert await storage.get("pac_actual", "store_001_202406") == before
+    assert (await storage.get("invoice_log_totals", "store_001_202406"))["totals"] == {"M+R": 12}
+    assert await service(storage).apply_invoice_delta("store_001", "202407", "M+R", 0, 5) is None
+
+
+def test_delta_endpoint_runs_on_sqlite(storage):
+    import asyncio
+    import routers
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.storage import set_storage
+
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", full_gi(1000)),
+        WriteOp("invoice_log_totals", "store_001_202406", {"totals": {"M+R": 12}}),
+    ])
+    asyncio.run(service(storage).compute("store_001", "202406"))
+    body = {"store_id": "store_001", "year_month": "202406", "category": "M+R", "old_total": 12, "new_total": 20}
+
+    set_storage(storage)
+    app.dependency_overrides[routers.require_auth] = lambda: {}
+    try:
+        client = TestClient(app)
+        applied = client.post("/api/pac/actual/delta", json=body)
+        stale = client.post("/api/pac/actual/delta", json=body)
+        missing = client.post("/api/pac/actual/delta", json={**body, "year_month": "202407"})
+    finally:
+        app.dependency_overrides.pop(routers.require_auth, None)
+        set_storage(None)
+
+    assert applied.status_code == 200 and applied.json()["updated"]
+    assert stale.status_code == 409
+    assert missing.status_code == 404
+
+
+def test_unavailable_storage_is_named_in_the_503(storage, monkeypatch):
+    import routers
+    from fastapi.testclient import TestClient
+    from main import app
+    from services.storage import set_storage
+
+    monkeypatch.setattr(storage, "is_available", lambda: False)
+    body = {"store_id": "store_001", "year_month": "202406", "category": "M+R", "old_total": 12, "new_total": 20}
+    set_storage(storage)
+    app.dependency_overrides[routers.require_auth] = lambda: {}
+    try:
+        response = TestClient(app).post("/api/pac/actual/delta", json=body)
+    finally:
+        app.dependency_overrides.pop(routers.require_auth, None)
+        set_storage(None)
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "sqlite storage not available"
@@ -0,0 +1,89 @@
+"""
+Tests for consolidated multi-store PAC aggregation
+"""
+import pytest
+from services.pac_aggregation_service import (
+    UNASSIGNED_ENTITY, PacAggregationService, consolidate_pac_actual, group_stores_by_entity,
+)
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp, set_storage
+from tests.test_pac_actual_service import gi
+from tests.test_pac_rollup_service import make_doc
+
+
+def test_group_stores_by_entity_normalizes_ids():
+    stores = [
+        {"id": "store_002", "entity": "North LLC"},
+        {"id": "store_001", "entity": "North LLC"},
+        {"id": "store_010", "entity": " "},
+        {"storeID": "7", "entity": "South LLC"},
+        {"entity": "South LLC"},
+    ]
+    assert group_stores_by_entity(stores) == {
+        "North LLC": ["store_001", "store_002"],
+        "South LLC": ["store_007"],
+        UNASSIGNED_ENTITY: ["store_010"],
+    }
+
+
+def test_consolidation_sums_dollars_and_recomputes_percent_from_sales():
+    result = consolidate_pac_actual({
+        "store_001": make_doc(100000, 20),
+        "store_002": make_doc(300000, 10),
+        "store_003": None,
+    })
+
+    assert result["stores"] == ["store_001", "store_002"]
+    assert result["missingStores"] == ["store_003"]
+    assert [row["productSales"] for row in result["byStore"]] == [100000, 300000]
+
+    consolidated = result["consolidated"]
+    assert consolidated["sales"]["productSales"]["dollars"] == 400000
+    assert consolidated["labor"]["crewLabor"]["dollars"] == pytest.approx(50000)
+    assert consolidated["labor"]["crewLabor"]["percent"] == pytest.approx(12.5)
+    assert consolidated["totals"]["pac"]["percent"] == pytest.approx(
+        100 - consolidated["totals"]["totalControllable"]["percent"]
+    )
+
+
+def test_consolidation_without_data_is_zero():
+    result = consolidate_pac_actual({"store_001": None})
+    assert result["stores"] == []
+    assert result["consolidated"]["totals"]["pac"]["dollars"] == 0
+
+
+class FakeStoreService:
+    def __init__(self, stores):
+        self.stores = stores
+        self.fetches = 0
+
+    async def fetch_active_stores(self):
+        self.fetches += 1
+        return self.stores
+
+
+@pytest.mark.asyncio
+async def test_entities_come_from_the_active_stores():
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202501", gi(1000)),
+        WriteOp("generate_input", "store_002_202501", gi(3000)),
+        WriteOp("generate_input", "store_003_202501", gi(5000)),  # deleted store: not in the stores collection
+    ])
+    set_storage(storage)
+    stores = FakeStoreService([
+        {"id": "store_001", "entity": "North LLC"},
+        {"id": "store_002", "entity": "North LLC"},
+    ])
+    service = PacAggregationService.__new__(PacAggregationService)
+    service.db, service._store_service = object(), stores
+    try:
+        result = await service.aggregate_entities("202501")
+    finally:
+        set_storage(None)
+        storage.close()
+
+    assert stores.fetches == 1
+    [north] = result["entities"]
+    assert (north["entity"], north["stores"]) == ("North LLC", ["store_001", "store_002"])
+    assert north["consolidated"]["sales"]["productSales"]["dollars"] == 4000
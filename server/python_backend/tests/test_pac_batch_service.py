@@ -0,0 +1,131 @@
+"""
+Tests for the vectorized PAC batch engine
+Batch results must match the scalar PacCalculationService path to the cent
+"""
+import pytest
+from decimal import Decimal, ROUND_HALF_UP
+from services.pac_calculation_service import PacCalculationService
+from services.pac_batch_service import calculate_pac_batch, EXPENSE_LINES
+from services.account_mapping_service import AccountMappingService
+from models import PacInputData, InventoryData, PurchaseData
+from benchmarks.corpus import generate_corpus
+
+
+CENT = Decimal("0.01")
+BASIS_POINT = Decimal("0.0001")
+
+
+def make_input(scale: int) -> PacInputData:
+    """Build a realistic input whose values vary with scale"""
+    s = Decimal(scale)
+    return PacInputData(
+        product_net_sales=Decimal("98765.43") + s * Decimal("1234.57"),
+        cash_adjustments=Decimal("-123.45") + s,
+        promotions=Decimal("2150.10") + s * 3,
+        manager_meals=Decimal("310.77") + s,
+        last_year_product_sales=Decimal("91000") + s,
+        crew_labor_percent=Decimal("24.7") + s / 10,
+        total_labor_percent=Decimal("33.9") + s / 10,
+        payroll_tax_rate=Decimal("8.15"),
+        additional_labor_dollars=Decimal("415.25") + s,
+        complete_waste_percent=Decimal("2.35"),
+        raw_waste_percent=Decimal("1.65") + s / 100,
+        condiment_percent=Decimal("3.05"),
+        advertising_percent=Decimal("4.0"),
+        dues_and_subscriptions=Decimal("89.99"),
+        beginning_inventory=InventoryData(
+            food=Decimal("15342.18"), condiment=Decimal("2011.40"), paper=Decimal("3120.55"),
+            non_product=Decimal("1004.10"), op_supplies=Decimal("512.33"),
+        ),
+        ending_inventory=InventoryData(
+            food=Decimal("12876.90") + s, condiment=Decimal("1830.25"), paper=Decimal("2499.99"),
+            non_product=Decimal("811.11"), op_supplies=Decimal("480.00"),
+        ),
+        purchases=PurchaseData(
+            food=Decimal("45321.87") + s * 7, condiment=Decimal("3010.20"), paper=Decimal("2048.64"),
+            non_product=Decimal("1523.45"), travel=Decimal("812.34"), advertising_other=Decimal("1200.01"),
+            outside_services=Decimal("640.50"), linen=Decimal("401.20"), operating_supply=Decimal("305.75"),
+            maintenance_repair=Decimal("533.33") + s, small_equipment=Decimal("210.00"),
+            utilities=Decimal("1288.42"), office=Decimal("151.15"), training=Decimal("300.30"),
+            crew_relations=Decimal("202.02"),
+        ),
+    )
+
+
+@pytest.fixture
+def pac_service():
+    return PacCalculationService(None, AccountMappingService())
+
+
+def assert_cents(batch_value: Decimal, scalar_value: Decimal, places: Decimal = CENT):
+    assert batch_value == scalar_value.quantize(places, ROUND_HALF_UP)
+
+
+def test_batch_matches_scalar_path_to_the_cent(pac_service):
+    inputs = [make_input(i) for i in range(25)]
+    batch = pac_service.calculate_pac_batch(inputs)
+
+    assert len(batch) == len(inputs)
+    for input_data, result in zip(inputs, batch):
+        expected = pac_service.calculate_pac_from_input(input_data)
+        assert_cents(result.all_net_sales, expected.all_net_sales)
+        assert_cents(result.amount_used.food, expected.amount_used.food)
+        assert_cents(result.amount_used.op_supplies, expected.amount_used.op_supplies)
+        for name in EXPENSE_LINES:
+            got = getattr(result.controllable_expenses, name)
+            want = getattr(expected.controllable_expenses, name)
+            assert_cents(got.dollars, want.dollars)
+            assert_cents(got.percent, want.percent, BASIS_POINT)
+        assert_cents(result.total_controllable_dollars, expected.total_controllable_dollars)
+        assert_cents(result.pac_dollars, expected.pac_dollars)
+        assert_cents(result.pac_percent, expected.pac_percent, BASIS_POINT)
+        assert result.sales_comparison.lastYearProductSales == expected.sales_comparison.lastYearProductSales
+
+
+def test_batch_rounds_half_cent_ties_like_the_scalar_path(pac_service):
+    # Synthetic store-months hit values whose nearest float sits just below a half cent
+    inputs = [month.input_data for month in generate_corpus(400, seed=3)]
+    batch = pac_service.calculate_pac_batch(inputs)
+
+    for input_data, result in zip(inputs, batch):
+        expected = pac_service.calculate_pac_from_input(input_data)
+        for field in ("food", "paper", "condiment", "non_product", "op_supplies"):
+            assert_cents(getattr(result.amount_used, field), getattr(expected.amount_used, field))
+        for name in EXPENSE_LINES:
+            got = getattr(result.controllable_expenses, name)
+            want = getattr(expected.controllable_expenses, name)
+            assert_cents(got.dollars, want.dollars)
+            assert_cents(got.percent, want.percent, BASIS_POINT)
+        assert_cents(result.total_controllable_dollars, expected.total_controllable_dollars)
+        assert_cents(result.total_controllable_percent, expected.total_controllable_percent, BASIS_POINT)
+        assert_cents(result.pac_dollars, expected.pac_dollars)
+        assert_cents(result.pac_percent, expected.pac_percent, BASIS_POINT)
+
+
+def test_batch_rounds_once_from_the_exact_value(pac_service):
+    # Just below a half cent: rounding a 12-digit copy first would carry it up to .91
+    travel = Decimal("12345678.904999999")
+    input_data = make_input(1).model_copy(
+        update={"purchases": make_input(1).purchases.model_copy(update={"travel": travel})}
+    )
+    result, = calculate_pac_batch([input_data])
+    expected = pac_service.calculate_pac_from_input(input_data)
+
+    assert result.controllable_expenses.travel.dollars == Decimal("12345678.90")
+    assert_cents(result.total_controllable_dollars, expected.total_controllable_dollars)
+    assert_cents(result.pac_percent, expected.pac_percent, BASIS_POINT)
+
+
+def test_batch_zero_sales_rows_match_scalar_zeroed_result(pac_service):
+    empty = make_input(0).model_copy(update={"product_net_sales": Decimal("0")})
+    result, = calculate_pac_batch([empty])
+    expected = pac_service.calculate_pac_from_input(empty)
+
+    assert result.pac_dollars == expected.pac_dollars == Decimal("0")
+    assert result.controllable_expenses.base_food.dollars == Decimal("0")
+    assert result.sales_comparison is None
+    assert_cents(result.all_net_sales, expected.all_net_sales)
+
+
+def test_batch_empty_input_returns_empty_list():
+    assert calculate_pac_batch([]) == []
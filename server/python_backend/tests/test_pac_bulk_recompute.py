@@ -0,0 +1,146 @@
+"""
+Tests for the bulk pac_actual recompute
+"""
+import asyncio
+import pytest
+from services import pac_bulk_recompute
+from services.pac_bulk_recompute import BulkRecompute
+from services.pac_actual_service import PacActualService
+from services.pac_cache import PacResultCache
+from services.recompute_queue import RECOMPUTE_JOBS_COLLECTION, RecomputeQueue
+from services.sales_index_service import SALES_INDEX_COLLECTION
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+from tests.test_pac_actual_service import gi
+from tests.test_pac_cache import FakeClock
+
+MONTHS = ["202406", "202407", "202506", "202507"]
+
+
+def seeded_storage():
+    storage = SqliteStorage(":memory:")
+    ops = [WriteOp("invoice_log_totals", "store_001_202407", {"totals": {"PROMOTION": 40, "Op Supply": 5}})]
+    for store_id in ("store_001", "store_002"):
+        for i, ym in enumerate(MONTHS):
+            ops.append(WriteOp("generate_input", f"{store_id}_{ym}", gi(1000 + 100 * i)))
+    ops.append(WriteOp("generate_input", "store_001_202508", gi(5000)))
+    storage.batch_sync(ops)
+    return storage
+
+
+def comparable(doc):
+    return {key: value for key, value in doc.items() if key not in ("lastUpdatedAt", "lastUpdatedBy", "sourceData")}
+
+
+@pytest.mark.asyncio
+async def test_bulk_recompute_matches_computing_each_month():
+    storage, expected_storage = seeded_storage(), seeded_storage()
+    clock = FakeClock()
+    bulk = BulkRecompute(storage, workers=0, page_size=3, clock=clock)
+    job = BulkRecompute.new_job(["1", "store_002"], "202406", "202507")
+    pages = []
+
+    def progress(job):
+        clock.now += 1
+        pages.append(job["monthsWritten"])
+
+    finished = await bulk.run(job, progress=progress)
+
+    assert finished["status"] == "completed"
+    assert (finished["monthsRead"], finished["monthsWritten"], finished["pages"]) == (8, 8, 4)
+    # Read canonically, left for migrate_invoice_categories to rewrite
+    assert await storage.get("invoice_log_totals", "store_001_202407") == {"totals": {"PROMOTION": 40, "Op Supply": 5}}
+    assert pages == [3, 4, 7, 8]  # one id range per store, paged
+    assert (finished["elapsedSeconds"], finished["monthsPerSecond"]) == (4, 2.0)
+    assert await storage.get("pac_actual", "store_001_202508") is None  # outside the range
+
+    service = PacActualService(expected_storage, result_cache=PacResultCache(max_entries=0))
+    await service.recompute_many([(s, ym) for s in ("store_001", "store_002") for ym in MONTHS], cascade=False)
+    for store_id in ("store_001", "store_002"):
+        for ym in MONTHS:
+            doc_id = f"{store_id}_{ym}"
+            assert comparable(await storage.get("pac_actual", doc_id)) == comparable(
+                await expected_storage.get("pac_actual", doc_id)
+            )
+    saved = await storage.get(RECOMPUTE_JOBS_COLLECTION, job["jobId"])
+    assert (saved["status"], saved["monthsWritten"]) == ("completed", 8)
+    storage.close()
+    expected_storage.close()
+
+
+@pytest.mark.asyncio
+async def test_process_pool_gives_the_same_documents():
+    in_thread, pooled = seeded_storage(), seeded_storage()
+
+    await BulkRecompute(in_thread, workers=0).run(BulkRecompute.new_job())
+    job = await BulkRecompute(pooled, workers=2).run(BulkRecompute.new_job())
+
+    assert (job["status"], job["monthsWritten"]) == ("completed", 9)
+    for doc_id, doc in await in_thread.scan("pac_actual"):
+        assert comparable(await pooled.get("pac_actual", doc_id)) == comparable(doc)
+    in_thread.close()
+    pooled.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_months_are_reported_and_the_rest_written(monkeypatch):
+    storage = seeded_storage()
+    calculate = pac_bulk_recompute.calculate_pac_actual
+
+    def flaky(generate_input, *sources):
+        if generate_input["sales"]["productNetSales"] == 5000:
+            raise ValueError("bad input")
+        return calculate(generate_input, *sources)
+
+    monkeypatch.setattr(pac_bulk_recompute, "calculate_pac_actual", flaky)
+    job = await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"]))
+
+    assert (job["status"], job["monthsWritten"], job["monthsFailed"]) == ("completed", 4, 1)
+    assert job["errors"] == ["store_001_202508: bad input"]
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_started_job_runs_in_the_background_and_reports_status():
+    storage = seeded_storage()
+    bulk = BulkRecompute(storage, workers=0)
+
+    job = await bulk.start(BulkRecompute.new_job(["store_002"]))
+    queue = RecomputeQueue(storage)
+    assert (await queue.status(job["jobId"]))["status"] == "queued"
+    await asyncio.gather(*pac_bulk_recompute._bulk_tasks)
+
+    status = await queue.status(job["jobId"])
+    assert (status["kind"], status["status"], status["monthsWritten"]) == ("bulk", "completed", 4)
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_rerun_skips_current_months_unless_forced():
+    storage = seeded_storage()
+    await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"]))
+
+    rerun = await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"]))
+    forced = await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"], force=True))
+
+    assert (rerun["monthsWritten"], rerun["monthsUnchanged"]) == (0, 5)
+    assert (forced["monthsWritten"], forced["monthsUnchanged"]) == (5, 0)
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_pages_are_recorded_in_the_sales_index():
+    storage = seeded_storage()
+    await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"]))
+    # Saved by the web client without /actual/compute: the index still has the old sales
+    await storage.set("generate_input", "store_001_202406", gi(4000))
+    await storage.set("generate_input", "store_001_202506", gi(4100))
+
+    job = await BulkRecompute(storage, workers=0).run(BulkRecompute.new_job(["store_001"]))
+
+    assert job["monthsWritten"] == 4  # the two saved months and the two that compare against them
+    june = await storage.get("pac_actual", "store_001_202506")
+    assert june["salesComparison"]["lastYearProductSales"] == 4000
+    index = await storage.get(SALES_INDEX_COLLECTION, "store_001")
+    assert (index["months"]["202406"], index["months"]["202506"]) == (4000.0, 4100.0)
+    storage.close()
@@ -0,0 +1,84 @@
+"""
+Tests for the content-addressed PAC result cache
+"""
+import pytest
+from services.pac_cache import PacResultCache, source_fingerprint
+from services.pac_actual_service import PacActualService
+from services.sqlite_storage import SqliteStorage
+from tests.test_pac_actual_service import gi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fingerprint_ignores_key_order_and_detects_changes():
+    a = {"sales": {"productNetSales": 100, "promo": 5}, "updatedAt": "2025-01-01"}
+    b = {"updatedAt": "2025-01-01", "sales": {"promo": 5, "productNetSales": 100}}
+
+    assert source_fingerprint(a, {}) == source_fingerprint(b, {})
+    assert source_fingerprint(a, {}) != source_fingerprint(a, {"totals": {"M+R": 1}})
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = PacResultCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", 1, "store_001", "202501")
+    cache.put("b", 2, "store_001", "202502")
+    assert cache.get("a") == 1  # a is now most recently used
+    cache.put("c", 3, "store_001", "202503")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 1, 1, 2)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PacResultCache(max_entries=10, ttl_seconds=60, clock=clock)
+    cache.put("a", 1, "store_001", "202501")
+
+    clock.now = 59
+    assert cache.get("a") == 1
+    clock.now = 61
+    assert cache.get("a") is None
+
+
+def test_invalidate_store_month_and_whole_store():
+    cache = PacResultCache(max_entries=10, ttl_seconds=0)
+    cache.put("a", 1, "store_001", "202501")
+    cache.put("b", 2, "store_001", "202502")
+    cache.put("c", 3, "store_002", "202501")
+
+    assert cache.invalidate("store_001", "202501") == 1
+    assert cache.get("b") == 2
+    assert cache.invalidate("store_001") == 1
+    assert cache.get("c") == 3
+
+
+def test_disabled_cache_stores_nothing():
+    cache = PacResultCache(max_entries=0)
+    assert cache.get_or_compute("a", "store_001", "202501", lambda: 1) == 1
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_pac_actual_reuses_results_by_input_fingerprint():
+    cache = PacResultCache(max_entries=10, ttl_seconds=0)
+    first, second = SqliteStorage(":memory:"), SqliteStorage(":memory:")
+    for storage in (first, second):
+        await storage.set("generate_input", "store_001_202501", gi(1000))
+
+    computed = await PacActualService(first, result_cache=cache).compute("store_001", "202501")
+    reused = await PacActualService(second, result_cache=cache).compute("store_001", "202501")
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get(("actual", computed["data"]["inputFingerprint"])) is not None
+    assert reused["data"]["inputFingerprint"] == computed["data"]["inputFingerprint"]
+    assert reused["data"]["totals"] == computed["data"]["totals"]
+    first.close()
+    second.close()
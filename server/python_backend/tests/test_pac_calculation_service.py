@@ -7,6 +7,7 @@ from decimal import Decimal
 from services.pac_calculation_service import (
     PacCalculationService,
     calculate_pac_actual,
+    calculate_pac_actual_delta,
     normalize_store_id
 )
 from services.data_ingestion_service import DataIngestionService
@@ -218,7 +219,7 @@ def sample_invoice_log_totals():
             "CONDIMENT": 3000,
             "TRAVEL": 800,
             "ADV-OTHER": 1200,
-            "PROMOTION": 0,
+            "PROMO": 0,
             "ADVERTISING": 0,
             "OUTSIDE SVC": 600,
             "LINEN": 400,
@@ -325,6 +326,22 @@ def test_calculate_controllable_expenses_base_food_is_correct(pac_service, test_
     assert abs(expenses.base_food.percent - expected_percent) < Decimal('0.01')
 
 
+def test_calculate_controllable_expenses_uses_the_given_amount_used(pac_service, test_input_data):
+    """Test base food and paper come from the amount used passed in"""
+    # Arrange
+    amount_used = pac_service.calculate_amount_used(test_input_data).model_copy(
+        update={"food": Decimal('40000'), "paper": Decimal('2500')}
+    )
+    S = test_input_data.product_net_sales
+
+    # Act
+    expenses = pac_service.calculate_controllable_expenses(test_input_data, amount_used, S)
+
+    # Assert
+    assert (expenses.base_food.dollars, expenses.base_food.percent) == (Decimal('40000'), Decimal('40'))
+    assert (expenses.paper.dollars, expenses.paper.percent) == (Decimal('2500'), Decimal('2.5'))
+
+
 def test_calculate_controllable_expenses_employee_meal_is_correct(pac_service, test_input_data):
     """Test employee meal calculation is correct"""
     # Arrange
@@ -721,7 +738,7 @@ def test_calculate_pac_actual_cash_plus_minus_sign_flip(sample_generate_input, s
 def test_calculate_pac_actual_promotion_combines_sources(sample_generate_input, sample_invoice_log_totals):
     """Test calculate_pac_actual promotion combines generate input and invoices"""
     # Arrange - add promotion to invoice totals
-    sample_invoice_log_totals["totals"]["PROMOTION"] = 500
+    sample_invoice_log_totals["totals"]["PROMO"] = 500
     
     # Act
     result = calculate_pac_actual(sample_generate_input, sample_invoice_log_totals)
@@ -748,6 +765,22 @@ def test_calculate_pac_actual_advertising_combines_sources(sample_generate_input
     assert abs(result["purchases"]["advertising"]["dollars"] - expected_advertising) < 0.01
 
 
+def test_calculate_pac_actual_reads_legacy_category_spellings(sample_generate_input, sample_invoice_log_totals):
+    """Unmarked documents with alias keys give the same result as canonical ones"""
+    # Arrange
+    canonical = {"totals": {**sample_invoice_log_totals["totals"], "PROMO": 500}, "categorySchema": 1}
+    legacy_totals = dict(canonical["totals"])
+    legacy_totals["PROMOTION"] = legacy_totals.pop("PROMO")
+    legacy_totals["Maintenance & Repair"] = legacy_totals.pop("M+R")
+    legacy_totals["op supply"] = legacy_totals.pop("OP. SUPPLY")
+
+    # Act
+    result = calculate_pac_actual(sample_generate_input, {"totals": legacy_totals})
+
+    # Assert
+    assert result == calculate_pac_actual(sample_generate_input, canonical)
+
+
 def test_calculate_pac_actual_totals_calculation(sample_generate_input, sample_invoice_log_totals):
     """Test calculate_pac_actual totals calculation"""
     # Act
@@ -854,7 +887,7 @@ def sample_invoice_log_totals_with_non_product():
             "CONDIMENT": 3000,
             "TRAVEL": 800,
             "ADV-OTHER": 1200,
-            "PROMOTION": 0,
+            "PROMO": 0,
             "ADVERTISING": 0,
             "OUTSIDE SVC": 600,
             "LINEN": 400,
@@ -1206,4 +1239,76 @@ def test_pac_result_sales_comparison_populated(pac_service, test_input_data_with
     assert result.sales_comparison.lastYearProductSales == Decimal('95000')
     assert result.sales_comparison.lastMonthProductSales == Decimal('98000')
     assert result.sales_comparison.lastMonthLastYearProductSales == Decimal('92000')
-    assert result.sales_comparison.lastYearLastYearProductSales == Decimal('90000')
\ No newline at end of file
+    assert result.sales_comparison.lastYearLastYearProductSales == Decimal('90000')
+
+
+# ============================================================================
+# Tests for Incremental PAC Actual Deltas
+# ============================================================================
+
+def _flatten(doc, prefix=""):
+    flat = {}
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+@pytest.mark.parametrize("category", ["M+R", "FOOD", "CONDIMENT", "OP. SUPPLY", "ADVERTISING"])
+def test_calculate_pac_actual_delta_matches_full_recompute(sample_generate_input, sample_invoice_log_totals, category):
+    """Applying the delta to the old document gives the fully recomputed document"""
+    # Arrange
+    old_totals = sample_invoice_log_totals
+    new_totals = {"totals": {**old_totals["totals"], category: old_totals["totals"][category] + 250.75}}
+    before = calculate_pac_actual(sample_generate_input, old_totals)
+    after = calculate_pac_actual(sample_generate_input, new_totals)
+
+    # Act
+    updates = calculate_pac_actual_delta(
+        before, category, old_totals["totals"][category], new_totals["totals"][category]
+    )
+
+    # Assert
+    patched = _flatten(before)
+    for path, amount in updates.items():
+        patched[path] += amount
+    expected = _flatten(after)
+    for path, value in expected.items():
+        assert abs(patched[path] - value) < 1e-6, path
+    changed = {path for path, value in expected.items() if value != _flatten(before)[path]}
+    assert set(updates) == changed
+
+
+def test_calculate_pac_actual_delta_touches_only_affected_fields(sample_generate_input, sample_invoice_log_totals):
+    """An M+R change only moves its own line, the purchases and controllable totals and PAC"""
+    # Act
+    before = calculate_pac_actual(sample_generate_input, sample_invoice_log_totals)
+    updates = calculate_pac_actual_delta(before, "M+R", 500, 600)
+
+    # Assert
+    assert updates["purchases.maintenanceRepair.dollars"] == 100
+    assert updates["totals.pac.dollars"] == -100
+    assert abs(updates["totals.pac.percent"] - -0.1) < 1e-12
+    assert set(updates) == {
+        "purchases.maintenanceRepair.dollars", "purchases.maintenanceRepair.percent",
+        "purchases.total.dollars", "purchases.total.percent",
+        "totals.totalControllable.dollars", "totals.totalControllable.percent",
+        "totals.pac.dollars", "totals.pac.percent",
+    }
+
+
+def test_calculate_pac_actual_delta_ignores_unknown_or_unchanged_category(sample_generate_input, sample_invoice_log_totals):
+    """Unknown categories and zero changes produce no updates"""
+    before = calculate_pac_actual(sample_generate_input, sample_invoice_log_totals)
+    assert calculate_pac_actual_delta(before, "NOT A CATEGORY", 0, 100) == {}
+    assert calculate_pac_actual_delta(before, "M+R", 500, 500) == {}
+
+
+def test_calculate_pac_actual_delta_accepts_category_aliases(sample_generate_input, sample_invoice_log_totals):
+    """Alias spellings of a category update the same fields"""
+    before = calculate_pac_actual(sample_generate_input, sample_invoice_log_totals)
+    assert calculate_pac_actual_delta(before, "Maintenance & Repair", 500, 600) == calculate_pac_actual_delta(
+        before, "M+R", 500, 600
+    )
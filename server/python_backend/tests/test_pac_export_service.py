@@ -0,0 +1,135 @@
+"""
+Tests for the columnar pac_actual / pac-projections export
+"""
+import csv
+import io
+import pytest
+from fastapi.testclient import TestClient
+from services.pac_calculation_service import calculate_pac_actual
+from services.pac_export_service import (
+    PAC_ACTUAL_COLUMNS,
+    PROJECTION_COLUMNS,
+    export_collection,
+    iter_export_pages,
+    stream_export,
+)
+from services.sqlite_storage import SqliteStorage
+from services.storage import FirestoreStorage, WriteOp, set_storage
+from tests.test_data_ingestion_service import FakeAsyncFirestore
+
+GENERATE_INPUT = {"sales": {"productNetSales": 1000, "allNetSales": 1100}, "labor": {"crewLabor": 20}}
+
+
+def pac_actual(by="tester"):
+    return {**calculate_pac_actual(GENERATE_INPUT, {"totals": {"FOOD": 300}}), "lastUpdatedBy": by}
+
+
+DOCS = {
+    f"pac_actual/{store}_{ym}": pac_actual()
+    for store in ("store_001", "store_002", "store_011")
+    for ym in ("202412", "202501", "202502")
+}
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([WriteOp(*path.split("/"), data) for path, data in DOCS.items()])
+    storage.batch_sync([WriteOp("pac_actual", "not-a-period-id", {})])
+    yield storage
+    storage.close()
+
+
+def read_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+@pytest.mark.asyncio
+async def test_csv_export_flattens_typed_columns_and_filters(storage):
+    out = io.StringIO()
+
+    count = await export_collection(
+        storage, "pac_actual", "csv", out, store_ids=["1", "11"], from_ym="202501", to_ym="202502", page_size=2
+    )
+
+    rows = read_csv(out.getvalue())
+    assert count == 4
+    assert [(r["storeId"], r["yearMonth"]) for r in rows] == [
+        ("store_001", "202501"), ("store_001", "202502"), ("store_011", "202501"), ("store_011", "202502"),
+    ]
+    assert list(rows[0]) == [column.name for column in PAC_ACTUAL_COLUMNS]
+    assert float(rows[0]["sales.productSales.dollars"]) == 1000.0
+    assert rows[0]["month"] == "1" and rows[0]["lastUpdatedBy"] == "tester"
+    assert rows[0]["salesComparison.lastYearProductSales"] == ""  # missing, not zero
+
+
+@pytest.mark.asyncio
+async def test_firestore_pages_follow_the_document_cursor():
+    db = FakeAsyncFirestore(dict(DOCS))
+    pages = [
+        [(row[0], row[1]) for row in page]
+        async for page in iter_export_pages(FirestoreStorage(db), "pac_actual", from_ym="202501", page_size=4)
+    ]
+
+    assert sum(pages, []) == [
+        (store, ym) for store in ("store_001", "store_002", "store_011") for ym in ("202501", "202502")
+    ]
+    assert db.reads == 3  # 9 documents in pages of 4
+
+
+@pytest.mark.asyncio
+async def test_stream_export_matches_the_file_export(storage):
+    out = io.StringIO()
+    await export_collection(storage, "pac_actual", "csv", out, page_size=3)
+
+    chunks = [chunk async for chunk in await stream_export(storage, "pac_actual", "csv", page_size=3)]
+
+    assert len(chunks) == 4  # one per page of 3 (10 documents); CSV has no footer
+    assert b"".join(chunks).decode() == out.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_projection_rows_become_columns(storage):
+    await storage.set("pac-projections", "store_001_202501", {
+        "pacGoal": 15, "rows": [{"name": "Product Sales", "projectedDollar": 900, "projectedPercent": 100}],
+    })
+    out = io.StringIO()
+
+    await export_collection(storage, "pac-projections", "csv", out)
+
+    (row,) = read_csv(out.getvalue())
+    assert list(row) == [column.name for column in PROJECTION_COLUMNS]
+    assert (row["pacGoal"], row["Product Sales.dollars"], row["Crew Labor.dollars"]) == ("15.0", "900.0", "")
+
+
+@pytest.mark.asyncio
+async def test_parquet_export_writes_one_row_group_per_page(storage, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "pac.parquet"
+    with open(path, "wb") as out:
+        await export_collection(storage, "pac_actual", "parquet", out, page_size=4)
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_rows == 9
+    assert parquet.metadata.num_row_groups == 3
+    assert str(parquet.schema_arrow.field("sales.productSales.dollars").type) == "double"
+
+
+def test_export_endpoint_streams_csv(storage):
+    import routers
+    from main import app
+
+    set_storage(storage)
+    app.dependency_overrides[routers.require_auth] = lambda: {}
+    try:
+        client = TestClient(app)
+        response = client.get("/api/pac/export/actual", params={"stores": "store_002", "to": "202412"})
+        bad = client.get("/api/pac/export/actual", params={"format": "xml"})
+    finally:
+        app.dependency_overrides.pop(routers.require_auth, None)
+        set_storage(None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert [(r["storeId"], r["yearMonth"]) for r in read_csv(response.text)] == [("store_002", "202412")]
+    assert bad.status_code == 400
@@ -0,0 +1,98 @@
+"""
+Tests for the declarative PAC formula graph
+"""
+import pytest
+from decimal import Decimal
+from services.pac_formulas import (
+    FormulaGraph, FormulaGraphError, Node, Line,
+    SHARED_NODES, PAC_INPUT_GRAPH, PAC_ACTUAL_GRAPH,
+)
+
+
+def pct_of(sales):
+    return lambda value: (value / sales) * 100
+
+
+def test_nodes_are_ordered_after_their_dependencies():
+    graph = FormulaGraph("t", [
+        Node("c", "a + b"),
+        Node("a", "x * 2"),
+        Node("b", "a + y"),
+    ], [Line("c", "c")])
+
+    assert graph.node_names == ("a", "b", "c")
+    assert set(graph.inputs) == {"x", "y"}
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(FormulaGraphError, match="cycle"):
+        FormulaGraph("t", [Node("a", "b + 1"), Node("b", "a + 1")], [])
+
+
+def test_only_pct_calls_are_allowed():
+    with pytest.raises(FormulaGraphError):
+        FormulaGraph("t", [Node("a", "abs(x)")], [])
+    with pytest.raises(FormulaGraphError):
+        FormulaGraph("t", [Node("a", "x if y else z")], [])
+
+
+def test_float_literals_use_backend_number_type():
+    graph = FormulaGraph("t", [Node("meal", "manager_meals * 0.30")], [Line("meal", "meal")])
+    values, lines = graph.evaluate({"manager_meals": Decimal("310.77")}, pct_of(Decimal("1000")), Decimal)
+
+    assert values["meal"] == Decimal("93.2310")
+    assert lines["meal"] == (Decimal("93.2310"), Decimal("9.323100"))
+
+
+def test_line_percent_defaults_to_pct_of_dollars():
+    graph = FormulaGraph("t", [], [Line("a", "x"), Line("b", "x", "rate")])
+    _, lines = graph.evaluate({"x": 50.0, "rate": 7.0}, pct_of(200.0))
+
+    assert lines == {"a": (50.0, 25.0), "b": (50.0, 7.0)}
+
+
+def test_shared_nodes_are_evaluated_once_per_engine():
+    shared = {node.name for node in SHARED_NODES}
+    for graph in (PAC_INPUT_GRAPH, PAC_ACTUAL_GRAPH):
+        src, _ = graph.source()
+        for name in shared:
+            assert src.count(f"    {name} = ") == 1
+
+
+def test_engines_agree_on_shared_formulas():
+    inputs = {
+        "product_sales": 100000.0, "all_net_sales": 102800.0, "cash_adjustments": 0.0,
+        "promotions": 2000.0, "manager_meals": 300.0, "advertising_percent": 2.0,
+        "raw_waste_percent": 1.8, "complete_waste_percent": 2.5, "condiment_percent": 3.2,
+        "crew_labor_percent": 25.5, "total_labor_percent": 35.0, "payroll_tax_rate": 8.5,
+    }
+    input_values, _ = PAC_INPUT_GRAPH.evaluate(
+        {name: inputs.get(name, 0.0) for name in PAC_INPUT_GRAPH.inputs}, pct_of(100000.0)
+    )
+    actual_values, _ = PAC_ACTUAL_GRAPH.evaluate(
+        {name: inputs.get(name, 0.0) for name in PAC_ACTUAL_GRAPH.inputs}, pct_of(100000.0)
+    )
+
+    for node in ("other_food_components", "employee_meal", "condiment", "total_waste",
+                 "crew_labor", "management_labor", "payroll_tax", "promotion_from_sales"):
+        assert input_values[node] == actual_values[node]
+    assert actual_values["payroll_tax"] == pytest.approx(2975.0)
+
+
+def test_sensitivity_splits_direct_and_percent_coefficients():
+    graph = FormulaGraph("t", [
+        Node("total", "a + 2 * b"),
+        Node("share", "100 - pct(total)"),
+    ], [Line("total", "total")])
+    sensitivity = graph.sensitivity("b")
+
+    assert sensitivity["nodes"] == {"total": (2.0, 0.0), "share": (0.0, -2.0)}
+    assert sensitivity["dollars"] == {"total": (2.0, 0.0)}
+    assert sensitivity["percents"] == {"total": (0.0, 2.0)}
+
+
+def test_sensitivity_rejects_non_affine_inputs():
+    graph = FormulaGraph("t", [Node("labor", "(rate / 100) * sales")], [])
+    with pytest.raises(FormulaGraphError, match="affine"):
+        graph.sensitivity("sales")
+
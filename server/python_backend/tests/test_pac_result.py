@@ -0,0 +1,50 @@
+"""
+Tests for the slot-based CompactPacResult
+"""
+import pytest
+from decimal import Decimal
+from services.pac_calculation_service import PacCalculationService
+from services.pac_batch_service import calculate_pac_batch_compact
+from services.account_mapping_service import AccountMappingService
+from tests.test_pac_batch_service import make_input
+
+
+@pytest.fixture
+def pac_service():
+    return PacCalculationService(None, AccountMappingService())
+
+
+def test_compact_lines_match_model(pac_service):
+    input_data = make_input(3)
+    compact = pac_service.calculate_pac_compact(input_data)
+    model = pac_service.calculate_pac_from_input(input_data)
+
+    assert compact.line("payroll_tax") == (
+        model.controllable_expenses.payroll_tax.dollars,
+        model.controllable_expenses.payroll_tax.percent,
+    )
+    assert compact.pac_dollars == model.pac_dollars
+    assert compact.value("non_product_usage") == model.amount_used.non_product
+    assert compact.to_model() == model
+
+
+def test_to_model_is_built_once(pac_service):
+    compact = pac_service.calculate_pac_compact(make_input(1))
+    assert compact.to_model() is compact.to_model()
+
+
+def test_compact_has_no_instance_dict():
+    compact, = calculate_pac_batch_compact([make_input(2)])
+    assert not hasattr(compact, "__dict__")
+    assert isinstance(compact.line("base_food")[0], float)
+    assert isinstance(compact.to_model().pac_dollars, Decimal)
+
+
+def test_zero_sales_compact_result(pac_service):
+    empty = make_input(0).model_copy(update={"product_net_sales": Decimal("0")})
+    compact = pac_service.calculate_pac_compact(empty)
+
+    assert not compact.valid
+    assert compact.line("crew_labor") == (0, 0)
+    assert compact.to_model() == pac_service.calculate_pac_from_input(empty)
+    assert compact.to_model().controllable_expenses.base_food.dollars == Decimal("0")
@@ -0,0 +1,62 @@
+"""
+Tests for PAC actual range rollups
+"""
+import pytest
+from services.pac_calculation_service import calculate_pac_actual
+from services.pac_rollup_service import month_range, rollup_months, rollup_pac_actual, shift_month
+
+
+def make_doc(product_sales: float, crew_labor_percent: float) -> dict:
+    return calculate_pac_actual(
+        {
+            "sales": {"productNetSales": product_sales, "allNetSales": product_sales},
+            "labor": {"crewLabor": crew_labor_percent, "totalLabor": crew_labor_percent},
+        },
+        {"totals": {"M+R": 100}},
+    )
+
+
+def test_month_helpers_cross_year_boundaries():
+    assert shift_month("202501", -1) == "202412"
+    assert shift_month("202412", 13) == "202601"
+    assert month_range("202411", "202502") == ["202411", "202412", "202501", "202502"]
+    assert rollup_months("202503", "202504")["trailing12"][0] == "202405"
+
+
+def test_month_range_rejects_reversed_and_oversized_ranges():
+    with pytest.raises(ValueError):
+        month_range("202502", "202501")
+    with pytest.raises(ValueError):
+        month_range("200001", "202501")
+
+
+def test_rollup_sums_dollars_and_recomputes_percent_from_sales():
+    docs = {
+        "202412": make_doc(50000, 30),
+        "202501": make_doc(100000, 20),
+        "202502": make_doc(300000, 10),
+    }
+    result = rollup_pac_actual("202501", "202503", docs)
+
+    assert [m["yearMonth"] for m in result["series"]] == ["202501", "202502", "202503"]
+    assert result["series"][2]["data"] is None
+
+    ytd = result["ytd"]
+    assert ytd["months"] == ["202501", "202502"]
+    assert ytd["sales"]["productSales"]["dollars"] == 400000
+    assert ytd["labor"]["crewLabor"]["dollars"] == pytest.approx(50000)
+    assert ytd["labor"]["crewLabor"]["percent"] == pytest.approx(12.5)
+    assert ytd["purchases"]["maintenanceRepair"]["dollars"] == 200
+
+    t12 = result["trailing12"]
+    assert t12["monthsWithData"] == 3
+    assert t12["labor"]["crewLabor"]["dollars"] == pytest.approx(65000)
+    assert t12["totals"]["pac"]["dollars"] == pytest.approx(
+        450000 - t12["totals"]["totalControllable"]["dollars"]
+    )
+
+
+def test_rollup_without_data_returns_zero_aggregates():
+    result = rollup_pac_actual("202501", "202501", {})
+    assert result["ytd"]["monthsWithData"] == 0
+    assert result["ytd"]["totals"]["pac"]["dollars"] == 0
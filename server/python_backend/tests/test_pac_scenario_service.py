@@ -0,0 +1,64 @@
+"""
+Tests for vectorized PAC what-if scenarios
+"""
+import pytest
+from services.pac_batch_service import calculate_pac_batch_compact
+from services.pac_scenario_service import MAX_SCENARIO_POINTS, evaluate_scenario, scenario_grid
+from tests.test_pac_batch_service import make_input
+
+
+def test_grid_is_cartesian_product_in_c_order():
+    axis, grid = scenario_grid({
+        "crew_labor_percent": {"values": [-1, 0, 1]},
+        "product_sales": {"start": 0, "stop": 10, "steps": 2},
+    })
+    assert axis["product_sales"].tolist() == [0, 10]
+    assert grid["crew_labor_percent"].tolist() == [-1, -1, 0, 0, 1, 1]
+    assert grid["product_sales"].tolist() == [0, 10, 0, 10, 0, 10]
+
+
+def test_grid_rejects_unknown_levers_and_oversized_grids():
+    with pytest.raises(ValueError, match="Unknown"):
+        scenario_grid({"rent": {"values": [1]}})
+    with pytest.raises(ValueError, match="at most"):
+        scenario_grid({
+            "crew_labor_percent": {"start": 0, "stop": 1, "steps": 1000},
+            "product_sales": {"start": 0, "stop": 1, "steps": MAX_SCENARIO_POINTS // 1000 + 1},
+        })
+
+
+def test_zero_adjustment_matches_base_calculation():
+    input_data = make_input(3)
+    expected = calculate_pac_batch_compact([input_data])[0]
+    result = evaluate_scenario(input_data, {"condiment_percent": {"values": [0.0]}})
+
+    assert result["points"] == 1
+    assert result["surface"]["pac_percent"][0] == pytest.approx(expected.pac_percent, abs=1e-4)
+    assert result["base"]["pac_percent"] == pytest.approx(expected.pac_percent, abs=1e-4)
+
+
+def test_lever_effects_on_pac_percent():
+    input_data = make_input(3)
+    result = evaluate_scenario(input_data, {
+        "crew_labor_percent": {"values": [0, 1]},
+        "waste_percent": {"values": [0, 1]},
+    })
+    base, waste, crew, both = result["surface"]["pac_percent"]
+    payroll_tax_rate = float(input_data.payroll_tax_rate)
+
+    assert result["shape"] == [2, 2]
+    assert crew - base == pytest.approx(-(1 + payroll_tax_rate / 100), abs=1e-3)
+    assert waste - base == pytest.approx(-1, abs=1e-3)
+    assert both - base == pytest.approx((crew - base) + (waste - base), abs=1e-3)
+
+
+def test_ten_thousand_point_sweep():
+    result = evaluate_scenario(make_input(1), {
+        "crew_labor_percent": {"start": -2, "stop": 2, "steps": 10},
+        "waste_percent": {"start": -0.5, "stop": 0.5, "steps": 10},
+        "condiment_percent": {"start": -0.5, "stop": 0.5, "steps": 10},
+        "advertising_percent": {"start": -1, "stop": 1, "steps": 5},
+        "product_sales": {"start": -5, "stop": 5, "steps": 2},
+    })
+    assert result["points"] == 10000
+    assert len(result["surface"]["pac_dollars"]) == 10000
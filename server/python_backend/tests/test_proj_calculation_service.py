@@ -125,4 +125,45 @@ def test_apply_all_returns_full_pipeline(proj_service, seeded_rows):
 
 def test_prev_year_month_wraps_year_correctly(proj_service):
     assert proj_service.prev_year_month(2024, 1) == (2023, 12)
-    assert proj_service.prev_year_month(2024, 5) == (2024, 4)
\ No newline at end of file
+    assert proj_service.prev_year_month(2024, 5) == (2024, 4)
+
+
+@pytest.mark.parametrize("variable,line", [
+    ("crew_labor_percent", None),
+    ("purchase", "Utilities"),
+    ("product_sales", None),
+])
+def test_solve_pac_goal_hits_target(proj_service, variable, line):
+    result = proj_service.solve_pac_goal(proj_service.ingestion.mock_rows, 9.0, variable, line)
+
+    assert result["solved"]
+    assert result["method"] == ("bisection" if variable == "product_sales" else "closed_form")
+    pac = next(r for r in result["rows"] if r["name"] == "P.A.C.")
+    assert pac["projectedPercent"] == pytest.approx(9.0, abs=0.01)
+    # Inputs move in cents, so the goal is met to the displayed precision
+    assert abs(proj_service.projected_pac_percent(result["rows"]) - Decimal("9.00")) <= Decimal("0.01")
+
+
+def test_solve_pac_goal_reports_unreachable_targets(proj_service):
+    # Sales can only approach 100% minus the variable cost share, never exceed it
+    result = proj_service.solve_pac_goal(proj_service.ingestion.mock_rows, 15.0, "product_sales")
+    assert not result["solved"]
+    assert result["value"] is None
+
+    with pytest.raises(ValueError):
+        proj_service.solve_pac_goal(proj_service.ingestion.mock_rows, 15.0, "purchase", "Base Food")
+
+
+@pytest.mark.asyncio
+async def test_solve_pac_goals_uses_saved_goal_and_isolates_errors(proj_service):
+    results = await proj_service.solve_pac_goals([
+        {"store_id": "store1", "year": 2024, "month_index_1": 1, "variable": "crew_labor_percent"},
+        {"store_id": "store2", "rows": proj_service.ingestion.mock_rows, "variable": "rent",
+         "target_pac_percent": 10.0},
+    ])
+
+    assert results[0]["store_id"] == "store1"
+    assert results[0]["target"] == 15.0
+    assert results[0]["solved"]
+    assert not results[1]["solved"]
+    assert "rent" in results[1]["error"]
@@ -0,0 +1,101 @@
+"""
+Tests for the pac-projections schema and its backfill
+"""
+import pytest
+from decimal import Decimal
+from main_helpers.migrate_projection_schema import migrate_projections
+from services.projection_schema import (
+    PROJECTION_SCHEMA_VERSION,
+    current_projection,
+    index_projection_rows,
+    projection_document,
+    projection_line,
+    projection_upgrade,
+)
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+from tests.test_data_ingestion_service import make_service
+
+ROWS = [
+    {"name": "Product Sales", "projectedDollar": 1000, "projectedPercent": 100},
+    {"name": "Cash +/-", "projectedDollar": "-5", "projectedPercent": -0.5},
+    {"name": "Adv Other", "projectedDollar": 0, "projectedPercent": 0},
+    {"name": "Advertising Other", "projectedDollar": 40, "projectedPercent": 4},
+    {"name": " maint. & repair ", "projectedDollar": 25, "projectedPercent": 2.5},
+    {"name": "Training", "projectedDollar": 12},
+    {"name": "Crew Relations", "projectedDollar": 8},
+    {"name": "Unknown line", "projectedDollar": 99},
+    {"name": "Product Sales", "projectedDollar": 1},  # later duplicates are ignored
+]
+
+LEGACY = {"store_id": "store_001", "pacGoal": 12.5, "rows": ROWS, "purchases": {"travel": 3.0}}
+
+
+def test_rows_are_indexed_by_line_id():
+    lines = index_projection_rows(ROWS)
+
+    assert lines["product_sales"] == {"dollars": 1000.0, "percent": 100.0}
+    assert lines["cash_adjustments"] == {"dollars": -5.0, "percent": -0.5}
+    assert lines["advertising_other"]["dollars"] == 40.0  # zero canonical row falls back to the alias
+    assert lines["maintenance_repair"]["dollars"] == 25.0
+    assert lines["training"] == {"dollars": 12.0, "percent": 0.0}
+    assert "travel" not in lines and len(lines) == 6
+
+
+def test_saved_document_carries_lines_and_structured_fields():
+    doc = projection_document("store_001", 2025, 1, 12.5, ROWS)
+
+    assert doc["schemaVersion"] == PROJECTION_SCHEMA_VERSION
+    assert doc["rows"] is ROWS
+    assert (doc["product_net_sales"], doc["cash_adjustments"]) == (1000.0, -5.0)
+    assert doc["purchases"]["advertising_other"] == 40.0
+    assert doc["purchases"]["operating_supply"] == 0.0
+    assert projection_upgrade(doc) is None
+    assert current_projection(doc) is doc
+
+
+def test_upgrade_keeps_stored_sales_and_fills_missing_purchases():
+    upgrade = projection_upgrade({**LEGACY, "product_net_sales": 1200})
+
+    assert upgrade["product_net_sales"] == 1200
+    assert upgrade["purchases"]["travel"] == 0.0  # derived from rows, like the old read path
+    assert upgrade["purchases"]["crew_relations"] == 8.0
+    assert projection_line(current_projection(LEGACY), "training")["dollars"] == 12.0
+    assert projection_line(current_projection(LEGACY), "linen") == {"dollars": 0.0, "percent": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_backfill_upgrades_old_documents_once():
+    storage = SqliteStorage(":memory:")
+    current = projection_document("store_001", 2025, 2, 10, ROWS)
+    storage.batch_sync([
+        WriteOp("pac-projections", "store_001_202501", LEGACY),
+        WriteOp("pac-projections", "store_001_202502", current),
+        WriteOp("pac-projections", "store_002_202501", {"pacGoal": 5}),
+    ])
+
+    assert await migrate_projections(storage, dry_run=True) == {"scanned": 3, "upgraded": 2}
+    assert "lines" not in await storage.get("pac-projections", "store_001_202501")
+
+    assert await migrate_projections(storage, page_size=2) == {"scanned": 3, "upgraded": 2}
+    upgraded = await storage.get("pac-projections", "store_001_202501")
+    assert upgraded == {**LEGACY, **projection_upgrade(LEGACY)}
+    assert await storage.get("pac-projections", "store_002_202501") == {
+        "pacGoal": 5, "lines": {}, "product_net_sales": 0.0, "cash_adjustments": 0.0,
+        "purchases": {}, "schemaVersion": PROJECTION_SCHEMA_VERSION,
+    }
+    assert await migrate_projections(storage) == {"scanned": 3, "upgraded": 0}
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_input_is_the_same_before_and_after_the_backfill():
+    legacy = make_service({"pac-projections/store_001_202501": LEGACY})
+    upgraded = make_service({"pac-projections/store_001_202501": current_projection(LEGACY)})
+
+    before = await legacy.get_input_data_async("store_001", "202501")
+    after = await upgraded.get_input_data_async("store_001", "202501")
+
+    assert before == after
+    assert after.purchases.crew_relations == Decimal("8.0")
+    assert after.purchases.advertising_other == Decimal("40.0")
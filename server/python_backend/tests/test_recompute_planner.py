@@ -0,0 +1,106 @@
+"""
+Tests for planning transitive pac_actual recomputes
+"""
+import pytest
+from services.pac_actual_service import PacActualService
+from services.pac_cache import PacResultCache
+from services.pac_rollup_service import shift_month
+from services.recompute_planner import RecomputePlanner
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+from tests.test_pac_actual_service import gi
+from tests.test_pac_bulk_recompute import comparable
+
+# Four years of one store: changes near the start reach dependents 24 months on
+STORE_MONTHS = [("store_001", shift_month("202301", i)) for i in range(48)]
+
+
+def months(plan):
+    return [ym for _, ym in plan]
+
+
+def test_depth_one_plans_every_month_that_reads_the_change():
+    plan = RecomputePlanner().plan([("store_001", "202406")])
+
+    assert months(plan) == ["202407", "202506", "202507", "202606"]
+
+
+def test_deeper_plans_are_transitive_and_topologically_ordered():
+    plan = RecomputePlanner(max_depth=2, horizon_months=24).plan([("store_001", "202406")])
+
+    assert months(plan) == ["202407", "202408", "202506", "202507", "202508", "202606"]
+    position = {key: i for i, key in enumerate(plan)}
+    assert position[("store_001", "202407")] < position[("store_001", "202508")]  # 202508 reads 202407
+
+
+def test_horizon_and_skip_bound_the_plan():
+    planner = RecomputePlanner(max_depth=3, horizon_months=2)
+
+    plan = planner.plan([("store_001", "202406"), ("store_002", "202406")], skip=[("store_001", "202407")])
+
+    assert plan == [("store_002", "202407"), ("store_001", "202408"), ("store_002", "202408")]
+
+
+def test_max_months_caps_the_plan_and_counts_the_rest():
+    planner = RecomputePlanner(max_months=2)
+
+    assert months(planner.plan([("store_001", "202406")])) == ["202407", "202506"]
+    assert planner.stats()["truncated"] == 2
+
+
+@pytest.mark.asyncio
+async def test_compute_cascades_two_years_ahead():
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", gi(1000)),
+        WriteOp("generate_input", "store_001_202606", gi(1300)),
+        WriteOp("pac_actual", "store_001_202606", {"stale": True}),
+    ])
+    service = PacActualService(storage, result_cache=PacResultCache(max_entries=0))
+
+    result = await service.compute("store_001", "202406")
+
+    assert result["cascaded_months"] == ["202606"]
+    dependent = await storage.get("pac_actual", "store_001_202606")
+    assert dependent["salesComparison"]["lastYearLastYearProductSales"] == 1000.0
+    storage.close()
+
+
+async def computed_store(sales_by_month):
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", f"{store_id}_{ym}", gi(sales_by_month[ym])) for store_id, ym in STORE_MONTHS
+    ])
+    service = PacActualService(storage, result_cache=PacResultCache(max_entries=0))
+    await service.recompute_many(STORE_MONTHS, cascade=False)
+    return storage
+
+
+async def pac_actuals(storage):
+    return {doc_id: comparable(doc) for doc_id, doc in await storage.scan("pac_actual")}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("changed", ["202301", "202412", "202506", "202612"])
+async def test_default_depth_leaves_no_month_stale(changed):
+    sales = {ym: 1000 + 10 * i for i, (_, ym) in enumerate(STORE_MONTHS)}
+    storage = await computed_store(sales)
+    before = await pac_actuals(storage)
+
+    # Saved and cascaded at the default depth, as /actual/compute and the queue do
+    sales[changed] = 5000
+    await storage.set("generate_input", f"store_001_{changed}", gi(5000))
+    service = PacActualService(storage, result_cache=PacResultCache(max_entries=0), planner=RecomputePlanner())
+    result = await service.compute("store_001", changed)
+
+    # Every month equals a recompute of the whole store from the new inputs...
+    expected = await computed_store(sales)
+    after = await pac_actuals(storage)
+    assert after == await pac_actuals(expected)
+    # ...and the months that changed are the saved one and the +1/+12/+13/+24 months that read it
+    moved = sorted(doc_id[-6:] for doc_id in after if after[doc_id] != before[doc_id])
+    readers = [ym for ym in (shift_month(changed, n) for n in (1, 12, 13, 24)) if ("store_001", ym) in STORE_MONTHS]
+    assert moved == sorted([changed] + readers)
+    assert result["cascaded_months"] == readers
+    storage.close()
+    expected.close()
@@ -0,0 +1,159 @@
+"""
+Tests for the background cascade recompute queue
+"""
+import asyncio
+import pytest
+import pytest_asyncio
+from services.pac_actual_service import PacActualService
+from services.pac_cache import PacResultCache
+from services.recompute_queue import PENDING_CASCADES_COLLECTION, RECOMPUTE_JOBS_COLLECTION, RecomputeQueue
+from services.sqlite_storage import SqliteStorage
+from services.storage import WriteOp
+from tests.test_pac_actual_service import gi
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    storage.batch_sync([
+        WriteOp("generate_input", "store_001_202406", gi(1000)),
+        WriteOp("generate_input", "store_001_202407", gi(1100)),
+        WriteOp("pac_actual", "store_001_202407", {"stale": True}),
+        WriteOp("generate_input", "store_001_202506", gi(1200)),  # no pac_actual: skipped
+    ])
+    yield storage
+    storage.close()
+
+
+@pytest_asyncio.fixture
+async def make_queue():
+    queues = []
+
+    def make(storage, **kwargs):
+        queues.append(RecomputeQueue(storage, result_cache=PacResultCache(max_entries=0), **kwargs))
+        return queues[-1]
+
+    yield make
+    for queue in queues:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_job_recomputes_existing_months_in_the_background(storage, make_queue):
+    queue = make_queue(storage)
+
+    job = await queue.enqueue("1", ["202407", "202506"], source="store_001_202406")
+    assert job["status"] == "queued"
+    assert await storage.get("pac_actual", "store_001_202407") == {"stale": True}
+    assert (await storage.get(RECOMPUTE_JOBS_COLLECTION, job["jobId"]))["status"] == "queued"
+    assert (await storage.get(PENDING_CASCADES_COLLECTION, job["jobId"]))["months"] == job["months"]
+
+    await queue.join()
+
+    status = await queue.status(job["jobId"])
+    assert status["status"] == "completed"
+    assert (status["recomputed"], status["skipped"]) == (["store_001_202407"], ["store_001_202506"])
+    recomputed = await storage.get("pac_actual", "store_001_202407")
+    assert recomputed["lastUpdatedBy"] == "System (Cascade)"
+    assert (await storage.get(RECOMPUTE_JOBS_COLLECTION, job["jobId"]))["status"] == "completed"
+    assert await storage.get(PENDING_CASCADES_COLLECTION, job["jobId"]) is None
+
+
+@pytest.mark.asyncio
+async def test_pending_months_are_coalesced_across_jobs(storage, make_queue, monkeypatch):
+    release = asyncio.Event()
+    calls = []
+    recompute_existing = PacActualService.recompute_existing
+
+    async def after_release(self, store_months):
+        calls.append(list(store_months))
+        await release.wait()
+        return await recompute_existing(self, store_months)
+
+    monkeypatch.setattr(PacActualService, "recompute_existing", after_release)
+    queue = make_queue(storage, workers=1)
+    await queue.enqueue("store_001", ["202406"])
+    await asyncio.sleep(0)  # the only worker is busy; the next jobs wait in the queue
+
+    first = await queue.enqueue("store_001", ["202407", "202506"])
+    second = await queue.enqueue("store_001", ["202407"])
+    release.set()
+    await queue.join()
+
+    assert second["coalesced"] == 1
+    assert calls[1:] == [[("store_001", "202407"), ("store_001", "202506")]]  # read and written together
+    assert queue.stats()["recomputed"] == 1
+    for job in (first, second):
+        assert (await queue.status(job["jobId"]))["recomputed"] == ["store_001_202407"]
+
+
+@pytest.mark.asyncio
+async def test_month_queued_while_running_is_recomputed_again(storage, make_queue, monkeypatch):
+    release = asyncio.Event()
+    calls = []
+
+    async def recompute_existing(self, store_months):
+        calls.append(list(store_months))
+        await release.wait()
+        return list(store_months)
+
+    monkeypatch.setattr(PacActualService, "recompute_existing", recompute_existing)
+    queue = make_queue(storage)
+
+    first = await queue.enqueue("store_001", ["202407"])
+    await asyncio.sleep(0)  # a worker picks the month up
+    second = await queue.enqueue("store_001", ["202407"])
+    assert (await queue.status(first["jobId"]))["status"] == "running"
+    release.set()
+    await queue.join()
+
+    assert calls == [[("store_001", "202407")], [("store_001", "202407")]]
+    assert (await queue.status(second["jobId"]))["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_failed_recompute_fails_its_jobs_and_keeps_the_worker(storage, make_queue, monkeypatch):
+    async def broken(self, store_months):
+        raise RuntimeError("storage down")
+
+    queue = make_queue(storage, workers=1)
+    monkeypatch.setattr(PacActualService, "recompute_existing", broken)
+    failed = await queue.enqueue("store_001", ["202407"])
+    await queue.join()
+    monkeypatch.undo()
+    ok = await queue.enqueue("store_001", ["202407"])
+    await queue.join()
+
+    failed = await queue.status(failed["jobId"])
+    assert (failed["status"], failed["error"], failed["skipped"]) == ("failed", "storage down", ["store_001_202407"])
+    assert (await queue.status(ok["jobId"]))["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_jobs_left_queued_by_a_stopped_process_are_resumed(storage, make_queue, monkeypatch):
+    async def stuck(self, store_months):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(PacActualService, "recompute_existing", stuck)
+    stopped = make_queue(storage)
+    job = await stopped.enqueue("store_001", ["202407", "202506"], source="store_001_202406")
+    await asyncio.sleep(0)  # a worker picks the months up
+    await stopped.close()  # restart or deploy mid-recompute
+    monkeypatch.undo()
+    assert await storage.get("pac_actual", "store_001_202407") == {"stale": True}
+
+    queue = make_queue(storage)
+    assert await queue.resume() == 1
+    await queue.join()
+
+    status = await queue.status(job["jobId"])
+    assert (status["status"], status["source"]) == ("completed", "store_001_202406")
+    assert (status["recomputed"], status["skipped"]) == (["store_001_202407"], ["store_001_202506"])
+    assert (await storage.get("pac_actual", "store_001_202407"))["lastUpdatedBy"] == "System (Cascade)"
+    assert (await storage.get(RECOMPUTE_JOBS_COLLECTION, job["jobId"]))["status"] == "completed"
+    assert await make_queue(storage).resume() == 0  # finished jobs are not resumed again
+
+
+@pytest.mark.asyncio
+async def test_status_of_unknown_job_is_none(storage, make_queue):
+    assert await make_queue(storage).status("missing") is None
@@ -0,0 +1,97 @@
+"""
+Tests for the per-store sales index
+"""
+import asyncio
+import pytest
+from services import sales_index_service
+from services.document_loader import DocumentLoader
+from services.sales_index_service import SALES_INDEX_COLLECTION, SalesIndexService, product_net_sales
+from services.sqlite_storage import SqliteStorage
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+def gi(sales):
+    return {"sales": {"productNetSales": sales}}
+
+
+def test_product_net_sales_parses_client_formats():
+    assert product_net_sales(gi("$1,234.50")) == 1234.5
+    assert product_net_sales(gi(900)) == 900.0
+    assert product_net_sales(gi("n/a")) == 0.0
+    assert product_net_sales({}) == 0.0
+    assert product_net_sales(None) == 0.0
+
+
+async def rebuilds_finished():
+    await asyncio.gather(*list(sales_index_service._rebuild_tasks.values()))
+
+
+@pytest.mark.asyncio
+async def test_store_without_an_index_reads_generate_input_and_is_rebuilt_in_the_background(storage):
+    for ym, sales in (("202401", 90), ("202412", "$95"), ("202501", 100)):
+        await storage.set("generate_input", f"store_001_{ym}", gi(sales))
+    await storage.set("generate_input", "store_002_202401", gi(5))
+
+    service = SalesIndexService(storage, DocumentLoader(storage))
+    assert await service.lookup("store_001", ["202401", "202412", "202312"]) == {
+        "202401": 90.0, "202412": 95.0, "202312": None,
+    }
+    await rebuilds_finished()
+
+    index = await storage.get(SALES_INDEX_COLLECTION, "store_001")
+    assert index["complete"] is True
+    assert index["months"] == {"202401": 90.0, "202412": 95.0, "202501": 100.0}
+    loader = DocumentLoader(storage)
+    assert await SalesIndexService(storage, loader).lookup("store_001", ["202501", "202312"]) == {
+        "202501": 100.0, "202312": None,
+    }
+    assert loader.stats()["fetched"] == 1  # the index document alone
+
+
+@pytest.mark.asyncio
+async def test_lookup_many_reads_every_store_in_one_round_trip(storage):
+    await storage.set("generate_input", "store_001_202401", gi(90))
+    await storage.set("generate_input", "store_002_202312", gi(80))
+    for store_id in ("store_001", "store_002"):
+        await SalesIndexService(storage, DocumentLoader(storage)).rebuild(store_id)
+
+    loader = DocumentLoader(storage)
+    found = await SalesIndexService(storage, loader).lookup_many({
+        "store_001": ["202401", "202312"], "store_002": ["202312"],
+    })
+
+    assert found == {"store_001": {"202401": 90.0, "202312": None}, "store_002": {"202312": 80.0}}
+    assert loader.stats()["roundTrips"] == 1
+
+
+@pytest.mark.asyncio
+async def test_record_updates_one_month_and_skips_unchanged(storage):
+    await storage.set("generate_input", "store_001_202401", gi(90))
+    service = SalesIndexService(storage, DocumentLoader(storage))
+    await service.rebuild("store_001")
+
+    await storage.set("generate_input", "store_001_202402", gi(120))
+    assert await service.record("store_001", "202402", gi(120)) is True
+    assert await service.record("store_001", "202402", gi(120)) is False
+    assert await service.lookup("store_001", ["202401", "202402"]) == {"202401": 90.0, "202402": 120.0}
+
+    # A fresh reader sees the merged document, still complete
+    fresh = SalesIndexService(storage, DocumentLoader(storage))
+    assert await fresh.lookup("store_001", ["202401", "202402"]) == {"202401": 90.0, "202402": 120.0}
+    assert sales_index_service._rebuild_tasks == {}
+
+
+@pytest.mark.asyncio
+async def test_record_many_writes_a_store_once(storage):
+    service = SalesIndexService(storage, DocumentLoader(storage))
+    await service.record_many("store_001", {"202501": gi(100)})
+
+    assert await service.record_many("store_001", {"202501": gi(100), "202502": gi(200)}) is True
+    assert await service.record_many("store_001", {"202502": gi(200)}) is False
+    assert (await storage.get(SALES_INDEX_COLLECTION, "store_001"))["months"] == {"202501": 100.0, "202502": 200.0}
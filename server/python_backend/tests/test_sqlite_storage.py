@@ -0,0 +1,143 @@
+"""
+Tests for the embedded SQLite storage backend
+"""
+import pytest
+from firebase_admin import firestore
+from services.data_ingestion_service import DataIngestionService
+from services.document_loader import DocumentLoader
+from services.sqlite_storage import SqliteStorage
+from services.storage import MAX_BATCH_WRITES, WriteOp, create_storage, set_storage
+
+
+@pytest.fixture
+def storage():
+    storage = SqliteStorage(":memory:")
+    yield storage
+    storage.close()
+
+
+@pytest.mark.asyncio
+async def test_get_many_returns_documents_and_misses(storage):
+    await storage.set("generate_input", "store_001_202501", {"sales": {"productNetSales": 100}})
+    await storage.set("stores", "store_001", {})
+
+    docs = await storage.get_many([
+        ("generate_input", "store_001_202501"),
+        ("generate_input", "store_001_202502"),
+        ("stores", "store_001"),
+    ])
+
+    assert docs == {
+        ("generate_input", "store_001_202501"): {"sales": {"productNetSales": 100}},
+        ("generate_input", "store_001_202502"): None,
+        ("stores", "store_001"): {},
+    }
+
+
+@pytest.mark.asyncio
+async def test_merge_is_deep_and_server_timestamps_are_stored(storage):
+    await storage.set("pac_actual", "store_001_202501", {"sales": {"a": 1, "b": 2}, "x": 1})
+    await storage.set(
+        "pac_actual", "store_001_202501",
+        {"sales": {"b": 3}, "lastUpdatedAt": firestore.SERVER_TIMESTAMP}, merge=True,
+    )
+
+    doc = await storage.get("pac_actual", "store_001_202501")
+    assert doc["sales"] == {"a": 1, "b": 3}
+    assert doc["x"] == 1
+    assert isinstance(doc["lastUpdatedAt"], str)
+
+    await storage.set("pac_actual", "store_001_202501", {"y": 2})
+    assert await storage.get("pac_actual", "store_001_202501") == {"y": 2}
+
+
+@pytest.mark.asyncio
+async def test_batch_writes_and_deletes(storage):
+    ops = [WriteOp("pac_actual", f"store_{i:03d}_202501", {"i": i}) for i in range(MAX_BATCH_WRITES + 20)]
+    await storage.batch(ops)
+    await storage.batch([WriteOp("pac_actual", "store_000_202501", delete=True)])
+
+    docs = await storage.get_many([(op.collection, op.doc_id) for op in ops])
+    assert docs[("pac_actual", "store_000_202501")] is None
+    assert sum(doc is not None for doc in docs.values()) == MAX_BATCH_WRITES + 19
+
+
+@pytest.mark.asyncio
+async def test_query_period_uses_the_store_period_index(storage):
+    for doc_id in ("store_001_202412", "store_001_202502", "store_001_202501", "store_0011_202501"):
+        await storage.set("pac_actual", doc_id, {"id": doc_id})
+
+    assert [ym for ym, _ in await storage.query_period("pac_actual", "store_001")] == ["202412", "202501", "202502"]
+    assert await storage.query_period("pac_actual", "store_001", "202501", "202501") == [
+        ("202501", {"id": "store_001_202501"})
+    ]
+
+    plan = storage._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT data FROM documents"
+        " WHERE collection = ? AND store_id = ? AND year_month BETWEEN ? AND ?",
+        ("pac_actual", "store_001", "202501", "202512"),
+    ).fetchall()
+    assert "ix_documents_store_period" in str(plan)
+
+
+@pytest.mark.asyncio
+async def test_scan_pages_through_a_collection_in_id_order(storage):
+    for doc_id in ("c", "a", "b"):
+        await storage.set("invoice_log_totals", doc_id, {"id": doc_id})
+    await storage.set("pac_actual", "a0", {})
+
+    first = await storage.scan("invoice_log_totals", limit=2)
+    rest = await storage.scan("invoice_log_totals", start_after=first[-1][0], limit=2)
+
+    assert [doc_id for doc_id, _ in first] == ["a", "b"]
+    assert rest == [("c", {"id": "c"})]
+
+
+@pytest.mark.asyncio
+async def test_services_run_on_sqlite_without_firebase(storage):
+    set_storage(storage)
+    try:
+        service = DataIngestionService()
+        await service.save_projections("store_001", 2025, 1, 12.5, [{"name": "Product Sales", "projectedDollar": 1000}])
+
+        assert await service.fetch_projections("store_001", 2025, 1) == (
+            [{"name": "Product Sales", "projectedDollar": 1000}], 12.5
+        )
+        loader = DocumentLoader()
+        assert (await loader.load("pac-projections", "store_001_202501"))["product_net_sales"] == 1000
+    finally:
+        set_storage(None)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_storage("redis")
+
+
+@pytest.mark.asyncio
+async def test_scan_stops_at_end_at(storage):
+    for doc_id in ("a_1", "b_1", "b_2", "c_1"):
+        await storage.set("pac_actual", doc_id, {})
+
+    page = await storage.scan("pac_actual", start_after="a_1", end_at="b_2")
+
+    assert [doc_id for doc_id, _ in page] == ["b_1", "b_2"]
+
+
+@pytest.mark.asyncio
+async def test_transact_writes_from_what_it_read_or_nothing(storage):
+    await storage.set("invoice_log_totals", "store_001_202501", {"totals": {"M+R": 10}})
+
+    def add(docs):
+        totals = docs[("invoice_log_totals", "store_001_202501")]["totals"]
+        return [WriteOp("invoice_log_totals", "store_001_202501", {"totals": {"M+R": totals["M+R"] + 5}}, merge=True)]
+
+    def fail(docs):
+        raise ValueError("conflict")
+
+    ops = await storage.transact([("invoice_log_totals", "store_001_202501")], add)
+    with pytest.raises(ValueError):
+        await storage.transact([("invoice_log_totals", "store_001_202501")], fail)
+
+    assert len(ops) == 1
+    assert await storage.get("invoice_log_totals", "store_001_202501") == {"totals": {"M+R": 15}}